@@ -11,6 +11,7 @@ from pathlib import Path
 import percolate as p8
 from percolate.utils import logger, make_uuid
 from percolate.models.p8.types import Resources
+from percolate.services.PostgresService import should_bulk_upsert
 from percolate.models.media.tus import TusFileUpload
 from percolate.models.media.audio import AudioFile
 from percolate.services.media.audio.processor import AudioProcessor
@@ -117,7 +118,7 @@ async def create_resources_from_upload(upload_id: str, save_resources: bool=True
                 userid = chunks[0].userid if chunks else None
                 logger.info(f"Saving {len(chunks)} resources to database with userid: {userid}")
                 from percolate.models.p8.types import Resources
-                p8.repository(Resources).update_records(chunks)
+                p8.repository(Resources).update_records(chunks, bulk=should_bulk_upsert(chunks))
             
             # Update the upload record to link it to the first resource
             upload.resource_id = str(chunks[0].id)
@@ -242,7 +243,7 @@ async def create_audio_resources(upload: TusFileUpload, s3_uri: str, user_id: Op
             
             # Save all resources
             if resources:
-                p8.repository(Resources).update_records(resources)
+                p8.repository(Resources).update_records(resources, bulk=should_bulk_upsert(resources))
                 logger.info(f"Created {len(resources)} audio resources from {len(chunks)} chunks")
                 
                 # Update upload with resource references
@@ -331,7 +332,7 @@ async def create_document_resources(upload: TusFileUpload, s3_uri: str, user_id:
         
         # Save all resources to database
         if resources:
-            p8.repository(Resources).update_records(resources)
+            p8.repository(Resources).update_records(resources, bulk=should_bulk_upsert(resources))
         
         # Update upload with resource references
         resource_ids = [str(r.id) for r in resources]
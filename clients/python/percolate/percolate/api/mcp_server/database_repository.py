@@ -123,7 +123,7 @@ class DatabaseRepository(BaseMCPRepository):
     ) -> List[Dict[str, Any]]:
         """Search for entities"""
         # Use PercolateAgent repository for general search
-        repo = p8.repository(
+        repo = p8.async_repository(
             PercolateAgent,
             user_id=self.user_id,
             user_groups=self.user_groups,
@@ -131,7 +131,7 @@ class DatabaseRepository(BaseMCPRepository):
         )
         
         # Use the search method which returns raw results
-        results = repo.search(query)
+        results = await repo.search(query)
         
         # Handle the response - search returns a list with one dict containing query results
         if results and isinstance(results, list) and len(results) > 0:
@@ -173,7 +173,7 @@ class DatabaseRepository(BaseMCPRepository):
         """List all entities of a specific type"""
         # Special handling for p8.Function
         if entity_type == 'p8.Function':
-            repo = p8.repository(
+            repo = p8.async_repository(
                 Function,
                 user_id=self.user_id,
                 user_groups=self.user_groups,
@@ -181,7 +181,7 @@ class DatabaseRepository(BaseMCPRepository):
             )
             
             # Use select to get all functions
-            results = repo.select()
+            results = await repo.select()
             
             # Extract relevant fields for functions
             function_list = []
@@ -217,7 +217,7 @@ class DatabaseRepository(BaseMCPRepository):
             except:
                 return []
         
-        repo = p8.repository(
+        repo = p8.async_repository(
             model_class,
             user_id=self.user_id,
             user_groups=self.user_groups,
@@ -225,7 +225,7 @@ class DatabaseRepository(BaseMCPRepository):
         )
         
         # Use select to get all entities
-        results = repo.select()
+        results = await repo.select()
         
         entity_list = []
         if results:
@@ -246,7 +246,7 @@ class DatabaseRepository(BaseMCPRepository):
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """Search for functions using the Function model repository"""
-        repo = p8.repository(
+        repo = p8.async_repository(
             Function,
             user_id=self.user_id,
             user_groups=self.user_groups,
@@ -255,7 +255,7 @@ class DatabaseRepository(BaseMCPRepository):
         
         # Use the search method which returns raw results
         logger.debug(f"Searching functions with query: {query}")
-        results = repo.search(query)
+        results = await repo.search(query)
         logger.debug(f"Raw search results type: {type(results)}")
         
         # Handle the response - search returns a list with one dict containing query results
@@ -353,7 +353,7 @@ class DatabaseRepository(BaseMCPRepository):
             combined_context = "\n\n".join(full_context) if full_context else ""
             
             # Now search with enhanced context
-            repo = p8.repository(
+            repo = p8.async_repository(
                 PercolateAgent,
                 user_id=self.user_id,
                 user_groups=self.user_groups,
@@ -365,7 +365,7 @@ class DatabaseRepository(BaseMCPRepository):
                 prompt = f"{combined_context}\n\n{query}"
             
             # Search for relevant help content
-            results = repo.search(prompt)
+            results = await repo.search(prompt)
             
             # Format the response
             if results and isinstance(results, list) and len(results) > 0:
@@ -571,7 +571,7 @@ class DatabaseRepository(BaseMCPRepository):
     ) -> List[Dict[str, Any]]:
         """Search for resources using the Resource model"""
         try:
-            repo = p8.repository(
+            repo = p8.async_repository(
                 Resources,
                 user_id=self.user_id,
                 user_groups=self.user_groups,
@@ -579,7 +579,7 @@ class DatabaseRepository(BaseMCPRepository):
             )
             
             # Use the search method which returns raw results
-            results = repo.search(query)
+            results = await repo.search(query)
             
             # Handle the response - search returns a list with one dict containing query results
             if results and isinstance(results, list) and len(results) > 0:
@@ -11,8 +11,11 @@ import typing
 from typing import Optional
 import uuid
 from percolate.services import PostgresService
+from percolate.services.PostgresService import should_bulk_upsert
 from percolate.models.p8 import IndexAudit
 from percolate.utils import logger
+from percolate.utils.env import P8_JOBS_ENABLED
+from percolate.services.tasks import JobQueue
 from apscheduler.triggers.cron import CronTrigger
 
 import traceback
@@ -95,7 +98,7 @@ async def add_agent(add_request: AddAgentRequest, user: dict = Depends(get_api_k
 
 
 @router.post("/add/project")
-async def add_project(project: Project, user: dict = Depends(get_api_key)):
+def add_project(project: Project, user: dict = Depends(get_api_key)):
     """Post the project yaml/json file to apply the settings. This can be used to add apis, agents and models.
 
     - If you have set environment keys in your API we will sync these to your database if the `sync-env` flag is set in the project options
@@ -106,7 +109,7 @@ async def add_project(project: Project, user: dict = Depends(get_api_key)):
 
 
 @router.get("/slow-endpoint", include_in_schema=False)
-async def slow_response(auth_user_id: Optional[str] = Depends(hybrid_auth)):
+def slow_response(auth_user_id: Optional[str] = Depends(hybrid_auth)):
     """a test utility"""
     import time
 
@@ -123,7 +126,7 @@ class IndexRequest(BaseModel):
 
 
 @router.post("/index/", response_model=IndexAudit)
-async def index_entity(
+def index_entity(
     request: IndexRequest,
     background_tasks: BackgroundTasks,
     sleep_seconds: int = 7,
@@ -151,12 +154,20 @@ async def index_entity(
             s.update_records(record)
             """todo create an audit record pending and use that in the api response"""
             logger.info(f"handling {request=}")
-            background_tasks.add_task(
-                s.index_entity_by_name,
-                request.entity_full_name,
-                id=id,
-                sleep_seconds=sleep_seconds,
-            )
+            if P8_JOBS_ENABLED:
+                """a worker builds the index after the delay instead of this process"""
+                JobQueue().enqueue(
+                    "index.entity",
+                    {"entity_name": request.entity_full_name, "id": str(id)},
+                    delay_seconds=sleep_seconds,
+                )
+            else:
+                background_tasks.add_task(
+                    s.index_entity_by_name,
+                    request.entity_full_name,
+                    id=id,
+                    sleep_seconds=sleep_seconds,
+                )
             return record
         else:
             record = IndexAudit(
@@ -185,7 +196,7 @@ async def index_entity(
 
 
 @router.get("/index/{id}", response_model=IndexAudit)
-async def get_index(id: uuid.UUID, user: dict = Depends(get_api_key)) -> IndexAudit:
+def get_index(id: uuid.UUID, user: dict = Depends(get_api_key)) -> IndexAudit:
     """
     request the status of the index by id
     """
@@ -198,7 +209,7 @@ async def get_index(id: uuid.UUID, user: dict = Depends(get_api_key)) -> IndexAu
 
 
 @router.post("/content/bookmark")
-async def upload_uri(
+def upload_uri(
     request: dict,
     background_tasks: BackgroundTasks,
     task_id: str = None,
@@ -293,7 +304,7 @@ async def upload_uri(
             tr = SessionResources(resource_id=head.id, session_id=task_id, count=length)
 
             """for now we insert seps but in future we will have a function for this"""
-            p8.repository(Resources).update_records(resources)
+            p8.repository(Resources).update_records(resources, bulk=should_bulk_upsert(resources))
             p8.repository(SessionResources).update_records(tr)
 
             logger.debug(
@@ -346,7 +357,7 @@ optional_hybrid_auth = OptionalHybridAuth()
 
 
 @router.post("/content/upload")
-async def upload_file(
+def upload_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     task_id: str = Form(None),
@@ -452,7 +463,7 @@ async def upload_file(
 
             if resources:
                 # Save all chunks to database using the dynamic model
-                _ = p8.repository(ResourceModel).update_records(resources)
+                _ = p8.repository(ResourceModel).update_records(resources, bulk=should_bulk_upsert(resources))
                 """resources can be stored as chunked but we store a ref to the head only"""
                 tr = SessionResources(
                     resource_id=resources[0].id,
@@ -538,7 +549,7 @@ async def upload_file(
 
 
 @router.get("/content/files")
-async def list_files(
+def list_files(
     task_id: str = "default",
     prefix: str = None,
     user: dict = Depends(get_current_token),
@@ -567,7 +578,7 @@ async def list_files(
 
 
 @router.get("/content/file/{task_id}/{filename:path}")
-async def get_file(
+def get_file(
     task_id: str,
     filename: str,
     prefix: str = None,
@@ -609,7 +620,7 @@ async def get_file(
 
 
 @router.delete("/content/file/{task_id}/{filename:path}")
-async def delete_file(
+def delete_file(
     task_id: str,
     filename: str,
     prefix: str = None,
@@ -651,7 +662,7 @@ async def delete_file(
 
 
 @router.get("/content/url/{task_id}/{filename:path}")
-async def get_presigned_url(
+def get_presigned_url(
     task_id: str,
     filename: str,
     operation: str = "get_object",
@@ -714,7 +725,7 @@ class CreateS3KeyRequest(BaseModel):
 
 
 @router.post("/content/keys")
-async def create_project_keys(
+def create_project_keys(
     request: CreateS3KeyRequest,
     user: dict = Depends(get_api_key),  # Higher security: require API key
 ):
@@ -754,7 +765,7 @@ async def create_project_keys(
 
 # Scheduled tasks endpoints
 @router.post("/schedules", response_model=Schedule)
-async def create_schedule(request: ScheduleCreate, user: dict = Depends(get_api_key)):
+def create_schedule(request: ScheduleCreate, user: dict = Depends(get_api_key)):
     """Create a new scheduled task."""
     from percolate.api.main import scheduler, run_scheduled_job
 
@@ -782,7 +793,7 @@ async def create_schedule(request: ScheduleCreate, user: dict = Depends(get_api_
 
 
 @router.get("/schedules", response_model=typing.List[Schedule])
-async def list_schedules(user: dict = Depends(get_api_key)):
+def list_schedules(user: dict = Depends(get_api_key)):
     """List all active (non-disabled) schedules."""
 
     repo = p8.repository(Schedule)
@@ -792,7 +803,7 @@ async def list_schedules(user: dict = Depends(get_api_key)):
 
 
 @router.delete("/schedules/{schedule_id}", response_model=Schedule)
-async def disable_schedule(schedule_id: str, user: dict = Depends(get_api_key)):
+def disable_schedule(schedule_id: str, user: dict = Depends(get_api_key)):
     """Disable (soft delete) a schedule by setting its disabled_at timestamp."""
     from percolate.api.main import scheduler
 
@@ -849,7 +860,7 @@ class SyncScheduleRequest(BaseModel):
 
 
 @router.post("/sync/schedule", response_model=dict)
-async def create_sync_schedule(
+def create_sync_schedule(
     request: SyncScheduleRequest,
     background_tasks: BackgroundTasks,
     auth_user_id: Optional[str] = Depends(hybrid_auth),
@@ -31,6 +31,7 @@ open-webui/backend/open_webui/utils/chat.py, the chat ID is included in line 211
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query, Path
 from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 import uuid
 import time
@@ -44,6 +45,7 @@ from percolate.api.routes.auth import get_current_token, hybrid_auth, require_us
 import percolate as p8
 from percolate.services import ModelRunner
 from percolate.services.llm import LanguageModel
+from percolate.services.llm.LanguageModel import AsyncStreamingLanguageModel
 from percolate.services.llm.utils import stream_openai_response, stream_anthropic_response, stream_google_response
 from percolate.models import MessageStack
 from percolate.services.llm.CallingContext import CallingContext
@@ -52,6 +54,7 @@ from percolate.utils import logger
 from percolate.models import Session, User,AIResponse
 from percolate.utils import make_uuid
 from percolate.services import ModelCache
+from percolate.services.AuditWriter import audit_writer
 
 import traceback
 # Import models from models.py
@@ -62,7 +65,7 @@ from .models import (
     CompletionsResponse,
     StreamingCompletionsResponseChunk
 )
-from percolate.utils.env import POSTGRES_PASSWORD
+from percolate.utils.env import POSTGRES_PASSWORD, P8_BATCH_MAX_CONCURRENCY
 
 router = APIRouter()
 
@@ -159,11 +162,11 @@ def handle_agent_request(request: CompletionsRequestOpenApiFormat, params: Optio
     if agent_model_name and '-' in agent_model_name:
         agent_model_name = agent_model_name.replace('-', '.')
     
-    # Get or create a ModelRunner with user context
+    # Get a clone of the pooled runner for the agent and role level with this user's context
     runner = get_runner(
         agent_model_name or "p8.Resources",
         user_id=userid,
-        # Add any other user context needed for row-level security
+        role_level=metadata.get('role_level'),
         fallback_to_resources=True
     )
     
@@ -570,11 +573,67 @@ def map_delta_to_canonical_format(data, dialect, model):
     Returns:
         Dict with data converted to canonical format with delta structure
     """
-    # Use the StreamingCompletionsResponseChunk class methods to handle the conversion
-    from .models import StreamingCompletionsResponseChunk
+    # Plain dict translators produce the same chunks as StreamingCompletionsResponseChunk.map_to_canonical_format
+    # without building a model per token (the models are used if P8_STREAM_DELTA_VALIDATION is set)
+    from percolate.services.llm.proxy.translators import to_completions_chunk
     
-    # This delegates the mapping logic to the appropriate method based on the dialect
-    return StreamingCompletionsResponseChunk.map_to_canonical_format(data, dialect, model)
+    return to_completions_chunk(data, dialect, model)
+
+def _sse_heartbeat() -> bytes:
+    """a single minimal heartbeat to establish the connection - this reduces initial latency before content starts flowing"""
+    heartbeat = {
+        "id": str(uuid.uuid4()),
+        "object": "chat.completion.chunk",
+        "choices": [{
+            "index": 0,
+            "delta": {"content": ""},
+            "finish_reason": None
+        }]
+    }
+    return f'data: {json.dumps(heartbeat)}\n\n'.encode('utf-8')
+
+
+def _to_client_sse_chunk(chunk: bytes, from_dialect: str, model: str) -> bytes:
+    """map a provider line to the canonical (openai) SSE format"""
+    
+    """
+    this is convenience that comes at a cost - the user is essentially using all models in the open ai format so we must do some parsing
+    TODO: think more about this
+    """
+    if from_dialect and from_dialect != 'openai':
+        json_data = chunk.decode('utf-8')[6:]
+        if json_data and json_data[0] == '{':       
+            """Parse in valid data and use the canonical mapping"""     
+            canonical_data = map_delta_to_canonical_format(json.loads(json_data), from_dialect, model)
+
+            """recover the SSE binary format"""
+            chunk = f"data: {json.dumps(canonical_data)}\n\n".encode('utf-8')
+    
+    """this should always be the case for properly streaming lines on the client for SSE"""
+    if not chunk.endswith(b'\n\n'):
+        chunk = chunk + b'\n\n'
+    return chunk
+
+
+def _sse_stream_end(done_marker_seen: bool) -> List[bytes]:
+    """
+    Send finish_reason "stop" so clients know the response is complete and
+    always send a [DONE] marker at the end if we haven't seen one yet - this ensures OpenWebUI knows the stream is complete
+    """
+    finish_chunk = {
+        "id": str(uuid.uuid4()),
+        "object": "chat.completion.chunk",
+        "choices": [{
+            "index": 0,
+            "delta": {},
+            "finish_reason": "stop"
+        }]
+    }
+    end = [f'data: {json.dumps(finish_chunk)}\n\n'.encode('utf-8')]
+    if not done_marker_seen:
+        end.append('data: [DONE]\n\n'.encode('utf-8'))
+    return end
+
 
 def stream_generator(response, stream_mode, audit_callback=None, from_dialect='openai', model=None, agent_name=None):
     """
@@ -593,40 +652,13 @@ def stream_generator(response, stream_mode, audit_callback=None, from_dialect='o
     done_marker_seen = False
     
     try:
-        # Optimization: Send only a single minimal heartbeat to establish connection
-        # This reduces initial latency before content starts flowing
-        heartbeat = {
-            "id": str(uuid.uuid4()),
-            "object": "chat.completion.chunk",
-            "choices": [{
-                "index": 0,
-                "delta": {"content": ""},
-                "finish_reason": None
-            }]
-        }
-        yield f'data: {json.dumps(heartbeat)}\n\n'.encode('utf-8')
+        yield _sse_heartbeat()
         
         """TODO: Percolate agents can implement a response with iter_lines() that behave the same as thing but are agentic"""
         for chunk in response.iter_lines():
             """add the decoded lines for later processing"""
             collected_chunks.append(chunk.decode('utf-8'))
-            
-            """
-            this is convenience that comes at a cost - the user is essentially using all models in the open ai format so we must do some parsing
-            TODO: think more about this
-            """
-            if from_dialect and from_dialect != 'openai':
-                json_data = chunk.decode('utf-8')[6:]
-                if json_data and json_data[0] == '{':       
-                    """Parse in valid data and use the canonical mapping"""     
-                    canonical_data = map_delta_to_canonical_format(json.loads(json_data), from_dialect, model)
-
-                    """recover the SSE binary format"""
-                    chunk = f"data: {json.dumps(canonical_data)}\n\n".encode('utf-8')
-            
-            """this should always be the case for properly streaming lines on the client for SSE"""
-            if not chunk.endswith(b'\n\n'):
-                chunk = chunk + b'\n\n'
+            chunk = _to_client_sse_chunk(chunk, from_dialect, model)
             
             # Check if this is a [DONE] marker
             if chunk.decode('utf-8').strip() == 'data: [DONE]':
@@ -639,28 +671,44 @@ def stream_generator(response, stream_mode, audit_callback=None, from_dialect='o
         logger.error(f"Error during streaming in stream_generator: {str(e)}")
         
     finally:
-        # Send finish_reason "stop" if we haven't seen a finish_reason yet
-        # This ensures clients know the response is complete
-        finish_chunk = {
-            "id": str(uuid.uuid4()),
-            "object": "chat.completion.chunk",
-            "choices": [{
-                "index": 0,
-                "delta": {},
-                "finish_reason": "stop"
-            }]
-        }
-        yield f'data: {json.dumps(finish_chunk)}\n\n'.encode('utf-8')
-        
-        # Always send a [DONE] marker at the end if we haven't seen one yet
-        # This ensures OpenWebUI knows the stream is complete
-        if not done_marker_seen:
-            done_marker = 'data: [DONE]\n\n'
-            yield done_marker.encode('utf-8')
+        yield from _sse_stream_end(done_marker_seen)
         
         if audit_callback:
             full_response = "".join(collected_chunks)
             audit_callback(full_response)
+
+
+async def astream_generator(response, stream_mode, audit_callback=None, from_dialect='openai', model=None, agent_name=None):
+    """
+    The async version of `stream_generator` for responses with `aiter_lines` (see AsyncStreamingLanguageModel).
+    Provider lines are awaited on the event loop so a slow stream does not hold a worker thread and the audit runs in the threadpool.
+    """
+    
+    collected_chunks = []
+    done_marker_seen = False
+    
+    try:
+        yield _sse_heartbeat()
+        
+        async for chunk in response.aiter_lines():
+            collected_chunks.append(chunk.decode('utf-8'))
+            chunk = _to_client_sse_chunk(chunk, from_dialect, model)
+            
+            if chunk.decode('utf-8').strip() == 'data: [DONE]':
+                done_marker_seen = True
+            
+            yield chunk
+    
+    except Exception as e:
+        logger.error(f"Error during streaming in astream_generator: {str(e)}")
+        
+    finally:
+        for chunk in _sse_stream_end(done_marker_seen):
+            yield chunk
+        
+        if audit_callback:
+            full_response = "".join(collected_chunks)
+            await run_in_threadpool(audit_callback, full_response)
                
  
 def extract_metadata(request, params=None):
@@ -734,6 +782,11 @@ def extract_metadata(request, params=None):
     
     return metadata
 
+def _update_user_model(user_id: str, last_ai_response: str):
+    """merge the latest session into the user model - runs on the audit writer thread"""
+    p8.repository(User).execute('select * from p8.update_user_model(%s, %s)', data=(user_id, last_ai_response))
+
+
 def audit_request(request:str, 
                   response:str|dict, 
                   metadata:dict=None,
@@ -741,7 +794,7 @@ def audit_request(request:str,
                   max_response_audit_length: int=None):
     """
     Audit the request and response in the database.
-    This is a placeholder for the actual implementation.
+    The records and the user model update are queued on the process audit writer so this does not wait for the database.
     
     Mappings of metadata
     the incoming session_id is actually the thread_id
@@ -773,7 +826,7 @@ def audit_request(request:str,
     try:
         # Create session record with clean metadata
         s = Session(id=session_id, **session_metadata)
-        p8.repository(Session).update_records(s)
+        audit_writer.submit(s)
         logger.info(f"Audited session {session_id} with metadata: {session_metadata}")
         
     except:
@@ -791,8 +844,8 @@ def audit_request(request:str,
         last_ai_response = str(getattr(response, 'content', ''))
         user_id = metadata.get('userid')
         if user_id:
-            p8.repository(User).execute('select * from p8.update_user_model(%s, %s)', data=(user_id, last_ai_response))
-            logger.info(f"Updated user model {metadata['userid']}")
+            audit_writer.submit_task(_update_user_model, user_id, last_ai_response)
+            logger.info(f"Queued user model update {metadata['userid']}")
         else:
             logger.warning("We do not have a user so we cannot audit.")
         
@@ -803,7 +856,7 @@ def audit_request(request:str,
     try:
         """audit ai responses which is only use in the agentic mode"""
         if hasattr(response, 'ai_responses'):
-            p8.repository(AIResponse).update_records(response.ai_responses)
+            audit_writer.submit(response.ai_responses, AIResponse)
             logger.debug(f"Added AI Response audit")
     except:
         logger.warning("Problem with audit response")
@@ -920,8 +973,12 @@ async def completions(
         else:
             handler = handle_openai_request
         
-        # Process the request using the selected handler
-        response = handler(request, params)
+        # Process the request using the selected handler - off the event loop since handlers load settings and may transcribe.
+        # Streaming handlers return an AsyncProviderStream that is read on the event loop by astream_generator
+        if stream_mode:
+            response = await run_in_threadpool(handler, request, params, language_model_class=AsyncStreamingLanguageModel)
+        else:
+            response = await run_in_threadpool(handler, request, params)
         
         # Extract metadata for auditing - for now they are as is and we probably will not support them in the request since its better to stick to the openai scheme in the payload - but we can test this in future
         metadata = params# extract_metadata(request, params)
@@ -936,8 +993,9 @@ async def completions(
                 audit_request(request, full_response, metadata)
                     
             # Create streaming response with all required headers for OpenWebUI compatibility
+            generator = astream_generator if hasattr(response, 'aiter_lines') else stream_generator
             streaming_response = StreamingResponse(
-                stream_generator(
+                generator(
                     response=response,
                     stream_mode=stream_mode,
                     audit_callback=audit_callback,
@@ -1080,7 +1138,8 @@ async def agent_completions(
         params = {k: v for k, v in params.items() if v is not None}
         stream_mode = request.get_streaming_mode(params)
         """wrap the agent call - we can lookup and agent and use the iter lines to get the sse or return the non streaming response"""
-        response = handle_agent_request(request, params, request.model, agent_model_name=agent_name)
+        """the agent loop (tool calls, database) is synchronous so we set it up in the threadpool and the StreamingResponse iterates it there too"""
+        response = await run_in_threadpool(handle_agent_request, request, params, request.model, agent_model_name=agent_name)
         
         if background_tasks:
             background_tasks.add_task(audit_request, request, response, params)
@@ -1180,21 +1239,92 @@ async def google_completions(
  
 
 async def run_agent_in_background(agent, prompt, model, callback_id, session_id):
-    """Run an agent in the background and store results for polling."""
+    """Run an agent in the background and store the outcome as a job that can be polled at /tasks/jobs/{callback_id}.
+    Prefer queuing an agent.run job (POST /tasks/jobs) so that long runs happen on `p8 worker` processes instead."""
+    from percolate.models.p8 import Job, JobStatus
+    
+    job = Job(id=callback_id, name="agent.run", payload={"question": prompt, "model": model, "session_id": session_id},
+              status=JobStatus.Running.value, attempts=1, max_attempts=1)
     try:
-        # Run the agent
-        result = agent.run(prompt, language_model=model)
-        
-        # Store the result in the database or cache for polling
-        # TODO: Implement storing results in database/cache
-        
-        print(f"COMPLETED AGENT TASK {callback_id} FOR SESSION {session_id}")
-        print(f"RESULT: {result}")
+        p8.repository(Job).update_records(job)
+        result = await run_in_threadpool(agent.run, prompt, language_model=model)
+        job.status, job.result = JobStatus.Completed.value, {"content": result}
+        logger.info(f"Completed agent task {callback_id} for session {session_id}")
     except Exception as e:
-        # Store the error for polling
-        print(f"FAILED AGENT TASK {callback_id}: {str(e)}")
+        job.status, job.error = JobStatus.Failed.value, f"{type(e).__name__}: {e}"
+        logger.warning(f"Failed agent task {callback_id}: {e}")
+    job.finished_at = datetime.utcnow()
+    try:
+        p8.repository(Job).update_records(job)
+    except Exception as e:
+        logger.warning(f"Failed to store the outcome of agent task {callback_id}: {e}")
 
  
+class BatchRequest(BaseModel):
+    """Request model to run one agent over many questions."""
+    agent: str = Field(..., description="The agent to run e.g. p8.PercolateAgent")
+    questions: List[str] = Field(..., description="The questions")
+    concurrency: int = Field(4, ge=1, le=P8_BATCH_MAX_CONCURRENCY, description="Questions run at once")
+    model: Optional[str] = Field(None, description="The language model to use - Percolate defaults to GPT models")
+    limit: Optional[int] = Field(None, description="Maximum agent loop iterations per question")
+    stream: bool = Field(False, description="Stream each result as a server sent event as it completes and the summary last")
+    queue: bool = Field(False, description="Run the batch as a job on `p8 worker` processes and return the job to poll")
+
+
+@router.post("/batch")
+async def run_batch(
+    request: BatchRequest,
+    auth_user_id: Optional[str] = Depends(hybrid_auth)
+):
+    """
+    Run an agent over a batch of questions with bounded concurrency and return the throughput and latency summary.
+    
+    Large batches should be queued as a job - the job saves its answers on the job row so that a retried job resumes
+    the batch on any worker.
+    """
+    from percolate.services.BatchRunner import BatchRunner
+    
+    if request.queue:
+        from percolate.services.tasks import JobQueue
+        
+        job_id = str(uuid.uuid1())
+        payload = {
+            "agent": request.agent,
+            "questions": request.questions,
+            "concurrency": request.concurrency,
+            "model": request.model,
+            "limit": request.limit,
+            "userid": auth_user_id,
+            "job_id": job_id,
+        }
+        job = await run_in_threadpool(JobQueue().enqueue, "agent.batch", payload, id=job_id, userid=auth_user_id)
+        return JSONResponse(content=job.model_dump(mode="json"))
+    
+    try:
+        runner = BatchRunner(
+            request.agent,
+            concurrency=request.concurrency,
+            language_model=request.model,
+            limit=request.limit,
+            user_id=auth_user_id,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Unable to load the agent {request.agent}: {str(e)}")
+    
+    if request.stream:
+        def events():
+            """a sync generator is iterated on the threadpool by the streaming response"""
+            for item in runner.stream(request.questions):
+                yield f"data: {item.model_dump_json()}\n\n"
+            yield f"data: {json.dumps({'summary': runner.summary.model_dump(mode='json', exclude={'results'})})}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
+    summary = await run_in_threadpool(runner.run, request.questions)
+    return JSONResponse(content=summary.model_dump(mode="json"))
+
+
 class SimpleAskRequest(BaseModel):
     """Request model for a simple question to an agent."""
     model: Optional[str] = Field(None, description="The language model to use - Percolate defaults to GPT models")
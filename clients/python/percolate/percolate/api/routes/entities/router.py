@@ -36,8 +36,13 @@ async def create_agent(
         # Save agent to database
         from percolate import p8
 
-        repo = p8.repository(Agent, user_id=user_id)
-        result = repo.update_records([agent])
+        repo = p8.async_repository(Agent, user_id=user_id)
+        result = await repo.update_records([agent])
+
+        # Drop the cached model now - the change notification reaches other processes asynchronously
+        from percolate.services.ModelCache import ModelCache
+
+        ModelCache().invalidate_agent({"name": agent.name})
 
         # update_records returns a list, get the first item
         if result and len(result) > 0:
@@ -53,8 +58,8 @@ async def create_agent(
                     function = Function.from_entity(loaded_model)
 
                     # Save the function
-                    function_repo = p8.repository(Function, user_id=user_id)
-                    function_repo.update_records([function])
+                    function_repo = p8.async_repository(Function, user_id=user_id)
+                    await function_repo.update_records([function])
 
                 except Exception as func_error:
                     logger.error(f"Failed to make agent discoverable: {func_error}")
@@ -83,7 +88,7 @@ async def list_agents(user_id: Optional[str] = Depends(hybrid_auth)):
     try:
         from percolate import p8
 
-        agents = p8.repository(Agent).select()
+        agents = await p8.async_repository(Agent).select()
         return agents
     except Exception as e:
         logger.error(f"Failed to list agents: {e}")
@@ -97,7 +102,7 @@ async def get_agent(agent_name: str, user_id: Optional[str] = Depends(hybrid_aut
     try:
         from percolate import p8
 
-        agents = p8.repository(Agent).select(name=agent_name)
+        agents = await p8.async_repository(Agent).select(name=agent_name)
         if not agents:
             raise HTTPException(
                 status_code=404, detail=f"Agent '{agent_name}' not found"
@@ -196,8 +201,8 @@ async def search_entities(
             )
 
         # Use repository search method
-        repo = p8.repository(loaded, user_id=user_id)
-        results = repo.search(search.query)
+        repo = p8.async_repository(loaded, user_id=user_id)
+        results = await repo.search(search.query)
 
         return results
     except HTTPException:
@@ -223,8 +228,8 @@ async def list_entities(
     try:
         # Special handling for p8.Function
         if entity_type == "p8.Function":
-            repo = p8.repository(Function, user_id=user_id)
-            results = repo.select()
+            repo = p8.async_repository(Function, user_id=user_id)
+            results = await repo.select()
             
             # Extract relevant fields for functions
             function_list = []
@@ -248,8 +253,8 @@ async def list_entities(
                     detail=f"Invalid entity type: {entity_type}. Entity type must be a valid model."
                 )
             
-            repo = p8.repository(loaded, user_id=user_id)
-            results = repo.select()
+            repo = p8.async_repository(loaded, user_id=user_id)
+            results = await repo.select()
             
             # Return paginated results
             return results[offset:offset+limit] if results else []
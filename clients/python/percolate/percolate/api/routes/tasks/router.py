@@ -6,8 +6,15 @@ from percolate.api.routes.auth import get_current_token
 import uuid
 from fastapi import   Depends
 import typing
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from percolate.utils import logger
+from percolate.utils.env import P8_JOBS_ENABLED, P8_JOB_POLL_INTERVAL
+from percolate.models.p8 import Job
+from percolate.services.tasks import JobQueue
+from percolate.services.tasks.JobQueue import FINAL_STATUSES
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 
 router = APIRouter()
 
@@ -71,18 +78,10 @@ async def create_research_iteration(
     raise Exception("this should not happened but we will be adding error stuff")
 
 def exec_research_tasks(task):
-    repo = p8.repository(ResearchIteration)
-    """this can be parallel in future but now our free tier is one request per second anyway"""
-    for q in task.question_set:
-        """this guy does a lot
-        - first we do the web search and fetch the content optionally 
-        - we insert the results into task/resources
-        - we build the index - a smart index can also fetch content when the first step does not
-        - the index is a Percolate special that adds vector and graph index for parsed content
-        """
-        repo.execute(f"SELECT * FROM p8.insert_web_search_results(%s,%s)", data=(q.query,task.task_id))
-        
-    return {}
+    """run the research iteration in this process - see the research.iteration job handler"""
+    from percolate.services.tasks.JobQueue import run_research_iteration
+    
+    return run_research_iteration(**task.model_dump())
             
 @router.post("/research/execute", response_model=ResearchIteration)
 async def execute_research_iteration(
@@ -106,7 +105,12 @@ async def queue_research_iteration(
 ) -> ResearchIteration:
     """execute a research plan - perform each search in the question set - this can take time so should be done as background tasks"""
     
-    result = background_tasks(exec_research_tasks, task)
+    if P8_JOBS_ENABLED:
+        """run by a worker - the job can be polled at /tasks/jobs/{id}"""
+        job = JobQueue().enqueue("research.iteration", task.model_dump(mode="json"))
+        logger.info(f"Queued research iteration job {job.id}")
+    else:
+        background_tasks.add_task(exec_research_tasks, task)
     
     """handle errors and/or update the task response to say we have changed its status to queue"""
     
@@ -123,3 +127,67 @@ async def queue_research_iteration(
 # @router.delete("/{task_id}")
 # async def delete_task(draft_id: uuid.UUID):
 #     pass
+
+
+class JobRequest(BaseModel):
+    """Queue a job for a registered handler e.g. agent.run, research.iteration or index.entity"""
+    name: str = Field(description="The job handler")
+    payload: dict = Field(default_factory=dict, description="Keyword arguments for the handler")
+    queue: str = Field("default", description="The queue (worker pool) to run the job on")
+    max_attempts: typing.Optional[int] = Field(None, description="Attempts before the job fails - P8_JOB_MAX_ATTEMPTS by default")
+    delay_seconds: float = Field(0, description="Do not start the job before this many seconds")
+
+
+@router.post("/jobs", response_model=Job)
+async def queue_job(request: JobRequest, user: dict = Depends(get_current_token)) -> Job:
+    """queue a job for `p8 worker` processes - poll it at /tasks/jobs/{id} or stream its status from /tasks/jobs/{id}/events"""
+    options = {"max_attempts": request.max_attempts} if request.max_attempts else {}
+    return await run_in_threadpool(
+        JobQueue().enqueue,
+        request.name,
+        request.payload,
+        queue=request.queue,
+        delay_seconds=request.delay_seconds,
+        **options,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(
+    job_id: str = Path(..., description="The job id"),
+    user: dict = Depends(get_current_token)
+) -> Job:
+    """the status and, once completed, the result of a job"""
+    job = await run_in_threadpool(JobQueue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"There is no job {job_id}")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str = Path(..., description="The job id"),
+    timeout: float = Query(600, description="Stop streaming after this many seconds"),
+    user: dict = Depends(get_current_token)
+):
+    """server sent events with the job each time its status changes until it completes or fails"""
+    job_queue = JobQueue()
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"There is no job {job_id}")
+
+    async def events():
+        current, last_state = job, None
+        deadline = asyncio.get_event_loop().time() + timeout
+        while True:
+            state = (current.status, current.attempts)
+            if state != last_state:
+                last_state = state
+                yield f"data: {current.model_dump_json()}\n\n"
+            if current.status in FINAL_STATUSES or asyncio.get_event_loop().time() > deadline:
+                break
+            await asyncio.sleep(P8_JOB_POLL_INTERVAL)
+            current = await run_in_threadpool(job_queue.get, job_id) or current
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
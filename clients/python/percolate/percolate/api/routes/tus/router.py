@@ -13,6 +13,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Request, Response, Header, Depends, BackgroundTasks, Query, Path, HTTPException
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from datetime import timezone
 import percolate as p8
 from percolate.api.controllers import tus_filesystem as tus_controller
@@ -639,15 +640,14 @@ async def update_upload_tags(
         upload.tags = tags[:3] if len(tags) > 3 else tags
         upload.updated_at = datetime.now(timezone.utc)
         
-        # Save the changes
-        p8.repository(TusFileUpload).update_records([upload])
-        
         # If the upload is in S3, update the metadata there too
         if (upload.upload_metadata.get("storage_type") == "s3" and 
             upload.upload_metadata.get("s3_uri")):
             # Update tags in metadata for S3 search compatibility
             upload.upload_metadata["tags"] = upload.tags
-            p8.repository(TusFileUpload).update_records([upload])
+        
+        # Save the changes off the event loop
+        await run_in_threadpool(p8.repository(TusFileUpload).update_records, [upload])
         
         # Set Tus response headers for consistency
         tus_response_headers(response)
@@ -10,7 +10,7 @@ from typing import List, Optional
 from percolate.utils.ingestion import add
 from percolate.utils.env import sync_model_keys
 import percolate as p8
-from percolate.models.p8 import PercolateAgent
+from percolate.models.p8 import PercolateAgent, EmbeddingCache
 import webbrowser
 import requests
 import os
@@ -156,6 +156,56 @@ def billing():
     AUTH_URL = f"https://{PERCOLATE_DOMAIN}/admin/billing"
     webbrowser.open(AUTH_URL)
     
+@admin_app.command("index-embeddings")
+def index_embeddings(
+    entities: Optional[List[str]] = typer.Argument(None, help="Entity names e.g. p8.Resources - defaults to the core models"),
+    method: Optional[str] = typer.Option(None, help="hnsw, ivfflat or none (defaults to P8_VECTOR_INDEX_METHOD)"),
+    ops: Optional[str] = typer.Option(None, help="The pgvector operator class (defaults to P8_VECTOR_INDEX_OPS)"),
+    embedding_model: Optional[List[str]] = typer.Option(None, "--embedding-model", help="Embedding models to index - defaults to the model field providers"),
+    blocking: bool = typer.Option(False, "--blocking", help="Build in a transaction instead of concurrently (faster but blocks writes)"),
+):
+    """Build the approximate nearest neighbour and source_record_id indexes on existing embedding tables"""
+    from percolate.models import CORE_INSTALL_MODELS
+    from percolate.utils.names import EmbeddingProviders
+
+    models = [p8.try_load_model(e, allow_abstract=True) for e in entities] if entities else CORE_INSTALL_MODELS
+    for model in models:
+        repo = p8.repository(model)
+        name = repo.model.get_model_full_name()
+        try:
+            started = time.time()
+            repo.build_embedding_indexes(
+                method=method,
+                ops=ops,
+                embedding_models=embedding_model
+                or repo.helper.embedding_models
+                or [EmbeddingProviders.embedding_text_embedding_ada_002],
+                concurrently=not blocking,
+            )
+            typer.echo(f"✅ {name} ({time.time() - started:.1f}s)")
+        except Exception as ex:
+            typer.echo(f"❌ {name} - {ex}", err=True)
+
+@admin_app.command("evict-embedding-cache")
+def evict_embedding_cache(
+    ttl_days: int = typer.Option(None, help="Entries older than this are removed (defaults to P8_EMBEDDING_CACHE_TTL_DAYS)"),
+    batch_size: int = typer.Option(1000, help="Rows deleted per statement"),
+):
+    """Remove expired query embeddings from p8."EmbeddingCache" - run this from a scheduler e.g. daily"""
+    from percolate.utils.env import P8_EMBEDDING_CACHE_TTL_DAYS
+
+    repo = p8.repository(EmbeddingCache)
+    total = 0
+    while True:
+        evicted = repo.execute(
+            "SELECT p8.evict_embedding_cache(%s * INTERVAL '1 day', %s) AS evicted",
+            data=(ttl_days or P8_EMBEDDING_CACHE_TTL_DAYS, batch_size),
+        )[0]["evicted"]
+        total += evicted
+        if evicted < batch_size:
+            break
+    typer.echo(f"✅ Evicted {total} cached embeddings")
+
 @add_app.command()
 def api(
     uri: str = typer.Argument(..., help="The API URI"),   
@@ -335,6 +385,33 @@ def ask(
     else:
         typer.echo(f"Did not get a response")
 
+@app.command()
+def worker(
+    queue: List[str] = typer.Option(["default"], help="Queues to run - name or name=concurrency e.g. --queue default --queue research=2"),
+    concurrency: int = typer.Option(4, help="Jobs run at once per queue unless given with the queue name"),
+    mode: str = typer.Option("thread", help="Run jobs on threads or (for cpu bound work) processes"),
+    handlers: Optional[List[str]] = typer.Option(None, help="Modules to import that register more job handlers"),
+):
+    """Run background jobs (agent runs, research and indexing) from the p8.Job queue outside the API"""
+    import importlib
+    import signal
+    import threading
+    from percolate.services.tasks import WorkerPool, run_workers
+
+    for module in handlers or []:
+        importlib.import_module(module)
+
+    pools = []
+    for spec in queue:
+        name, _, size = spec.partition("=")
+        pools.append(WorkerPool(queue=name, concurrency=int(size) if size else concurrency, mode=mode))
+        typer.echo(f"👷 {name} - {pools[-1].concurrency} {mode}s")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    run_workers(pools, stop_event=stop)
+
+
 if __name__ == "__main__":
     app()
 
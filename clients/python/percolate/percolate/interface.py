@@ -3,6 +3,7 @@ from .models import AbstractModel
 import typing
 from pydantic import BaseModel
 from .services.ModelRunner import ModelRunner
+from .services.BatchRunner import run_batch, BatchRunner
 from .services import OpenApiService
 from .models.p8.db_types import AskResponse
 import json
@@ -88,9 +89,13 @@ def custom_load_model(name):
 def dump(
     question: str, data: typing.List[dict], response: AIResponse, context, **kwargs
 ):
-    """we dump the session using the session id from the AI response and we dump the final response"""
+    """we dump the session using the session id from the AI response and we dump the final response.
+    The records are queued on the process audit writer which writes them in batches off the request path
+    """
+    from percolate.services.AuditWriter import audit_writer
+
     try:
-        p8.repository(Session).update_records(
+        audit_writer.submit(
             Session.from_question_and_context(
                 id=response.session_id,
                 question=question,
@@ -99,7 +104,7 @@ def dump(
             )
         )
         """we could dump data but lets not for now"""
-        p8.repository(AIResponse).update_records(response)
+        audit_writer.submit(response, AIResponse)
     except:
         logger.warning(f"Failed to dump session  -  {traceback.format_exc()}")
 
@@ -211,6 +216,25 @@ def repository(
     )
 
 
+def async_repository(
+    model: AbstractModel | BaseModel, user_id=None, user_groups=None, role_level=None
+):
+    """gets an async repository for the model for use in async code such as API routes.
+    The methods are coroutines e.g. `await p8.async_repository(Agent).select()`
+
+    Args:
+        model: a Pydantic base model or AbstractModel
+        user_id: optional user ID for row-level security
+        user_groups: optional list of user group IDs for row-level security
+        role_level: optional role level for row-level security (0=god, 1=admin, 5=internal, 10=partner, 100=public)
+    """
+    from .services.AsyncPostgresService import AsyncPostgresService
+
+    return AsyncPostgresService(
+        model=model, user_id=user_id, user_groups=user_groups, role_level=role_level
+    )
+
+
 def Agent(
     model: AbstractModel | BaseModel,
     allow_help: bool = True,
@@ -32,7 +32,7 @@ from .p8.types import UserMemory
 
 """For now we whitelist the models that are installed in the database"""
 CORE_INSTALL_MODELS= [ User, Project, Agent, ModelField, LanguageModelApi, Function, Session, SessionEvaluation, AIResponse, ApiProxy, PlanModel,
-               Settings, PercolateAgent, IndexAudit, Task, TaskResources, ResearchIteration , Resources,SessionResources, Schedule, Audit, UserMemory]
+               Settings, PercolateAgent, IndexAudit, Task, TaskResources, ResearchIteration , Resources,SessionResources, Schedule, Audit, UserMemory, Job, EmbeddingCache, Nl2SqlCache]
    
 def migrate_core_models():
     """apply schema changes"""
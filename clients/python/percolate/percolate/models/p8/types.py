@@ -335,10 +335,21 @@ class Agent(AbstractEntityModel):
 
         return model
 
+    @classmethod
+    def _select_row(cls, name: str) -> typing.Optional[dict]:
+        """the agent row by name or None if there is no such agent"""
+        agents = p8.repository(Agent).select(name=name)
+        if len(agents) > 1:
+            raise ValueError(
+                f"Multiple agents found with name '{name}'. Please use fully qualified name."
+            )
+        return agents[0] if agents else None
+
     @classmethod
     def load(cls, name: str) -> AbstractModel:
         """
-        Load an agent from the database and reconstruct it as a proper model
+        Load an agent from the database and reconstruct it as a proper model.
+        The compiled model is cached by name and row version (see ModelCache.load_agent)
 
         Args:
             name: The agent name (can be namespace.name or just name)
@@ -349,21 +360,13 @@ class Agent(AbstractEntityModel):
         Raises:
             ValueError: If agent not found or multiple agents found
         """
-        try:
-            # Query the database for the agent
-            agents = p8.repository(Agent).select(name=name)
+        from percolate.services.ModelCache import ModelCache
 
-            if not agents:
+        try:
+            model = ModelCache().load_agent(name, cls._select_row, cls._create_model_from_data)
+            if model is None:
                 raise ValueError(f"Agent '{name}' not found in database")
-            if len(agents) > 1:
-                raise ValueError(
-                    f"Multiple agents found with name '{name}'. Please use fully qualified name."
-                )
-
-            # Repository returns dicts, not objects
-            agent_data = agents[0]
-
-            return cls._create_model_from_data(agent_data)
+            return model
 
         except Exception as e:
             logger.error(f"Failed to load agent '{name}': {str(e)}")
@@ -1787,6 +1790,84 @@ class Audit(AbstractModel):
     )
 
 
+class JobStatus(Enum):
+    """Status enum for queued jobs"""
+
+    Queued = "QUEUED"
+    Running = "RUNNING"
+    Completed = "COMPLETED"
+    Failed = "FAILED"
+
+
+class Job(AbstractModel):
+    """A durable unit of background work e.g. an agent run. Jobs are claimed by `p8 worker` processes - see `percolate.services.tasks.JobQueue`"""
+
+    model_config = {"index_notify": False}
+    id: typing.Optional[uuid.UUID | str] = Field(None, description="Unique job id")
+    userid: typing.Optional[uuid.UUID | str] = Field(
+        None, description="The user that queued the job"
+    )
+    name: str = Field(..., description="The registered job handler e.g. agent.run")
+    queue: str = Field("default", description="The queue (worker pool) that runs the job")
+    payload: typing.Optional[dict] = Field(
+        default_factory=dict, description="Keyword arguments for the handler"
+    )
+    status: str = Field(JobStatus.Queued.value, description="QUEUED|RUNNING|COMPLETED|FAILED")
+    attempts: int = Field(0, description="The number of times the job has been started")
+    max_attempts: int = Field(3, description="Failed jobs are retried with backoff until this many attempts")
+    run_at: typing.Optional[datetime.datetime] = Field(
+        None, description="The job is not claimed before this time - used for delays and retry backoff"
+    )
+    locked_by: typing.Optional[str] = Field(None, description="The worker running the job")
+    locked_at: typing.Optional[datetime.datetime] = Field(
+        None, description="When the worker claimed the job"
+    )
+    finished_at: typing.Optional[datetime.datetime] = Field(
+        None, description="When the job completed or finally failed"
+    )
+    result: typing.Optional[dict] = Field(None, description="The handler result")
+    error: typing.Optional[str] = Field(None, description="The last error")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _set_defaults(cls, values):
+        if isinstance(values, dict) and not values.get("id"):
+            values["id"] = str(uuid.uuid1())
+        return values
+
+
+class EmbeddingCache(AbstractModel):
+    """Query embeddings cached by embedding model and a hash of the whitespace-normalized text.
+    Rows are written by p8.get_embedding_for_text and (when enabled) percolate.utils.embedding and expire by created_at
+    """
+
+    model_config = {"index_notify": False}
+    id: uuid.UUID | str = Field(
+        description="md5 of the embedding model and text hash as a uuid - see p8.embedding_cache_id"
+    )
+    embedding_model: str = Field(description="The embedding model e.g. text-embedding-ada-002")
+    text_hash: str = Field(description="md5 of the normalized text - see p8.embedding_text_hash")
+    embedding: typing.List[float] = Field(
+        description="The embedding vector", json_schema_extra={"sql_type": "VECTOR"}
+    )
+
+
+class Nl2SqlCache(AbstractModel):
+    """SQL generated by p8.nl2sql cached per entity, normalized question and entity schema so repeated questions skip the LLM.
+    Rows are written by p8.nl2sql_cached - only successful generations are stored and a schema change is a cache miss
+    """
+
+    model_config = {"index_notify": False}
+    id: uuid.UUID | str = Field(
+        description="md5 of the entity, question hash and schema hash as a uuid - see p8.nl2sql_cache_id"
+    )
+    entity_name: str = Field(description="The fully qualified entity the question was asked about")
+    question_hash: str = Field(description="md5 of the normalized question - see p8.embedding_text_hash")
+    schema_hash: str = Field(description="A fingerprint of the entity table columns - see p8.entity_schema_hash")
+    query: str = Field(description="The generated SQL query")
+    confidence: typing.Optional[float] = Field(None, description="The confidence returned with the query")
+
+
 # """The daily digest agent will evolve with the help of some API utils
 # - we want to summarize changes in the user including their readings etc
 # - we want to summarize new resources they have uploaded
@@ -6,7 +6,16 @@ import uuid
 import datetime
 import types
 import json
+import hashlib
 from percolate.utils import make_uuid
+from percolate.utils.names import EMBEDDING_DIMENSIONS
+from percolate.utils.env import (
+    P8_VECTOR_INDEX_METHOD,
+    P8_VECTOR_INDEX_OPS,
+    P8_HNSW_M,
+    P8_HNSW_EF_CONSTRUCTION,
+    P8_IVFFLAT_LISTS,
+)
 
 
 class SqlModelHelper:
@@ -227,6 +236,73 @@ SELECT p8.attach_rls_policy('{cls.model.get_model_namespace()}', '{cls.model.get
 
         return upsert_statement.strip()
 
+    @staticmethod
+    def copy_text_value(value) -> str:
+        """encode a (serialized) value in the COPY text format - see `serialize_for_db`"""
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            value = "t" if value else "f"
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.isoformat()
+        elif isinstance(value, (list, tuple, set)):
+            """postgres array literal with every element quoted"""
+
+            def element(e):
+                if e is None:
+                    return "NULL"
+                e = str(e).replace("\\", "\\\\").replace('"', '\\"')
+                return f'"{e}"'
+
+            value = "{" + ",".join(element(e) for e in value) + "}"
+        else:
+            value = str(value)
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    @classmethod
+    def copy_text_row(cls, values: typing.List[typing.Any]) -> str:
+        """a tab separated, newline terminated COPY text row"""
+        return "\t".join(cls.copy_text_value(v) for v in values) + "\n"
+
+    def create_staging_table_query(self, staging_table: str) -> str:
+        """a temporary table shaped like the model table that is dropped when the transaction commits"""
+        return f"""CREATE TEMP TABLE {staging_table} (LIKE {self.table_name} INCLUDING DEFAULTS) ON COMMIT DROP"""
+
+    def copy_query(self, staging_table: str, columns: typing.List[str]) -> str:
+        """the COPY statement to stream text rows into the staging table"""
+        return f"""COPY {staging_table} ({", ".join(columns)}) FROM STDIN"""
+
+    def bulk_merge_query(
+        self, staging_table: str, columns: typing.List[str], id_field: str = "id"
+    ) -> str:
+        """merge the staging table into the model table in one statement and count inserts and updates.
+        The last staged row wins for duplicate ids because a single insert cannot update the same row twice.
+        """
+        insert_columns = ", ".join(columns)
+        update_set = ", ".join(
+            [f"{c} = EXCLUDED.{c}" for c in columns if c != id_field]
+        )
+        on_conflict = (
+            f"DO UPDATE SET {update_set}" if update_set else "DO NOTHING"
+        )
+        return f"""
+        WITH upserted AS (
+            INSERT INTO {self.table_name} ({insert_columns})
+            SELECT DISTINCT ON ({id_field}) {insert_columns} FROM {staging_table}
+            ORDER BY {id_field}, ctid DESC
+            ON CONFLICT ({id_field}) {on_conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted) AS inserted,
+               count(*) FILTER (WHERE NOT inserted) AS updated
+        FROM upserted;
+        """.strip()
+
     @classmethod
     def select_fields(cls, model):
         """select db relevant fields"""
@@ -265,6 +341,57 @@ SELECT p8.attach_rls_policy('{cls.model.get_model_namespace()}', '{cls.model.get
 
         return f"""SELECT { fields } FROM {self.table_name} {predicate}"""
 
+    def select_with_predicates_query(
+        self,
+        filter: typing.Dict[str, typing.Any] = None,
+        fields: typing.List[str] = None,
+        limit: int = None,
+        order_by: str = None,
+    ) -> typing.Tuple[str, tuple]:
+        """
+        build the select query and parameters for the filter, limit and order by
+
+        Args:
+            filter: Dictionary of field-value pairs - scalars use equality and lists use ANY
+            fields: List of field names to select (defaults to all fields)
+            limit: Maximum number of records to return
+            order_by: Order clause (e.g., 'created_at DESC', 'name ASC')
+
+        Returns:
+            the query and the tuple of parameters (or None)
+        """
+        # Build the base query
+        selected_fields = fields or self.field_names
+        if isinstance(selected_fields, list):
+            selected_fields = ", ".join(selected_fields)
+
+        query = f"SELECT {selected_fields} FROM {self.table_name}"
+        data = []
+
+        # Add WHERE clause if filters provided
+        if filter:
+            where_clauses = []
+            for field, value in filter.items():
+                if isinstance(value, list):
+                    where_clauses.append(f"{field} = ANY(%s)")
+                    data.append(value)
+                else:
+                    where_clauses.append(f"{field} = %s")
+                    data.append(value)
+
+            if where_clauses:
+                query += " WHERE " + " AND ".join(where_clauses)
+
+        # Add ORDER BY clause if provided
+        if order_by:
+            query += f" ORDER BY {order_by}"
+
+        # Add LIMIT clause if provided
+        if limit:
+            query += f" LIMIT {limit}"
+
+        return query, tuple(data) if data else None
+
     def delete_query(self, **kwargs):
         """
         Generate a DELETE query with WHERE clause based on kwargs
@@ -332,6 +459,84 @@ SELECT p8.attach_rls_policy('{cls.model.get_model_namespace()}', '{cls.model.get
 """
         return Q
 
+    @property
+    def embedding_models(self) -> typing.List[str]:
+        """the distinct embedding providers used by the model's fields"""
+        providers = []
+        for field in self.get_model_field_models():
+            if field.embedding_provider and field.embedding_provider not in providers:
+                providers.append(field.embedding_provider)
+        return providers
+
+    @staticmethod
+    def embedding_cast_type(embedding_model: str) -> str | None:
+        """the typed vector that the embedding column is cast to for indexing and index-friendly search.
+        pgvector can only index up to 2000 dimensions for `vector` so larger models use `halfvec`
+        """
+        dims = EMBEDDING_DIMENSIONS.get(embedding_model)
+        if not dims:
+            return None
+        return f"vector({dims})" if dims <= 2000 else f"halfvec({dims})"
+
+    def embedding_index_name(self, suffix: str) -> str:
+        """index names for the embedding table - postgres truncates identifiers at 63 characters so we hash long names"""
+        base = f"{self.model.get_model_namespace()}_{self.model.get_model_name()}_embeddings".lower()
+        name = f"{base}_{suffix}"
+        if len(name) > 63:
+            digest = hashlib.md5(name.encode()).hexdigest()[:8]
+            name = f"{base[: max(62 - len(suffix) - 9, 16)]}_{digest}_{suffix}"[:63]
+        return name
+
+    def create_embedding_index_scripts(
+        self,
+        method: str = None,
+        ops: str = None,
+        embedding_models: typing.List[str] = None,
+        concurrently: bool = False,
+    ) -> typing.List[str]:
+        """
+        the index statements for the embeddings table - a btree on source_record_id for joins and cascades
+        and approximate nearest neighbour (hnsw or ivfflat) indexes for each embedding model.
+
+        The embedding column has no fixed dimension so the ANN indexes are partial expression indexes
+        `(embedding_vector::vector(N)) WHERE embedding_name = '<model>'` and searches must use the same expression.
+
+        Args:
+            method: hnsw, ivfflat or none (P8_VECTOR_INDEX_METHOD by default)
+            ops: the pgvector operator class (P8_VECTOR_INDEX_OPS by default)
+            embedding_models: the embedding models to index - defaults to the providers on the model fields
+            concurrently: build without blocking writes (cannot be run in a transaction)
+        """
+        method = (method or P8_VECTOR_INDEX_METHOD).lower()
+        ops = ops or P8_VECTOR_INDEX_OPS
+        table = self.model.get_model_embedding_table_name()
+        concurrently = "CONCURRENTLY " if concurrently else ""
+
+        scripts = [
+            f"""CREATE INDEX {concurrently}IF NOT EXISTS {self.embedding_index_name('source_idx')} ON {table} (source_record_id)"""
+        ]
+        if method == "none":
+            return scripts
+        if method == "hnsw":
+            params = f"WITH (m = {P8_HNSW_M}, ef_construction = {P8_HNSW_EF_CONSTRUCTION})"
+        elif method == "ivfflat":
+            params = f"WITH (lists = {P8_IVFFLAT_LISTS})"
+        else:
+            raise ValueError(f"Unsupported vector index method {method} - use hnsw, ivfflat or none")
+
+        for embedding_model in embedding_models or self.embedding_models:
+            cast = SqlModelHelper.embedding_cast_type(embedding_model)
+            if not cast:
+                """we do not know the dimension of this model so it cannot be indexed"""
+                continue
+            model_ops = ops.replace("vector_", "halfvec_") if cast.startswith("halfvec") else ops
+            slug = "".join(c if c.isalnum() else "_" for c in embedding_model.lower())
+            scripts.append(
+                f"""CREATE INDEX {concurrently}IF NOT EXISTS {self.embedding_index_name(f'{method}_{slug}')} ON {table} """
+                f"""USING {method} ((embedding_vector::{cast}) {model_ops}) {params} WHERE embedding_name = '{embedding_model}'"""
+            )
+        return scripts
+
     def try_generate_migration_script(self, field_list: typing.List[dict]) -> str:
         """
         pass in fields like this
@@ -0,0 +1,405 @@
+"""
+Async counterpart of the PostgresService for use in async routes and MCP tools.
+
+The PostgresService uses psycopg2 which blocks the event loop for the duration of every query.
+This service uses psycopg 3 with an async connection pool so that route handlers can `await`
+database work. It uses client side cursors so the same `%s` queries generated by the SqlModelHelper
+work unchanged and, like the PostgresService, it applies the user context for row-level security
+on every checked out connection and resets the session when the connection is returned.
+
+```python
+repo = p8.async_repository(Agent, user_id=user_id)
+agents = await repo.select(name='p8.PercolateAgent')
+```
+"""
+
+import asyncio
+import typing
+import uuid
+from contextlib import asynccontextmanager
+
+from pydantic import BaseModel
+
+from percolate.models.AbstractModel import ensure_model_not_instance, AbstractModel
+from percolate.models.utils import SqlModelHelper
+from percolate.utils import logger, batch_collection
+from percolate.utils.env import (
+    POSTGRES_CONNECTION_STRING,
+    SYSTEM_USER_ID,
+    P8_PG_POOL_MIN_SIZE,
+    P8_PG_POOL_MAX_SIZE,
+    P8_PG_POOL_MAX_LIFETIME,
+    P8_PG_POOL_TIMEOUT,
+    P8_PG_STREAM_FETCH_SIZE,
+    P8_SEARCH_CONCURRENT,
+    P8_SEARCH_MAX_PARALLEL_QUESTIONS,
+)
+from percolate.services.PostgresService import (
+    search_result_or_hint,
+    is_semantic_search_only,
+    merge_query_entity_results,
+    merge_search_results,
+    search_questions,
+)
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # pragma: no cover - the sync service does not need psycopg 3
+    psycopg = None
+
+
+async def _reset_connection(conn):
+    """clear session state e.g. the user context before the pool reuses the connection"""
+    await conn.execute("RESET ALL")
+    await conn.commit()
+
+
+class AsyncPostgresService:
+    """the async postgres service wrapper for querying and sinking entities/models"""
+
+    """pools are bound to an event loop so we keep one per connection string and loop"""
+    _pools: typing.Dict[typing.Tuple[str, int], typing.Tuple[typing.Any, typing.Any]] = {}
+
+    def __init__(
+        self,
+        model: BaseModel = None,
+        connection_string: str = None,
+        user_id=None,
+        user_groups=None,
+        role_level=None,
+    ):
+        if psycopg is None:
+            raise ImportError(
+                "The async repository requires psycopg 3 - pip install 'psycopg[binary,pool]'"
+            )
+        self._connection_string = connection_string or POSTGRES_CONNECTION_STRING
+        self.user_id = user_id if user_id is not None else SYSTEM_USER_ID
+        self.user_groups = user_groups or []
+        self.role_level = role_level
+        self.helper = SqlModelHelper(AbstractModel)
+        if model:
+            self.model = AbstractModel.Abstracted(ensure_model_not_instance(model))
+            self.helper: SqlModelHelper = SqlModelHelper(model)
+        else:
+            self.model = None
+
+    def __repr__(self):
+        return f"AsyncPostgresService({self.model.get_model_full_name() if self.model else None})"
+
+    def repository(self, model: BaseModel, **kwargs) -> "AsyncPostgresService":
+        """an async repository for another model in the same user context"""
+        return AsyncPostgresService(
+            model=model,
+            connection_string=self._connection_string,
+            user_id=kwargs.pop("user_id", self.user_id),
+            user_groups=kwargs.pop("user_groups", self.user_groups),
+            role_level=kwargs.pop("role_level", self.role_level),
+        )
+
+    @classmethod
+    async def get_pool(cls, connection_string: str = None):
+        """get (or open) the async pool for the connection string on the running loop"""
+        connection_string = connection_string or POSTGRES_CONNECTION_STRING
+        loop = asyncio.get_running_loop()
+        key = (connection_string, id(loop))
+
+        entry = cls._pools.get(key)
+        if entry and entry[0] is loop:
+            return entry[1]
+
+        """drop pools of loops that have gone away e.g. between tests"""
+        for k, (l, _) in list(cls._pools.items()):
+            if l.is_closed():
+                cls._pools.pop(k, None)
+
+        pool = AsyncConnectionPool(
+            connection_string,
+            min_size=P8_PG_POOL_MIN_SIZE,
+            max_size=P8_PG_POOL_MAX_SIZE,
+            max_lifetime=P8_PG_POOL_MAX_LIFETIME,
+            timeout=P8_PG_POOL_TIMEOUT,
+            kwargs={
+                "row_factory": dict_row,
+                "cursor_factory": psycopg.AsyncClientCursor,
+            },
+            check=AsyncConnectionPool.check_connection,
+            reset=_reset_connection,
+            open=False,
+        )
+        await pool.open()
+
+        entry = cls._pools.get(key)
+        if entry and entry[0] is loop:
+            """another task opened the pool while we were waiting"""
+            await pool.close()
+            return entry[1]
+        cls._pools[key] = (loop, pool)
+        return pool
+
+    @classmethod
+    async def close_pools(cls):
+        """close the pools on the running loop e.g. on application shutdown"""
+        loop = asyncio.get_running_loop()
+        for k, (l, pool) in list(cls._pools.items()):
+            if l is loop:
+                cls._pools.pop(k, None)
+                await pool.close()
+
+    async def _apply_user_context(self, conn):
+        """Apply user context to the session for row-level security - see PostgresService._apply_user_context"""
+        if self.user_id == SYSTEM_USER_ID:
+            return
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT * from p8.set_user_context(%s::UUID);", (str(self.user_id),)
+                )
+                row = await cursor.fetchone()
+                if row:
+                    self.role_level = row.get("role_level")
+                    self.user_groups = row.get("groups")
+            await conn.commit()
+        except Exception as e:
+            logger.warning(f"Error applying user security context: {str(e)}")
+            await conn.rollback()
+
+    @asynccontextmanager
+    async def connection(self):
+        """check out a pooled connection with this service's user context applied"""
+        pool = await self.get_pool(self._connection_string)
+        async with pool.connection() as conn:
+            await self._apply_user_context(conn)
+            yield conn
+
+    async def execute(
+        self,
+        query: str,
+        data: tuple = None,
+        as_upsert: bool = False,
+        page_size: int = 100,
+        verbose_errors: bool = True,
+        timeout_seconds: int = None,
+    ):
+        """run any sql query - see PostgresService.execute
+
+        Args:
+            query: the sql query with %s placeholders
+            data: tuple of args or, for upserts, the list of row tuples
+            as_upsert: the query is an `INSERT ... VALUES %s` statement and data are rows
+            page_size: for upsert batching
+            verbose_errors: log the query and data on errors
+            timeout_seconds: optional statement timeout for this query
+        """
+        if not query:
+            return
+
+        async with self.connection() as conn:
+            try:
+                async with conn.cursor() as c:
+                    if timeout_seconds and isinstance(timeout_seconds, int):
+                        await c.execute(f"set statement_timeout = '{timeout_seconds}s'")
+
+                    if as_upsert:
+                        result = []
+                        for batch in batch_collection(list(data), page_size):
+                            await c.execute(*self._expand_values(query, batch))
+                            if c.description:
+                                result += await c.fetchall()
+                        await conn.commit()
+                        return result
+
+                    await c.execute(query, data)
+                    if c.description:
+                        result = await c.fetchall()
+                        await conn.commit()
+                        return result
+                    await conn.commit()
+            except Exception as pex:
+                msg = f"Failing to execute query {query} for model {self.model} - Postgres error: {pex}, {data}"
+                if not verbose_errors:
+                    msg = f"Failing to execute query model {self.model} - {verbose_errors=} - {pex}"
+                logger.warning(msg)
+                await conn.rollback()
+                raise
+
+    @staticmethod
+    def _expand_values(query: str, rows: typing.List[tuple]) -> typing.Tuple[str, tuple]:
+        """psycopg 3 has no execute_values so we expand the `VALUES %s` placeholder for the batch"""
+        width = len(rows[0])
+        row_placeholder = f"({', '.join(['%s'] * width)})"
+        values = ", ".join([row_placeholder] * len(rows))
+        params = tuple(v for row in rows for v in row)
+        return query.replace("VALUES %s", f"VALUES {values}", 1), params
+
+    async def stream(
+        self,
+        query: str,
+        data: tuple = None,
+        fetch_size: int = None,
+        as_model: bool = False,
+    ) -> typing.AsyncIterator[dict | AbstractModel]:
+        """iterate the results of a query with a server-side cursor - see PostgresService.stream
+
+        ```python
+        async for row in repo.stream('select * from p8."Session"'):
+            ...
+        ```
+        """
+        async with self.connection() as conn:
+            async with conn.cursor(name=f"p8_stream_{uuid.uuid4().hex}") as c:
+                c.itersize = fetch_size or P8_PG_STREAM_FETCH_SIZE
+                try:
+                    await c.execute(query, data)
+                    async for row in c:
+                        yield self.model(**row) if as_model else row
+                    await conn.commit()
+                except BaseException as pex:
+                    if not isinstance(pex, GeneratorExit):
+                        logger.warning(
+                            f"Failing to stream query {query} for model {self.model} - Postgres error: {pex}, {data}"
+                        )
+                    await conn.rollback()
+                    raise
+
+    def iter_select(
+        self, fields: typing.List[str] = None, fetch_size: int = None, as_model: bool = False, **kwargs
+    ) -> typing.AsyncIterator[dict | AbstractModel]:
+        """like select except rows are streamed lazily from a server-side cursor"""
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        data = tuple(kwargs.values()) if kwargs else None
+        return self.stream(
+            self.helper.select_query(fields, **kwargs),
+            data=data,
+            fetch_size=fetch_size,
+            as_model=as_model,
+        )
+
+    async def select(self, fields: typing.List[str] = None, **kwargs):
+        """
+        select based on the model and use kwargs as quality or in-list template predicates
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        data = None
+        if kwargs:
+            data = tuple(kwargs.values())
+        return await self.execute(self.helper.select_query(fields, **kwargs), data=data)
+
+    async def select_with_predicates(
+        self,
+        filter: typing.Dict[str, typing.Any] = None,
+        fields: typing.List[str] = None,
+        limit: int = None,
+        order_by: str = None,
+    ):
+        """select with filter, limit and order by - see PostgresService.select_with_predicates"""
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        query, data = self.helper.select_with_predicates_query(
+            filter=filter, fields=fields, limit=limit, order_by=order_by
+        )
+        return await self.execute(query, data=data)
+
+    async def get_by_id(self, id: str, as_model: bool = False):
+        """select dictionary values by if unless as model set set - returns one value"""
+        data = await self.select(id=str(id))
+        if not data:
+            return
+        data = data[0]
+        if as_model and self.model:
+            data = self.model(**data)
+        return data
+
+    async def update_records(
+        self,
+        records: typing.List[BaseModel],
+        batch_size: int = 100,
+    ):
+        """records are upserted using typed object relational mapping - see PostgresService.update_records"""
+
+        if records is None:
+            return []
+
+        if records and not isinstance(records, list):
+            records = [records]
+
+        if not records:
+            logger.warning(f"Nothing to do - records is empty {records}")
+            return []
+
+        if self.model is None:
+            """we encourage explicitly construct repository but we will infer"""
+            return await self.repository(records[0]).update_records(
+                records=records, batch_size=batch_size
+            )
+
+        data = [tuple(self.helper.serialize_for_db(r).values()) for r in records]
+        query = self.helper.upsert_query(batch_size=len(records))
+        try:
+            return await self.execute(
+                query, data=data, as_upsert=True, page_size=batch_size
+            )
+        except:
+            logger.warning(f"Failing to run {query}")
+            raise
+
+    async def search(self, question: str | typing.List[str], user_id: str = None):
+        """
+        search the model's entity using the percolate query_entity function - see PostgresService.search
+
+        Args:
+            question: detailed natural language question or questions
+            user_id deprecated
+        """
+        questions = search_questions(question)
+        if len(questions) == 1:
+            result = await self._search_question(questions[0])
+        else:
+            """each question is its own search and at most P8_SEARCH_MAX_PARALLEL_QUESTIONS run at a time"""
+            limit = asyncio.Semaphore(max(P8_SEARCH_MAX_PARALLEL_QUESTIONS, 1) if P8_SEARCH_CONCURRENT else 1)
+
+            async def bounded(q: str):
+                async with limit:
+                    return await self._search_question(q)
+
+            result = merge_search_results(await asyncio.gather(*[bounded(q) for q in questions]))
+        return search_result_or_hint(result, question)
+
+    async def _search_question(self, question: str) -> typing.List[dict]:
+        """the query_entity row for one question"""
+        entity_name = self.model.get_model_full_name()
+        semantic_only = is_semantic_search_only(self.model)
+
+        if semantic_only or not P8_SEARCH_CONCURRENT:
+            return await self.execute(
+                """select * from p8.query_entity(%s, %s, semantic_only => %s) """,
+                data=(question, entity_name, semantic_only),
+            )
+
+        """the relational (nl2sql) and vector searches run concurrently - see PostgresService._concurrent_query_entity"""
+        relational, result = await asyncio.gather(
+            self.execute(
+                """select * from p8.relational_search_entity(%s, %s) """,
+                data=(question, entity_name),
+            ),
+            self.execute(
+                """select * from p8.query_entity(%s, %s, semantic_only => true) """,
+                data=(question, entity_name),
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(result, BaseException):
+            raise result
+        if isinstance(relational, BaseException):
+            logger.warning(f"The relational search failed for {entity_name} - {relational}")
+            relational = [{"error_message": str(relational)}]
+        return merge_query_entity_results(result, relational)
@@ -0,0 +1,268 @@
+"""
+One batched writer for audit records (sessions, AI responses and user model updates) per process.
+
+Auditing used to happen inline on the request (`p8.dump`, `audit_request`) or on a new thread per stream
+(`BackgroundAudit`). Now callers only put records on a bounded queue and a single long-lived thread writes them
+
+- records are flushed when P8_AUDIT_BATCH_SIZE are waiting or P8_AUDIT_FLUSH_INTERVAL seconds after the first arrived
+- each flush is one `update_records` call per model (with the COPY based bulk upsert from P8_BULK_UPSERT_THRESHOLD records)
+- when the queue (P8_AUDIT_QUEUE_SIZE) is full the caller waits at most P8_AUDIT_ENQUEUE_TIMEOUT seconds and the
+  record is then dropped, counted and logged - auditing never fails or stalls a user request for long (default 0.5s)
+- the queue is drained on exit (or with `flush`) so records are not lost on a graceful shutdown
+
+`get_stats()` reports the queue depth, flush latency, written, failed and dropped records.
+"""
+
+import atexit
+import queue
+import threading
+import time
+import typing
+
+from pydantic import BaseModel
+
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_AUDIT_QUEUE_SIZE,
+    P8_AUDIT_BATCH_SIZE,
+    P8_AUDIT_FLUSH_INTERVAL,
+    P8_AUDIT_ENQUEUE_TIMEOUT,
+)
+# imported first so that the connection pools are closed after the audit queue is drained at exit
+from .PostgresConnectionPool import PostgresConnectionPool  # noqa: F401
+
+_STOP = object()
+_FLUSH = object()
+
+
+def _write_records(model: typing.Type[BaseModel], records: typing.List[typing.Any]):
+    import percolate as p8
+    from percolate.services.PostgresService import should_bulk_upsert
+
+    """the rows are not needed back so large batches use the COPY based loader"""
+    p8.repository(model).update_records(records, bulk=should_bulk_upsert(records))
+
+
+def _key(record: typing.Any):
+    return record.get("id") if isinstance(record, dict) else getattr(record, "id", None)
+
+
+class AuditWriter:
+    """bounded queue and background thread that writes audit records in batches - see the module docs"""
+
+    def __init__(
+        self,
+        max_queue: int = P8_AUDIT_QUEUE_SIZE,
+        batch_size: int = P8_AUDIT_BATCH_SIZE,
+        flush_interval: float = P8_AUDIT_FLUSH_INTERVAL,
+        enqueue_timeout: float = P8_AUDIT_ENQUEUE_TIMEOUT,
+        write: typing.Callable[[typing.Type[BaseModel], typing.List[typing.Any]], typing.Any] = None,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._write = write or _write_records
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.tasks = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._last_flush_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="p8-audit-writer", daemon=True)
+                self._thread.start()
+
+    def _drop(self, reason: str) -> bool:
+        """count a dropped record - the first and then every 1000th drop is logged"""
+        with self._lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning(f"{reason} - {dropped} audit records dropped so far")
+        return False
+
+    def _put(self, item) -> bool:
+        if self._closed:
+            return self._drop("The audit writer is closed")
+        self._ensure_thread()
+        try:
+            if self.enqueue_timeout > 0:
+                self._queue.put(item, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            return self._drop(f"The audit queue is full after waiting {self.enqueue_timeout}s")
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def submit(self, records: typing.Any, model: typing.Type[BaseModel] = None) -> bool:
+        """queue one or more records of the model (inferred from the first record) - False if any were dropped"""
+        if records is None:
+            return True
+        if not isinstance(records, list):
+            records = [records]
+        if not records:
+            return True
+        model = model or type(records[0])
+        return all([self._put((model, r)) for r in records])
+
+    def submit_task(self, fn: typing.Callable, *args, **kwargs) -> bool:
+        """
+        queue other audit work (e.g. a user model update) to run on the writer thread after earlier records.
+        The task may return `(model, records)` pairs which are added to the current batch - tasks must not `submit`
+        since they run on the only consumer of the queue
+        """
+        return self._put((None, (fn, args, kwargs)))
+
+    def _run(self):
+        pending: typing.List[tuple] = []
+        """pending records that came from the queue (the rest were returned by tasks)"""
+        queued = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(pending, queued)
+                self._queue.task_done()
+                return
+            if item is not None:
+                model, record = item
+                if model is None or model is _FLUSH:
+                    """records queued before the task are written first"""
+                    self._flush(pending, queued)
+                    pending, queued, deadline = [], 0, None
+                    if model is _FLUSH:
+                        record.set()
+                    else:
+                        pending = self._run_task(record)
+                    self._queue.task_done()
+                    if pending:
+                        deadline = time.monotonic() + self.flush_interval
+                    continue
+                pending.append(item)
+                queued += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending, queued)
+                pending, queued, deadline = [], 0, None
+
+    def _run_task(self, task) -> typing.List[tuple]:
+        """run the task and return the records it produced as pending batch items"""
+        fn, args, kwargs = task
+        try:
+            produced = fn(*args, **kwargs)
+            self.tasks += 1
+        except Exception as ex:
+            self.failed += 1
+            logger.warning(f"Audit task {getattr(fn, '__name__', fn)} failed - {ex}")
+            return []
+        items = []
+        if not isinstance(produced, (list, tuple)):
+            """tasks that only do work return nothing (or a value we do not write)"""
+            return items
+        for model, records in produced:
+            if records is None:
+                continue
+            for record in records if isinstance(records, list) else [records]:
+                items.append((model or type(record), record))
+        with self._lock:
+            self.enqueued += len(items)
+        return items
+
+    def _flush(self, pending: typing.List[tuple], queued: int = None):
+        if not pending:
+            return
+        started = time.monotonic()
+        by_model: typing.Dict[type, dict] = {}
+        for model, record in pending:
+            """the last write of a record wins - an upsert cannot update the same row twice in one statement"""
+            records = by_model.setdefault(model, {})
+            key = _key(record)
+            records[key if key is not None else id(record)] = record
+        for model, records in by_model.items():
+            records = list(records.values())
+            try:
+                self._write(model, records)
+                self.written += len(records)
+                logger.debug(f"Audited {len(records)} {getattr(model, '__name__', model)} records")
+            except Exception as ex:
+                self.failed += len(records)
+                logger.error(f"Failed to write {len(records)} {getattr(model, '__name__', model)} audit records - {ex}")
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.flushes += 1
+            self._flush_seconds += elapsed
+            self._last_flush_seconds = elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+        for _ in range(len(pending) if queued is None else queued):
+            self._queue.task_done()
+
+    def flush(self, timeout: float = None) -> bool:
+        """wait until everything queued so far is written - False on timeout"""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.unfinished_tasks == 0
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """drain the queue and stop the writer - later records are dropped"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"Timed out closing the audit writer with {self._queue.qsize()} records queued")
+            return
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"The audit writer did not drain within {timeout}s")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "tasks": self.tasks,
+                "flushes": self.flushes,
+                "avg_flush_ms": round(1000 * self._flush_seconds / self.flushes, 3) if self.flushes else 0,
+                "last_flush_ms": round(1000 * self._last_flush_seconds, 3),
+                "max_flush_ms": round(1000 * self._max_flush_seconds, 3),
+            }
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.close)
+
+
+def get_audit_stats() -> dict:
+    """queue depth, flush latency and written/failed/dropped counts of the process audit writer"""
+    return audit_writer.get_stats()
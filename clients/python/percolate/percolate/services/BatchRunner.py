@@ -0,0 +1,259 @@
+"""
+Run one agent over many questions (evals and backfills) with bounded concurrency.
+
+```python
+summary = p8.run_batch("p8.PercolateAgent", questions, concurrency=8, checkpoint="eval.jsonl")
+summary.throughput, summary.latency_p95
+```
+
+- each worker thread builds its own ModelRunner from the agent once and reuses it for all its questions - runners keep
+  per run state (messages, context) so they are not shared between threads. Runners share the process connection pool
+  and the pooled provider http client
+- results are yielded (`BatchRunner.stream`) or passed to `on_result` as they complete
+- with a checkpoint file every result is appended as a json line. Running the batch again with the same file skips the
+  questions that already have an answer so an interrupted batch resumes where it stopped (failed questions are retried)
+- the summary has the counts, throughput and latency percentiles of the run
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pydantic import BaseModel, Field
+
+import percolate as p8
+from percolate.utils import logger
+from .ModelRunner import ModelRunner
+from .llm.CallingContext import CallingContext
+
+
+class BatchItem(BaseModel):
+    """the outcome of one question"""
+
+    index: int = Field(description="The position of the question in the batch")
+    key: str = Field(description="Identifies the question in checkpoints")
+    question: str
+    answer: typing.Optional[str] = None
+    error: typing.Optional[str] = None
+    latency: float = Field(0, description="Seconds to answer")
+    resumed: bool = Field(False, description="Loaded from the checkpoint rather than run")
+
+
+class BatchSummary(BaseModel):
+    """counts, throughput and latency of a batch run"""
+
+    agent: str
+    total: int
+    completed: int = 0
+    failed: int = 0
+    resumed: int = 0
+    concurrency: int
+    elapsed: float = Field(0, description="Seconds for the questions run (not resumed)")
+    throughput: float = Field(0, description="Questions answered per second")
+    latency_mean: typing.Optional[float] = None
+    latency_p50: typing.Optional[float] = None
+    latency_p95: typing.Optional[float] = None
+    latency_max: typing.Optional[float] = None
+    results: typing.List[BatchItem] = Field(default_factory=list, description="Results in question order")
+
+
+def question_key(index: int, question: str) -> str:
+    return hashlib.sha1(f"{index}:{question}".encode()).hexdigest()
+
+
+def _percentile(values: typing.List[float], q: float) -> typing.Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _agent_name(agent) -> str:
+    if isinstance(agent, str):
+        return agent
+    if isinstance(agent, ModelRunner):
+        return agent.name
+    return getattr(agent, "get_model_full_name", lambda: getattr(agent, "__name__", str(agent)))()
+
+
+class BatchRunner:
+    """runs the questions of a batch on a thread pool - see the module docs"""
+
+    def __init__(
+        self,
+        agent: typing.Union[str, ModelRunner, typing.Any],
+        concurrency: int = 4,
+        checkpoint: str = None,
+        language_model: str = None,
+        limit: int = None,
+        audit: bool = True,
+        runner_factory: typing.Callable[[], ModelRunner] = None,
+        **runner_kwargs,
+    ):
+        """
+        Args:
+            agent: an agent name, model or ModelRunner (used as the template of the worker runners)
+            concurrency: the number of questions run at once
+            checkpoint: a jsonl file of results used to resume the batch
+            language_model: the model to use instead of the default
+            limit: the maximum agent loop iterations per question
+            audit: audit sessions and responses as for single runs
+            runner_factory: builds a runner for a worker - by default from the agent
+            runner_kwargs: user_id, role_level etc. for the runners
+        """
+        self.agent_name = _agent_name(agent)
+        self.concurrency = max(1, concurrency)
+        self.checkpoint = checkpoint
+        self.language_model = language_model
+        self.limit = limit
+        self.audit = audit
+        self._factory = runner_factory or self._default_factory(agent, **runner_kwargs)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.summary: typing.Optional[BatchSummary] = None
+
+    @staticmethod
+    def _default_factory(agent, **runner_kwargs) -> typing.Callable[[], ModelRunner]:
+        if isinstance(agent, ModelRunner):
+            options = {
+                "allow_help": agent._allow_help,
+                "user_id": agent.user_id,
+                "user_groups": agent.user_groups,
+                "role_level": agent.role_level,
+            }
+            options.update(runner_kwargs)
+            model = agent.agent_model
+            return lambda: ModelRunner(model, **options)
+        model = p8.load_model(agent) if isinstance(agent, str) else agent
+        return lambda: ModelRunner(model, **runner_kwargs)
+
+    def _runner(self) -> ModelRunner:
+        """the runner of this worker thread - built on first use"""
+        runner = getattr(self._local, "runner", None)
+        if runner is None:
+            runner = self._local.runner = self._factory()
+        return runner
+
+    def load_checkpoint(self) -> typing.Dict[str, BatchItem]:
+        """the answered questions in the checkpoint by key"""
+        done = {}
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return done
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    item = BatchItem(**json.loads(line))
+                except Exception:
+                    """a line cut short by the interruption"""
+                    continue
+                if item.error is None:
+                    done[item.key] = item
+                else:
+                    done.pop(item.key, None)
+        return done
+
+    def _save(self, item: BatchItem):
+        if not self.checkpoint:
+            return
+        with self._lock:
+            with open(self.checkpoint, "a") as f:
+                f.write(item.model_dump_json(exclude={"resumed"}) + "\n")
+
+    def _ask(self, index: int, key: str, question: str) -> BatchItem:
+        """answer on a worker and checkpoint the result there so it is kept even if the consumer stops"""
+        item = self._answer(index, key, question)
+        self._save(item)
+        return item
+
+    def _answer(self, index: int, key: str, question: str) -> BatchItem:
+        started = time.monotonic()
+        try:
+            context = CallingContext.with_model(self.language_model)
+            answer = self._runner().run(question, context=context, limit=self.limit, audit=self.audit)
+            return BatchItem(index=index, key=key, question=question, answer=answer, latency=time.monotonic() - started)
+        except Exception as ex:
+            logger.warning(f"Batch question {index} failed - {ex}")
+            return BatchItem(
+                index=index,
+                key=key,
+                question=question,
+                error=f"{type(ex).__name__}: {ex}",
+                latency=time.monotonic() - started,
+            )
+
+    def stream(self, questions: typing.Iterable[str]) -> typing.Iterator[BatchItem]:
+        """yield the result of each question as it completes (resumed ones first) - `summary` is set at the end"""
+        questions = list(questions)
+        done = self.load_checkpoint()
+        summary = BatchSummary(agent=self.agent_name, total=len(questions), concurrency=self.concurrency)
+        results: typing.Dict[int, BatchItem] = {}
+        pending = []
+        for index, question in enumerate(questions):
+            key = question_key(index, question)
+            if key in done:
+                results[index] = done[key].model_copy(update={"resumed": True})
+            else:
+                pending.append((index, key, question))
+        summary.resumed = len(results)
+        if summary.resumed:
+            logger.info(f"Resuming batch - {summary.resumed} of {summary.total} questions are answered in {self.checkpoint}")
+        yield from (results[i] for i in sorted(results))
+
+        latencies = []
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="p8-batch")
+        futures = [executor.submit(self._ask, *p) for p in pending]
+        try:
+            for future in as_completed(futures):
+                item = future.result()
+                results[item.index] = item
+                if item.error is None:
+                    summary.completed += 1
+                    latencies.append(item.latency)
+                else:
+                    summary.failed += 1
+                yield item
+        finally:
+            """an interrupted batch stops queued questions - the checkpoint has the answered ones"""
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        summary.elapsed = time.monotonic() - started
+        summary.throughput = summary.completed / summary.elapsed if summary.elapsed else 0
+        if latencies:
+            summary.latency_mean = sum(latencies) / len(latencies)
+            summary.latency_p50 = _percentile(latencies, 0.5)
+            summary.latency_p95 = _percentile(latencies, 0.95)
+            summary.latency_max = max(latencies)
+        summary.results = [results[i] for i in sorted(results)]
+        self.summary = summary
+        logger.info(
+            f"Batch {self.agent_name} completed {summary.completed}/{summary.total} ({summary.failed} failed, "
+            f"{summary.resumed} resumed) in {summary.elapsed:.1f}s - {summary.throughput:.2f}/s"
+        )
+
+    def run(
+        self, questions: typing.Iterable[str], on_result: typing.Callable[[BatchItem], typing.Any] = None
+    ) -> BatchSummary:
+        """run the batch to the end and return the summary - `on_result` is called as results complete"""
+        for item in self.stream(questions):
+            if on_result:
+                on_result(item)
+        return self.summary
+
+
+def run_batch(
+    agent: typing.Union[str, ModelRunner, typing.Any],
+    questions: typing.Iterable[str],
+    concurrency: int = 4,
+    checkpoint: str = None,
+    on_result: typing.Callable[[BatchItem], typing.Any] = None,
+    **kwargs,
+) -> BatchSummary:
+    """run the agent over the questions with bounded concurrency - see `BatchRunner`"""
+    return BatchRunner(agent, concurrency=concurrency, checkpoint=checkpoint, **kwargs).run(questions, on_result=on_result)
@@ -14,15 +14,45 @@ class _RuntimeFunction(Function):
         """overrides the proxied base call"""
         return self.fn(**kwargs)
     
+
+def _get_tool_attribute(function, name: str):
+    """read an attribute set by the @tool decorator on a function, runtime function wrapper or classmethod"""
+    # Check RuntimeFunction wrapper
+    if hasattr(function, 'fn'):
+        function = function.fn
+    if hasattr(function, name):
+        return getattr(function, name)
+    # Class method case
+    if hasattr(function, '__func__') and hasattr(function.__func__, name):
+        return getattr(function.__func__, name)
+    return None
+
+
 class FunctionManager:
     def __init__(cls, use_concise_plan:bool=True, custom_planner=None):
         cls._functions= {}
         cls._function_access_levels = {}  # New: track access levels
+        cls._serial_functions = set()  # functions that opted out of concurrent tool calls
         cls.repo = p8.repository(Function)
         
         cls.use_concise_plan=use_concise_plan
         cls.planner = custom_planner
         
+    def clone(cls) -> "FunctionManager":
+        """a copy with its own function registry so that functions activated on the copy do not leak into this one
+        - the function objects and repository are shared
+        """
+        other = object.__new__(type(cls))
+        other.__dict__.update(cls.__dict__)
+        other._functions = dict(cls._functions)
+        other._function_access_levels = dict(cls._function_access_levels)
+        other._serial_functions = set(cls._serial_functions)
+        return other
+        
+    def is_thread_safe(cls, name: str) -> bool:
+        """False if the function opted out of running concurrently with @tool(thread_safe=False)"""
+        return name not in cls._serial_functions
+    
     def __getitem__(cls, key):
         """unsafely gets the function"""
         return cls._functions[key]
@@ -42,22 +72,9 @@ class FunctionManager:
                 cls._functions[function.name] = function
                 
                 # Check for access level from decorator
-                access_level = None
-                
-                # Check RuntimeFunction wrapper
-                if hasattr(function, 'fn'):
-                    if hasattr(function.fn, '_p8_access_required'):
-                        access_level = function.fn._p8_access_required
-                    elif hasattr(function.fn, '__func__') and hasattr(function.fn.__func__, '_p8_access_required'):
-                        # Class method case
-                        access_level = function.fn.__func__._p8_access_required
-                
-                # Check direct function
-                elif hasattr(function, '_p8_access_required'):
-                    access_level = function._p8_access_required
-                elif hasattr(function, '__func__') and hasattr(function.__func__, '_p8_access_required'):
-                    # Class method case
-                    access_level = function.__func__._p8_access_required
+                access_level = _get_tool_attribute(function, '_p8_access_required')
+                if _get_tool_attribute(function, '_p8_thread_safe') is False:
+                    cls._serial_functions.add(function.name)
                 
                 if access_level is not None and access_level < 100:
                     cls._function_access_levels[function.name] = access_level
@@ -4,13 +4,25 @@ Model Cache singleton for storing and reusing loaded models.
 This module provides a simple in-memory cache for agent models to avoid 
 expensive reloading of models between requests, reducing latency when 
 handling streaming requests.
+
+`Agent.load` resolves database agents through `ModelCache.load_agent`. The compiled model class is kept with the
+version (`updated_at`) of the p8."Agent" row it was built from:
+
+- within P8_AGENT_CACHE_TTL seconds the cached class is returned without a query
+- after that the row is read again and the class is only rebuilt if the row version changed
+- names that are not in the database are cached for P8_AGENT_NEGATIVE_CACHE_TTL seconds, at most
+  P8_AGENT_NEGATIVE_CACHE_SIZE of them - the names come from requests so the least recently used are dropped
+- changes to p8."Agent" drop the entry straight away via LISTEN/NOTIFY (see PostgresNotificationListener)
 """
 
 import threading
 import time
-from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable
 from percolate.utils import logger
+from percolate.utils.env import P8_AGENT_CACHE_TTL, P8_AGENT_NEGATIVE_CACHE_TTL, P8_AGENT_NEGATIVE_CACHE_SIZE
 from percolate.models import AbstractModel
+from percolate.services.PostgresNotificationListener import PostgresNotificationListener
 
 
 class ModelCache:
@@ -22,6 +34,7 @@ class ModelCache:
     """
     _instance = None
     _lock = threading.Lock()
+    CHANNEL = "p8_agent"
     
     def __new__(cls):
         with cls._lock:
@@ -39,6 +52,21 @@ class ModelCache:
         self._max_size = 100  # Maximum number of models to cache
         self._default_ttl = 3600  # Default TTL in seconds (1 hour)
         self._lock = threading.Lock()
+        # Database agents: name -> (model, row name, row version, expiry)
+        self._agents: Dict[str, Tuple[AbstractModel, Optional[str], Optional[str], float]] = {}
+        # Names that are not agents: name -> expiry, least recently used first
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._agent_ttl = P8_AGENT_CACHE_TTL
+        self._negative_ttl = P8_AGENT_NEGATIVE_CACHE_TTL
+        self._negative_max_size = P8_AGENT_NEGATIVE_CACHE_SIZE
+        self._generation = 0
+        self._subscribed = False
+        self._agent_hits = 0
+        self._negative_hits = 0
+        self._agent_misses = 0
+        self._builds = 0
+        self._revalidations = 0
+        self._invalidations = 0
         logger.info("ModelCache initialized")
     
     def get(self, model_name: str) -> Optional[AbstractModel]:
@@ -102,6 +130,88 @@ class ModelCache:
             
             logger.debug(f"Added model to cache: {model_name}")
     
+    def load_agent(
+        self,
+        name: str,
+        fetch: Callable[[str], Optional[dict]],
+        build: Callable[[dict], AbstractModel],
+    ) -> Optional[AbstractModel]:
+        """
+        Resolve a database agent to its compiled model class.
+
+        Args:
+            name: The agent name as requested
+            fetch: Reads the p8."Agent" row by name - None if there is no such agent. Errors are raised and not cached
+            build: Compiles the model class from the row
+
+        Returns:
+            The model class or None if the agent does not exist
+        """
+        if not self._agent_ttl:
+            row = fetch(name)
+            return build(row) if row else None
+        if not self._subscribed:
+            self._subscribed = True
+            PostgresNotificationListener.subscribe(self.CHANNEL, self.invalidate_agent)
+
+        with self._lock:
+            now = time.monotonic()
+            expires = self._missing.get(name)
+            if expires is not None:
+                if expires > now:
+                    self._missing.move_to_end(name)
+                    self._negative_hits += 1
+                    return None
+                del self._missing[name]
+            entry = self._agents.get(name)
+            if entry and entry[3] > now:
+                self._agent_hits += 1
+                return entry[0]
+            self._agent_misses += 1
+            generation = self._generation
+
+        row = fetch(name)
+        if not row:
+            with self._lock:
+                """do not cache what we loaded if the table changed while we were loading"""
+                if generation == self._generation and self._negative_ttl and self._negative_max_size > 0:
+                    self._agents.pop(name, None)
+                    self._missing[name] = time.monotonic() + self._negative_ttl
+                    self._missing.move_to_end(name)
+                    while len(self._missing) > self._negative_max_size:
+                        self._missing.popitem(last=False)
+            return None
+
+        row_name, version = row.get("name"), str(row.get("updated_at"))
+        if entry and entry[2] == version:
+            """the row has not changed since we built the class"""
+            model = entry[0]
+            with self._lock:
+                self._revalidations += 1
+        else:
+            model = build(row)
+            with self._lock:
+                self._builds += 1
+
+        with self._lock:
+            if generation == self._generation:
+                self._agents[name] = (model, row_name, version, time.monotonic() + self._agent_ttl)
+        return model
+
+    def invalidate_agent(self, payload: dict = None) -> None:
+        """drop the changed agent (by name in the notification payload) or every agent"""
+        name = (payload or {}).get("name")
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if name:
+                for key in [k for k, e in self._agents.items() if k == name or e[1] == name]:
+                    del self._agents[key]
+                self._missing.pop(name, None)
+            else:
+                self._agents.clear()
+                self._missing.clear()
+
     def _remove(self, model_name: str) -> None:
         """Remove a model from the cache."""
         if model_name in self._cache:
@@ -123,6 +233,8 @@ class ModelCache:
         with self._lock:
             self._cache.clear()
             self._access_times.clear()
+            self._agents.clear()
+            self._missing.clear()
             logger.info("Model cache cleared")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -137,7 +249,20 @@ class ModelCache:
                 "hit_count": self._hit_count,
                 "miss_count": self._miss_count,
                 "hit_rate": f"{hit_rate:.2f}%",
-                "cached_models": list(self._cache.keys())
+                "cached_models": list(self._cache.keys()),
+                "agents": {
+                    "size": len(self._agents),
+                    "ttl": self._agent_ttl,
+                    "negative_ttl": self._negative_ttl,
+                    "missing": len(self._missing),
+                    "max_missing": self._negative_max_size,
+                    "hits": self._agent_hits,
+                    "negative_hits": self._negative_hits,
+                    "misses": self._agent_misses,
+                    "builds": self._builds,
+                    "revalidations": self._revalidations,
+                    "invalidations": self._invalidations,
+                },
             }
 
 
@@ -1,8 +1,14 @@
 import typing
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import percolate as p8
 from pydantic import BaseModel
 from percolate.utils import logger
+from percolate.utils.decorators import tool
+from percolate.utils.env import P8_TOOL_CALL_CONCURRENCY, P8_TOOL_CALL_TIMEOUT
+from percolate.services.PostgresConnectionPool import acquire_fan_out, release_fan_out
 from percolate.models.p8 import Function
 from .FunctionManager import FunctionManager
 from percolate.models import AbstractModel, MessageStack
@@ -15,6 +21,9 @@ from percolate.services.llm import (
 from percolate.services.llm.utils import LLMStreamIterator
 import uuid
 
+"""seconds between checks of tool calls that are waiting for a concurrent slot"""
+_QUEUED_CALL_POLL = 0.05
+
 GENERIC_P8_PROMPT = """\n# General Advice.
 Use whatever functions are available to you and use world knowledge only if prompted 
 or if there is not other way 
@@ -73,6 +82,26 @@ class ModelRunner:
         self.messages = MessageStack(None)
         logger.info(f"******Constructed agent {self.name}******")
 
+    def clone(self, user_id=None, user_groups=None, role_level=None) -> "ModelRunner":
+        """a runner for one request that skips the model and function setup of the constructor.
+        The clone has a fresh message stack and context, its own copy of the activated functions (with the runner
+        functions e.g. help and search bound to the clone) and the given user context. The repository is shared.
+        """
+        runner = object.__new__(type(self))
+        runner.__dict__.update(self.__dict__)
+        runner._context = None
+        runner.messages = MessageStack(None)
+        runner.user_id = user_id
+        runner.user_groups = user_groups
+        runner.role_level = role_level
+        runner._function_manager = self._function_manager.clone()
+        functions = runner._function_manager._functions
+        for name, function in list(functions.items()):
+            fn = getattr(function, "fn", None)
+            if getattr(fn, "__self__", None) is self:
+                functions[name] = function.model_copy(update={"fn": getattr(runner, fn.__name__)})
+        return runner
+
     def get_repo(self):
         """
         get the repo and use the user context of its given
@@ -137,6 +166,7 @@ class ModelRunner:
 
         return self.get_repo().search(questions, user_id=str(user_id))
 
+    @tool(thread_safe=False)
     def activate_functions_by_name(self, function_names: typing.List[str], **kwargs):
         """Provide a list of function names to load.
         The names should be fully qualified object_id_function_name and we use underscores in place of periods which are illegal.
@@ -226,39 +256,162 @@ class ModelRunner:
         Args:
             function_call (FunctionCall): the payload send from an LLM to call a function
         """
+        data = self._call_function(function_call)
+        # print(data) # maybe trace here
+        """update messages with data if we can or add error messages to notify the language model"""
+        self.messages.add(data)
+        return data
+
+    def _call_function(self, function_call: FunctionCall) -> dict:
+        """call the function and format the result or error as a message for the language model - see invoke"""
         logger.info(f"({self.name}){function_call=}")
         f = self._function_manager[function_call.name]
         if not f:
             message = f"attempting to load function {function_call.name} which is not activated - please activate it"
-            data = MessageStackFormatter.format_function_response_error(
+            return MessageStackFormatter.format_function_response_error(
                 function_call, ValueError(message), self._context
             )
-        else:
-            try:
-                """try call the function - assumes its some sort of json thing that comes back"""
-                data = f(**function_call.arguments) or {}
-                data = MessageStackFormatter.format_function_response_data(
-                    function_call, data, self._context
-                )
+        """if there is an error, how you format the message matters - some generic ones are added
+        its important to make sure the format coincides with the language model being used in context
+        """
+        try:
+            """try call the function - assumes its some sort of json thing that comes back"""
+            data = f(**function_call.arguments) or {}
+            return MessageStackFormatter.format_function_response_data(
+                function_call, data, self._context
+            )
+        except TypeError as tex:  # type errors are usually the agents fault
+            logger.warning(f"Error calling function {traceback.format_exc()}")
+            return MessageStackFormatter.format_function_response_type_error(
+                function_call, tex, self._context
+            )
+        except Exception as ex:  # general errors are usually our fault
+            logger.warning(f"Error calling function {traceback.format_exc()}")
+            return MessageStackFormatter.format_function_response_error(
+                function_call, ex, self._context
+            )
 
-                """if there is an error, how you format the message matters - some generic ones are added
-                its important to make sure the format coincides with the language model being used in context
-                """
-            except TypeError as tex:  # type errors are usually the agents fault
-                logger.warning(f"Error calling function {traceback.format_exc()}")
-                data = MessageStackFormatter.format_function_response_type_error(
-                    function_call, tex, self._context
-                )
-            except Exception as ex:  # general errors are usually our fault
-                logger.warning(f"Error calling function {traceback.format_exc()}")
-                data = MessageStackFormatter.format_function_response_error(
-                    function_call, ex, self._context
-                )
+    def _safe_call_function(self, function_call: FunctionCall) -> dict:
+        """errors outside the function e.g. it is not registered are also formatted for the language model"""
+        try:
+            return self._call_function(function_call)
+        except Exception as ex:
+            logger.error(f"Error executing function {function_call.name}: {str(ex)}")
+            return MessageStackFormatter.format_function_response_error(
+                function_call, ex, self._context
+            )
 
-        # print(data) # maybe trace here
-        """update messages with data if we can or add error messages to notify the language model"""
-        self.messages.add(data)
-        return data
+    def _call_functions(
+        self, function_calls: typing.List[FunctionCall]
+    ) -> typing.List[dict]:
+        """Call the functions that the language model asked for in one turn and return their messages in call order.
+
+        Independent calls run concurrently, at most P8_TOOL_CALL_CONCURRENCY at a time, and each call gets P8_TOOL_CALL_TIMEOUT
+        seconds from when it starts running (queued calls are not charged for the wait). A call that times out is abandoned
+        and no longer holds one of the concurrent slots. Tools mostly query the database so every call beyond the first
+        needs one of the process-wide fan out slots that search also uses (see fan_out) - without free slots they run in sequence.
+        Functions that opted out with @tool(thread_safe=False) run on this thread after the calls before them complete,
+        so e.g. activating functions and then calling them in the same turn still works.
+        """
+        results: typing.List[dict] = [None] * len(function_calls)
+        batch: typing.List[int] = []
+
+        def timed_out(fc: FunctionCall) -> dict:
+            logger.warning(f"Function {fc.name} timed out after {P8_TOOL_CALL_TIMEOUT}s")
+            return MessageStackFormatter.format_function_response_error(
+                fc,
+                TimeoutError(f"The function {fc.name} did not complete within {P8_TOOL_CALL_TIMEOUT} seconds"),
+                self._context,
+            )
+
+        def run_batch():
+            if not batch:
+                return
+            if (len(batch) == 1 and not P8_TOOL_CALL_TIMEOUT) or P8_TOOL_CALL_CONCURRENCY <= 1:
+                for i in batch:
+                    results[i] = self._safe_call_function(function_calls[i])
+                batch.clear()
+                return
+
+            """a thread per call so abandoned calls cannot block queued ones - the slots bound how many run at once"""
+            extra = acquire_fan_out(min(len(batch), P8_TOOL_CALL_CONCURRENCY) - 1)
+            executor = ThreadPoolExecutor(max_workers=len(batch), thread_name_prefix="p8-tool")
+            slots = threading.Semaphore(extra + 1)
+            lock = threading.Lock()
+            started: typing.Dict[int, float] = {}
+            freed: typing.Set[int] = set()
+
+            def free(i: int):
+                with lock:
+                    if i in freed:
+                        return
+                    freed.add(i)
+                slots.release()
+
+            def call(i: int) -> dict:
+                slots.acquire()
+                with lock:
+                    started[i] = time.monotonic()
+                try:
+                    return self._safe_call_function(function_calls[i])
+                finally:
+                    free(i)
+
+            unfinished = [len(batch)]
+
+            def finished(_):
+                """the shared slots are returned when the last thread exits - including calls that were abandoned"""
+                with lock:
+                    unfinished[0] -= 1
+                    last = unfinished[0] == 0
+                if last:
+                    release_fan_out(extra)
+
+            try:
+                futures = {executor.submit(call, i): i for i in batch}
+                for future in futures:
+                    future.add_done_callback(finished)
+                pending = set(futures)
+                while pending:
+                    timeout = None
+                    if P8_TOOL_CALL_TIMEOUT:
+                        now = time.monotonic()
+                        for future in list(pending):
+                            i = futures[future]
+                            with lock:
+                                start = started.get(i)
+                            if start is None:
+                                """queued for a slot - check again shortly since its clock starts when it runs"""
+                                remaining = _QUEUED_CALL_POLL
+                            elif future.done():
+                                continue
+                            else:
+                                remaining = start + P8_TOOL_CALL_TIMEOUT - now
+                                if remaining <= 0:
+                                    pending.discard(future)
+                                    results[i] = timed_out(function_calls[i])
+                                    free(i)
+                                    continue
+                            timeout = remaining if timeout is None else min(timeout, remaining)
+                        if not pending:
+                            break
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.discard(future)
+                        results[futures[future]] = future.result()
+            finally:
+                """do not wait for calls that timed out"""
+                executor.shutdown(wait=False, cancel_futures=True)
+            batch.clear()
+
+        for i, fc in enumerate(function_calls):
+            if self._function_manager.is_thread_safe(fc.name):
+                batch.append(i)
+            else:
+                run_batch()
+                results[i] = self._safe_call_function(fc)
+        run_batch()
+        return results
 
     @property
     def functions(self) -> typing.Dict[str, Function]:
@@ -428,26 +581,22 @@ class ModelRunner:
                         turn_usage = chunk.get("usage", {}) or {}
                         # Invoke each buffered function call and build aggregate response data
                         tool_call_evals = {}
-                        for tc in choice["delta"].get("tool_calls", []):
-                            fc = FunctionCall(
-                                id=tc["id"], **tc["function"], scheme="openai"
-                            )
+                        function_calls = [
+                            FunctionCall(id=tc["id"], **tc["function"], scheme="openai")
+                            for tc in choice["delta"].get("tool_calls", [])
+                        ]
+                        for fc in function_calls:
                             # We already sent "Preparing to call" message earlier, now send "executing" message
                             executing_msg = f"event: executing {fc.name}...\n\n"
                             yield executing_msg.encode("utf-8")
-                            self.messages.add(fc.to_assistant_message())
 
-                            # Safely invoke the function, catching any exceptions that might occur
-                            try:
-                                tool_call_evals[fc.id] = self.invoke(fc)
-                            except Exception as e:
-                                logger.error(
-                                    f"Error executing function {fc.name}: {str(e)}"
-                                )
-                                # Add error to the evaluations to avoid breaking the stream
-                                tool_call_evals[fc.id] = {
-                                    "error": f"Error executing function: {str(e)}"
-                                }
+                        """the calls run concurrently but the messages are added in the order of the calls"""
+                        for fc, result in zip(
+                            function_calls, self._call_functions(function_calls)
+                        ):
+                            self.messages.add(fc.to_assistant_message())
+                            self.messages.add(result)
+                            tool_call_evals[fc.id] = result
 
                         last_ai_response = {
                             "tool_calls": choice["delta"].get("tool_calls", []),
@@ -507,6 +656,9 @@ class ModelRunner:
         data = data or self._init_data
         """setup all the bits before running the loop"""
         self._context = context or CallingContext.with_model(language_model)
+        if not self._context.agent:
+            """the response cache can be enabled per agent - the caller's context is not modified"""
+            self._context = self._context.model_copy(update={"agent": self.name})
         """a generic wrapper around the REST interfaces of any LLM client"""
         lm_client = LanguageModel.from_context(self._context)
 
@@ -541,13 +693,11 @@ class ModelRunner:
             if function_calls := response.tool_calls:
                 """models need us to add the tool call to the stack - this is not the case for openai function call but for consistency over models we must"""
                 self.messages.add(response.verbatim)
-                """call one or more functions and update messages - functions can be updated inside this context"""
-                for (
-                    func_call
-                ) in (
-                    function_calls
-                ):  # its assumed to be only one for now but we could par do in future
-                    self.invoke(FunctionCall(**func_call))
+                """call one or more functions (concurrently) and update messages in call order - functions can be updated inside this context"""
+                for result in self._call_functions(
+                    [FunctionCall(**func_call) for func_call in function_calls]
+                ):
+                    self.messages.add(result)
                 continue
             if response is not None:
                 # marks the fact that we have unfinished business
@@ -1,74 +1,88 @@
 """
-ModelRunner Cache singleton for storing and reusing fully initialized ModelRunner instances.
+ModelRunner warm pool for reusing fully initialized ModelRunner instances.
 
-This module provides a more effective cache that stores fully initialized ModelRunner
-instances, not just model classes. This eliminates the significant overhead of
-creating and initializing ModelRunner objects on each request.
+Constructing a ModelRunner loads the agent's functions (`FunctionManager.activate_agent_context`), creates its
+repository and does the initial database lookups. The pool keeps one initialized runner per agent and role level as a
+template and each request gets a clone of it (`ModelRunner.clone`) with its own message stack, calling context,
+activated functions and user context - so concurrent users never share the state of a run.
+
+Templates expire after P8_RUNNER_POOL_TTL seconds and the least recently used are evicted above P8_RUNNER_POOL_SIZE.
 """
 
 import threading
 import time
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Callable
 from percolate.utils import logger
+from percolate.utils.env import P8_RUNNER_POOL_SIZE, P8_RUNNER_POOL_TTL
 from percolate.models import AbstractModel
 from percolate.services.ModelRunner import ModelRunner
 
+
+def runner_key(model_name: str, role_level: Optional[int] = None) -> str:
+    """the pool key of the agent (hyphenated url names are converted to dotted names) and role level"""
+    if '-' in model_name:
+        model_name = model_name.replace('-', '.')
+    return f"{model_name}:{role_level}" if role_level is not None else model_name
+
+
 class ModelRunnerCache:
     """
-    Singleton cache for ModelRunner instances to eliminate initialization overhead.
-    
-    Unlike the ModelCache which only caches model classes, this cache stores fully
-    initialized ModelRunner instances, preserving all registered functions and state.
+    Singleton warm pool of ModelRunner templates keyed by agent and role level.
+
+    Templates are never run - `get_runner` returns clones of them. Each template is built once even when
+    concurrent requests ask for it at the same time.
     """
     _instance = None
     _lock = threading.Lock()
-    
+
     def __new__(cls):
         with cls._lock:
             if cls._instance is None:
                 logger.info("Creating new ModelRunnerCache singleton instance")
                 cls._instance = super(ModelRunnerCache, cls).__new__(cls)
                 cls._instance._initialize()
-            else:
-                logger.info("Reusing existing ModelRunnerCache singleton instance")
             return cls._instance
-            
+
     def __init__(self):
         # We don't do initialization here because __init__ is called every time
         # the class is instantiated, even if __new__ returns an existing instance
         pass
-    
+
     def _initialize(self):
         """Initialize the cache internals."""
         self._cache: Dict[str, Tuple[ModelRunner, float]] = {}
         self._access_times: Dict[str, float] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
         self._hit_count = 0
         self._miss_count = 0
-        self._max_size = 20  # ModelRunners use more memory, so use a smaller max size
-        self._default_ttl = 3600  # Default TTL in seconds (1 hour)
+        self._evictions = 0
+        self._expirations = 0
+        self._builds = 0
+        self._build_seconds = 0.0
+        self._max_build_seconds = 0.0
+        self._clones = 0
+        self._clone_seconds = 0.0
+        self._max_size = P8_RUNNER_POOL_SIZE  # ModelRunners use more memory, so use a smaller max size
+        self._default_ttl = P8_RUNNER_POOL_TTL
         logger.info("ModelRunnerCache initialized")
-    
+
     def get(self, model_name: str) -> Optional[ModelRunner]:
         """
-        Get a ModelRunner from the cache by name.
-        
+        Get a ModelRunner template from the cache by key - use `get_runner` for a runner to use in a request.
+
         Args:
-            model_name: The fully qualified name of the model
-            
+            model_name: The pool key (see `runner_key`) or fully qualified name of the model
+
         Returns:
-            The cached ModelRunner instance or None if not found/expired
+            The cached ModelRunner template or None if not found/expired
         """
         with self._lock:
             current_time = time.time()
-            
+
             # Convert hyphenated names (used in URLs) to dotted format
             if '-' in model_name:
                 model_name = model_name.replace('-', '.')
-            
-            # Extra debugging for cache inspection
-            logger.info(f"Checking cache for model: {model_name}")
-            logger.info(f"Current cache contents: {list(self._cache.keys())}")
-            
+
             # Check if ModelRunner exists in cache and isn't expired
             if model_name in self._cache:
                 runner, expiry_time = self._cache[model_name]
@@ -76,23 +90,24 @@ class ModelRunnerCache:
                     # Update access time for LRU logic
                     self._access_times[model_name] = current_time
                     self._hit_count += 1
-                    logger.info(f"ModelRunnerCache HIT for runner: {model_name}")
+                    logger.debug(f"ModelRunnerCache HIT for runner: {model_name}")
                     return runner
                 else:
                     # Expired, remove from cache
                     logger.info(f"Cache entry expired for {model_name}, removing")
+                    self._expirations += 1
                     self._remove(model_name)
-            
+
             self._miss_count += 1
-            logger.info(f"ModelRunnerCache MISS for runner: {model_name}")
+            logger.debug(f"ModelRunnerCache MISS for runner: {model_name}")
             return None
-    
+
     def put(self, model_name: str, runner: ModelRunner, ttl: Optional[int] = None) -> None:
         """
-        Add a ModelRunner to the cache.
-        
+        Add a ModelRunner template to the cache.
+
         Args:
-            model_name: The fully qualified name of the model
+            model_name: The pool key (see `runner_key`) or fully qualified name of the model
             runner: The ModelRunner instance to cache
             ttl: Time-to-live in seconds, 0 for no expiration, None for default
         """
@@ -100,60 +115,108 @@ class ModelRunnerCache:
             # Convert hyphenated names (used in URLs) to dotted format - ensure consistency
             if '-' in model_name:
                 model_name = model_name.replace('-', '.')
-                
+
             # Ensure cache doesn't exceed max size by removing LRU items if needed
             if len(self._cache) >= self._max_size and model_name not in self._cache:
                 self._evict_lru()
-            
+
             # Set expiry time based on TTL
             current_time = time.time()
             if ttl is None:
                 ttl = self._default_ttl
-            
+
             expiry_time = 0 if ttl == 0 else current_time + ttl
-            
+
             # Store ModelRunner and update access time
             self._cache[model_name] = (runner, expiry_time)
             self._access_times[model_name] = current_time
-            
+
             logger.info(f"Added ModelRunner to cache: {model_name}")
-            logger.info(f"Updated cache contents: {list(self._cache.keys())}")
-    
+
+    def get_or_create(self, key: str, build: Callable[[], Optional[ModelRunner]]) -> Optional[ModelRunner]:
+        """
+        Get the template or build it - concurrent callers for the same key wait for one build.
+
+        Args:
+            key: The pool key (see `runner_key`)
+            build: Constructs the template - it is not cached if it returns None
+        """
+        runner = self.get(key)
+        if runner is not None:
+            return runner
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            """another request may have built it while we waited"""
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached is not None and (cached[1] == 0 or cached[1] > time.time()):
+                return cached[0]
+            started = time.monotonic()
+            runner = build()
+            elapsed = time.monotonic() - started
+            if runner is None:
+                return None
+            with self._lock:
+                self._builds += 1
+                self._build_seconds += elapsed
+                self._max_build_seconds = max(self._max_build_seconds, elapsed)
+            self.put(key, runner)
+            logger.info(f"Built ModelRunner template {key} in {elapsed:.3f}s")
+            return runner
+
+    def clone(self, template: ModelRunner, **user_context) -> ModelRunner:
+        """A request runner from the template with the user context (user_id, user_groups, role_level)."""
+        started = time.monotonic()
+        runner = template.clone(**user_context)
+        with self._lock:
+            self._clones += 1
+            self._clone_seconds += time.monotonic() - started
+        return runner
+
     def _remove(self, model_name: str) -> None:
         """Remove a ModelRunner from the cache."""
         if model_name in self._cache:
             del self._cache[model_name]
         if model_name in self._access_times:
             del self._access_times[model_name]
-    
+
     def _evict_lru(self) -> None:
         """Evict the least recently used item from cache."""
         if not self._access_times:
             return
-        
+
         lru_key = min(self._access_times.items(), key=lambda x: x[1])[0]
         self._remove(lru_key)
+        self._evictions += 1
         logger.debug(f"Evicted LRU ModelRunner from cache: {lru_key}")
-    
+
     def clear(self) -> None:
         """Clear the entire cache."""
         with self._lock:
             self._cache.clear()
             self._access_times.clear()
             logger.info("ModelRunner cache cleared")
-    
+
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
         with self._lock:
             total_requests = self._hit_count + self._miss_count
             hit_rate = (self._hit_count / total_requests) * 100 if total_requests > 0 else 0
-            
+
             return {
                 "size": len(self._cache),
                 "max_size": self._max_size,
                 "hit_count": self._hit_count,
                 "miss_count": self._miss_count,
                 "hit_rate": f"{hit_rate:.2f}%",
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "builds": self._builds,
+                "avg_build_ms": round(1000 * self._build_seconds / self._builds, 3) if self._builds else 0,
+                "max_build_ms": round(1000 * self._max_build_seconds, 3),
+                "clones": self._clones,
+                "avg_clone_ms": round(1000 * self._clone_seconds / self._clones, 3) if self._clones else 0,
                 "cached_runners": list(self._cache.keys())
             }
 
@@ -162,77 +225,69 @@ class ModelRunnerCache:
 
 def get_runner(model_name: str, create_if_missing: bool = True, **kwargs) -> Optional[ModelRunner]:
     """
-    Get a ModelRunner from the cache, or create and cache it if not found.
-    
-    In multi-user and multi-threaded environments, this function creates per-user ModelRunners
-    by including user-specific context in the cache key. This ensures each user gets their own
-    ModelRunner instance with proper access controls.
-    
+    Get a ModelRunner for a request - a clone of the warm template of the agent and role level.
+
+    The template is built (and cached) on first use. The clone has a fresh message stack and context and the
+    user context given here so it can be used by one request without affecting other users.
+
     Args:
         model_name: The fully qualified name of the model
-        create_if_missing: If True, create a new ModelRunner when not found
-        **kwargs: Additional arguments to pass to ModelRunner constructor if created
-                 Important keys for multi-user support:
-                 - user_id: User ID for row-level security (creates per-user ModelRunner)
+        create_if_missing: If True, build the template when it is not in the pool
+        **kwargs: Additional arguments to pass to the ModelRunner constructor if created
+                 User context keys are applied to the clone:
+                 - user_id: User ID for row-level security
                  - user_groups: User group IDs for access control
-                 - role_level: Role level for security
-        
+                 - role_level: Role level for security (templates are kept per role level)
+                 - fallback_to_resources: use a p8.Resources runner if the model cannot be loaded (default True)
+
     Returns:
         The ModelRunner instance or None if it couldn't be loaded and create_if_missing is False
     """
-    # For multi-user support, we need to create a cache key that includes user context
-    # If user_id is provided, we'll create a per-user runner with that user's security context
-    user_id = kwargs.get('user_id')
-    user_groups = kwargs.get('user_groups')
-    role_level = kwargs.get('role_level')
-    
-    # Create a cache key that includes user context if present
-    # For debugging, let's log what we're getting as input
-    logger.info(f"ModelRunnerCache get_runner called with model_name={model_name}, user_id={user_id}, role_level={role_level}")
-    
-    # Standardize model name format (replace dots with hyphens if they're in the name)
-    if '-' in model_name:
-        model_name = model_name.replace('-', '.')
-    
-    # Create a simpler cache key, just using the model name for now
-    # During initial development, let's avoid user-specific runners for simplicity
-    cache_key = model_name
-    
-    # Debug log the final cache key
-    logger.info(f"Using cache key: {cache_key}")
-    
+    user_context = {
+        'user_id': kwargs.pop('user_id', None),
+        'user_groups': kwargs.pop('user_groups', None),
+        'role_level': kwargs.pop('role_level', None),
+    }
+    fallback_to_resources = kwargs.pop('fallback_to_resources', True)
+    # Convert hyphenated names (used in URLs) to dotted format so the template is loaded by the name it is pooled under
+    model_name = model_name.replace('-', '.')
+    role_level = user_context['role_level']
+    key = runner_key(model_name, role_level)
     cache = ModelRunnerCache()
-    runner = cache.get(cache_key)
-    
-    if runner is None and create_if_missing:
-        try:
-            # Import here to avoid circular import
-            from percolate.interface import try_load_model
-            from percolate.models import Resources
-            
-            # Try to load the model
-            model = try_load_model(model_name)
-            if model:
-                # Create a new ModelRunner with user context and cache it
-                runner = ModelRunner(model, **kwargs)
-                cache.put(cache_key, runner)
-                logger.info(f"Created new ModelRunner for {cache_key}")
-            else:
-                logger.warning(f"Could not load model {model_name}")
-                # Fall back to Resources if requested
-                if kwargs.get('fallback_to_resources', True):
-                    runner = ModelRunner(Resources, **kwargs)
-                    # Don't cache the fallback
-        except Exception as e:
-            logger.warning(f"Failed to create ModelRunner for {model_name}: {str(e)}")
+
+    if not create_if_missing:
+        template = cache.get(key)
+        return cache.clone(template, **user_context) if template is not None else None
+
+    def build() -> Optional[ModelRunner]:
+        # Import here to avoid circular import
+        from percolate.interface import try_load_model
+
+        model = try_load_model(model_name)
+        if not model:
+            logger.warning(f"Could not load model {model_name}")
             return None
-    
-    return runner
+        return ModelRunner(model, role_level=role_level, **kwargs)
+
+    try:
+        template = cache.get_or_create(key, build)
+        if template is None and fallback_to_resources:
+            from percolate.models import Resources
+
+            template = cache.get_or_create(
+                runner_key(Resources.get_model_full_name(), role_level),
+                lambda: ModelRunner(Resources, role_level=role_level, **kwargs),
+            )
+    except Exception as e:
+        logger.warning(f"Failed to create ModelRunner for {model_name}: {str(e)}")
+        return None
+
+    return cache.clone(template, **user_context) if template is not None else None
 
 def cache_runner(model_name: str, runner: ModelRunner, ttl: Optional[int] = None) -> None:
     """
-    Explicitly add a ModelRunner to the cache.
-    
+    Explicitly add a ModelRunner template to the cache.
+
     Args:
         model_name: The fully qualified name of the model
         runner: The ModelRunner instance to cache
@@ -246,4 +301,4 @@ def clear_runner_cache() -> None:
 
 def get_runner_cache_stats() -> Dict[str, Any]:
     """Get statistics about the ModelRunner cache."""
-    return ModelRunnerCache().get_stats()
\ No newline at end of file
+    return ModelRunnerCache().get_stats()
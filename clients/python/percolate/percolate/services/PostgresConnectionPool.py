@@ -0,0 +1,408 @@
+"""
+Process-wide connection pool for the PostgresService.
+
+Opening a psycopg2 connection costs a TCP and auth handshake. The PostgresService used to
+connect and close for every query so this pool keeps connections open and hands them out
+to services as needed. There is one pool per connection string per process.
+
+- connections are recycled when they are older than the max lifetime
+- connections idle for a while are pinged before they are handed out
+- connections are reset (RESET ALL) when they are returned so that no user context
+  for row level security or statement timeouts leak between callers
+
+Work that fans out onto extra threads (search questions, tool calls) takes slots from one
+process-wide budget (P8_PG_FAN_OUT_MAX) so that nested fan out cannot exhaust the pool.
+"""
+
+import atexit
+import os
+import threading
+import time
+import typing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+from tenacity import retry, stop_after_attempt, wait_fixed
+
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_PG_POOL_MIN_SIZE,
+    P8_PG_POOL_MAX_SIZE,
+    P8_PG_POOL_MAX_LIFETIME,
+    P8_PG_POOL_HEALTH_CHECK_SECONDS,
+    P8_PG_POOL_TIMEOUT,
+    P8_PG_FAN_OUT_MAX,
+)
+
+
+class PoolTimeoutError(Exception):
+    """raised when no connection could be checked out of the pool in time"""
+
+
+class _PooledConnection:
+    """book keeping for a connection that the pool owns"""
+
+    __slots__ = ["conn", "created_at", "last_used_at"]
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class PostgresConnectionPool:
+    """
+    A thread-safe, blocking connection pool with health checks and a max lifetime per connection.
+
+    Use `PostgresConnectionPool.get(connection_string)` to get the shared pool for a connection string.
+
+    ```python
+    pool = PostgresConnectionPool.get(POSTGRES_CONNECTION_STRING)
+    with pool.connection() as conn:
+        ...
+    ```
+    """
+
+    _pools: typing.Dict[str, "PostgresConnectionPool"] = {}
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+    def __init__(
+        self,
+        connection_string: str,
+        min_size: int = P8_PG_POOL_MIN_SIZE,
+        max_size: int = P8_PG_POOL_MAX_SIZE,
+        max_lifetime: int = P8_PG_POOL_MAX_LIFETIME,
+        health_check_seconds: int = P8_PG_POOL_HEALTH_CHECK_SECONDS,
+        timeout: int = P8_PG_POOL_TIMEOUT,
+        connect: typing.Callable = None,
+    ):
+        """
+        Args:
+            connection_string: the postgres connection string
+            min_size: the number of idle connections we keep open even when they are not used
+            max_size: the max number of connections (in use and idle) this pool will open
+            max_lifetime: seconds after which a connection is closed and replaced
+            health_check_seconds: connections idle for longer than this are pinged before use
+            timeout: seconds to wait for a free connection when all connections are in use
+            connect: optional connection factory - defaults to psycopg2.connect
+        """
+        self._connection_string = connection_string
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.max_lifetime = max_lifetime
+        self.health_check_seconds = health_check_seconds
+        self.timeout = timeout
+        self._connect_fn = connect or psycopg2.connect
+
+        self._idle: typing.Deque[_PooledConnection] = deque()
+        self._in_use: typing.Dict[int, _PooledConnection] = {}
+        self._condition = threading.Condition()
+        self._opened = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._created_count = 0
+        self._recycled_count = 0
+        self._failed_health_checks = 0
+        self._wait_time_total = 0.0
+
+    @classmethod
+    def get(cls, connection_string: str, **kwargs) -> "PostgresConnectionPool":
+        """get the process-wide pool for the connection string - pools are not shared over forks"""
+        with cls._lock:
+            if cls._pid != os.getpid():
+                """we are in a forked worker - the parent's sockets are not ours to use"""
+                cls._pools = {}
+                cls._pid = os.getpid()
+            pool = cls._pools.get(connection_string)
+            if pool is None or pool._closed:
+                pool = cls(connection_string, **kwargs)
+                cls._pools[connection_string] = pool
+                logger.debug(
+                    f"Created connection pool {pool.min_size=}, {pool.max_size=}"
+                )
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        """close all pools in this process e.g. on shutdown"""
+        with cls._lock:
+            pools = list(cls._pools.values())
+            cls._pools = {}
+        for pool in pools:
+            pool.close()
+
+    def _open(self) -> _PooledConnection:
+        """open a new connection - retried as per the connection logic in the PostgresService"""
+
+        @retry(wait=wait_fixed(1), stop=stop_after_attempt(4), reraise=True)
+        def open_connection_with_retry(conn_string):
+            return self._connect_fn(conn_string, connect_timeout=5)
+
+        conn = open_connection_with_retry(self._connection_string)
+        self._created_count += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, item: _PooledConnection):
+        try:
+            item.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, item: _PooledConnection) -> bool:
+        if self.max_lifetime and self.max_lifetime > 0:
+            return time.monotonic() - item.created_at > self.max_lifetime
+        return False
+
+    def _is_healthy(self, item: _PooledConnection) -> bool:
+        """closed connections are never healthy - connections idle for a while are pinged"""
+        if item.conn.closed:
+            return False
+        idle_for = time.monotonic() - item.last_used_at
+        if self.health_check_seconds is not None and idle_for < self.health_check_seconds:
+            return True
+        try:
+            cursor = item.conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            item.conn.rollback()
+            return True
+        except Exception:
+            self._failed_health_checks += 1
+            logger.debug("Pooled connection failed a health check and will be replaced")
+            return False
+
+    def getconn(self):
+        """check out a connection - blocks for up to `timeout` seconds if the pool is exhausted"""
+        started = time.monotonic()
+        deadline = started + (self.timeout or 0)
+
+        while True:
+            item = None
+            with self._condition:
+                if self._closed:
+                    raise PoolTimeoutError("The connection pool is closed")
+                while not self._idle and self._opened >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout}s waiting for one of {self.max_size} pooled connections"
+                        )
+                    self._condition.wait(remaining)
+                if self._idle:
+                    item = self._idle.pop()
+                else:
+                    """reserve a slot and open the connection outside the lock"""
+                    self._opened += 1
+
+            if item is not None:
+                if self._is_expired(item) or not self._is_healthy(item):
+                    self._recycled_count += 1
+                    self._discard(item)
+                    with self._condition:
+                        self._opened -= 1
+                        self._condition.notify()
+                    continue
+            else:
+                try:
+                    item = self._open()
+                except Exception:
+                    with self._condition:
+                        self._opened -= 1
+                        self._condition.notify()
+                    raise
+
+            with self._condition:
+                self._in_use[id(item.conn)] = item
+                self._checkouts += 1
+                self._wait_time_total += time.monotonic() - started
+            return item.conn
+
+    def _reset(self, conn) -> bool:
+        """clear any session state e.g. user context for RLS before the connection is reused"""
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("RESET ALL")
+            finally:
+                cursor.close()
+            conn.commit()
+            return True
+        except Exception:
+            logger.debug("Failed to reset pooled connection - it will be discarded")
+            return False
+
+    def putconn(self, conn, discard: bool = False):
+        """return a connection to the pool - broken, expired or failed to reset connections are closed"""
+        with self._condition:
+            item = self._in_use.pop(id(conn), None)
+        if item is None:
+            """not ours - just close it"""
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        keep = (
+            not discard
+            and not self._closed
+            and not conn.closed
+            and not self._is_expired(item)
+            and self._reset(conn)
+        )
+
+        with self._condition:
+            if keep:
+                item.last_used_at = time.monotonic()
+                self._idle.append(item)
+            else:
+                self._opened -= 1
+                self._recycled_count += 1
+            self._condition.notify()
+
+        if not keep:
+            self._discard(item)
+
+    @contextmanager
+    def connection(self):
+        """check out a connection for the duration of a block"""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def maintain(self) -> int:
+        """close expired idle connections and open new ones until there are at least min_size connections.
+        This can be called on startup to warm the pool or periodically from a scheduler.
+        Returns the number of connections opened.
+        """
+        expired = []
+        with self._condition:
+            keep = deque()
+            while self._idle:
+                item = self._idle.popleft()
+                if self._is_expired(item):
+                    expired.append(item)
+                    self._opened -= 1
+                    self._recycled_count += 1
+                else:
+                    keep.append(item)
+            self._idle = keep
+            missing = max(0, min(self.min_size, self.max_size) - self._opened)
+            self._opened += missing
+            self._condition.notify_all()
+        for item in expired:
+            self._discard(item)
+
+        opened = 0
+        for _ in range(missing):
+            try:
+                item = self._open()
+            except Exception:
+                with self._condition:
+                    self._opened -= 1
+                    self._condition.notify()
+                logger.warning("Failed to open a connection while filling the pool")
+                continue
+            with self._condition:
+                self._idle.append(item)
+                self._condition.notify()
+            opened += 1
+        return opened
+
+    def close(self):
+        """close all idle connections and stop handing out connections - in use connections are closed on return"""
+        with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+            self._condition.notify_all()
+        for item in idle:
+            self._discard(item)
+
+    def get_stats(self) -> typing.Dict[str, typing.Any]:
+        """pool statistics"""
+        with self._condition:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "checkouts": self._checkouts,
+                "created": self._created_count,
+                "recycled": self._recycled_count,
+                "failed_health_checks": self._failed_health_checks,
+                "avg_wait_ms": (
+                    round(1000 * self._wait_time_total / self._checkouts, 3)
+                    if self._checkouts
+                    else 0
+                ),
+            }
+
+
+def get_pool_stats() -> typing.Dict[str, typing.Any]:
+    """statistics for all pools in this process keyed by host (credentials are not included)"""
+    with PostgresConnectionPool._lock:
+        pools = dict(PostgresConnectionPool._pools)
+    return {k.split("@")[-1]: p.get_stats() for k, p in pools.items()}
+
+
+_fan_out_slots = threading.BoundedSemaphore(max(1, P8_PG_FAN_OUT_MAX))
+
+
+def _reset_fan_out_slots():
+    """threads holding slots in the parent do not exist in a forked child"""
+    global _fan_out_slots
+    _fan_out_slots = threading.BoundedSemaphore(max(1, P8_PG_FAN_OUT_MAX))
+
+
+def acquire_fan_out(n: int) -> int:
+    """reserve up to n of the process-wide fan out slots without waiting - returns how many were reserved"""
+    reserved = 0
+    while reserved < n and _fan_out_slots.acquire(blocking=False):
+        reserved += 1
+    return reserved
+
+
+def release_fan_out(n: int):
+    """return slots reserved with acquire_fan_out"""
+    for _ in range(n):
+        _fan_out_slots.release()
+
+
+def fan_out(calls: typing.List[typing.Callable], max_workers: int = None) -> typing.List[typing.Any]:
+    """
+    Run the calls and return their results in order. The caller's thread is one worker and every extra
+    worker needs a free process-wide slot, so when the slots are taken the calls simply run in sequence.
+    Nested fan out (e.g. the halves of each question of a search) never waits for slots and so cannot deadlock.
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    extra = acquire_fan_out(min(len(calls), max_workers or len(calls)) - 1)
+    if not extra:
+        return [call() for call in calls]
+    try:
+        with ThreadPoolExecutor(max_workers=extra + 1, thread_name_prefix="p8-fan-out") as executor:
+            futures = [executor.submit(call) for call in calls]
+            return [future.result() for future in futures]
+    finally:
+        release_fan_out(extra)
+
+
+atexit.register(PostgresConnectionPool.close_all)
+os.register_at_fork(after_in_child=_reset_fan_out_slots)
@@ -0,0 +1,157 @@
+"""
+Process-wide LISTEN/NOTIFY subscriber used to invalidate in-process caches.
+
+Tables that are cached in memory e.g. p8."LanguageModelApi" have a trigger (see p8.attach_change_notify)
+that calls pg_notify with a json payload when rows change. One daemon thread per process holds a dedicated
+connection, listens on the subscribed channels and calls the subscribers with the decoded payload.
+
+- the listener starts lazily on the first subscription
+- if the connection drops we reconnect with backoff and call every subscriber with `None`
+  because notifications may have been missed in the meantime - subscribers should clear their cache
+- caches should still use a TTL so that they are correct when the listener is disabled or unavailable
+
+```python
+PostgresNotificationListener.subscribe("p8_language_model_api", lambda payload: cache.invalidate())
+```
+"""
+
+import json
+import os
+import select
+import threading
+import time
+import typing
+
+import psycopg2
+
+from percolate.utils import logger
+from percolate.utils.env import POSTGRES_CONNECTION_STRING, P8_PG_NOTIFY_ENABLED
+
+
+class PostgresNotificationListener:
+    """a daemon thread dispatching postgres notifications to subscribers"""
+
+    _instance: "PostgresNotificationListener" = None
+    _lock = threading.Lock()
+
+    def __init__(self, connection_string: str = None, connect: typing.Callable = None):
+        self.connection_string = connection_string or POSTGRES_CONNECTION_STRING
+        self._connect = connect or psycopg2.connect
+        self._subscribers: typing.Dict[str, typing.List[typing.Callable]] = {}
+        self._listening: typing.Set[str] = set()
+        self._conn = None
+        self._thread: threading.Thread = None
+        self._stop = threading.Event()
+        self._pid = os.getpid()
+        self.notifications = 0
+        self.reconnects = 0
+
+    @classmethod
+    def get(cls) -> "PostgresNotificationListener":
+        """the listener for this process - a forked child gets its own"""
+        with cls._lock:
+            if cls._instance is None or cls._instance._pid != os.getpid():
+                cls._instance = PostgresNotificationListener()
+            return cls._instance
+
+    @classmethod
+    def subscribe(cls, channel: str, callback: typing.Callable[[typing.Optional[dict]], None]) -> bool:
+        """
+        call back with the (json decoded) payload of notifications on the channel
+
+        Returns:
+            False if notifications are disabled (P8_PG_NOTIFY_ENABLED) in which case only TTLs apply
+        """
+        if not P8_PG_NOTIFY_ENABLED:
+            return False
+        listener = cls.get()
+        with cls._lock:
+            listener._subscribers.setdefault(channel, []).append(callback)
+            listener._start()
+        return True
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="p8-notify-listener", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """stop the listener thread e.g. in tests"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._listening = set()
+
+    def _ensure_listening(self):
+        """open the connection if needed and LISTEN on channels that were subscribed since"""
+        if self._conn is None:
+            self._conn = self._connect(self.connection_string, connect_timeout=5)
+            self._conn.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+            )
+        with self._lock:
+            channels = set(self._subscribers) - self._listening
+        for channel in channels:
+            with self._conn.cursor() as c:
+                c.execute(f'LISTEN "{channel}"')
+            self._listening.add(channel)
+
+    def _dispatch(self, channel: str, payload: typing.Optional[dict]):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, []))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as ex:
+                logger.warning(f"Notification subscriber failed on {channel} - {ex}")
+
+    def _dispatch_all(self):
+        """we may have missed notifications so every subscriber is told to invalidate"""
+        with self._lock:
+            channels = list(self._subscribers)
+        for channel in channels:
+            self._dispatch(channel, None)
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                reconnecting = self._conn is None and self.reconnects > 0
+                self._ensure_listening()
+                if reconnecting:
+                    self._dispatch_all()
+                backoff = 1
+                if select.select([self._conn], [], [], 1.0) == ([], [], []):
+                    continue
+                self._conn.poll()
+                while self._conn.notifies:
+                    n = self._conn.notifies.pop(0)
+                    self.notifications += 1
+                    try:
+                        payload = json.loads(n.payload) if n.payload else {}
+                    except ValueError:
+                        payload = {"payload": n.payload}
+                    self._dispatch(n.channel, payload)
+            except Exception as ex:
+                if self._stop.is_set():
+                    break
+                logger.warning(
+                    f"The notification listener lost its connection - retrying in {backoff}s - {ex}"
+                )
+                self._close()
+                self.reconnects += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+        self._close()
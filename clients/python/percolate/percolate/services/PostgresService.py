@@ -12,6 +12,12 @@ from percolate.utils.env import (
     DEFAULT_CONNECTION_TIMEOUT,
     SYSTEM_USER_ID,
     SYSTEM_USER_ROLE_LEVEL,
+    P8_PG_POOL_ENABLED,
+    P8_PG_STREAM_FETCH_SIZE,
+    P8_EMBEDDINGS_SCHEMA,
+    P8_SEARCH_CONCURRENT,
+    P8_SEARCH_MAX_PARALLEL_QUESTIONS,
+    P8_BULK_UPSERT_THRESHOLD,
 )
 import os
 import psycopg2.extras
@@ -21,8 +27,193 @@ from tenacity import retry, stop_after_attempt, wait_fixed
 import traceback
 import uuid
 import json
+import itertools
+import functools
 from percolate.models.p8 import Function
 from percolate.services.PercolateGraph import PercolateGraph
+from percolate.services.PostgresConnectionPool import PostgresConnectionPool, fan_out
+from contextlib import contextmanager
+
+
+class _IterableTextIO:
+    """a minimal read-only file over an iterator of strings so that COPY can stream rows without building the payload"""
+
+    def __init__(self, lines: typing.Iterator[str]):
+        self._lines = lines
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def _schema_type(schema, name: str):
+    """the arrow type of a named field in the schema if there is one"""
+    if schema is None or schema.get_field_index(name) < 0:
+        return None
+    return schema.field(name).type
+
+
+def _to_arrow_array(values: typing.Sequence, arrow_type=None):
+    """
+    build an arrow array for a result column - the expected type is used when the values conform to it
+    otherwise values are coerced to strings (e.g. uuids, json) for string types or the type is inferred
+    """
+    import pyarrow as pa
+
+    if arrow_type is not None:
+        try:
+            return pa.array(values, type=arrow_type, from_pandas=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+            if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+                return pa.array(
+                    [
+                        v if v is None or isinstance(v, str)
+                        else json.dumps(v, default=str) if isinstance(v, (dict, list))
+                        else str(v)
+                        for v in values
+                    ],
+                    type=arrow_type,
+                )
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        """mixed or unsupported python types are kept as strings"""
+        return pa.array([v if v is None else str(v) for v in values], type=pa.string())
+
+
+def is_semantic_search_only(check_model: BaseModel) -> bool:
+    """semantic-only entities skip the relational (nl2sql) half of query_entity - see PostgresService.is_semantic_search_only"""
+    if not check_model:
+        return False
+
+    if hasattr(check_model, "model_config"):
+        model_config = check_model.model_config
+        if isinstance(model_config, dict) and "is_semantic_only" in model_config:
+            return bool(model_config["is_semantic_only"])
+
+    env_override = os.getenv("P8_RESOURCES_SEMANTIC_ONLY")
+    if env_override is not None:
+        return env_override.lower() in ("true", "1", "yes", "on")
+
+    try:
+        from percolate.models.p8.types import Resources
+
+        if check_model is Resources:
+            return True
+
+        if isinstance(check_model, type) and issubclass(check_model, Resources):
+            return True
+    except:
+        pass
+
+    return False
+
+
+def merge_query_entity_results(
+    vector_result: typing.List[dict], relational_result: typing.List[dict]
+) -> typing.List[dict]:
+    """combine a semantic-only query_entity row with a relational_search_entity row into the query_entity row shape"""
+    if not vector_result:
+        return vector_result
+    row = dict(vector_result[0])
+    rel = relational_result[0] if relational_result else {}
+    row["query_text"] = rel.get("query_text")
+    row["confidence"] = rel.get("confidence")
+    row["relational_result"] = rel.get("relational_result")
+    errors = [e for e in [rel.get("error_message"), row.get("error_message")] if e]
+    row["error_message"] = "; ".join(errors) if errors else None
+    return [row]
+
+
+def search_result_or_hint(result: typing.List[dict], question: str):
+    """the query_entity result or a hint for the agent if neither the relational nor the vector search recovered anything"""
+    try:
+        if result:
+            a = result[0].get("relational_result")
+            b = result[0].get("vector_result")
+            if a is None and b is None:
+                logger.warning(
+                    f"Nothing was recovered from the relational or vector result - injecting a prompt"
+                )
+                return [
+                    {
+                        "status": "no data",
+                        "next-steps": f"There is no data to address the questions {question} further using this query but dont worry - try asking for help to find another tool if we have not already been able to find data for this question elsewhere",
+                    }
+                ]
+    except:
+        pass
+
+    return result
+
+
+def should_bulk_upsert(records: typing.Any) -> bool:
+    """writers that do not need the upserted rows back pass `update_records(records, bulk=should_bulk_upsert(records))`
+    to use the COPY based loader for lists of P8_BULK_UPSERT_THRESHOLD records or more"""
+    return bool(P8_BULK_UPSERT_THRESHOLD) and isinstance(records, list) and len(records) >= P8_BULK_UPSERT_THRESHOLD
+
+
+def search_questions(question: str | typing.List[str]) -> typing.List[str]:
+    """the distinct non empty questions of a search in order"""
+    questions = question if isinstance(question, list) else [question]
+    return list(dict.fromkeys(q.strip() for q in questions if q and q.strip())) or [""]
+
+
+def _dedup_records(records: typing.List[dict]) -> typing.List[dict]:
+    """dedup records by id (keeping the smallest vdistance if there is one) - records without ids are kept"""
+    by_id = {}
+    unkeyed = []
+    for record in records:
+        key = record.get("id") if isinstance(record, dict) else None
+        if key is None:
+            unkeyed.append(record)
+            continue
+        existing = by_id.get(key)
+        if existing is None or (record.get("vdistance") is not None and (existing.get("vdistance") is None or record["vdistance"] < existing["vdistance"])):
+            by_id[key] = record
+    return list(by_id.values()) + unkeyed
+
+
+def merge_search_results(results: typing.List[typing.List[dict]]) -> typing.List[dict]:
+    """
+    merge the query_entity rows of several questions into one row of the same shape.
+    Vector results are deduplicated by id with the best (smallest) distance and ordered by distance
+    """
+    rows = [r[0] for r in results if r]
+    if len(rows) <= 1:
+        return rows
+
+    vector = [v for row in rows for v in (row.get("vector_result") or [])]
+    relational = [v for row in rows for v in (row.get("relational_result") or [])]
+    errors = list(dict.fromkeys(row["error_message"] for row in rows if row.get("error_message")))
+    queries = [row["query_text"] for row in rows if row.get("query_text")]
+    confidences = [row["confidence"] for row in rows if row.get("confidence") is not None]
+
+    merged = dict(rows[0])
+    merged["vector_result"] = (
+        sorted(_dedup_records(vector), key=lambda v: (v.get("vdistance") is None, v.get("vdistance") or 0))
+        if any(row.get("vector_result") is not None for row in rows)
+        else None
+    )
+    merged["relational_result"] = (
+        _dedup_records(relational)
+        if any(row.get("relational_result") is not None for row in rows)
+        else None
+    )
+    merged["query_text"] = ";\n".join(queries) if queries else None
+    merged["confidence"] = max(confidences) if confidences else None
+    merged["error_message"] = "; ".join(errors) if errors else None
+    return [merged]
 
 
 class PostgresService:
@@ -36,10 +227,20 @@ class PostgresService:
         user_id=None,
         user_groups=None,
         role_level=None,
+        use_pool: bool = None,
     ):
+        """
+        Args:
+            model: the model (type) that the repository is bound to
+            connection_string: defaults to the percolate connection string from env
+            on_connect_error: 'ignore' to suppress connection warnings
+            user_id, user_groups, role_level: user context for row-level security
+            use_pool: use the process-wide connection pool - defaults to P8_PG_POOL_ENABLED
+        """
         try:
             self._connection_string = connection_string or POSTGRES_CONNECTION_STRING
             self.conn = None
+            self._pool = None
             self._graph = PercolateGraph(self)
             self.helper = SqlModelHelper(AbstractModel)
 
@@ -59,11 +260,18 @@ class PostgresService:
             else:
                 self.model = None
 
-            self.conn = psycopg2.connect(self._connection_string)
-            # Apply user context when connection is established
-            if self.conn:
-                # print('applying user context')
-                self._apply_user_context()
+            if P8_PG_POOL_ENABLED if use_pool is None else use_pool:
+                """connections are checked out per query - we only need one now to resolve the user's role level"""
+                self._pool = PostgresConnectionPool.get(self._connection_string)
+                if self.user_id != SYSTEM_USER_ID:
+                    with self._pool.connection() as conn:
+                        self._apply_user_context(conn)
+            else:
+                self.conn = psycopg2.connect(self._connection_string)
+                # Apply user context when connection is established
+                if self.conn:
+                    # print('applying user context')
+                    self._apply_user_context()
 
         except:
             if on_connect_error != "ignore":
@@ -80,9 +288,13 @@ class PostgresService:
         """this util is to create a test database primarily"""
 
         if not self.conn:
-            raise Exception(
-                "The connection was not established - check the connection string and db service"
-            )
+            """pooled services do not hold a connection - databases are created on a dedicated one"""
+            try:
+                self.conn = psycopg2.connect(self._connection_string)
+            except psycopg2.OperationalError:
+                raise Exception(
+                    "The connection was not established - check the connection string and db service"
+                )
         self.conn.autocommit = True
         try:
             cursor = self.conn.cursor()
@@ -101,7 +313,7 @@ class PostgresService:
             logger.debug(ex)
             raise
         finally:
-            pass
+            self.conn = None
 
     def __repr__(self):
         return f"PostgresService({self.model.get_model_full_name() if self.model else None}, {POSTGRES_SERVER=}, {POSTGRES_DB=})"
@@ -154,13 +366,20 @@ class PostgresService:
         }
 
         # Return local values if no connection or if system user
-        if not self.conn or self.user_id == SYSTEM_USER_ID:
+        if (not self.conn and not self._pool) or self.user_id == SYSTEM_USER_ID:
             return context
 
-        # Try to get values from database session
+        if self.conn is None:
+            """pooled services check out a connection with the user context applied to read the session"""
+            with self._pooled_connection() as conn:
+                return self._read_user_context(conn, context)
+        return self._read_user_context(self.conn, context)
+
+    def _read_user_context(self, conn, context: dict):
+        """read the session variables for the user context from the connection"""
         cursor = None
         try:
-            cursor = self.conn.cursor()
+            cursor = conn.cursor()
             cursor.execute(
                 """
                 SELECT 
@@ -202,16 +421,32 @@ class PostgresService:
 
         return context
 
-    def _apply_user_context(self):
-        """Apply user context to the PostgreSQL session for row-level security"""
-        if not self.conn:
-            return
+    def _apply_user_context(self, conn=None):
+        """Apply user context to the PostgreSQL session for row-level security and keep the role level and groups it resolves
+
+        Args:
+            conn: the connection to apply the context to - defaults to the service connection
+        """
+        resolved = self._set_user_context(conn or self.conn)
+        if resolved:
+            self.role_level, self.user_groups = resolved
+
+    def _set_user_context(self, conn) -> typing.Optional[tuple]:
+        """Apply user context to the session without changing the service - pooled connections are checked out
+        from worker threads (see fan_out) so they must not write to the shared instance.
+
+        Returns:
+            the (role_level, user_groups) that the database resolved for the user if any
+        """
+        if not conn:
+            return None
 
         # Skip applying context for system user
         if self.user_id == SYSTEM_USER_ID:
-            return
+            return None
 
-        cursor = self.conn.cursor()
+        resolved = None
+        cursor = conn.cursor()
 
         try:
 
@@ -225,8 +460,7 @@ class PostgresService:
                     # Handle different return formats from set_user_context
                     if isinstance(r, tuple) and len(r) >= 3:
                         # Expected format: (user_id, role_level, user_groups)
-                        self.role_level = r[1]
-                        self.user_groups = r[2]
+                        resolved = (r[1], r[2])
                     elif isinstance(r, tuple) and len(r) == 1:
                         # Function might just return user_id or success indicator
                         logger.debug(f"set_user_context returned single value: {r[0]}")
@@ -237,7 +471,7 @@ class PostgresService:
                 else:
                     logger.debug("set_user_context returned no results")
                 # Commit changes
-                self.conn.commit()
+                conn.commit()
 
         except Exception as e:
             logger.warning(f"Error applying user security context: {str(e)}")
@@ -246,14 +480,44 @@ class PostgresService:
 
             logger.warning(f"Full traceback: {traceback.format_exc()}")
             # If the function failed, fall back to the old approach or just continue without security
+            # but clear the failed transaction so the connection can still be used
+            try:
+                conn.rollback()
+            except Exception:
+                pass
         finally:
             cursor.close()
+        return resolved
 
     def _connect(self):
         self.conn = psycopg2.connect(self._connection_string)
         self._apply_user_context()
         return self.conn
 
+    @contextmanager
+    def _connection(self):
+        """a connection with the user context applied - pooled or opened (and closed) for the block"""
+        if self._pool is not None:
+            with self._pooled_connection() as conn:
+                yield conn
+            return
+        self._reopen_connection()
+        try:
+            yield self.conn
+        finally:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    @contextmanager
+    def _pooled_connection(self):
+        """check out a connection from the pool with this service's user context applied.
+        The pool resets the session when the connection is returned so the context does not leak to other users.
+        """
+        with self._pool.connection() as conn:
+            self._set_user_context(conn)
+            yield conn
+
     @property
     def entity_exists(self):
         """convenience to see if the entity exists"""
@@ -310,32 +574,7 @@ class PostgresService:
         Returns:
             bool: True if model should use semantic search only
         """
-
-        check_model = model or self.model
-        if not check_model:
-            return False
-
-        if hasattr(check_model, "model_config"):
-            model_config = check_model.model_config
-            if isinstance(model_config, dict) and "is_semantic_only" in model_config:
-                return bool(model_config["is_semantic_only"])
-
-        env_override = os.getenv("P8_RESOURCES_SEMANTIC_ONLY")
-        if env_override is not None:
-            return env_override.lower() in ("true", "1", "yes", "on")
-
-        try:
-            from percolate.models.p8.types import Resources
-
-            if check_model is Resources:
-                return True
-
-            if isinstance(check_model, type) and issubclass(check_model, Resources):
-                return True
-        except:
-            pass
-
-        return False
+        return is_semantic_search_only(model or self.model)
 
     def get_entities(
         self,
@@ -387,43 +626,72 @@ class PostgresService:
             ]
         return data[0]
 
-    def search(self, question: str, user_id: str = None):
+    def search(self, question: str | typing.List[str], user_id: str = None):
         """
         If the repository has been activated with a model we use the models search function
         Otherwise we use percolates generic plan and search.
         Either way, feel free to ask a detailed question and we will seek data.
 
+        Each of a list of questions is searched separately and the results are merged and deduplicated (see merge_search_results).
+        Questions run concurrently on pooled connections while the process-wide fan out slots allow (see fan_out)
+
         Args:
-            question: detailed natural language question
+            question: detailed natural language question or questions
             user_id deprecated
         """
 
-        """in future we should pardo multiple questions"""
-        if isinstance(question, list):
-            question = "\n".join(question)
+        questions = search_questions(question)
+        if len(questions) == 1:
+            result = self._search_question(questions[0])
+        elif P8_SEARCH_CONCURRENT and self._pool is not None:
+            result = merge_search_results(
+                fan_out(
+                    [functools.partial(self._search_question, q) for q in questions],
+                    max_workers=max(P8_SEARCH_MAX_PARALLEL_QUESTIONS, 1),
+                )
+            )
+        else:
+            result = merge_search_results([self._search_question(q) for q in questions])
 
-        Q = f"""select * from p8.query_entity(%s,%s) """
+        return search_result_or_hint(result, question)
 
-        result = self.execute(Q, data=(question, self.model.get_model_full_name()))
+    def _search_question(self, question: str) -> typing.List[dict]:
+        """the query_entity row for one question"""
+        entity_name = self.model.get_model_full_name()
+        semantic_only = self.is_semantic_search_only()
 
-        try:
-            if result:
-                a = result[0].get("relational_result")
-                b = result[0].get("vector_result")
-                if a is None and b is None:
-                    logger.warning(
-                        f"Nothing was recovered from the relational or vector result - injecting a prompt"
-                    )
-                    return [
-                        {
-                            "status": "no data",
-                            "next-steps": f"There is no data to address the questions {question} further using this query but dont worry - try asking for help to find another tool if we have not already been able to find data for this question elsewhere",
-                        }
-                    ]
-        except:
-            pass
+        if semantic_only or not P8_SEARCH_CONCURRENT or self._pool is None:
+            return self.execute(
+                """select * from p8.query_entity(%s, %s, semantic_only => %s) """,
+                data=(question, entity_name, semantic_only),
+            )
+        return self._concurrent_query_entity(question, entity_name)
 
-        return result
+    def _concurrent_query_entity(self, question: str, entity_name: str):
+        """
+        query_entity runs nl2sql (an LLM round trip) before the vector search.
+        Here the relational and the semantic-only vector search run at the same time on separate pooled connections
+        when a fan out slot is free (otherwise one after the other) and are merged into the same row shape as query_entity.
+        """
+
+        def vector():
+            return self.execute(
+                """select * from p8.query_entity(%s, %s, semantic_only => true) """,
+                data=(question, entity_name),
+            )
+
+        def relational():
+            try:
+                return self.execute(
+                    """select * from p8.relational_search_entity(%s, %s) """,
+                    data=(question, entity_name),
+                )
+            except Exception as ex:
+                logger.warning(f"The relational search failed for {entity_name} - {ex}")
+                return [{"error_message": str(ex)}]
+
+        result, relational_result = fan_out([vector, relational])
+        return merge_query_entity_results(result, relational_result)
 
     def get_model_database_schema(self):
         assert (
@@ -448,6 +716,10 @@ class PostgresService:
         }
         secondary_scripts = {
             "register_embeddings": self.helper.create_embedding_table_script(),
+            "register_embedding_indexes": ";\n".join(
+                self.helper.create_embedding_index_scripts()
+            )
+            + ";",
             "insert_field_data": SqlModelHelper(ModelField).get_data_load_statement(
                 self.helper.get_model_field_models()
             ),
@@ -520,6 +792,10 @@ class PostgresService:
                 )
             except DuplicateTable:
                 logger.warning(f"The embedding-associated table already exists")
+            try:
+                self.build_embedding_indexes()
+            except Exception as ex:
+                logger.warning(f"Failed to build the embedding indexes - {ex}")
 
         if make_discoverable:
             """discoverable entities are agents that can be run as functions"""
@@ -546,6 +822,69 @@ class PostgresService:
         else:
             logger.info("Done - register entities was disabled")
 
+    def build_embedding_indexes(
+        self,
+        method: str = None,
+        ops: str = None,
+        embedding_models: typing.List[str] = None,
+        concurrently: bool = True,
+    ) -> typing.List[str]:
+        """
+        create the source_record_id and approximate nearest neighbour indexes on the model's embeddings table.
+        By default indexes are built concurrently so that existing tables can be indexed without blocking writes.
+        Invalid indexes left behind by a failed concurrent build are dropped and rebuilt.
+        See `SqlModelHelper.create_embedding_index_scripts` for the arguments.
+
+        Returns:
+            the statements that were run
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to build indexes"
+
+        scripts = self.helper.create_embedding_index_scripts(
+            method=method,
+            ops=ops,
+            embedding_models=embedding_models,
+            concurrently=concurrently,
+        )
+        invalid_query = """SELECT c.relname AS name FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND NOT i.indisvalid"""
+
+        with self._connection() as conn:
+            """concurrent index builds cannot run in a transaction"""
+            autocommit = conn.autocommit
+            conn.commit()
+            conn.autocommit = concurrently
+            c = conn.cursor()
+            try:
+                c.execute(invalid_query, (P8_EMBEDDINGS_SCHEMA,))
+                for (name,) in c.fetchall():
+                    if any(f" {name} ON " in script for script in scripts):
+                        logger.warning(f"Dropping invalid index {name} before rebuilding it")
+                        c.execute(
+                            f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {P8_EMBEDDINGS_SCHEMA}.{name}"
+                        )
+                for script in scripts:
+                    logger.debug(script)
+                    c.execute(script)
+                if not concurrently:
+                    conn.commit()
+            except Exception:
+                if not concurrently:
+                    conn.rollback()
+                raise
+            finally:
+                c.close()
+                conn.autocommit = autocommit
+
+        logger.info(
+            f"Built embedding indexes on {self.model.get_model_embedding_table_name()}"
+        )
+        return scripts
+
     def eval_function_call(self, name: str, arguments: dict):
         """call the function which can be rest or native via the database"""
         args = {"function": {"name": name, "arguments": arguments}}
@@ -582,34 +921,69 @@ class PostgresService:
             timeout_seconds: keep this off but for testing multi turn you can set it to something but keep in mind we would use background workers for this
         """
 
-        if cls.conn is None:
-            cls._reopen_connection()
         if not query:
             return
 
         if timeout_seconds and isinstance(timeout_seconds, int):
             query = f"set statement_timeout = '{timeout_seconds}s';{query}"
+
+        if cls._pool is not None:
+            """check out a pooled connection for this query and return it afterwards"""
+            with cls._pooled_connection() as conn:
+                return cls._execute_on_connection(
+                    conn,
+                    query,
+                    data=data,
+                    as_upsert=as_upsert,
+                    page_size=page_size,
+                    verbose_errors=verbose_errors,
+                )
+
+        if cls.conn is None:
+            cls._reopen_connection()
         try:
             """we can reopen the connection if needed"""
             try:
                 # Try to get a cursor or detect if connection is closed
                 if cls.conn is None:
                     cls._reopen_connection()
-                    c = cls.conn.cursor()
                 else:
                     # Test if connection is still valid
                     try:
                         cls.conn.poll()
-                        c = cls.conn.cursor()
                     except (psycopg2.InterfaceError, psycopg2.OperationalError):
                         # Connection was closed or invalid, reopen it
                         cls._reopen_connection()
-                        c = cls.conn.cursor()
             except:
                 # Something went wrong, try one more time with a fresh connection
                 cls._reopen_connection()
-                c = cls.conn.cursor()
 
+            return cls._execute_on_connection(
+                cls.conn,
+                query,
+                data=data,
+                as_upsert=as_upsert,
+                page_size=page_size,
+                verbose_errors=verbose_errors,
+            )
+        finally:
+            # Close connection and set to None - will be reopened with context on next query
+            if cls.conn:
+                cls.conn.close()
+                cls.conn = None
+
+    def _execute_on_connection(
+        self,
+        conn,
+        query: str,
+        data: tuple = None,
+        as_upsert: bool = False,
+        page_size: int = 100,
+        verbose_errors: bool = True,
+    ):
+        """run the query on the connection and commit - see `execute`"""
+        c = conn.cursor()
+        try:
             """prepare the query"""
             if as_upsert:
                 psycopg2.extras.execute_values(
@@ -622,24 +996,24 @@ class PostgresService:
                 result = c.fetchall()
                 """if we have and updated and read we can commit and send,
                 otherwise we commit outside this block"""
-                cls.conn.commit()
+                conn.commit()
                 column_names = [desc[0] for desc in c.description or []]
                 result = [dict(zip(column_names, r)) for r in result]
                 return result
             """case of upsert no-query transactions"""
-            cls.conn.commit()
+            conn.commit()
         except Exception as pex:
-            msg = f"Failing to execute query {query} for model {cls.model} - Postgres error: {pex}, {data}"
+            msg = f"Failing to execute query {query} for model {self.model} - Postgres error: {pex}, {data}"
             if not verbose_errors:
-                msg = f"Failing to execute query model {cls.model} - {verbose_errors=} - {pex}"
+                msg = f"Failing to execute query model {self.model} - {verbose_errors=} - {pex}"
             logger.warning(msg)
-            cls.conn.rollback()
+            try:
+                conn.rollback()
+            except psycopg2.InterfaceError:
+                pass
             raise
         finally:
-            # Close connection and set to None - will be reopened with context on next query
-            if cls.conn:
-                cls.conn.close()
-                cls.conn = None
+            c.close()
 
     def select(self, fields: typing.List[str] = None, **kwargs):
         """
@@ -686,38 +1060,12 @@ class PostgresService:
             self.model is not None
         ), "You need to specify a model in the constructor or via a repository to select models"
 
-        # Build the base query
-        selected_fields = fields or self.helper.field_names
-        if isinstance(selected_fields, list):
-            selected_fields = ", ".join(selected_fields)
-
-        query = f"SELECT {selected_fields} FROM {self.helper.table_name}"
-        data = []
-
-        # Add WHERE clause if filters provided
-        if filter:
-            where_clauses = []
-            for field, value in filter.items():
-                if isinstance(value, list):
-                    where_clauses.append(f"{field} = ANY(%s)")
-                    data.append(value)
-                else:
-                    where_clauses.append(f"{field} = %s")
-                    data.append(value)
-
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-
-        # Add ORDER BY clause if provided
-        if order_by:
-            query += f" ORDER BY {order_by}"
-
-        # Add LIMIT clause if provided
-        if limit:
-            query += f" LIMIT {limit}"
+        query, data = self.helper.select_with_predicates_query(
+            filter=filter, fields=fields, limit=limit, order_by=order_by
+        )
 
         # Execute the query
-        return self.execute(query, data=tuple(data) if data else None)
+        return self.execute(query, data=data)
 
     def get_by_name(cls, name: str, as_model: bool = False):
         """select model by name"""
@@ -742,6 +1090,214 @@ class PostgresService:
         """
         return [self.model.model_parse(d) for d in self.select(fields)]
 
+    def stream(
+        self,
+        query: str,
+        data: tuple = None,
+        fetch_size: int = None,
+        as_model: bool = False,
+    ) -> typing.Iterator[dict | AbstractModel]:
+        """
+        iterate the results of a query with a named server-side cursor so that large tables are read in constant memory.
+        Rows are fetched `fetch_size` at a time (P8_PG_STREAM_FETCH_SIZE by default).
+        The connection is held until the iterator is exhausted or closed so consume (or close) it promptly.
+
+        Args:
+            query: the sql query with %s placeholders
+            data: tuple of args
+            fetch_size: the number of rows fetched per round trip
+            as_model: yield model instances instead of dicts
+
+        Example:
+            for resource in p8.repository(Resources).stream('select * from p8."Resources"', as_model=True):
+                ...
+        """
+        if as_model:
+            assert (
+                self.model is not None
+            ), "You need to specify a model in the constructor or via a repository to stream models"
+
+        with self._connection() as conn:
+            c = conn.cursor(name=f"p8_stream_{uuid.uuid4().hex}")
+            c.itersize = fetch_size or P8_PG_STREAM_FETCH_SIZE
+            try:
+                c.execute(query, data)
+                column_names = None
+                for row in c:
+                    if column_names is None:
+                        column_names = [desc[0] for desc in c.description]
+                    row = dict(zip(column_names, row))
+                    yield self.model(**row) if as_model else row
+                conn.commit()
+            except GeneratorExit:
+                """the caller stopped early - the read only transaction is simply discarded"""
+                conn.rollback()
+                raise
+            except Exception as pex:
+                logger.warning(
+                    f"Failing to stream query {query} for model {self.model} - Postgres error: {pex}, {data}"
+                )
+                try:
+                    conn.rollback()
+                except psycopg2.InterfaceError:
+                    pass
+                raise
+            finally:
+                c.close()
+
+    def iter_select(
+        self,
+        fields: typing.List[str] = None,
+        fetch_size: int = None,
+        as_model: bool = False,
+        **kwargs,
+    ) -> typing.Iterator[dict | AbstractModel]:
+        """
+        like select except rows are streamed lazily from a server-side cursor - see `stream`
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        data = None
+        if kwargs:
+            data = tuple(kwargs.values())
+        return self.stream(
+            self.helper.select_query(fields, **kwargs),
+            data=data,
+            fetch_size=fetch_size,
+            as_model=as_model,
+        )
+
+    def iter_select_with_predicates(
+        self,
+        filter: typing.Dict[str, typing.Any] = None,
+        fields: typing.List[str] = None,
+        limit: int = None,
+        order_by: str = None,
+        fetch_size: int = None,
+        as_model: bool = False,
+    ) -> typing.Iterator[dict | AbstractModel]:
+        """
+        like select_with_predicates except rows are streamed lazily from a server-side cursor - see `stream`
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        query, data = self.helper.select_with_predicates_query(
+            filter=filter, fields=fields, limit=limit, order_by=order_by
+        )
+        return self.stream(query, data=data, fetch_size=fetch_size, as_model=as_model)
+
+    def _arrow_schema(self):
+        """the arrow schema of the model (if it can be mapped) used to type columnar results"""
+        if self.model is None:
+            return None
+        try:
+            return self.model.to_arrow_schema()
+        except Exception as ex:
+            logger.debug(f"Unable to map {self.model} to an arrow schema - types will be inferred: {ex}")
+            return None
+
+    def execute_arrow(
+        self,
+        query: str,
+        data: tuple = None,
+        schema=None,
+        fetch_size: int = None,
+        as_polars: bool = False,
+    ):
+        """
+        run a query and build a `pyarrow.Table` column-wise from the result set without creating a dict per row.
+        Rows are read from a server-side cursor `fetch_size` at a time and each chunk becomes a record batch.
+        Columns are typed with the model's arrow schema where the names match, otherwise types are inferred.
+
+        Args:
+            query: the sql query with %s placeholders
+            data: tuple of args
+            schema: an optional arrow schema to use instead of the model schema
+            fetch_size: the number of rows fetched per round trip
+            as_polars: return a polars DataFrame instead of the arrow table
+        """
+        import pyarrow as pa
+
+        schema = schema if schema is not None else self._arrow_schema()
+        fetch_size = fetch_size or P8_PG_STREAM_FETCH_SIZE
+        batches = []
+        column_types = None
+
+        with self._connection() as conn:
+            c = conn.cursor(name=f"p8_arrow_{uuid.uuid4().hex}")
+            try:
+                c.execute(query, data)
+                while True:
+                    rows = c.fetchmany(fetch_size)
+                    if column_types is None:
+                        column_names = [desc[0] for desc in c.description]
+                        column_types = [_schema_type(schema, n) for n in column_names]
+                    elif not rows:
+                        break
+                    columns = list(zip(*rows)) if rows else [()] * len(column_names)
+                    arrays = [
+                        _to_arrow_array(values, column_types[i])
+                        for i, values in enumerate(columns)
+                    ]
+                    """inferred column types are fixed by the first batch that has values"""
+                    column_types = [
+                        t if t is not None or pa.types.is_null(a.type) else a.type
+                        for t, a in zip(column_types, arrays)
+                    ]
+                    batches.append(pa.RecordBatch.from_arrays(arrays, names=column_names))
+                    if len(rows) < fetch_size:
+                        break
+                conn.commit()
+            except Exception as pex:
+                logger.warning(
+                    f"Failing to execute arrow query {query} for model {self.model} - Postgres error: {pex}, {data}"
+                )
+                try:
+                    conn.rollback()
+                except psycopg2.InterfaceError:
+                    pass
+                raise
+            finally:
+                c.close()
+
+        """columns that were all null in early batches are promoted to the type found later"""
+        table = pa.concat_tables(
+            [pa.Table.from_batches([b]) for b in batches], promote_options="permissive"
+        )
+        if as_polars:
+            import polars as pl
+
+            return pl.from_arrow(table)
+        return table
+
+    def select_arrow(
+        self,
+        fields: typing.List[str] = None,
+        fetch_size: int = None,
+        as_polars: bool = False,
+        **kwargs,
+    ):
+        """
+        like select except the result is a `pyarrow.Table` (or polars DataFrame) typed by the model - see `execute_arrow`
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to select models"
+
+        data = None
+        if kwargs:
+            data = tuple(kwargs.values())
+        return self.execute_arrow(
+            self.helper.select_query(fields, **kwargs),
+            data=data,
+            fetch_size=fetch_size,
+            as_polars=as_polars,
+        )
+
     def execute_upsert(cls, query: str, data: tuple = None, page_size: int = 100):
         """run an upsert sql query"""
         return cls.execute(query, data=data, page_size=page_size, as_upsert=True)
@@ -751,8 +1307,19 @@ class PostgresService:
         records: typing.List[BaseModel],
         batch_size: int = 100,
         index_entities: bool = False,
+        bulk: bool = False,
     ):
-        """records are updated using typed object relational mapping."""
+        """records are updated using typed object relational mapping and the upserted rows are returned.
+
+        Callers that do not need the rows back can opt in to the COPY based loader with `bulk=True`
+        (see `bulk_upsert`) which returns the inserted/updated counts instead.
+
+        Args:
+            records: one or more records
+            batch_size: the number of records per upsert statement
+            index_entities: run the entity indexer after the update
+            bulk: load with `bulk_upsert` and return its counts rather than the rows
+        """
 
         if records is None:
             return []
@@ -763,9 +1330,15 @@ class PostgresService:
         if self.model is None:
             """we encourage explicitly construct repository but we will infer"""
             return self.repository(records[0]).update_records(
-                records=records, batch_size=batch_size
+                records=records,
+                batch_size=batch_size,
+                index_entities=index_entities,
+                bulk=bulk,
             )
 
+        if bulk and records:
+            return self.bulk_upsert(records, index_entities=index_entities)
+
         if records is not None and len(records) > batch_size:
             logger.info(f"Saving  {len(records)} records in batches of {batch_size}")
             for batch in batch_collection(records, batch_size=batch_size):
@@ -793,6 +1366,69 @@ class PostgresService:
         else:
             logger.warning(f"Nothing to do - records is empty {records}")
 
+    def bulk_upsert(
+        self,
+        records: typing.Iterable[BaseModel],
+        index_entities: bool = False,
+    ) -> typing.Dict[str, int]:
+        """load records with COPY into a temporary staging table and merge them into the entity table in one statement.
+        This is much faster than `update_records` for large collections because rows are streamed to the server
+        and nothing is returned except the counts. If a record id occurs more than once the last one wins.
+
+        Args:
+            records: an iterable of records e.g. a list or a generator
+            index_entities: run the entity indexer after the load
+
+        Returns:
+            a dict with the number of `inserted` and `updated` records
+        """
+        assert (
+            self.model is not None
+        ), "You need to specify a model in the constructor or via a repository to load records"
+
+        rows = (self.helper.serialize_for_db(r) for r in records)
+        first = next(rows, None)
+        if first is None:
+            logger.warning(f"Nothing to do - records is empty")
+            return {"inserted": 0, "updated": 0}
+        columns = [c for c in self.helper.field_names if c in first]
+        if "id" not in columns:
+            columns.append("id")
+
+        def copy_lines():
+            for row in itertools.chain([first], rows):
+                yield SqlModelHelper.copy_text_row([row.get(c) for c in columns])
+
+        staging_table = f"_p8_staging_{uuid.uuid4().hex[:12]}"
+        with self._connection() as conn:
+            c = conn.cursor()
+            try:
+                c.execute(self.helper.create_staging_table_query(staging_table))
+                c.copy_expert(
+                    self.helper.copy_query(staging_table, columns), _IterableTextIO(copy_lines())
+                )
+                c.execute(self.helper.bulk_merge_query(staging_table, columns))
+                inserted, updated = c.fetchone()
+                conn.commit()
+            except Exception as pex:
+                logger.warning(
+                    f"Failing to bulk load records for model {self.model} - Postgres error: {pex}"
+                )
+                try:
+                    conn.rollback()
+                except psycopg2.InterfaceError:
+                    pass
+                raise
+            finally:
+                c.close()
+
+        logger.info(
+            f"Bulk loaded records into {self.helper.table_name} - {inserted=}, {updated=}"
+        )
+        if index_entities:
+            self.index_entities()
+        return {"inserted": inserted, "updated": updated}
+
     def upsert_records(
         self,
         records: typing.List[BaseModel],
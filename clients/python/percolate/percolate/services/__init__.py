@@ -1,4 +1,6 @@
 from .PostgresService import PostgresService
+from .PostgresConnectionPool import PostgresConnectionPool, get_pool_stats
+from .AsyncPostgresService import AsyncPostgresService
 from .OpenApiService import OpenApiSpec, OpenApiService
 from .FunctionManager import FunctionManager
 from .MinioService import MinioService
@@ -8,6 +10,7 @@ from .EmailService import EmailService
 from .FileSystemService import FileSystemService
 from .ModelCache import get_model, cache_model, clear_cache, get_cache_stats, ModelCache
 from .ModelRunnerCache import get_runner, cache_runner, clear_runner_cache, get_runner_cache_stats, ModelRunnerCache
+from .AuditWriter import AuditWriter, audit_writer, get_audit_stats
 from percolate.models import Audit, AuditStatus
 import traceback
 from percolate.utils import logger
@@ -106,6 +106,15 @@ class ApiCallingContext(BaseModel):
         description="User's role level for access control (lower = more access, None = system access)",
     )
 
+    agent: typing.Optional[str] = Field(
+        default=None,
+        description="The full name of the agent making the calls - set by the ModelRunner",
+    )
+    response_cache: typing.Optional[bool] = Field(
+        default=None,
+        description="Use the LLM response cache for this context - by default P8_LLM_CACHE_ENABLED and P8_LLM_CACHE_AGENTS decide",
+    )
+
     def get_response_format(cls):
         """"""
         if cls.prefer_json:
@@ -11,6 +11,7 @@ from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 from PIL import Image
 import requests
+from percolate.utils import http_client
 
 from percolate.utils import logger
 
@@ -232,7 +233,7 @@ class ImageInterpreter:
             payload["response_format"] = {"type": "json_object"}
         
         try:
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=120)
+            response = http_client.post(self.base_url, headers=headers, json=payload, timeout=120)
             
             if response.status_code == 200:
                 result = response.json()
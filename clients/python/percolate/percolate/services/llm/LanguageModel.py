@@ -6,14 +6,21 @@ import requests
 import json
 import os
 import typing
+import threading
+import time
 from .CallingContext import CallingContext
 from percolate.models import MessageStack
 from percolate.services import PostgresService
+from percolate.services.PostgresNotificationListener import PostgresNotificationListener
+from percolate.utils.env import P8_MODEL_SETTINGS_CACHE_TTL
+from percolate.utils import http_client
 from percolate.models.p8 import AIResponse
 import uuid
 from percolate.utils import logger
 import traceback
 from .MessageStackFormatter import MessageStackFormatter
+from .ResponseCache import ResponseCache, response_cache
+from .ModelRouter import model_router
 from .utils import *
 
 
@@ -141,27 +148,98 @@ def try_get_open_ai_key():
         logger.warning(f"failed to get the open ai key - {traceback.format_exc()}")        
     
 
+class LanguageModelSettingsCache:
+    """
+    in-process cache of p8."LanguageModelApi" rows (with the token resolved) by model name.
+    Entries expire after P8_MODEL_SETTINGS_CACHE_TTL seconds and are dropped as soon as the table changes
+    via LISTEN/NOTIFY (see PostgresNotificationListener) so constructing a LanguageModel does not query the database.
+    """
+    CHANNEL = "p8_language_model_api"
+
+    def __init__(self, ttl: int = P8_MODEL_SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: typing.Dict[str, typing.Tuple[dict, float]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._subscribed = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, model_name: str, loader: typing.Callable[[str], dict]) -> dict:
+        """the cached settings or the settings from the loader - callers get a copy they can modify"""
+        if not self.ttl:
+            return loader(model_name)
+        if not self._subscribed:
+            self._subscribed = True
+            PostgresNotificationListener.subscribe(self.CHANNEL, self.invalidate)
+
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry and entry[1] > time.monotonic():
+                self.hits += 1
+                return dict(entry[0])
+            self.misses += 1
+            generation = self._generation
+
+        params = loader(model_name)
+        with self._lock:
+            """do not cache what we loaded if the table changed while we were loading"""
+            if generation == self._generation:
+                self._entries[model_name] = (params, time.monotonic() + self.ttl)
+        return dict(params)
+
+    def invalidate(self, payload: dict = None):
+        """drop the changed model (by name in the notification payload) or everything"""
+        name = (payload or {}).get("name")
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if name:
+                self._entries.pop(name, None)
+            else:
+                self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+model_settings_cache = LanguageModelSettingsCache()
+
+
 class LanguageModel:
     """the simplest language model wrapper we can make"""
     def __init__(self, model_name:str):
         """"""
         self.model_name = model_name
         self.db = PostgresService()
-        #TODO we can use a cache for this in future
-        self.params = self.db.execute('select * from p8."LanguageModelApi" where name = %s ', (model_name,))
-        if not self.params:
+        self.params = model_settings_cache.get(model_name, LanguageModel.load_settings)
+        self._scheme = self.params.get('scheme','openai')
+
+    @staticmethod
+    def load_settings(model_name: str) -> dict:
+        """load the model settings from p8."LanguageModelApi" and resolve the token"""
+        params = PostgresService().execute('select * from p8."LanguageModelApi" where name = %s ', (model_name,))
+        if not params:
             raise Exception(f"The model {model_name} does not exist in the Percolate settings")
-        self.params = self.params[0]
+        params = params[0]
         
-        if self.params['token'] is None:
+        if params['token'] is None:
             """if the token is not stored in the database we use whatever token env key to try and load it from environment"""
-            self.params['token'] = os.environ.get(self.params['token_env_key'])
-            if not self.params['token']:
-                raise Exception(f"There is no token or token key configured for model {self.model_name} - you should add an entry to Percolate for the model using the examples in p8.LanguageModelApi")
+            params['token'] = os.environ.get(params['token_env_key'])
+            if not params['token']:
+                raise Exception(f"There is no token or token key configured for model {model_name} - you should add an entry to Percolate for the model using the examples in p8.LanguageModelApi")
         """we use the env in favour of what is in the store"""
-        env_token = os.environ.get(self.params['token_env_key'])
-        self.params['token'] = env_token  if env_token is not None and len(env_token) else self.params.get('token')
-        self._scheme = self.params.get('scheme','openai')
+        env_token = os.environ.get(params['token_env_key'])
+        params['token'] = env_token  if env_token is not None and len(env_token) else params.get('token')
+        return params
         
     def parse(self, response: requests.models.Response | typing.Any, context: CallingContext=None) -> AIResponse:
         """the llm response or HybridResponse from streaming is parsed into our canonical AIResponse.
@@ -190,10 +268,77 @@ class LanguageModel:
         """call the language model with the message stack and functions.
         We return the parsed response unless the caller asks for the raw
         We support a hybrid mode of return the content stream and holding the function call
+        If the model has routes (see ModelRouter) the call may be answered by an equivalent model
         """
-            
+        if debug_response or not model_router.routes_for(self.model_name):
+            return self._call(messages, functions, context=context, debug_response=debug_response)
+        
+        """the message history is in the dialect of this model so models of other schemes only take single turn questions"""
+        streaming = bool(context and context.is_streaming)
+        streamed = threading.Event()
+        if streaming and context.streaming_callback:
+            """once a chunk has reached the caller a failure is surfaced rather than answered again by another model"""
+            callback = context.streaming_callback
+            def _streaming_callback(*args, **kwargs):
+                streamed.set()
+                return callback(*args, **kwargs)
+            context = context.model_copy(update={"streaming_callback": _streaming_callback})
+        return model_router.call(
+            self._routing_candidates(same_scheme=bool(messages.data)),
+            lambda m: self._model_for(m)._call(messages, functions, context=context),
+            lambda response: response.status != 'ERROR',
+            hedge=False if streaming else None,
+            committed=streamed.is_set,
+        )
+    
+    def _model_for(self, model_name: str) -> "LanguageModel":
+        return self if model_name == self.model_name else type(self)(model_name)
+    
+    def _routing_candidates(self, same_scheme: bool) -> typing.List[str]:
+        """the models to try in order - alternatives that are not configured or (optionally) use another scheme are skipped"""
+        candidates = []
+        for m in model_router.candidates(self.model_name):
+            if m != self.model_name:
+                try:
+                    params = model_settings_cache.get(m, LanguageModel.load_settings)
+                except Exception as ex:
+                    logger.warning(f"Skipping the route {self.model_name} -> {m} - {ex}")
+                    continue
+                if same_scheme and params.get('scheme', 'openai') != self._scheme:
+                    continue
+            candidates.append(m)
+        return candidates
+    
+    def _call_raw(self, messages: MessageStack, functions: typing.List[dict], context: CallingContext=None):
+        """the raw api call exists for testing - normally for consistency with the database we use a different interface
+        
+        Raw calls are routed between models of the same scheme since the caller reads the response in this model's dialect.
+        Async streams are only requested when they are read so they go to the healthiest model without fall back
+        """
+        if not model_router.routes_for(self.model_name):
+            return self._request(messages, functions=functions, context=context)
+        streaming = bool(context and context.is_streaming)
+        candidates = self._routing_candidates(same_scheme=True)
+        if streaming and isinstance(self, AsyncStreamingLanguageModel):
+            return self._model_for(candidates[0])._request(messages, functions=functions, context=context)
+        return model_router.call(
+            candidates,
+            lambda m: self._model_for(m)._request(messages, functions=functions, context=context),
+            lambda response: response.status_code in [200, 201],
+            hedge=False if streaming else None,
+        )
+        
+    def _call(self, messages: MessageStack, functions: typing.List[dict], context: CallingContext=None, debug_response:bool=False ) -> AIResponse:
+        """the call to this model - see __call__"""
         try:
-            response = self._call_raw(messages=messages, functions=functions,context=context)
+            """streamed responses are not cached"""
+            use_cache = not debug_response and not (context and context.is_streaming) and ResponseCache.is_enabled_for(context)
+            if use_cache and (cached := response_cache.get(self.model_name, messages, functions, context)) is not None:
+                logger.debug(f"Using a cached response for {self.model_name}")
+                return cached
+            
+            """the parsed response is cached here so the raw tier is skipped"""
+            response = self._request(messages=messages, functions=functions,context=context, use_cache=False)
             
             logger.debug(f"{response=}, {context=}")
             if debug_response:
@@ -203,6 +348,8 @@ class LanguageModel:
             
             """for consistency with DB we should audit here and also format the message the same with tool calls etc."""
             response = self.parse(response,context=context)
+            if use_cache and response.status != 'ERROR':
+                response_cache.put(self.model_name, messages, functions, response, context)
             return response
         except:
             # data = {
@@ -230,14 +377,16 @@ class LanguageModel:
         return self.__call__(MessageStack(question,system_prompt=system_prompt), functions=functions, context=context, **kwargs)
         
         
-    def _call_raw(self, messages: MessageStack, functions: typing.List[dict], context: CallingContext=None):
-         """the raw api call exists for testing - normally for consistency with the database we use a different interface"""
+    def _request(self, messages: MessageStack, functions: typing.List[dict], context: CallingContext=None, use_cache: bool=None):
+         """the provider request for this model - see _call_raw"""
    
          return self.call_api_simple(messages.question, 
                                     functions=functions,
                                     system_prompt=messages.system_prompt, 
                                     data_content=messages.data,
-                                    is_streaming=(context and context.is_streaming))
+                                    is_streaming=(context and context.is_streaming),
+                                    context=context,
+                                    use_cache=use_cache)
 
     @classmethod 
     def from_context(cls, context: CallingContext) -> "LanguageModel":
@@ -313,11 +462,47 @@ class LanguageModel:
                         data_content:typing.List[dict]=None,
                         is_streaming:bool = False,
                         temperature: float = 0.0,
+                        context: CallingContext = None,
+                        use_cache: bool = None,
                         **kwargs):
         """
         Simple REST wrapper to use with any language model
+        
+        Non streamed responses use the raw tier of the response cache when it is enabled for the context (see ResponseCache).
+        use_cache=False skips it e.g. when the caller caches the parsed response
         """
         logger.debug(f"invoking model {self.model_name}, {is_streaming=}")
+        url, headers, data = self.prepare_api_request(question, functions=functions, system_prompt=system_prompt,
+                                                      data_content=data_content, is_streaming=is_streaming,
+                                                      temperature=temperature, **kwargs)
+        
+        if use_cache is None:
+            use_cache = ResponseCache.is_enabled_for(context)
+        use_cache = use_cache and not is_streaming
+        if use_cache and (cached := response_cache.get_raw(self.model_name, data)) is not None:
+            logger.debug(f"Using a cached response for {self.model_name}")
+            return cached
+   
+        """the pooled client keeps the connection alive and retries 429/5xx with backoff (honouring Retry-After)"""
+        response =  http_client.post(url, headers=headers, data=json.dumps(data), stream=is_streaming)
+        
+        if response.status_code not in [200,201]:
+            logger.warning(f"failed to submit: {response.status_code=}  {response.content}")
+        elif use_cache:
+            response_cache.put_raw(self.model_name, data, response)
+        return response
+    
+    def prepare_api_request(self, 
+                        question:str, 
+                        functions: typing.List[dict]=None, 
+                        system_prompt:str=None, 
+                        data_content:typing.List[dict]=None,
+                        is_streaming:bool = False,
+                        temperature: float = 0.0,
+                        **kwargs) -> typing.Tuple[str, dict, dict]:
+        """
+        the url, headers and payload for a call in the dialect of the model's scheme - see call_api_simple
+        """
         """select this from the database or other lookup
         e.g. db.execute('select * from "LanguageModelApi" where name = %s ', ('gpt-4o-mini',))[0]
         """
@@ -398,18 +583,7 @@ class LanguageModel:
                 data["system_instruction"] =  { "parts": { "text": system_prompt } }
                     
         logger.trace(f"request {data=}, {is_streaming=}")
-   
-        response =  requests.post(url, headers=headers, data=json.dumps(data), stream=is_streaming)
-        
-        if response.status_code not in [200,201]:
-            logger.warning(f"failed to submit: {response.status_code=}  {response.content}")
-        if response.status_code == 429:
-            import time
-            """TODO: should be a flagged thing"""
-            time.sleep(61)
-            logger.warning(f"RATE LIMITED - SLEEPING FOR 1 MINUTE")
-            response =  requests.post(url, headers=headers, data=json.dumps(data),stream=is_streaming)   
-        return response
+        return url, headers, data
     
     
     
@@ -538,4 +712,42 @@ class LanguageModel:
             user_query=user_query,
             audit_on_flush=audit_on_flush
         )
-        
\ No newline at end of file
+        
+
+class AsyncProviderStream:
+    """
+    A provider SSE response that is requested when it is iterated. `aiter_lines` yields the raw lines as bytes
+    like `requests.Response.iter_lines` but reads them from the shared async http client so the event loop is not blocked
+    """
+
+    def __init__(self, url: str, headers: dict, data: dict):
+        self.url = url
+        self.headers = headers
+        self.data = data
+        self.status_code: int = None
+
+    async def aiter_lines(self) -> typing.AsyncGenerator[bytes, None]:
+        async with http_client.astream("POST", self.url, headers=self.headers, content=json.dumps(self.data)) as response:
+            self.status_code = response.status_code
+            if response.status_code not in [200, 201]:
+                logger.warning(f"failed to submit: {response.status_code=}")
+            async for line in response.aiter_lines():
+                yield line.encode('utf-8')
+
+
+class AsyncStreamingLanguageModel(LanguageModel):
+    """
+    A LanguageModel whose streaming raw calls return an `AsyncProviderStream` rather than a blocking response.
+    Use it as the `language_model_class` of the API handlers so streams are relayed on the event loop
+    """
+
+    def _request(self, messages: MessageStack, functions: typing.List[dict], context: CallingContext=None, use_cache: bool=None):
+        is_streaming = context and context.is_streaming
+        if not is_streaming:
+            return super()._request(messages, functions=functions, context=context, use_cache=use_cache)
+        url, headers, data = self.prepare_api_request(messages.question,
+                                                      functions=functions,
+                                                      system_prompt=messages.system_prompt,
+                                                      data_content=messages.data,
+                                                      is_streaming=True)
+        return AsyncProviderStream(url, headers, data)
@@ -0,0 +1,244 @@
+"""
+Latency and error aware routing between equivalent models.
+
+Models configured in P8_MODEL_ROUTES have an ordered list of equivalent-tier alternatives e.g.
+
+```bash
+export P8_ROUTING_ENABLED=true
+export P8_MODEL_ROUTES='{"gpt-4o": ["gpt-4.1", "claude-3-5-sonnet-20241022"]}'
+```
+
+The router keeps a rolling window of latencies and errors per model. A call goes to the primary model unless it is
+failing (error rate above P8_ROUTING_MAX_ERROR_RATE) or slow (p95 above P8_ROUTING_MAX_P95), otherwise to the
+healthy alternative with the lowest p95. A call that fails or returns an error falls over to the next candidate.
+
+With P8_ROUTING_HEDGE a second request is sent to the next candidate if the first has not answered by the p95 of the
+first model - the first successful answer is used and the other is discarded (a blocking request cannot be aborted
+so the loser finishes in the background and is only recorded in the stats).
+
+Streamed calls only fall over before the first chunk has been sent to the caller (see `call(committed=...)`) -
+after that a retry would repeat or mix output so the error is surfaced instead.
+"""
+
+import json
+import threading
+import time
+import typing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_ROUTING_ENABLED,
+    P8_MODEL_ROUTES,
+    P8_ROUTING_WINDOW,
+    P8_ROUTING_MIN_SAMPLES,
+    P8_ROUTING_MAX_ERROR_RATE,
+    P8_ROUTING_MAX_P95,
+    P8_ROUTING_HEDGE,
+)
+
+T = typing.TypeVar("T")
+
+
+class ModelHealth:
+    """rolling latencies and outcomes of the last calls to a model"""
+
+    def __init__(self, window: int = P8_ROUTING_WINDOW):
+        self._lock = threading.Lock()
+        self._calls: typing.Deque[typing.Tuple[float, bool]] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._calls.append((latency, ok))
+
+    @property
+    def samples(self) -> int:
+        return len(self._calls)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            calls = list(self._calls)
+        return sum(1 for _, ok in calls if not ok) / len(calls) if calls else 0.0
+
+    def percentile(self, q: float = 0.95) -> typing.Optional[float]:
+        """the latency percentile of successful calls or None with too few samples"""
+        with self._lock:
+            latencies = sorted(l for l, ok in self._calls if ok)
+        if len(latencies) < P8_ROUTING_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def get_stats(self) -> dict:
+        return {"samples": self.samples, "error_rate": self.error_rate(), "p95": self.percentile(0.95)}
+
+
+class ModelRouter:
+    """orders and calls equivalent models by health - see the module docs"""
+
+    def __init__(
+        self,
+        routes: typing.Dict[str, typing.List[str]] = None,
+        enabled: bool = P8_ROUTING_ENABLED,
+        hedge: bool = P8_ROUTING_HEDGE,
+        max_error_rate: float = P8_ROUTING_MAX_ERROR_RATE,
+        max_p95: float = P8_ROUTING_MAX_P95,
+    ):
+        self.routes = routes if routes is not None else self._load_routes()
+        self.enabled = enabled
+        self.hedge = hedge
+        self.max_error_rate = max_error_rate
+        self.max_p95 = max_p95
+        self._lock = threading.Lock()
+        self._health: typing.Dict[str, ModelHealth] = {}
+        self.fallbacks = 0
+        self.hedges = 0
+
+    @staticmethod
+    def _load_routes() -> typing.Dict[str, typing.List[str]]:
+        if not P8_MODEL_ROUTES:
+            return {}
+        try:
+            return {k: list(v) for k, v in json.loads(P8_MODEL_ROUTES).items()}
+        except Exception as ex:
+            logger.warning(f"Ignoring invalid P8_MODEL_ROUTES - {ex}")
+            return {}
+
+    def health(self, model_name: str) -> ModelHealth:
+        with self._lock:
+            if model_name not in self._health:
+                self._health[model_name] = ModelHealth()
+            return self._health[model_name]
+
+    def record(self, model_name: str, latency: float, ok: bool):
+        self.health(model_name).record(latency, ok)
+
+    def routes_for(self, model_name: str) -> typing.List[str]:
+        """the alternatives of the model if routing is enabled for it"""
+        return self.routes.get(model_name, []) if self.enabled else []
+
+    def is_healthy(self, model_name: str) -> bool:
+        health = self.health(model_name)
+        if health.samples >= P8_ROUTING_MIN_SAMPLES and health.error_rate() > self.max_error_rate:
+            return False
+        p95 = health.percentile(0.95)
+        return not (self.max_p95 and p95 is not None and p95 > self.max_p95)
+
+    def candidates(self, model_name: str, alternatives: typing.List[str] = None) -> typing.List[str]:
+        """the primary if it is healthy, then healthy alternatives by p95 and finally the unhealthy models"""
+        alternatives = self.routes_for(model_name) if alternatives is None else alternatives
+        models = [model_name, *[a for a in alternatives if a != model_name]]
+        healthy = [m for m in models if self.is_healthy(m)]
+        unhealthy = [m for m in models if m not in healthy]
+        primary = healthy[:1] if healthy and healthy[0] == model_name else []
+        rest = sorted(
+            healthy[len(primary) :],
+            key=lambda m: self.health(m).percentile(0.95) or float("inf"),
+        )
+        return primary + rest + unhealthy
+
+    def _timed(self, model_name: str, attempt: typing.Callable[[str], T], is_ok: typing.Callable[[T], bool]) -> T:
+        started = time.monotonic()
+        try:
+            result = attempt(model_name)
+        except Exception:
+            self.record(model_name, time.monotonic() - started, False)
+            raise
+        self.record(model_name, time.monotonic() - started, is_ok(result))
+        return result
+
+    def call(
+        self,
+        models: typing.List[str],
+        attempt: typing.Callable[[str], T],
+        is_ok: typing.Callable[[T], bool],
+        hedge: bool = None,
+        committed: typing.Callable[[], bool] = None,
+    ) -> T:
+        """
+        call the models in order until one succeeds, hedging after the p95 of the first if enabled.
+        If none succeed the last result is returned or the last error raised.
+        committed is true once output has reached the caller (e.g. the first streamed chunk) - a failure after that does not fall back
+        """
+        hedge = self.hedge if hedge is None else hedge
+        if hedge and len(models) > 1:
+            return self._call_hedged(models, attempt, is_ok, committed)
+
+        result, error = None, None
+        for i, model_name in enumerate(models):
+            if i:
+                if committed and committed():
+                    logger.warning(f"Not falling back from {models[i - 1]} - output was already sent")
+                    break
+                self.fallbacks += 1
+                logger.warning(f"Falling back from {models[i - 1]} to {model_name}")
+            try:
+                result, error = self._timed(model_name, attempt, is_ok), None
+                if is_ok(result):
+                    return result
+            except Exception as ex:
+                error = ex
+        if error is not None:
+            raise error
+        return result
+
+    def _call_hedged(
+        self,
+        models: typing.List[str],
+        attempt: typing.Callable[[str], T],
+        is_ok: typing.Callable[[T], bool],
+        committed: typing.Callable[[], bool] = None,
+    ) -> T:
+        remaining = list(models)
+        pending = {}
+        result, error = None, None
+        hedged = False
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="p8-hedge")
+
+        def launch():
+            model_name = remaining.pop(0)
+            pending[executor.submit(self._timed, model_name, attempt, is_ok)] = model_name
+
+        try:
+            launch()
+            while pending:
+                deadline = None
+                if not hedged and remaining and not (committed and committed()):
+                    deadline = self.health(next(iter(pending.values()))).percentile(0.95)
+                done, _ = wait(pending, timeout=deadline, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    logger.debug(f"Hedging {list(pending.values())} with {remaining[0]} after {deadline:.2f}s")
+                    launch()
+                    continue
+                for future in done:
+                    pending.pop(future)
+                    try:
+                        result, error = future.result(), None
+                        if is_ok(result):
+                            return result
+                    except Exception as ex:
+                        error = ex
+                if not pending and remaining and not (committed and committed()):
+                    self.fallbacks += 1
+                    launch()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+        if error is not None:
+            raise error
+        return result
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            health = dict(self._health)
+        return {
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "models": {m: {**h.get_stats(), "healthy": self.is_healthy(m)} for m, h in health.items()},
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,294 @@
+"""
+An optional in-process cache of language model responses.
+
+Evaluation and regression runs replay the same prompts many times and many production questions are near duplicates.
+When enabled (P8_LLM_CACHE_ENABLED and the agent in P8_LLM_CACHE_AGENTS, or `CallingContext.response_cache=True`)
+`LanguageModel.__call__` looks here before calling the provider.
+
+- the exact tier is keyed by a hash of the model, system prompt, question, messages, functions and temperature
+- the semantic tier (P8_LLM_CACHE_SEMANTIC_THRESHOLD > 0) reuses the answer to a single turn question whose embedding is close enough.
+  Only content answers are reused this way - tool calls depend on the exact question
+- entries expire after P8_LLM_CACHE_TTL seconds and the least recently used are evicted above P8_LLM_CACHE_MAX_ENTRIES
+
+Hits are new AIResponses (id and session) so they are audited like any other response.
+
+`LanguageModel.call_api_simple` returns the provider's HTTP response so it uses the raw tier (`get_raw`/`put_raw`),
+keyed by the model and request payload. Raw hits are new `requests.Response` objects with the cached body.
+"""
+
+import hashlib
+import json
+import math
+import requests
+import threading
+import time
+import typing
+import uuid
+from collections import OrderedDict
+
+from percolate.models import MessageStack
+from percolate.models.p8 import AIResponse
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_LLM_CACHE_ENABLED,
+    P8_LLM_CACHE_AGENTS,
+    P8_LLM_CACHE_TTL,
+    P8_LLM_CACHE_MAX_ENTRIES,
+    P8_LLM_CACHE_SEMANTIC_THRESHOLD,
+    P8_LLM_CACHE_EMBEDDING_MODEL,
+)
+from .CallingContext import CallingContext
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - similarity is computed in python without numpy
+    np = None
+
+
+def _default_embed(text: str) -> typing.List[float]:
+    from percolate.utils.embedding import get_embedding
+    from .LanguageModel import try_get_open_ai_key
+
+    return get_embedding(text, model=P8_LLM_CACHE_EMBEDDING_MODEL, api_key=try_get_open_ai_key())
+
+
+def _normalize(vector: typing.List[float]) -> typing.List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class ResponseCache:
+    """exact and semantic LRU cache of AIResponses - see the module docs"""
+
+    def __init__(
+        self,
+        ttl: int = P8_LLM_CACHE_TTL,
+        max_entries: int = P8_LLM_CACHE_MAX_ENTRIES,
+        semantic_threshold: float = P8_LLM_CACHE_SEMANTIC_THRESHOLD,
+        embed: typing.Callable[[str], typing.List[float]] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self._embed = embed or _default_embed
+        self._lock = threading.Lock()
+        """key -> (response data, verbatim, expires)"""
+        self._entries: "OrderedDict[str, typing.Tuple[dict, typing.Any, float]]" = OrderedDict()
+        """semantic scope -> {key: normalized question embedding}"""
+        self._vectors: typing.Dict[str, typing.Dict[str, typing.List[float]]] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_enabled_for(context: CallingContext = None) -> bool:
+        """the context can opt in or out, otherwise P8_LLM_CACHE_ENABLED and P8_LLM_CACHE_AGENTS decide"""
+        if context is not None and context.response_cache is not None:
+            return context.response_cache
+        if not P8_LLM_CACHE_ENABLED:
+            return False
+        agents = {a.strip() for a in P8_LLM_CACHE_AGENTS.split(",") if a.strip()}
+        return "*" in agents or (context is not None and context.agent in agents)
+
+    @staticmethod
+    def _hash(data: dict) -> str:
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def scope_key(
+        cls, model_name: str, messages: MessageStack, functions: typing.List[dict], temperature: float
+    ) -> str:
+        """everything but the question - near duplicate questions are only compared within a scope"""
+        return cls._hash(
+            {
+                "model": model_name,
+                "system_prompt": messages.system_prompt,
+                "functions": functions or [],
+                "temperature": temperature,
+            }
+        )
+
+    @classmethod
+    def key(
+        cls, model_name: str, messages: MessageStack, functions: typing.List[dict], temperature: float
+    ) -> str:
+        """the exact key of a call"""
+        return cls._hash(
+            {
+                "scope": cls.scope_key(model_name, messages, functions, temperature),
+                "question": messages.question,
+                "messages": [m if isinstance(m, dict) else getattr(m, "model_dump", lambda: str(m))() for m in messages.data],
+            }
+        )
+
+    @staticmethod
+    def _is_single_turn(messages: MessageStack) -> bool:
+        return not messages.data and bool(messages.question)
+
+    def _similarity(self, a: typing.List[float], b: typing.List[float]) -> float:
+        if np is not None:
+            return float(np.dot(a, b))
+        return sum(x * y for x, y in zip(a, b))
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        for vectors in self._vectors.values():
+            vectors.pop(key, None)
+
+    def _respond(self, key: str, context: CallingContext = None) -> typing.Optional[AIResponse]:
+        """a fresh AIResponse from the entry, or None if it expired - call under the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        data, verbatim, expires = entry
+        if expires < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        data = dict(data)
+        data["id"] = str(uuid.uuid1())
+        data["session_id"] = context.session_id if context else None
+        """a cached answer consumes no tokens"""
+        for usage in ["tokens", "tokens_in", "tokens_out", "tokens_other"]:
+            data[usage] = 0
+        return AIResponse(**data, verbatim=verbatim)
+
+    def get(
+        self,
+        model_name: str,
+        messages: MessageStack,
+        functions: typing.List[dict],
+        context: CallingContext = None,
+    ) -> typing.Optional[AIResponse]:
+        """the cached response for the call or None"""
+        temperature = context.temperature if context else None
+        key = self.key(model_name, messages, functions, temperature)
+        with self._lock:
+            response = self._respond(key, context)
+            if response is not None:
+                self.hits += 1
+                return response
+
+        if self.semantic_threshold and self._is_single_turn(messages):
+            scope = self.scope_key(model_name, messages, functions, temperature)
+            with self._lock:
+                candidates = list(self._vectors.get(scope, {}).items())
+            if candidates:
+                try:
+                    vector = _normalize(self._embed(messages.question))
+                    best_key, best = max(
+                        ((k, self._similarity(vector, v)) for k, v in candidates),
+                        key=lambda kv: kv[1],
+                    )
+                    if best >= self.semantic_threshold:
+                        with self._lock:
+                            response = self._respond(best_key, context)
+                            if response is not None:
+                                self.semantic_hits += 1
+                                return response
+                except Exception as ex:
+                    logger.warning(f"Skipping the semantic response cache - {ex}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(
+        self,
+        model_name: str,
+        messages: MessageStack,
+        functions: typing.List[dict],
+        response: AIResponse,
+        context: CallingContext = None,
+    ):
+        """cache a successful response"""
+        if response is None or response.status == "ERROR":
+            return
+        temperature = context.temperature if context else None
+        key = self.key(model_name, messages, functions, temperature)
+
+        vector = None
+        if self.semantic_threshold and self._is_single_turn(messages) and not response.tool_calls:
+            try:
+                vector = _normalize(self._embed(messages.question))
+            except Exception as ex:
+                logger.warning(f"Not adding the response to the semantic cache - {ex}")
+
+        data = response.model_dump()
+        with self._lock:
+            self._entries[key] = (data, response.verbatim, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                scope = self.scope_key(model_name, messages, functions, temperature)
+                self._vectors.setdefault(scope, {})[key] = vector
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    @classmethod
+    def raw_key(cls, model_name: str, payload: dict) -> str:
+        """the key of a provider request - the payload carries no credentials"""
+        return "raw:" + cls._hash({"model": model_name, "payload": payload})
+
+    def get_raw(self, model_name: str, payload: dict) -> typing.Optional[requests.Response]:
+        """the cached provider response for the request payload or None"""
+        key = self.raw_key(model_name, payload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        data, content, _ = entry
+        response = requests.Response()
+        response.status_code = data["status_code"]
+        response.headers.update(data["headers"])
+        response.encoding = data["encoding"]
+        response._content = content
+        return response
+
+    def put_raw(self, model_name: str, payload: dict, response: requests.Response):
+        """cache a successful (non streamed) provider response"""
+        if response is None or response.status_code not in [200, 201]:
+            return
+        key = self.raw_key(model_name, payload)
+        data = {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+        }
+        with self._lock:
+            self._entries[key] = (data, response.content, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache()
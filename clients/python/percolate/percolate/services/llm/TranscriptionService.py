@@ -11,6 +11,7 @@ from pathlib import Path
 from percolate.utils import logger
 import requests
 import urllib3
+from percolate.utils import http_client
 
 # Try to use the official OpenAI client if available
 try:
@@ -163,27 +164,6 @@ class TranscriptionService:
             # Prepare the request with SSL fixes
             headers = {"Authorization": f"Bearer {self.api_key}"}
             
-            # Create a session with SSL configuration
-            session = requests.Session()
-            
-            # SSL/TLS configuration to fix the EOF protocol violation
-            session.verify = True  # Keep SSL verification enabled
-            
-            # Configure SSL adapter with specific settings
-            from requests.adapters import HTTPAdapter
-            from urllib3.util.retry import Retry
-            
-            # Retry strategy for connection issues
-            retry_strategy = Retry(
-                total=3,
-                status_forcelist=[429, 500, 502, 503, 504],
-                backoff_factor=1,
-                allowed_methods=["POST"]
-            )
-            
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            session.mount("https://", adapter)
-            
             with open(file_path, "rb") as audio_file:
                 files = {
                     "file": (os.path.basename(file_path), audio_file, self._get_content_type(file_path))
@@ -193,8 +173,8 @@ class TranscriptionService:
                     "response_format": "text"
                 }
                 
-                # Make the request with improved SSL handling
-                response = session.post(
+                # The shared session keeps the connection alive and retries 429/5xx with backoff
+                response = http_client.post(
                     self.base_url,
                     headers=headers,
                     files=files,
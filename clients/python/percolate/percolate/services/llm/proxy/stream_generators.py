@@ -11,6 +11,7 @@ import time
 import typing
 import uuid
 import requests
+from percolate.utils import http_client
 from percolate.utils import logger
 from requests.models import Response
 from percolate.services.llm.CallingContext import CallingContext
@@ -22,6 +23,7 @@ from percolate.services.llm.proxy.models import (
 from percolate.services.llm.proxy.utils import (
     BackgroundAudit, parse_sse_line, create_sse_line, format_tool_calls_for_openai
 )
+from percolate.services.llm.proxy.translators import get_delta_translator
 
 
 def convert_chunk_to_target_scheme(chunk: dict, target_scheme: str) -> dict:
@@ -35,15 +37,136 @@ def convert_chunk_to_target_scheme(chunk: dict, target_scheme: str) -> dict:
     Returns:
         The chunk converted to the target scheme
     """
-    if target_scheme == 'openai':
-        return chunk
-    elif target_scheme == 'anthropic':
-        return OpenAIStreamDelta(**chunk).to_anthropic_format()
-    elif target_scheme == 'google':
-        return OpenAIStreamDelta(**chunk).to_google_format()
-    else:
+    if target_scheme not in ('openai', 'anthropic', 'google'):
         logger.warning(f"Unknown target scheme: {target_scheme}, falling back to OpenAI format")
-        return chunk
+    return get_delta_translator('openai', target_scheme)(chunk)
+
+
+class BufferedFunctionStream:
+    """
+    The state of a provider SSE stream with buffered function calls and aggregated usage.
+    Lines are fed one at a time so the same logic serves the sync and async generators - see `stream_with_buffered_functions`.
+    """
+
+    def __init__(
+        self,
+        source_scheme: str = 'openai',
+        target_scheme: str = 'openai',
+        relay_tool_use_events: bool = False,
+        relay_usage_events: bool = False
+    ):
+        self.source_scheme = source_scheme
+        self.target_scheme = target_scheme
+        self.relay_tool_use_events = relay_tool_use_events
+        self.relay_usage_events = relay_usage_events
+        self.tool_call_map = {}  # Map of tool call index to aggregated tool call
+        self.finished_tool_calls = False
+        self.usage = {}  # Aggregated usage information
+        self.done = False
+        """the dialect translators are looked up once per stream"""
+        self._to_canonical = get_delta_translator(source_scheme, 'openai')
+        self._to_target = get_delta_translator('openai', target_scheme)
+
+    def _event(self, canonical_chunk: dict) -> typing.Tuple[str, dict]:
+        target_chunk = self._to_target(canonical_chunk)
+        return f"data: {json.dumps(target_chunk)}\n\n", canonical_chunk
+
+    def feed(self, line: str) -> typing.List[typing.Tuple[str, dict]]:
+        """process one line of the response and return the events to relay - `done` is set on [DONE]"""
+        if not line or not line.startswith("data: "):
+            return []
+        
+        raw_data = line[6:].strip()
+        if raw_data == "[DONE]":
+            # Yield final [DONE] marker
+            self.done = True
+            return [(f"data: [DONE]\n\n", {"type": "done"})]
+        
+        try:
+            # Parse the chunk based on source scheme
+            chunk = json.loads(raw_data)
+        except json.JSONDecodeError:
+            # Skip malformed chunks
+            return []
+            
+        canonical_chunk = self._to_canonical(chunk)
+        
+        if 'usage' in canonical_chunk:
+            # Update our aggregated usage
+            new_usage = canonical_chunk.get('usage', {})
+            if new_usage:
+                self.usage.update(new_usage)
+            
+            # Optionally relay usage events
+            if self.relay_usage_events:
+                return [self._event(canonical_chunk)]
+            return []
+        
+        # Extract choice and delta
+        if 'choices' not in canonical_chunk or not canonical_chunk['choices']:
+            return []
+            
+        choice = canonical_chunk['choices'][0]
+        delta = choice.get('delta', {})
+        finish_reason = choice.get('finish_reason')
+        
+        # Handle content deltas (text)
+        if 'content' in delta:
+            return [self._event(canonical_chunk)]
+        
+        # Buffer tool calls
+        if 'tool_calls' in delta:
+            for tool_delta in delta['tool_calls']:
+                if 'id' in tool_delta:
+                    # First encounter of this tool call
+                    self.tool_call_map[tool_delta['index']] = tool_delta
+                else:
+                    # Update existing tool call with new arguments
+                    t = self.tool_call_map[tool_delta['index']]
+                    t['function']['arguments'] += tool_delta['function']['arguments']
+            
+            # Optionally relay tool use events
+            if self.relay_tool_use_events:
+                return [self._event(canonical_chunk)]
+            return []
+        
+        if finish_reason == 'tool_calls' and not self.finished_tool_calls:
+            self.finished_tool_calls = True
+            full_tool_calls = list(self.tool_call_map.values())
+            
+            consolidated_chunk = {
+                "id": canonical_chunk.get("id", f"chatcmpl-{int(time.time())}"),
+                "object": "chat.completion.chunk",
+                "created": canonical_chunk.get("created", int(time.time())),
+                "model": canonical_chunk.get("model", "unknown"),
+                "choices": [
+                    {
+                        "delta": {"tool_calls": full_tool_calls},
+                        "index": choice.get("index", 0),
+                        "finish_reason": "tool_calls"
+                    }
+                ]
+            }
+            return [self._event(consolidated_chunk)]
+        
+        # Handle stop reason
+        if finish_reason == 'stop':
+            return [self._event(canonical_chunk)]
+        return []
+
+    def flush(self) -> typing.List[typing.Tuple[str, dict]]:
+        """If we collected usage but haven't emitted it yet, emit it now"""
+        if self.usage and (self.relay_usage_events or self.finished_tool_calls):
+            usage_chunk = {
+                "id": f"chatcmpl-{int(time.time())}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "unknown",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": self.usage
+            }
+            return [self._event(usage_chunk)]
+        return []
 
 
 def stream_with_buffered_functions(
@@ -72,125 +195,15 @@ def stream_with_buffered_functions(
     Yields:
         Tuple of (raw_line_in_target_scheme, chunk_in_openai_scheme)
     """
-    # Track state for buffering tool calls
-    tool_call_map = {}  # Map of tool call index to aggregated tool call
-    finished_tool_calls = False
-    usage = {}  # Aggregated usage information
+    state = BufferedFunctionStream(source_scheme, target_scheme, relay_tool_use_events, relay_usage_events)
     
     # Process each line in the response
     for line in response.iter_lines(decode_unicode=True):
-        if not line or not line.startswith("data: "):
-            continue
-        
-        raw_data = line[6:].strip()
-        if raw_data == "[DONE]":
-            # Yield final [DONE] marker
-            yield f"data: [DONE]\n\n", {"type": "done"}
+        yield from state.feed(line)
+        if state.done:
             break
-        
-        try:
-            # Parse the chunk based on source scheme
-            chunk = json.loads(raw_data)
-            
-            canonical_chunk = chunk
-            if source_scheme == 'anthropic':
-                canonical_chunk = AnthropicStreamDelta(**chunk).to_openai_format()
-            elif source_scheme == 'google':
-                canonical_chunk = GoogleStreamDelta(**chunk).to_openai_format()
-            
-            if 'usage' in canonical_chunk:
-                # Update our aggregated usage
-                new_usage = canonical_chunk.get('usage', {})
-                if new_usage:
-                    usage.update(new_usage)
-                
-                # Optionally relay usage events
-                if relay_usage_events:
-                    target_chunk = convert_chunk_to_target_scheme(canonical_chunk, target_scheme)
-                    target_line = f"data: {json.dumps(target_chunk)}\n\n"
-                    yield target_line, canonical_chunk
-                continue
-            
-            # Extract choice and delta
-            if 'choices' not in canonical_chunk or not canonical_chunk['choices']:
-                continue
-                
-            choice = canonical_chunk['choices'][0]
-            delta = choice.get('delta', {})
-            finish_reason = choice.get('finish_reason')
-            
-            # Handle content deltas (text)
-            if 'content' in delta:
-                target_chunk = convert_chunk_to_target_scheme(canonical_chunk, target_scheme)
-                target_line = f"data: {json.dumps(target_chunk)}\n\n"
-                yield target_line, canonical_chunk
-            
-            # Buffer tool calls
-            elif 'tool_calls' in delta:
-                for tool_delta in delta['tool_calls']:
-                    if 'id' in tool_delta:
-                        # First encounter of this tool call
-                        tool_call_map[tool_delta['index']] = tool_delta
-                    else:
-                        # Update existing tool call with new arguments
-                        t = tool_call_map[tool_delta['index']]
-                        t['function']['arguments'] += tool_delta['function']['arguments']
-                
-                # Optionally relay tool use events
-                if relay_tool_use_events:
-                    target_chunk = convert_chunk_to_target_scheme(canonical_chunk, target_scheme)
-                    target_line = f"data: {json.dumps(target_chunk)}\n\n"
-                    yield target_line, canonical_chunk
-            
-            elif finish_reason == 'tool_calls' and not finished_tool_calls:
-                finished_tool_calls = True
-                full_tool_calls = list(tool_call_map.values())
-                
-                consolidated_chunk = {
-                    "id": canonical_chunk.get("id", f"chatcmpl-{int(time.time())}"),
-                    "object": "chat.completion.chunk",
-                    "created": canonical_chunk.get("created", int(time.time())),
-                    "model": canonical_chunk.get("model", "unknown"),
-                    "choices": [
-                        {
-                            "delta": {"tool_calls": full_tool_calls},
-                            "index": choice.get("index", 0),
-                            "finish_reason": "tool_calls"
-                        }
-                    ]
-                }
-                
-                target_chunk = convert_chunk_to_target_scheme(consolidated_chunk, target_scheme)
-                target_line = f"data: {json.dumps(target_chunk)}\n\n"
-                yield target_line, consolidated_chunk
-            
-            # Handle stop reason
-            elif finish_reason == 'stop':
-                target_chunk = convert_chunk_to_target_scheme(canonical_chunk, target_scheme)
-                target_line = f"data: {json.dumps(target_chunk)}\n\n"
-                yield target_line, canonical_chunk
-                
-        except json.JSONDecodeError:
-            # Skip malformed chunks
-            continue
     
-    # If we collected usage but haven't emitted it yet, emit it now
-    if usage and (relay_usage_events or finished_tool_calls):
-        usage_chunk = {
-            "id": f"chatcmpl-{int(time.time())}",
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "unknown",
-            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
-            "usage": usage
-        }
-        
-        # Convert to target scheme
-        target_chunk = convert_chunk_to_target_scheme(usage_chunk, target_scheme)
-        
-        # Yield in target format
-        target_line = f"data: {json.dumps(target_chunk)}\n\n"
-        yield target_line, usage_chunk
+    yield from state.flush()
 
 
 def flush_ai_response_audit(
@@ -218,6 +231,52 @@ def flush_ai_response_audit(
     )
 
 
+def _prepare_model_request(request: LLMApiRequest, context: CallingContext) -> typing.Tuple[str, str, dict, dict]:
+    """audit the user session and prepare the provider request - returns (source_scheme, api_url, headers, api_data)"""
+    from percolate.services.llm.LanguageModel import LanguageModel
+    
+    # Create background auditor and record the session
+    auditor = BackgroundAudit()
+    if context.session_id:
+        # Extract the last user message as the query
+        user_query = ""
+        for msg in request.messages:
+            if msg.get("role") == "user" and isinstance(msg.get("content"), str):
+                user_query = msg.get("content")
+        
+        # Audit the user session (only creates a Session record)
+        auditor.audit_user_session(
+            session_id=context.session_id,
+            user_id=context.username,
+            channel_id=context.channel_ts,
+            query=user_query
+        )
+    
+    # Get the LLM client to access model settings from the database
+    llm = LanguageModel(request.model)
+    params = llm.params
+    
+    # Ensure we're using the correct scheme
+    source_scheme = params.get('scheme', 'openai')
+    
+    # Use the request model's method to prepare all request data
+    prepared_request = request.prepare_request_data(params, source_scheme)
+    return source_scheme, prepared_request["api_url"], prepared_request["headers"], prepared_request["api_data"]
+
+
+def _error_event(message: str, code: int = None) -> typing.Tuple[str, dict]:
+    """an error in the target format"""
+    error_chunk = {
+        "error": {
+            "message": message,
+            "type": "api_error",
+        }
+    }
+    if code is not None:
+        error_chunk["error"]["code"] = code
+    return f"data: {json.dumps(error_chunk)}\n\n", error_chunk
+
+
 def request_stream_from_model(
     request: LLMApiRequest,
     context: CallingContext,
@@ -240,41 +299,11 @@ def request_stream_from_model(
     Returns:
         Generator yielding tuples of (raw_line_in_target_scheme, chunk_in_openai_scheme)
     """
-    from percolate.services.llm.LanguageModel import LanguageModel
-    
-    # Create background auditor and record the session
-    auditor = BackgroundAudit()
-    if context.session_id:
-        # Extract the last user message as the query
-        user_query = ""
-        for msg in request.messages:
-            if msg.get("role") == "user" and isinstance(msg.get("content"), str):
-                user_query = msg.get("content")
-        
-        # Audit the user session (only creates a Session record)
-        auditor.audit_user_session(
-            session_id=context.session_id,
-            user_id=context.username,
-            channel_id=context.channel_ts,
-            query=user_query
-        )
-    
     try:
-        # Get the LLM client to access model settings from the database
-        llm = LanguageModel(request.model)
-        params = llm.params
-        
-        # Ensure we're using the correct scheme
-        source_scheme = params.get('scheme', source_scheme)
-        
-        # Use the request model's method to prepare all request data
-        prepared_request = request.prepare_request_data(params, source_scheme)
-        api_data = prepared_request["api_data"]
-        api_url = prepared_request["api_url"]
-        headers = prepared_request["headers"]
+        source_scheme, api_url, headers, api_data = _prepare_model_request(request, context)
         
         # Make the API request
-        response = requests.post(
+        response = http_client.post(
             api_url,
             headers=headers,
             data=json.dumps(api_data),
@@ -291,17 +320,10 @@ def request_stream_from_model(
             except:
                 error_message = f"API error: {response.text}"
             
-            # Create an error message in the target format
-            error_chunk = {
-                "error": {
-                    "message": error_message,
-                    "type": "api_error",
-                    "code": response.status_code
-                }
-            }
             # Return a single-item generator with the error
+            event = _error_event(error_message, response.status_code)
             def error_generator():
-                yield f"data: {json.dumps(error_chunk)}\n\n", error_chunk
+                yield event
             return error_generator()
         
         # Return the stream generator directly
@@ -316,15 +338,10 @@ def request_stream_from_model(
     
     except Exception as e:
         logger.error(f"Error setting up stream from model: {e}")
-        error_chunk = {
-            "error": {
-                "message": f"Stream error: {str(e)}",
-                "type": "api_error",  # Changed from "stream_error" to "api_error" for test compatibility
-            }
-        }
         # Return a single-item generator with the error
+        event = _error_event(f"Stream error: {str(e)}")
         def error_generator():
-            yield f"data: {json.dumps(error_chunk)}\n\n", error_chunk
+            yield event
         return error_generator()
 
 
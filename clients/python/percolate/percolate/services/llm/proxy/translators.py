@@ -0,0 +1,358 @@
+"""
+Plain dict translators for streamed deltas between dialects.
+
+Converting a chunk with the pydantic stream models (e.g. `AnthropicStreamDelta(**chunk).to_openai_format()`) validates
+and builds a model per token. These functions produce the same dicts directly and are looked up once per stream
+
+```python
+to_openai = get_delta_translator('anthropic', 'openai')
+for chunk in chunks:
+    canonical = to_openai(chunk)
+```
+
+There are two canonical families
+- `get_delta_translator` - the proxy stream deltas (`StreamDelta.to_<scheme>_format`)
+- `to_completions_chunk` - the `/chat/completions` chunks (`StreamingCompletionsResponseChunk.map_to_canonical_format`)
+  which also carry the deprecated `text` and `tool_call` fields
+
+With P8_STREAM_DELTA_VALIDATION the pydantic models are used instead so malformed chunks are reported.
+"""
+
+import json
+import time
+import typing
+import uuid
+
+from percolate.utils.env import P8_STREAM_DELTA_VALIDATION
+
+Translator = typing.Callable[[dict], dict]
+
+
+def _identity(chunk: dict) -> dict:
+    return chunk
+
+
+def anthropic_to_openai(chunk: dict) -> dict:
+    """an Anthropic stream event as an OpenAI delta - see AnthropicStreamDelta.to_openai_format"""
+    now = int(time.time())
+    delta = {}
+    choice = {"index": 0, "delta": delta, "finish_reason": None}
+    event_type = chunk.get("type")
+    event_delta = chunk.get("delta")
+    if event_type == "content_block_delta":
+        if event_delta and event_delta.get("type") == "text_delta":
+            delta["content"] = event_delta.get("text", "")
+        elif event_delta and event_delta.get("type") == "input_json_delta":
+            delta["tool_calls"] = [{
+                "index": chunk.get("index") or 0,
+                "function": {"arguments": event_delta.get("partial_json", "")},
+            }]
+    elif event_type == "content_block_start":
+        block = chunk.get("content_block")
+        if block and block.get("type") == "tool_use":
+            delta["tool_calls"] = [{
+                "index": chunk.get("index") or 0,
+                "id": block.get("id", f"call_{str(uuid.uuid4())[:16]}"),
+                "type": "function",
+                "function": {"name": block.get("name", ""), "arguments": ""},
+            }]
+    elif event_type == "message_delta" and event_delta:
+        choice["finish_reason"] = event_delta.get("stop_reason")
+    return {
+        "id": f"chatcmpl-{now}",
+        "object": "chat.completion.chunk",
+        "created": now,
+        "model": "claude",
+        "choices": [choice],
+    }
+
+
+def google_to_openai(chunk: dict) -> dict:
+    """a Google stream chunk as an OpenAI delta - see GoogleStreamDelta.to_openai_format"""
+    now = int(time.time())
+    result = {
+        "id": f"chatcmpl-{now}",
+        "object": "chat.completion.chunk",
+        "created": now,
+        "model": "gemini",
+        "choices": [],
+    }
+    candidates = chunk.get("candidates")
+    if not candidates:
+        result["choices"] = [{"index": 0, "delta": {}, "finish_reason": None}]
+        return result
+
+    candidate = candidates[0]
+    delta = {}
+    content = candidate.get("content")
+    if content and "parts" in content:
+        parts = content["parts"]
+        text = [part["text"] for part in parts if "text" in part]
+        if text:
+            delta["content"] = "".join(text)
+        tool_calls = [
+            {
+                "index": i,
+                "id": f"call_{str(uuid.uuid4())[:16]}",
+                "type": "function",
+                "function": {
+                    "name": call.get("name", ""),
+                    "arguments": json.dumps(call.get("args", {})),
+                },
+            }
+            for i, call in enumerate(part["functionCall"] for part in parts if "functionCall" in part)
+        ]
+        if tool_calls:
+            delta["tool_calls"] = tool_calls
+    result["choices"].append({"index": 0, "delta": delta, "finish_reason": candidate.get("finishReason")})
+
+    usage = chunk.get("usageMetadata")
+    if usage:
+        result["usage"] = {
+            "prompt_tokens": usage.get("promptTokenCount", 0),
+            "completion_tokens": usage.get("candidatesTokenCount", 0),
+            "total_tokens": usage.get("totalTokenCount", 0),
+        }
+    return result
+
+
+def openai_to_anthropic(chunk: dict) -> dict:
+    """an OpenAI delta as an Anthropic stream event - see OpenAIStreamDelta.to_anthropic_format"""
+    choices = chunk.get("choices")
+    if not choices:
+        return {}
+    choice = choices[0]
+    delta = choice.get("delta", {})
+
+    if delta.get("content"):
+        return {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta["content"]}}
+
+    if delta.get("tool_calls"):
+        tool_call = delta["tool_calls"][0]
+        function = tool_call.get("function")
+        if function is not None:
+            if "name" in function:
+                return {
+                    "type": "content_block_start",
+                    "index": tool_call.get("index", 0),
+                    "content_block": {
+                        "type": "tool_use",
+                        "id": tool_call.get("id", f"toolu_{str(uuid.uuid4())[:16]}"),
+                        "name": function["name"],
+                        "input": {},
+                    },
+                }
+            if "arguments" in function:
+                return {
+                    "type": "content_block_delta",
+                    "index": tool_call.get("index", 0),
+                    "delta": {"type": "input_json_delta", "partial_json": function["arguments"]},
+                }
+
+    finish_reason = choice.get("finish_reason")
+    if finish_reason:
+        return {"type": "message_delta", "delta": {"stop_reason": finish_reason, "stop_sequence": None}}
+    return {"type": "content_block_delta", "delta": {}}
+
+
+def openai_to_google(chunk: dict) -> dict:
+    """an OpenAI delta as a Google stream chunk - see OpenAIStreamDelta.to_google_format"""
+    choices = chunk.get("choices")
+    if not choices:
+        return {}
+    choice = choices[0]
+    delta = choice.get("delta", {})
+    parts = []
+    result = {"candidates": [{"content": {"parts": parts, "role": "model"}, "finishReason": choice.get("finish_reason")}]}
+
+    if delta.get("content"):
+        parts.append({"text": delta["content"]})
+    elif delta.get("tool_calls"):
+        function = delta["tool_calls"][0].get("function")
+        if function is not None:
+            function_call = {"name": function.get("name", ""), "args": {}}
+            try:
+                function_call["args"] = json.loads(function.get("arguments", "{}"))
+            except json.JSONDecodeError:
+                """partial arguments can not be expressed - Google expects complete function calls"""
+                pass
+            parts.append({"functionCall": function_call})
+
+    usage = chunk.get("usage")
+    if usage:
+        result["usageMetadata"] = {
+            "promptTokenCount": usage.get("prompt_tokens", 0),
+            "candidatesTokenCount": usage.get("completion_tokens", 0),
+            "totalTokenCount": usage.get("total_tokens", 0),
+        }
+    return result
+
+
+DELTA_TRANSLATORS: typing.Dict[typing.Tuple[str, str], Translator] = {
+    ("openai", "openai"): _identity,
+    ("anthropic", "anthropic"): _identity,
+    ("google", "google"): _identity,
+    ("anthropic", "openai"): anthropic_to_openai,
+    ("google", "openai"): google_to_openai,
+    ("openai", "anthropic"): openai_to_anthropic,
+    ("openai", "google"): openai_to_google,
+    ("anthropic", "google"): lambda chunk: openai_to_google(anthropic_to_openai(chunk)),
+    ("google", "anthropic"): lambda chunk: openai_to_anthropic(google_to_openai(chunk)),
+}
+
+
+def _validated_translator(source: str, target: str) -> Translator:
+    """the pydantic stream models - slower but malformed chunks raise"""
+    from .models import OpenAIStreamDelta, AnthropicStreamDelta, GoogleStreamDelta
+
+    models = {"openai": OpenAIStreamDelta, "anthropic": AnthropicStreamDelta, "google": GoogleStreamDelta}
+
+    def translate(chunk: dict) -> dict:
+        delta = models[source](**chunk)
+        if source == target:
+            return chunk
+        return getattr(delta, f"to_{target}_format")()
+
+    return translate
+
+
+def get_delta_translator(source: str, target: str, validate: bool = None) -> Translator:
+    """the translator of stream deltas from the source to the target dialect - unknown dialects pass through"""
+    validate = P8_STREAM_DELTA_VALIDATION if validate is None else validate
+    if (source, target) not in DELTA_TRANSLATORS:
+        return _identity
+    if validate:
+        return _validated_translator(source, target)
+    return DELTA_TRANSLATORS[(source, target)]
+
+
+def translate_delta(chunk: dict, source: str, target: str) -> dict:
+    return get_delta_translator(source, target)(chunk)
+
+
+def _completions_chunk(chunk_id: str, model: str, content, tool_calls, finish_reason) -> dict:
+    tool_call = None
+    if tool_calls:
+        first = tool_calls[0]
+        tool_call = {"name": first["function"]["name"], "arguments": first["function"]["arguments"], "id": first["id"]}
+    return {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "delta": {"content": content, "tool_calls": tool_calls},
+            "text": content or None,
+            "logprobs": None,
+            "finish_reason": finish_reason,
+            "tool_call": tool_call,
+        }],
+    }
+
+
+def anthropic_to_completions_chunk(chunk: dict, model: str) -> dict:
+    """see StreamingCompletionsResponseChunk.from_anthropic_chunk"""
+    content, tool_calls = None, None
+    event_type = chunk.get("type")
+    if event_type == "content_block_delta":
+        event_delta = chunk.get("delta", {})
+        delta_type = event_delta.get("type")
+        if delta_type == "text_delta":
+            content = event_delta.get("text", "")
+        elif delta_type == "input_json_delta" and event_delta.get("partial_json"):
+            tool_calls = [{
+                "index": 0,
+                "id": f"tool_{int(time.time())}",
+                "type": "function",
+                "function": {"name": "unknown_tool", "arguments": event_delta.get("partial_json")},
+            }]
+        elif delta_type == "tool_use":
+            tool_calls = [{
+                "index": 0,
+                "id": event_delta.get("id", f"tool_{int(time.time())}"),
+                "type": "function",
+                "function": {"name": event_delta.get("name", ""), "arguments": event_delta.get("partial_json", "{}")},
+            }]
+    elif event_type == "content_block_start":
+        block = chunk.get("content_block", {})
+        if block.get("type") == "tool_use":
+            tool_calls = [{
+                "index": 0,
+                "id": block.get("id", f"tool_{int(time.time())}"),
+                "type": "function",
+                "function": {"name": block.get("name", ""), "arguments": ""},
+            }]
+    return _completions_chunk(
+        chunk.get("id", f"cmpl-{int(time.time())}"),
+        model,
+        content,
+        tool_calls,
+        chunk.get("delta", {}).get("stop_reason"),
+    )
+
+
+def google_to_completions_chunk(chunk: dict, model: str) -> dict:
+    """see StreamingCompletionsResponseChunk.from_google_chunk"""
+    content, tool_calls, finish_reason = None, None, None
+    if chunk.get("candidates"):
+        candidate = chunk["candidates"][0]
+        finish_reason = candidate.get("finishReason")
+        if "content" in candidate and "parts" in candidate["content"]:
+            for part in candidate["content"]["parts"]:
+                if "text" in part:
+                    content = part.get("text", "")
+                elif "functionCall" in part:
+                    call = part["functionCall"]
+                    tool_calls = tool_calls or []
+                    tool_calls.append({
+                        "index": 0,
+                        "id": f"tool_{int(time.time())}",
+                        "type": "function",
+                        "function": {"name": call.get("name", ""), "arguments": json.dumps(call.get("args", {}))},
+                    })
+    return _completions_chunk(f"cmpl-{int(time.time())}", model, content, tool_calls, finish_reason)
+
+
+def openai_to_completions_chunk(chunk: dict, model: str) -> dict:
+    """see StreamingCompletionsResponseChunk.map_openai_delta_to_canonical - delta chunks are returned as is"""
+    choices = chunk.get("choices")
+    if choices and "delta" in choices[0]:
+        return chunk
+    result = {
+        "id": chunk.get("id", f"cmpl-{int(time.time())}"),
+        "object": "chat.completion.chunk",
+        "created": chunk.get("created", int(time.time())),
+        "model": model or chunk.get("model", "unknown"),
+        "choices": [],
+    }
+    for i, choice in enumerate(choices or []):
+        delta = {}
+        if choice.get("text"):
+            delta["content"] = choice["text"]
+        if choice.get("tool_call"):
+            tool_call = choice["tool_call"]
+            delta["tool_calls"] = [{
+                "index": 0,
+                "id": tool_call.get("id", f"tool_{int(time.time())}"),
+                "type": "function",
+                "function": {"name": tool_call.get("name", ""), "arguments": tool_call.get("arguments", "")},
+            }]
+        result["choices"].append({"index": i, "delta": delta, "finish_reason": choice.get("finish_reason")})
+    return result
+
+
+COMPLETIONS_CHUNK_TRANSLATORS: typing.Dict[str, typing.Callable[[dict, str], dict]] = {
+    "anthropic": anthropic_to_completions_chunk,
+    "google": google_to_completions_chunk,
+    "openai": openai_to_completions_chunk,
+}
+
+
+def to_completions_chunk(chunk: dict, dialect: str, model: str) -> dict:
+    """a provider chunk as a canonical `/chat/completions` chunk"""
+    if P8_STREAM_DELTA_VALIDATION:
+        from percolate.api.routes.chat.models import StreamingCompletionsResponseChunk
+
+        return StreamingCompletionsResponseChunk.map_to_canonical_format(chunk, dialect, model)
+    return COMPLETIONS_CHUNK_TRANSLATORS.get(dialect, openai_to_completions_chunk)(chunk, model)
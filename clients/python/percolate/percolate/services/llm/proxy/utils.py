@@ -8,7 +8,6 @@ This module contains utility classes and functions for:
 """
 
 import json
-import threading
 import typing
 import uuid
 import time
@@ -21,8 +20,8 @@ class BackgroundAudit:
     """
     Background audit processor for AIResponse records.
     
-    This sends AIResponse audit records on a background thread to avoid blocking
-    the user stream. Used by higher level classes that construct their own AIResponse
+    Records are handed to the process-wide batched writer (`percolate.services.AuditWriter.audit_writer`)
+    so the user stream never waits on the database. Used by higher level classes that construct their own AIResponse
     turns consisting of both tool calls from the LLM and local evaluation data.
     
     This auditor is designed to make streaming efficient while supporting full 
@@ -30,11 +29,9 @@ class BackgroundAudit:
     """
     
     def __init__(self):
-        """Initialize the background auditor."""
-        self._queue = []
-        self._lock = threading.Lock()
-        self._thread = None
-        self._stop_event = threading.Event()
+        """Initialize the background auditor - instances share the process audit writer."""
+        from percolate.services.AuditWriter import audit_writer
+        self._writer = audit_writer
     
     def add_response(self, response: AIResponse) -> None:
         """
@@ -43,10 +40,7 @@ class BackgroundAudit:
         Args:
             response: The AIResponse to audit
         """
-        with self._lock:
-            self._queue.append(("ai_response", response))
-            if not self._thread or not self._thread.is_alive():
-                self._start_worker()
+        self._writer.submit(response, AIResponse)
     
     def add_session(self, session_data: dict) -> None:
         """
@@ -55,58 +49,17 @@ class BackgroundAudit:
         Args:
             session_data: The session data to audit
         """
-        with self._lock:
-            self._queue.append(("session", session_data))
-            if not self._thread or not self._thread.is_alive():
-                self._start_worker()
+        if isinstance(session_data, dict):
+            # typed here so that one bad record does not fail the batch it is written with
+            data = dict(session_data)
+            if data.get('user_id') and not data.get('userid'):
+                data['userid'] = data['user_id']
+            session_data = Session(**{k: v for k, v in data.items() if k in Session.model_fields and v is not None})
+        self._writer.submit(session_data, Session)
     
-    def _start_worker(self) -> None:
-        """Start the background worker thread."""
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._process_queue, daemon=True)
-        self._thread.start()
-    
-    def _process_queue(self) -> None:
-        """Process the queue of audit records."""
-        
-        while not self._stop_event.is_set():
-            with self._lock:
-                if not self._queue:
-                    break
-                records = self._queue.copy()
-                self._queue.clear()
-            
-            try:
-                ai_responses = []
-                session_records = []
-                
-                # Separate records by type
-                for record_type, record in records:
-                    if record_type == "ai_response":
-                        ai_responses.append(record)
-                    elif record_type == "session":
-                        session_records.append(record)
-                
-                # Process AI responses
-                if ai_responses:
-                    p8.repository(AIResponse).update_records(ai_responses)
-                    logger.debug(f"Audited {len(ai_responses)} AIResponse records")
-                
-                # Process sessions
-                if session_records:
-                    p8.repository(Session).update_records(session_records)
-                    logger.debug(f"Audited {len(session_records)} Session records")
-            except Exception as e:
-                logger.error(f"Error processing audit queue: {e}")
-            
-            # Small sleep to avoid tight loop
-            time.sleep(0.1)
-    
-    def stop(self) -> None:
-        """Stop the background worker thread."""
-        self._stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=2.0)
+    def stop(self, timeout: float = 2.0) -> None:
+        """Wait (up to the timeout) for the queued records to be written - the shared writer keeps running."""
+        self._writer.flush(timeout=timeout)
     
     
     def flush_ai_response_audit(
@@ -258,6 +211,8 @@ def audit_response_for_user(response, context, query: str = None):
     with LLMStreamIterator or similar response objects that have been collected
     into a complete response.
     
+    The audit is queued on the process audit writer so the end of the user stream does not wait for the database.
+    
     Args:
         response: The complete response object with content and usage information
         context: The CallingContext object containing user information
@@ -267,33 +222,9 @@ def audit_response_for_user(response, context, query: str = None):
         None
     """
     try:
-        from percolate.models import Session, User, AIResponse
-        from percolate.utils import make_uuid, logger
-        import percolate as p8
+        from percolate.services.AuditWriter import audit_writer
         
-        # Extract user information from context
-        user_id = None
-        if context.user_id:
-            user_id = context.user_id
-        elif context.username:
-            # Try to resolve username to user_id
-            if '@' in context.username:
-                # Treat as email and hash it
-                user_id = make_uuid(context.username.lower())
-            else:
-                # Try to lookup the user by username or ID
-                try:
-                    query_id_or_email = "SELECT * FROM p8.\"User\" WHERE id::TEXT = %s OR email = %s"
-                    user_result = p8.repository(User).execute(
-                        query_id_or_email, 
-                        data=(context.username, context.username)
-                    )
-                    if user_result:
-                        user_id = user_result[0]['id']
-                except Exception as e:
-                    logger.warning(f"Failed to lookup user by username: {e}")
-        
-        # Get response content and session information
+        # Get response content and session information while the response is still at hand
         content = getattr(response, 'content', str(response))
         
         # Make sure we have a valid session_id
@@ -304,49 +235,78 @@ def audit_response_for_user(response, context, query: str = None):
             session_id = str(uuid.uuid4())
             logger.debug(f"Generated new session_id for audit: {session_id}")
         
-        # Prepare metadata
-        channel_ts = getattr(context, 'channel_ts', None) if context else None
-        thread_id = getattr(context, 'session_id', None) if context else None
-        
-        metadata = {
-            'userid': user_id,
-            'channel_id': channel_ts,
-            'thread_id': thread_id,
-            'query': query or (getattr(context, 'plan', '') if context else '')
-        }
-        
-        # Audit Session
-        try:
-            session = Session(id=session_id, **metadata)
-            p8.repository(Session).update_records(session)
-            logger.info(f"Audited session: {session_id} for metadata {metadata}")
-        except Exception as e:
-            logger.warning(f"Problem with audit session: {e}")
-        
-        # Update user model if we have a user ID
-        if user_id:
+        ai_responses = list(getattr(response, 'ai_responses', None) or [])
+        audit_writer.submit_task(_audit_response_for_user, content, session_id, ai_responses, context, query)
+    except Exception as e:
+        logger.error(f"Error in audit_response_for_user: {e}")
+
+
+def _audit_response_for_user(content, session_id: str, ai_responses: list, context, query: str = None):
+    """
+    the work of `audit_response_for_user` on the audit writer thread - the Session and AIResponse records are
+    returned to the writer for its current batch
+    """
+    from percolate.models import User
+    from percolate.utils import make_uuid
+    
+    # Extract user information from context
+    user_id = None
+    if context.user_id:
+        user_id = context.user_id
+    elif context.username:
+        # Try to resolve username to user_id
+        if '@' in context.username:
+            # Treat as email and hash it
+            user_id = make_uuid(context.username.lower())
+        else:
+            # Try to lookup the user by username or ID
             try:
-                # Get the response content for user model update
-                response_content = str(content)
-                p8.repository(User).execute(
-                    'SELECT * FROM p8.update_user_model(%s, %s)', 
-                    data=(user_id, response_content)
+                query_id_or_email = "SELECT * FROM p8.\"User\" WHERE id::TEXT = %s OR email = %s"
+                user_result = p8.repository(User).execute(
+                    query_id_or_email, 
+                    data=(context.username, context.username)
                 )
-                logger.info(f"Updated user model for: {user_id}")
+                if user_result:
+                    user_id = user_result[0]['id']
             except Exception as e:
-                logger.warning(f"Problem updating user model: {e}")
-        else:
-            logger.warning("No user ID available for user model update")
-        
-        # Audit AI responses if present
+                logger.warning(f"Failed to lookup user by username: {e}")
+    
+    # Prepare metadata
+    channel_ts = getattr(context, 'channel_ts', None) if context else None
+    thread_id = getattr(context, 'session_id', None) if context else None
+    
+    metadata = {
+        'userid': user_id,
+        'channel_id': channel_ts,
+        'thread_id': thread_id,
+        'query': query or (getattr(context, 'plan', '') if context else '')
+    }
+    
+    # Audit Session
+    records = []
+    try:
+        records.append((Session, Session(id=session_id, **metadata)))
+        logger.info(f"Audited session: {session_id} for metadata {metadata}")
+    except Exception as e:
+        logger.warning(f"Problem with audit session: {e}")
+    
+    # Update user model if we have a user ID
+    if user_id:
         try:
-            if hasattr(response, 'ai_responses') and response.ai_responses:
-                p8.repository(AIResponse).update_records(response.ai_responses)
-                logger.debug(f"Added {len(response.ai_responses)} AI Response records")
+            # Get the response content for user model update
+            response_content = str(content)
+            p8.repository(User).execute(
+                'SELECT * FROM p8.update_user_model(%s, %s)', 
+                data=(user_id, response_content)
+            )
+            logger.info(f"Updated user model for: {user_id}")
         except Exception as e:
-            logger.warning(f"Problem with AI response audit: {e}")
+            logger.warning(f"Problem updating user model: {e}")
+    else:
+        logger.warning("No user ID available for user model update")
     
-    except Exception as e:
-        logger.error(f"Error in audit_response_for_user: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
\ No newline at end of file
+    # Audit AI responses if present
+    if ai_responses:
+        records.append((AIResponse, ai_responses))
+        logger.debug(f"Added {len(ai_responses)} AI Response records")
+    return records
@@ -7,6 +7,7 @@ with the new proxy module.
 """
 
 import requests
+from percolate.utils import http_client
 import json
 import os
 import base64
@@ -71,7 +72,7 @@ def audio_to_text(
     }
 
     endpoint = "https://api.openai.com/v1/audio/transcriptions"
-    response = requests.post(endpoint, headers=headers, files=files)
+    response = http_client.post(endpoint, headers=headers, files=files)
 
     # Raise for HTTP errors
     try:
@@ -312,7 +313,7 @@ def request_openai(messages,functions):
         "tools": functions
     }
     
-    return requests.post(url, headers=headers, data=json.dumps(data))
+    return http_client.post(url, headers=headers, data=json.dumps(data))
 
  
 def request_anthropic(messages, functions):
@@ -335,7 +336,7 @@ def request_anthropic(messages, functions):
     if system_prompt:
         data['system'] = '\n'.join( item['content'][0]['text'] for item in system_prompt )
     
-    return requests.post(url, headers=headers, data=json.dumps(data))
+    return http_client.post(url, headers=headers, data=json.dumps(data))
 
 def request_google(messages, functions):
     """
@@ -374,7 +375,7 @@ def request_google(messages, functions):
             {"tools": functions}
         )
     
-    return requests.post(url, headers=headers, data=json.dumps(data))
+    return http_client.post(url, headers=headers, data=json.dumps(data))
 
 
 def sse_openai_compatible_stream_with_tool_call_collapse(response) -> typing.Generator[typing.Tuple[str, dict], None, None]:
@@ -495,6 +496,127 @@ def sse_openai_compatible_stream_with_tool_call_collapse(response) -> typing.Gen
             yield line, chunk
 
  
+class SSEStreamAggregator:
+    """
+    Aggregates an OpenAI style stream in one pass - each SSE line (str or bytes) or chunk dict is parsed once with `feed`.
+
+    - content deltas are collected in a list and joined once when `content` is read
+    - tool call deltas are collapsed by index as they arrive (arguments are also joined when read)
+    - bytes lines are decoded by json.loads without an intermediate str
+    """
+
+    def __init__(self):
+        self._parts: typing.List[str] = []
+        self._joined = ""
+        self._joined_count = 0
+        self._tool_calls: typing.Dict[int, dict] = {}
+        self._arguments: typing.Dict[int, typing.List[str]] = {}
+        self.usage: dict = {}
+        self.finish_reason: str = None
+        self.done = False
+
+    @staticmethod
+    def parse(item) -> typing.Optional[dict]:
+        """the json payload of an SSE data line (str or bytes) or the chunk dict - None for [DONE] and other lines"""
+        if isinstance(item, dict):
+            return item
+        if isinstance(item, (bytes, bytearray)):
+            item = item.strip()
+            if not item.startswith(b"data:"):
+                return None
+            payload = item[5:].lstrip()
+            if payload == b"[DONE]":
+                return None
+        elif isinstance(item, str):
+            item = item.strip()
+            if not item.startswith("data:"):
+                return None
+            payload = item[5:].lstrip()
+            if payload == "[DONE]":
+                return None
+        else:
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def is_done(item) -> bool:
+        if isinstance(item, (bytes, bytearray)):
+            return item.strip() == b"data: [DONE]"
+        return isinstance(item, str) and item.strip() == "data: [DONE]"
+
+    def feed(self, item) -> typing.Optional[dict]:
+        """parse and aggregate one SSE line or chunk and return the chunk"""
+        data = self.parse(item)
+        if data is None:
+            if self.is_done(item):
+                self.done = True
+            return None
+        self.add(data)
+        return data
+
+    def add(self, data: dict):
+        """aggregate a parsed chunk"""
+        if data.get("usage"):
+            self.usage = data["usage"]
+        for choice in data.get("choices") or []:
+            delta = choice.get("delta") or {}
+            content = delta.get("content")
+            if content:
+                self._parts.append(content)
+            for tool_call in delta.get("tool_calls") or []:
+                self._add_tool_call(tool_call)
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+
+    def _add_tool_call(self, tool_call: dict):
+        index = tool_call.get("index", len(self._tool_calls))
+        function = tool_call.get("function") or {}
+        existing = self._tool_calls.get(index)
+        if tool_call.get("id") and (existing is None or existing["id"] != tool_call["id"]):
+            self._tool_calls[index] = {
+                "id": tool_call["id"],
+                "type": tool_call.get("type", "function"),
+                "function": {"name": function.get("name")},
+            }
+            self._arguments[index] = [function.get("arguments") or ""]
+        elif tool_call.get("id"):
+            """a collapsed tool call repeats the call with all of the arguments"""
+            self._arguments[index] = [function.get("arguments") or ""]
+        elif existing is not None:
+            self._arguments[index].append(function.get("arguments") or "")
+
+    @property
+    def content(self) -> str:
+        if self._joined_count != len(self._parts):
+            self._joined = "".join(self._parts)
+            self._joined_count = len(self._parts)
+        return self._joined
+
+    @property
+    def tool_calls(self) -> typing.List[dict]:
+        return [
+            {**t, "function": {**t["function"], "arguments": "".join(self._arguments[i])}}
+            for i, t in sorted(self._tool_calls.items())
+        ]
+
+
+def _function_status_event(function_name: str) -> bytes:
+    """a content delta telling the user that a function is being used"""
+    status_delta = {
+        "id": str(uuid.uuid4()),
+        "object": "chat.completion.chunk",
+        "choices": [{
+            "index": 0,
+            "delta": {"content": f"\n\n🔍 Using function: `{function_name}` to answer your question...\n\n"},
+            "finish_reason": None
+        }]
+    }
+    return f'data: {json.dumps(status_delta)}\n\n'.encode('utf-8')
+
+
 class LLMStreamIterator:
     """
     Wraps a streaming generator of LLM responses to:
@@ -504,6 +626,8 @@ class LLMStreamIterator:
     - Collect AIResponse objects for each tool call response in the .ai_responses list, for auditing.
     - Optionally audit the entire response when stream is finished using the audit_on_flush flag.
 
+    Each line is parsed once by an SSEStreamAggregator so long answers are aggregated in linear time.
+
     Attributes:
         ai_responses (List[AIResponse]): Captured AIResponse objects from tool call executions.
         content (str): Full aggregated content sent to the user; available after iter_lines() is fully consumed.
@@ -516,12 +640,10 @@ class LLMStreamIterator:
         self.user_query = user_query
         self.ai_responses = []
         self._is_consumed = False
-        self._content = ""
+        self._aggregator = SSEStreamAggregator()
         self.scheme = scheme
         self.context = context
         self.audit_on_flush = audit_on_flush
-        # Holds LLM token usage from the final SSE chunk (prompt, completion, total)
-        self._usage = {}
         # Tool calls collected during streaming
         self._tool_calls = []
         # Tool responses collected during streaming
@@ -537,7 +659,6 @@ class LLMStreamIterator:
         and other clients that expect this marker to detect the end of the stream.
         """
         self._is_consumed = False
-        done_marker_seen = False
         finish_reason_seen = False
         
         try:
@@ -546,103 +667,23 @@ class LLMStreamIterator:
             yield b'data: {"id":"init","object":"chat.completion.chunk","choices":[{"index":0,"delta":{"content":""},"finish_reason":null}]}\n\n'
             
             for item in self.g():
-                # Check if this is a [DONE] marker
-                if isinstance(item, str) and item.strip() == 'data: [DONE]':
-                    done_marker_seen = True
-                
-                # Collect the tool call responses and emit status messages about them
+                # Collect the tool call responses for auditing - they are not sent to the client
                 if isinstance(item, AIResponse):
                     self.ai_responses.append(item)
-                    
-                    # Debug log to understand what's in the AIResponse
-                    logger.debug(f"AIResponse received: {type(item)}")
-                    if hasattr(item, 'tool_calls'):
-                        logger.debug(f"tool_calls: {item.tool_calls}")
-                    if hasattr(item, 'status'):
-                        logger.debug(f"status: {item.status}")
-                    if hasattr(item, 'content'):
-                        logger.debug(f"content preview: {item.content[:100] if item.content else 'None'}")
-                    
-                    # Function calls are now detected much earlier in the stream process
-                    # We still need to yield the AIResponse for auditing, but we don't need to send
-                    # another status message to the client since we already sent one
+                    logger.debug(f"AIResponse received: status={item.status} tool_calls={item.tool_calls}")
                     continue
                     
                 try:
-                    for piece in _parse_open_ai_response(item):
-                        self._content += piece
-                    
-                    # Try to extract tool calls and finish reason
-                    try:
-                        if isinstance(item, str):
-                            try:
-                                data = json.loads(item[6:])
-                            except:
-                                # If this is the [DONE] marker, continue
-                                if item.strip() == 'data: [DONE]':
-                                    done_marker_seen = True
-                                    continue
-                                data = None
-                        else:
-                            data = item
-                        
-                        if not data:
-                            continue
-                            
-                        # Extract usage information
-                        if "usage" in data:
-                            self._usage = data["usage"]
-                        
-                        # Extract tool calls and check for finish_reason
-                        if "choices" in data and data["choices"]:
-                            choice = data["choices"][0]
-                            
-                            # Check if we've seen a finish_reason
-                            if choice.get("finish_reason"):
-                                finish_reason_seen = True
-                                
-                            if choice.get("finish_reason") == "tool_calls":
-                                delta = choice.get("delta", {})
-                                if "tool_calls" in delta:
-                                    for tool_call in delta["tool_calls"]:
-                                        if "id" in tool_call:
-                                            self._tool_calls.append(tool_call)
-                                            
-                                            # Get function name
-                                            function_name = tool_call.get("function", {}).get("name", "unknown_function")
-                                            
-                                            # Instead of status event, send a normal content delta with a message
-                                            # This will be visible to the user in OpenWebUI
-                                            status_delta = {
-                                                "id": str(uuid.uuid4()),
-                                                "object": "chat.completion.chunk",
-                                                "choices": [{
-                                                    "index": 0,
-                                                    "delta": {"content": f"\n\n🔍 Using function: `{function_name}` to answer your question...\n\n"},
-                                                    "finish_reason": None
-                                                }]
-                                            }
-                                            
-                                            # Comment out the original status event code for potential future use
-                                            # ---------------------------------------------------------
-                                            # # First send a newline to flush any previous data
-                                            # yield "\n", {"status": "flush"}
-                                            # 
-                                            # # Then send the actual status message
-                                            # status_message = {
-                                            #     "status": f"Preparing to call function: {function_name}...",
-                                            #     # Add a timestamp to ensure clients recognize this as a new message
-                                            #     "timestamp": time.time()
-                                            # }
-                                            # # Ensure status_event is a properly formatted string (not bytes)
-                                            # status_event = f'data: {json.dumps(status_message)}\n\n'
-                                            # yield status_event, {"status": "function_call_started"}
-                                            # ---------------------------------------------------------
-                                            
-                                            # Send the content delta instead
-                                            yield f'data: {json.dumps(status_delta)}\n\n'.encode('utf-8')
-                    except Exception:
-                        pass
+                    data = self._aggregator.feed(item)
+                    choice = data["choices"][0] if data and data.get("choices") else {}
+                    if choice.get("finish_reason"):
+                        finish_reason_seen = True
+                    if choice.get("finish_reason") == "tool_calls":
+                        for tool_call in (choice.get("delta") or {}).get("tool_calls") or []:
+                            if "id" in tool_call:
+                                self._tool_calls.append(tool_call)
+                                # a normal content delta so the message is visible to the user in OpenWebUI
+                                yield _function_status_event(tool_call.get("function", {}).get("name", "unknown_function"))
                 except Exception:
                     pass
                 
@@ -665,7 +706,7 @@ class LLMStreamIterator:
                 
             # Always send a [DONE] marker at the end if we haven't seen one yet
             # This ensures OpenWebUI knows the stream is complete
-            if not done_marker_seen:
+            if not self._aggregator.done:
                 done_marker = 'data: [DONE]\n\n'
                 yield done_marker.encode('utf-8')
             
@@ -682,7 +723,7 @@ class LLMStreamIterator:
             from percolate.services.llm.proxy.utils import audit_response_for_user
             import uuid
             
-            logger.info(f"Auditing stream response, content length: {len(self._content)}")
+            logger.info(f"Auditing stream response, content length: {len(self._aggregator.content)}")
             
             # Make sure context has a session_id
             if self.context and not getattr(self.context, 'session_id', None):
@@ -715,7 +756,7 @@ class LLMStreamIterator:
         """this is a collector for use by auditing tools"""
         if not self._is_consumed:
             raise Exception(f"You are trying to read content from an unconsumed iterator - you must iterate iter_lines first")
-        return self._content
+        return self._aggregator.content
     
     @property
     def usage(self):
@@ -725,7 +766,7 @@ class LLMStreamIterator:
         """
         if not self._is_consumed:
             raise Exception("You must fully consume iter_lines() before accessing usage")
-        return self._usage
+        return self._aggregator.usage
     
     
 def _parse_open_ai_response(json_data):
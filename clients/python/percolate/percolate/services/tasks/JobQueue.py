@@ -0,0 +1,471 @@
+"""
+A durable job queue in Postgres (p8.Job) and the worker pools that run it.
+
+Long agent runs, research iterations and indexing used to run as FastAPI background tasks in the API process. Jobs are
+rows in p8."Job" instead and `p8 worker` processes claim them with `FOR UPDATE SKIP LOCKED` so any number of workers
+can share a queue without running a job twice.
+
+```python
+from percolate.services.tasks import JobQueue
+job = JobQueue().enqueue("agent.run", {"agent": "p8-PercolateAgent", "question": "..."})
+JobQueue().get(job.id).status
+```
+
+- handlers are registered by name with `@job_handler("name")` and receive the payload as keyword arguments
+- a failed job is queued again after P8_JOB_RETRY_BACKOFF seconds (doubled per attempt) until `max_attempts`
+- workers renew the lease (`locked_at`) of their running jobs - a job whose lease is not renewed within
+  P8_JOB_LEASE_SECONDS is assumed lost with its worker and queued again, and the lost worker can no longer settle it
+- the handler result (a dict, a pydantic model or any json value) is stored on the job for polling
+
+Worker pools run the jobs of one queue on threads or, for cpu bound work, processes (handlers are looked up by name in
+the child so they must be registered when this module or the module defining them is imported).
+"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import typing
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from pydantic import BaseModel
+
+import percolate as p8
+from percolate.models.p8 import Job, JobStatus
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_JOB_POLL_INTERVAL,
+    P8_JOB_MAX_ATTEMPTS,
+    P8_JOB_RETRY_BACKOFF,
+    P8_JOB_LEASE_SECONDS,
+)
+
+_handlers: typing.Dict[str, typing.Callable[..., typing.Any]] = {}
+
+FINAL_STATUSES = (JobStatus.Completed.value, JobStatus.Failed.value)
+
+"""seconds between saves of the answers of a running agent.batch job"""
+BATCH_PROGRESS_INTERVAL = 5.0
+
+
+def job_handler(name: str):
+    """register the decorated function as the handler of jobs with this name"""
+
+    def decorator(fn):
+        _handlers[name] = fn
+        return fn
+
+    return decorator
+
+
+def get_handler(name: str) -> typing.Callable[..., typing.Any]:
+    if name not in _handlers:
+        raise KeyError(f"There is no job handler named {name} - registered handlers are {sorted(_handlers)}")
+    return _handlers[name]
+
+
+def execute_job(name: str, payload: dict) -> typing.Any:
+    """run the handler - a module level function so that it can be sent to a process pool"""
+    result = get_handler(name)(**(payload or {}))
+    if isinstance(result, BaseModel):
+        result = result.model_dump(mode="json")
+    return result
+
+
+def retry_delay(attempts: int, backoff: float = P8_JOB_RETRY_BACKOFF) -> float:
+    """seconds to wait before the next attempt after `attempts` failed ones"""
+    return backoff * 2 ** max(0, attempts - 1)
+
+
+def _as_result(result: typing.Any) -> typing.Optional[dict]:
+    if result is None or isinstance(result, dict):
+        return result
+    return {"value": result}
+
+
+class JobQueue:
+    """enqueue, claim and settle jobs in p8."Job" - see the module docs"""
+
+    def __init__(self, service=None):
+        self.repo = service or p8.repository(Job)
+
+    def enqueue(
+        self,
+        name: str,
+        payload: dict = None,
+        queue: str = "default",
+        max_attempts: int = P8_JOB_MAX_ATTEMPTS,
+        delay_seconds: float = 0,
+        userid: str = None,
+        id: str = None,
+    ) -> Job:
+        """queue a job for the named handler - it may be claimed after the delay"""
+        run_at = None
+        if delay_seconds:
+            """due times are computed on the database clock which claims compare them with"""
+            run_at = self.repo.execute(
+                "SELECT (CURRENT_TIMESTAMP + make_interval(secs => %s))::timestamp AS run_at", data=(delay_seconds,)
+            )[0]["run_at"]
+        job = Job(
+            id=id,
+            name=name,
+            queue=queue,
+            payload=payload or {},
+            max_attempts=max_attempts,
+            userid=userid,
+            run_at=run_at,
+        )
+        self.repo.update_records(job)
+        return job
+
+    def get(self, job_id: str) -> typing.Optional[Job]:
+        data = self.repo.execute('SELECT * FROM p8."Job" WHERE id = %s', data=(str(job_id),))
+        return Job(**data[0]) if data else None
+
+    def claim(self, queue: str, worker_id: str, limit: int = 1) -> typing.List[Job]:
+        """lock up to `limit` due jobs of the queue for this worker - concurrent workers skip each others rows"""
+        data = self.repo.execute(
+            """UPDATE p8."Job" j SET status = %s, attempts = j.attempts + 1, locked_by = %s, locked_at = CURRENT_TIMESTAMP
+                WHERE j.id IN (
+                    SELECT id FROM p8."Job"
+                    WHERE queue = %s AND status = %s AND COALESCE(run_at, created_at) <= CURRENT_TIMESTAMP
+                    ORDER BY COALESCE(run_at, created_at)
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT %s
+                )
+                RETURNING j.*""",
+            data=(JobStatus.Running.value, worker_id, queue, JobStatus.Queued.value, limit),
+        )
+        return [Job(**d) for d in data or []]
+
+    def renew(self, job_ids: typing.List[str], worker_id: str) -> int:
+        """extend the lease of the jobs this worker is running - returns the number still held"""
+        if not job_ids:
+            return 0
+        data = self.repo.execute(
+            """UPDATE p8."Job" SET locked_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s::uuid[]) AND locked_by = %s AND status = %s RETURNING id""",
+            data=([str(i) for i in job_ids], worker_id, JobStatus.Running.value),
+        )
+        return len(data or [])
+
+    def save_progress(self, job_id: str, result: typing.Any):
+        """store partial results on a running job - they are kept if the job fails so a retry can resume from them"""
+        self.repo.execute(
+            """UPDATE p8."Job" SET result = %s WHERE id = %s AND status = %s""",
+            data=(json.dumps(_as_result(result), default=str), str(job_id), JobStatus.Running.value),
+        )
+
+    def complete(self, job: Job, result: typing.Any = None) -> bool:
+        """store the result - False if the job is no longer held by its worker (the lease expired and it was requeued)"""
+        data = self.repo.execute(
+            """UPDATE p8."Job" SET status = %s, result = %s, error = NULL, locked_by = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND locked_by = %s AND status = %s RETURNING id""",
+            data=(
+                JobStatus.Completed.value,
+                json.dumps(_as_result(result), default=str),
+                str(job.id),
+                job.locked_by,
+                JobStatus.Running.value,
+            ),
+        )
+        return bool(data)
+
+    def fail(self, job: Job, error: str) -> typing.Optional[bool]:
+        """
+        queue the job again with backoff or mark it failed after its last attempt - True if it will be retried.
+        None if the job is no longer held by its worker (the lease expired and it was requeued)
+        """
+        if job.attempts < job.max_attempts:
+            data = self.repo.execute(
+                """UPDATE p8."Job" SET status = %s, error = %s, locked_by = NULL,
+                    run_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                    WHERE id = %s AND locked_by = %s AND status = %s RETURNING id""",
+                data=(
+                    JobStatus.Queued.value,
+                    error,
+                    retry_delay(job.attempts),
+                    str(job.id),
+                    job.locked_by,
+                    JobStatus.Running.value,
+                ),
+            )
+            return True if data else None
+        data = self.repo.execute(
+            """UPDATE p8."Job" SET status = %s, error = %s, locked_by = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND locked_by = %s AND status = %s RETURNING id""",
+            data=(JobStatus.Failed.value, error, str(job.id), job.locked_by, JobStatus.Running.value),
+        )
+        return False if data else None
+
+    def requeue_stale(self, queue: str, lease_seconds: int = P8_JOB_LEASE_SECONDS) -> int:
+        """queue again (or fail after the last attempt) the running jobs whose worker has not settled them within the lease"""
+        data = self.repo.execute(
+            """UPDATE p8."Job" SET locked_by = NULL,
+                    status = CASE WHEN attempts >= max_attempts THEN %s ELSE %s END,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END,
+                    error = COALESCE(error, 'the worker was lost')
+                WHERE queue = %s AND status = %s AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                RETURNING id""",
+            data=(JobStatus.Failed.value, JobStatus.Queued.value, queue, JobStatus.Running.value, lease_seconds),
+        )
+        return len(data or [])
+
+
+class WorkerPool:
+    """claims the jobs of one queue and runs them on a thread or process pool"""
+
+    def __init__(
+        self,
+        queue: str = "default",
+        concurrency: int = 4,
+        mode: str = "thread",
+        job_queue: JobQueue = None,
+        poll_interval: float = P8_JOB_POLL_INTERVAL,
+        worker_id: str = None,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"The worker mode must be thread or process not {mode}")
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.mode = mode
+        self.job_queue = job_queue or JobQueue()
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{queue}-{uuid.uuid4().hex[:6]}"
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight: typing.Dict[Future, Job] = {}
+        self._stop_event = threading.Event()
+        self._last_requeue = 0.0
+        self._last_renewal = time.monotonic()
+        self.renew_interval = max(1.0, min(60.0, P8_JOB_LEASE_SECONDS / 3))
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.concurrency)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix=f"p8-job-{self.queue}"
+                )
+        return self._executor
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def _settle(self, future: Future):
+        with self._lock:
+            job = self._in_flight.pop(future)
+        try:
+            result = future.result()
+        except Exception as ex:
+            error = f"{type(ex).__name__}: {ex}"
+            try:
+                retried = self.job_queue.fail(job, error)
+            except Exception as db_ex:
+                logger.error(f"Failed to record the failure of job {job.id} - {db_ex}")
+                return
+            if retried is None:
+                logger.warning(f"Job {job.name} {job.id} failed after its lease was lost - {error}")
+            elif retried:
+                self.retried += 1
+                logger.warning(f"Job {job.name} {job.id} failed (attempt {job.attempts}/{job.max_attempts}) - {error}")
+            else:
+                self.failed += 1
+                logger.error(f"Job {job.name} {job.id} failed after {job.attempts} attempts - {error}")
+            return
+        try:
+            if self.job_queue.complete(job, result):
+                self.completed += 1
+                logger.info(f"Completed job {job.name} {job.id}")
+            else:
+                logger.warning(f"Job {job.name} {job.id} completed after its lease was lost - the result is not stored")
+        except Exception as ex:
+            logger.error(f"Failed to store the result of job {job.id} - {ex}")
+
+    def run_once(self) -> int:
+        """claim jobs for the free slots and start them - returns the number claimed"""
+        free = self.concurrency - self.in_flight
+        if free <= 0:
+            return 0
+        if time.monotonic() - self._last_requeue > min(60, P8_JOB_LEASE_SECONDS):
+            self._last_requeue = time.monotonic()
+            if requeued := self.job_queue.requeue_stale(self.queue):
+                logger.warning(f"Requeued {requeued} stale jobs in {self.queue}")
+        jobs = self.job_queue.claim(self.queue, self.worker_id, limit=free)
+        executor = self._get_executor()
+        for job in jobs:
+            with self._lock:
+                future = executor.submit(execute_job, job.name, job.payload)
+                self._in_flight[future] = job
+            future.add_done_callback(self._settle)
+        return len(jobs)
+
+    def renew_leases(self) -> int:
+        """extend the leases of the running jobs so long runs are not requeued while they are still going"""
+        self._last_renewal = time.monotonic()
+        with self._lock:
+            job_ids = [job.id for job in self._in_flight.values()]
+        if not job_ids:
+            return 0
+        held = self.job_queue.renew(job_ids, self.worker_id)
+        if held < len(job_ids):
+            logger.warning(f"{len(job_ids) - held} running jobs in {self.queue} are no longer held by {self.worker_id}")
+        return held
+
+    def run(self):
+        """claim and run jobs until `stop` - polls when the queue is empty or all slots are busy"""
+        logger.info(f"Worker {self.worker_id} is running {self.queue} with {self.concurrency} {self.mode}s")
+        while not self._stop_event.is_set():
+            if time.monotonic() - self._last_renewal >= self.renew_interval:
+                try:
+                    self.renew_leases()
+                except Exception as ex:
+                    logger.warning(f"Failed to renew the job leases of {self.worker_id} - {ex}")
+            try:
+                claimed = self.run_once()
+            except Exception as ex:
+                logger.warning(f"Failed to claim jobs from {self.queue} - {ex}")
+                claimed = 0
+            if not claimed:
+                self._stop_event.wait(self.poll_interval)
+
+    def stop(self, wait: bool = True):
+        """stop claiming jobs and (optionally) wait for the running ones to finish"""
+        self._stop_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def get_stats(self) -> dict:
+        return {
+            "queue": self.queue,
+            "worker_id": self.worker_id,
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+def run_workers(pools: typing.List[WorkerPool], stop_event: threading.Event = None):
+    """run the pools on their own threads until interrupted (or the event is set) and then drain them"""
+    stop_event = stop_event or threading.Event()
+    threads = [threading.Thread(target=pool.run, name=f"p8-worker-{pool.queue}", daemon=True) for pool in pools]
+    for thread in threads:
+        thread.start()
+    try:
+        while not stop_event.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    logger.info("Stopping workers - waiting for running jobs")
+    for pool in pools:
+        pool.stop(wait=False)
+    for pool in pools:
+        pool.stop(wait=True)
+
+
+@job_handler("agent.run")
+def run_agent(agent: str, question: str, model: str = None, limit: int = None, session_id: str = None, userid: str = None):
+    """run the agent (by name) on the question and return its answer"""
+    from percolate.services.llm import CallingContext
+
+    context = CallingContext(session_id=session_id, username=userid) if session_id or userid else None
+    return {"content": p8.Agent(p8.load_model(agent)).run(question, context=context, limit=limit, language_model=model)}
+
+
+@job_handler("agent.batch")
+def run_agent_batch(
+    agent: str,
+    questions: typing.List[str],
+    concurrency: int = 4,
+    model: str = None,
+    limit: int = None,
+    checkpoint: str = None,
+    userid: str = None,
+    job_id: str = None,
+):
+    """
+    run the agent over the questions. With the job id the answers are saved on the job row as they complete (every
+    BATCH_PROGRESS_INTERVAL seconds) so that a retry on any worker resumes the batch - otherwise from the checkpoint file
+    """
+    from percolate.services.BatchRunner import BatchItem, run_batch
+
+    if not job_id:
+        return run_batch(
+            agent, questions, concurrency=concurrency, checkpoint=checkpoint, language_model=model, limit=limit, user_id=userid
+        )
+
+    job_queue = JobQueue()
+    previous = job_queue.get(job_id)
+    answered = [BatchItem(**i) for i in ((previous.result or {}).get("checkpoint") or [])] if previous else []
+    """the checkpoint file is local to this attempt and seeded with the answers of earlier attempts"""
+    checkpoint = os.path.join(tempfile.mkdtemp(prefix="p8-batch-"), f"{job_id}.jsonl")
+    with open(checkpoint, "w") as f:
+        for item in answered:
+            f.write(item.model_dump_json(exclude={"resumed"}) + "\n")
+
+    lock = threading.Lock()
+    saved = [time.monotonic()]
+
+    def save(force: bool = False):
+        with lock:
+            if not force and time.monotonic() - saved[0] < BATCH_PROGRESS_INTERVAL:
+                return
+            saved[0] = time.monotonic()
+            items = [i.model_dump(mode="json", exclude={"resumed"}) for i in answered]
+        job_queue.save_progress(job_id, {"checkpoint": items})
+
+    def on_result(item: BatchItem):
+        if item.error is None and not item.resumed:
+            with lock:
+                answered.append(item)
+            save()
+
+    try:
+        return run_batch(
+            agent,
+            questions,
+            concurrency=concurrency,
+            checkpoint=checkpoint,
+            on_result=on_result,
+            language_model=model,
+            limit=limit,
+            user_id=userid,
+        )
+    finally:
+        save(force=True)
+        shutil.rmtree(os.path.dirname(checkpoint), ignore_errors=True)
+
+
+@job_handler("research.iteration")
+def run_research_iteration(**task):
+    """fetch and index the web search results for each question of a research iteration"""
+    from percolate.models.p8 import ResearchIteration
+
+    task = ResearchIteration(**task)
+    repo = p8.repository(ResearchIteration)
+    """this can be parallel in future but now our free tier is one request per second anyway"""
+    for q in task.question_set:
+        repo.execute("SELECT * FROM p8.insert_web_search_results(%s,%s)", data=(q.query, task.task_id))
+    return {"questions": len(task.question_set)}
+
+
+@job_handler("index.entity")
+def index_entity(entity_name: str, id: str = None, sleep_seconds: int = 0):
+    """build the smart indexes of an entity - see `PostgresService.index_entity_by_name`"""
+    from percolate.models.p8 import IndexAudit
+    from percolate.services import PostgresService
+
+    return PostgresService(IndexAudit).index_entity_by_name(entity_name, id=id, sleep_seconds=sleep_seconds)
@@ -0,0 +1 @@
+from .JobQueue import JobQueue, WorkerPool, job_handler, run_workers
@@ -3,7 +3,7 @@ Decorators for Percolate framework
 """
 
 
-def tool(access_required: int = 100):
+def tool(access_required: int = 100, thread_safe: bool = True):
     """
     Decorator to mark functions as tools with access control
 
@@ -14,11 +14,14 @@ def tool(access_required: int = 100):
                         - 1: Admin only
                         - 10: Partner level
                         - 100: All users (default)
+        thread_safe: False if the function must not run concurrently with other tool calls of the same turn
+                        e.g. it changes the agent's state. Such calls run on the agent's thread in call order
     """
 
     def decorator(func):
         # Store access requirement as function attribute
         func._p8_access_required = access_required
+        func._p8_thread_safe = thread_safe
         func._p8_is_tool = True
         return func
 
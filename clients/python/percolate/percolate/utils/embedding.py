@@ -6,35 +6,221 @@ text embeddings across different providers and models.
 """
 
 import json
+import re
+import threading
 import typing
-import requests
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from percolate.utils import http_client
 import uuid
 import datetime
 from loguru import logger
 from percolate.utils import make_uuid
+from percolate.utils.env import (
+    P8_EMBEDDING_CACHE_ENABLED,
+    P8_EMBEDDING_CACHE_TTL_DAYS,
+    P8_EMBEDDING_CACHE_RETRY_SECONDS,
+    P8_EMBEDDING_MEMORY_CACHE_SIZE,
+    P8_EMBEDDING_BATCH_SIZE,
+    P8_EMBEDDING_BATCH_MAX_TOKENS,
+    P8_EMBEDDING_MAX_PARALLEL,
+    P8_EMBEDDING_COALESCE_WINDOW_MS,
+)
+
+"""the database cache is skipped until this (monotonic) time after it failed - see P8_EMBEDDING_CACHE_RETRY_SECONDS"""
+_cache_retry_at = 0.0
+
+
+def _cache_available() -> bool:
+    return time.monotonic() >= _cache_retry_at
+
+
+def _back_off_cache(reason: str):
+    """skip the database cache for a while rather than adding a failing round trip to every call"""
+    global _cache_retry_at
+    logger.warning(f"Skipping the embedding cache for {P8_EMBEDDING_CACHE_RETRY_SECONDS}s - {reason}")
+    _cache_retry_at = time.monotonic() + P8_EMBEDDING_CACHE_RETRY_SECONDS
+
+
+def embedding_text_hash(text: str) -> str:
+    """the cache key for a text - this must match p8.embedding_text_hash in the database"""
+    return hashlib.md5(re.sub(r"\s+", " ", text.strip(" \t\r\n")).encode()).hexdigest()
+
+
+def embedding_cache_id(model: str, text_hash: str) -> str:
+    """the p8."EmbeddingCache" id - this must match p8.embedding_cache_id in the database"""
+    return str(uuid.UUID(hashlib.md5(f"{model}:{text_hash}".encode()).hexdigest()))
+
+
+class EmbeddingLRU:
+    """in-process embeddings by (model, text hash) - checked before the database cache"""
+
+    def __init__(self, max_entries: int = P8_EMBEDDING_MEMORY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[typing.Tuple[str, str], typing.List[float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, hashes: typing.List[str], model: str) -> typing.Dict[str, typing.List[float]]:
+        found = {}
+        with self._lock:
+            for h in hashes:
+                vector = self._entries.get((model, h))
+                if vector is not None:
+                    self._entries.move_to_end((model, h))
+                    found[h] = vector
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, embeddings: typing.Dict[str, typing.List[float]], model: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for h, vector in embeddings.items():
+                self._entries[(model, h)] = vector
+                self._entries.move_to_end((model, h))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+memory_cache = EmbeddingLRU()
+
+
+def _get_cached_embeddings(hashes: typing.List[str], model: str) -> typing.Dict[str, typing.List[float]]:
+    """load cached embeddings for the text hashes from p8."EmbeddingCache" """
+    from percolate.services import PostgresService
+
+    try:
+        rows = PostgresService().execute(
+            """SELECT text_hash, embedding::text AS embedding FROM p8."EmbeddingCache"
+               WHERE id = ANY(%s::uuid[])
+               AND created_at > CURRENT_TIMESTAMP - %s * INTERVAL '1 day'""",
+            data=([embedding_cache_id(model, h) for h in set(hashes)], P8_EMBEDDING_CACHE_TTL_DAYS),
+            verbose_errors=False,
+        )
+        return {r["text_hash"]: json.loads(r["embedding"]) for r in rows or []}
+    except Exception as e:
+        _back_off_cache(f"failed to read it: {e}")
+        return {}
+
+
+def _cache_embeddings(embeddings: typing.Dict[str, typing.List[float]], model: str):
+    """save embeddings by text hash to p8."EmbeddingCache" """
+    from percolate.services import PostgresService
+
+    try:
+        PostgresService().execute(
+            """INSERT INTO p8."EmbeddingCache" (id, embedding_model, text_hash, embedding)
+               SELECT p8.embedding_cache_id(%s, h), %s, h, e::vector FROM unnest(%s::text[], %s::text[]) AS t(h, e)
+               ON CONFLICT (id) DO UPDATE
+               SET embedding = EXCLUDED.embedding, created_at = CURRENT_TIMESTAMP""",
+            data=(model, model, list(embeddings.keys()), [json.dumps(v) for v in embeddings.values()]),
+            verbose_errors=False,
+        )
+    except Exception as e:
+        _back_off_cache(f"failed to write it: {e}")
+
+class _Coalescer:
+    """
+    collects single text requests from concurrent threads into one batch per provider/model.
+    The first caller waits up to the window (or until the batch is full), requests the batch and hands out the results
+    """
+
+    def __init__(self, window_ms: float = P8_EMBEDDING_COALESCE_WINDOW_MS, max_batch: int = P8_EMBEDDING_BATCH_SIZE):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: typing.Dict[typing.Hashable, dict] = {}
+        self.batches = 0
+        self.requests = 0
+
+    def submit(
+        self,
+        key: typing.Hashable,
+        text: str,
+        fetch: typing.Callable[[typing.List[str]], typing.List[typing.List[float]]],
+    ) -> typing.List[float]:
+        future = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = {"items": [], "full": threading.Event()}
+            batch["items"].append((text, future))
+            if len(batch["items"]) >= self.max_batch:
+                batch["full"].set()
+
+        if leader:
+            batch["full"].wait(self.window)
+            with self._lock:
+                """no one can join the batch once it is removed"""
+                self._pending.pop(key, None)
+                self.batches += 1
+                self.requests += len(batch["items"])
+            items = batch["items"]
+            try:
+                vectors = fetch([t for t, _ in items])
+                for (_, f), vector in zip(items, vectors):
+                    f.set_result(vector)
+            except Exception as ex:
+                for _, f in items:
+                    f.set_exception(ex)
+        return future.result()
+
+
+_coalescer = _Coalescer()
+
 
 def get_embedding(text: str, model: str = "text-embedding-ada-002", api_key: str = None, 
-                  scheme: str = "openai", api_base: str = None) -> typing.List[float]:
+                  scheme: str = "openai", api_base: str = None, use_cache: bool = None) -> typing.List[float]:
     """Get embedding for a single text string
     
+    Concurrent calls for the same model are coalesced into one batched provider request (P8_EMBEDDING_COALESCE_WINDOW_MS).
+    
     Args:
         text: Text to embed
         model: Name of the embedding model to use
         api_key: API key for the provider
         scheme: Provider scheme ('openai', 'anthropic', etc.)
         api_base: Optional API base URL override
+        use_cache: Use the embedding cache (P8_EMBEDDING_CACHE_ENABLED by default)
         
     Returns:
         Embedding vector as list of floats
     """
-    return get_embeddings([text], model, api_key, scheme, api_base)[0]
+    if use_cache is not False:
+        cached = memory_cache.get_many([embedding_text_hash(text)], model)
+        if cached:
+            return next(iter(cached.values()))
+    if _coalescer.window <= 0:
+        return get_embeddings([text], model, api_key, scheme, api_base, use_cache=use_cache)[0]
+    return _coalescer.submit(
+        (model, api_key, scheme, api_base, use_cache),
+        text,
+        lambda texts: get_embeddings(texts, model, api_key, scheme, api_base, use_cache=use_cache),
+    )
 
 def get_embeddings(texts: typing.List[str], model: str = "text-embedding-ada-002", 
                    api_key: str = None, scheme: str = "openai", 
-                   api_base: str = None) -> typing.List[typing.List[float]]:
+                   api_base: str = None, use_cache: bool = None) -> typing.List[typing.List[float]]:
     """Get embeddings for multiple texts in a single batch request
     
     This is much more efficient than calling get_embedding for each text.
+    Embeddings are read from the in-process LRU and then the database embedding cache (shared with p8.get_embedding_for_text)
+    so only texts that are not cached are sent to the provider - in batches within the provider limits, sent concurrently.
     
     Args:
         texts: List of texts to embed
@@ -42,13 +228,87 @@ def get_embeddings(texts: typing.List[str], model: str = "text-embedding-ada-002
         api_key: API key for the provider
         scheme: Provider scheme ('openai', 'anthropic', etc.)
         api_base: Optional API base URL override
+        use_cache: Use the database embedding cache (P8_EMBEDDING_CACHE_ENABLED, off by default) - False also skips the in-process cache
         
     Returns:
         List of embedding vectors
     """
     if not texts:
         return []
-        
+
+    if use_cache is False:
+        return _request_embeddings(texts, model, api_key, scheme, api_base)
+    use_database = (P8_EMBEDDING_CACHE_ENABLED if use_cache is None else use_cache) and _cache_available()
+
+    hashes = [embedding_text_hash(t) for t in texts]
+    cached = memory_cache.get_many(hashes, model)
+    remaining = [h for h in dict.fromkeys(hashes) if h not in cached]
+    if remaining and use_database:
+        stored = _get_cached_embeddings(remaining, model)
+        memory_cache.put_many(stored, model)
+        cached.update(stored)
+
+    """request each distinct missing text once"""
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in cached and h not in missing:
+            missing[h] = t
+    if missing:
+        fetched = dict(
+            zip(missing.keys(), _request_embeddings(list(missing.values()), model, api_key, scheme, api_base))
+        )
+        if use_database and _cache_available():
+            _cache_embeddings(fetched, model)
+        memory_cache.put_many(fetched, model)
+        cached.update(fetched)
+    logger.debug(f"Embedding cache - {len(texts) - len(missing)} of {len(texts)} texts were cached")
+
+    return [cached[h] for h in hashes]
+
+
+def _estimate_tokens(text: str) -> int:
+    """a rough token count (about 4 characters per token) for batching"""
+    return len(text) // 4 + 1
+
+
+def split_batches(
+    texts: typing.List[str],
+    max_size: int = P8_EMBEDDING_BATCH_SIZE,
+    max_tokens: int = P8_EMBEDDING_BATCH_MAX_TOKENS,
+) -> typing.List[typing.List[str]]:
+    """split texts into provider requests of at most max_size texts and max_tokens estimated tokens"""
+    batches, batch, tokens = [], [], 0
+    for text in texts:
+        n = _estimate_tokens(text)
+        if batch and (len(batch) >= max_size or tokens + n > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _request_embeddings(texts: typing.List[str], model: str, api_key: str = None,
+                        scheme: str = "openai", api_base: str = None) -> typing.List[typing.List[float]]:
+    """request embeddings for the texts from the provider in concurrent batches - see get_embeddings"""
+    batches = split_batches(texts)
+    if len(batches) == 1:
+        return _request_embedding_batch(batches[0], model, api_key, scheme, api_base)
+    logger.debug(f"Requesting {len(texts)} embeddings in {len(batches)} batches")
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(P8_EMBEDDING_MAX_PARALLEL, len(batches))), thread_name_prefix="p8-embed"
+    ) as pool:
+        results = list(
+            pool.map(lambda batch: _request_embedding_batch(batch, model, api_key, scheme, api_base), batches)
+        )
+    return [vector for result in results for vector in result]
+
+
+def _request_embedding_batch(texts: typing.List[str], model: str, api_key: str = None,
+                             scheme: str = "openai", api_base: str = None) -> typing.List[typing.List[float]]:
+    """one provider request"""
     # Prepare request based on provider scheme
     if scheme == "openai":
         url = api_base or "https://api.openai.com/v1/embeddings"
@@ -68,7 +328,7 @@ def get_embeddings(texts: typing.List[str], model: str = "text-embedding-ada-002
     
     # Make request
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        response = http_client.post(url, headers=headers, data=json.dumps(data))
         
         if response.status_code != 200:
             logger.error(f"Embedding request failed with status {response.status_code}: {response.text}")
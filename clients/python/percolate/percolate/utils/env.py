@@ -79,6 +79,191 @@ POSTGRES_CONNECTION_STRING = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@
 TESTDB_CONNECTION_STRING = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/test"
 DEFAULT_CONNECTION_TIMEOUT = 30
 
+# PostgreSQL connection pool settings - the pool is shared by all PostgresService instances in the process
+P8_PG_POOL_ENABLED = os.environ.get("P8_PG_POOL_ENABLED", "true").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+P8_PG_POOL_MIN_SIZE = int(os.environ.get("P8_PG_POOL_MIN_SIZE", 1))
+P8_PG_POOL_MAX_SIZE = int(os.environ.get("P8_PG_POOL_MAX_SIZE", 20))
+# connections older than this (seconds) are closed when they are returned or checked out
+P8_PG_POOL_MAX_LIFETIME = int(os.environ.get("P8_PG_POOL_MAX_LIFETIME", 1800))
+# connections idle for longer than this (seconds) are pinged before they are handed out
+P8_PG_POOL_HEALTH_CHECK_SECONDS = int(
+    os.environ.get("P8_PG_POOL_HEALTH_CHECK_SECONDS", 30)
+)
+# how long (seconds) to wait for a free connection when the pool is exhausted
+P8_PG_POOL_TIMEOUT = int(os.environ.get("P8_PG_POOL_TIMEOUT", DEFAULT_CONNECTION_TIMEOUT))
+# extra threads that search and tool calls may fan out onto, shared by the process so that concurrent requests cannot exhaust the pool
+P8_PG_FAN_OUT_MAX = int(os.environ.get("P8_PG_FAN_OUT_MAX", max(1, P8_PG_POOL_MAX_SIZE // 2)))
+# rows fetched per round trip by the streaming (server-side cursor) repository methods
+P8_PG_STREAM_FETCH_SIZE = int(os.environ.get("P8_PG_STREAM_FETCH_SIZE", 1000))
+# writers that do not need the upserted rows back (the audit writer and resource ingestion) use the COPY based bulk loader
+# at or above this many records (0 disables) - keep it below P8_AUDIT_BATCH_SIZE so that full audit batches are bulk loaded
+P8_BULK_UPSERT_THRESHOLD = int(os.environ.get("P8_BULK_UPSERT_THRESHOLD", 100))
+
+# approximate nearest neighbour indexes on p8_embeddings tables - hnsw, ivfflat or none
+P8_VECTOR_INDEX_METHOD = os.environ.get("P8_VECTOR_INDEX_METHOD", "hnsw").lower()
+# the pgvector operator class - vector_l2_ops matches the <-> distance used by the search functions
+P8_VECTOR_INDEX_OPS = os.environ.get("P8_VECTOR_INDEX_OPS", "vector_l2_ops")
+P8_HNSW_M = int(os.environ.get("P8_HNSW_M", 16))
+P8_HNSW_EF_CONSTRUCTION = int(os.environ.get("P8_HNSW_EF_CONSTRUCTION", 64))
+P8_IVFFLAT_LISTS = int(os.environ.get("P8_IVFFLAT_LISTS", 100))
+
+# query embeddings are cached in p8."EmbeddingCache" by model and normalized text hash - the database search functions always use it
+# and get_embeddings in python only reads and writes it when this is enabled (it always uses the in-process cache)
+P8_EMBEDDING_CACHE_ENABLED = os.environ.get("P8_EMBEDDING_CACHE_ENABLED", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+P8_EMBEDDING_CACHE_TTL_DAYS = int(os.environ.get("P8_EMBEDDING_CACHE_TTL_DAYS", 30))
+# seconds that get_embeddings skips the database cache after it failed to read or write it
+P8_EMBEDDING_CACHE_RETRY_SECONDS = float(os.environ.get("P8_EMBEDDING_CACHE_RETRY_SECONDS", 60))
+
+# search runs the relational (nl2sql) and vector halves of query_entity concurrently on pooled connections
+P8_SEARCH_CONCURRENT = os.environ.get("P8_SEARCH_CONCURRENT", "true").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+"""search runs each of a list of questions as its own query on up to this many pooled connections at a time"""
+P8_SEARCH_MAX_PARALLEL_QUESTIONS = int(os.environ.get("P8_SEARCH_MAX_PARALLEL_QUESTIONS", 4))
+
+# clients LISTEN for table change notifications to invalidate in-process caches
+P8_PG_NOTIFY_ENABLED = os.environ.get("P8_PG_NOTIFY_ENABLED", "true").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+# seconds that language model settings (p8."LanguageModelApi") are cached in process (0 disables)
+P8_MODEL_SETTINGS_CACHE_TTL = int(os.environ.get("P8_MODEL_SETTINGS_CACHE_TTL", 300))
+
+"""shared http client for LLM and embedding providers - limits are per provider host"""
+P8_HTTP_POOL_MAXSIZE = int(os.environ.get("P8_HTTP_POOL_MAXSIZE", 20))
+P8_HTTP_CONNECT_TIMEOUT = float(os.environ.get("P8_HTTP_CONNECT_TIMEOUT", 10))
+P8_HTTP_READ_TIMEOUT = float(os.environ.get("P8_HTTP_READ_TIMEOUT", 300))
+P8_HTTP_MAX_RETRIES = int(os.environ.get("P8_HTTP_MAX_RETRIES", 3))
+P8_HTTP_BACKOFF_FACTOR = float(os.environ.get("P8_HTTP_BACKOFF_FACTOR", 0.5))
+P8_HTTP2_ENABLED = os.environ.get("P8_HTTP2_ENABLED", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+"""json map of host to max connections e.g. {"api.openai.com": 50}"""
+P8_HTTP_PROVIDER_LIMITS = os.environ.get("P8_HTTP_PROVIDER_LIMITS")
+
+"""tool calls of one agent turn run concurrently on up to this many threads (1 runs them in sequence) with a per call timeout in seconds (0 for none)"""
+P8_TOOL_CALL_CONCURRENCY = int(os.environ.get("P8_TOOL_CALL_CONCURRENCY", 4))
+P8_TOOL_CALL_TIMEOUT = float(os.environ.get("P8_TOOL_CALL_TIMEOUT", 120))
+
+"""optional cache of LanguageModel responses (exact key and, for single turn questions, embedding similarity)"""
+P8_LLM_CACHE_ENABLED = os.environ.get("P8_LLM_CACHE_ENABLED", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+"""comma separated agent names to cache or * for all agents and direct calls"""
+P8_LLM_CACHE_AGENTS = os.environ.get("P8_LLM_CACHE_AGENTS", "*")
+P8_LLM_CACHE_TTL = int(os.environ.get("P8_LLM_CACHE_TTL", 3600))
+P8_LLM_CACHE_MAX_ENTRIES = int(os.environ.get("P8_LLM_CACHE_MAX_ENTRIES", 1000))
+"""cosine similarity above which a single turn question reuses a cached answer - 0 disables the semantic tier"""
+P8_LLM_CACHE_SEMANTIC_THRESHOLD = float(os.environ.get("P8_LLM_CACHE_SEMANTIC_THRESHOLD", 0))
+P8_LLM_CACHE_EMBEDDING_MODEL = os.environ.get("P8_LLM_CACHE_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+"""embeddings are also kept in an in-process LRU (0 disables it) in front of p8."EmbeddingCache" """
+P8_EMBEDDING_MEMORY_CACHE_SIZE = int(os.environ.get("P8_EMBEDDING_MEMORY_CACHE_SIZE", 10000))
+"""provider requests are split into batches of at most this many texts and (estimated) tokens and sent concurrently"""
+P8_EMBEDDING_BATCH_SIZE = int(os.environ.get("P8_EMBEDDING_BATCH_SIZE", 2048))
+P8_EMBEDDING_BATCH_MAX_TOKENS = int(os.environ.get("P8_EMBEDDING_BATCH_MAX_TOKENS", 250000))
+P8_EMBEDDING_MAX_PARALLEL = int(os.environ.get("P8_EMBEDDING_MAX_PARALLEL", 4))
+"""single text requests from different threads within this window are sent as one batch - 0 disables coalescing"""
+P8_EMBEDDING_COALESCE_WINDOW_MS = float(os.environ.get("P8_EMBEDDING_COALESCE_WINDOW_MS", 5))
+
+"""outbound provider requests are scheduled per provider by percolate.utils.rate_limiter"""
+P8_RATE_LIMIT_ENABLED = os.environ.get("P8_RATE_LIMIT_ENABLED", "true").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+"""json map of host or host/model to {"rpm", "tpm", "max_concurrency"} e.g. {"api.openai.com": {"rpm": 5000, "tpm": 800000}}"""
+P8_RATE_LIMITS = os.environ.get("P8_RATE_LIMITS")
+P8_RATE_LIMIT_MIN_CONCURRENCY = int(os.environ.get("P8_RATE_LIMIT_MIN_CONCURRENCY", 1))
+"""a response slower than this multiple of the recent average reduces concurrency - 0 adapts to errors only"""
+P8_RATE_LIMIT_LATENCY_FACTOR = float(os.environ.get("P8_RATE_LIMIT_LATENCY_FACTOR", 3))
+
+"""route calls between equivalent models by latency and errors - json map of model to alternatives e.g. {"gpt-4o": ["gpt-4.1"]}"""
+P8_ROUTING_ENABLED = os.environ.get("P8_ROUTING_ENABLED", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+P8_MODEL_ROUTES = os.environ.get("P8_MODEL_ROUTES")
+"""the calls per model that latency and error rates are computed over and the calls needed before they are used"""
+P8_ROUTING_WINDOW = int(os.environ.get("P8_ROUTING_WINDOW", 100))
+P8_ROUTING_MIN_SAMPLES = int(os.environ.get("P8_ROUTING_MIN_SAMPLES", 10))
+P8_ROUTING_MAX_ERROR_RATE = float(os.environ.get("P8_ROUTING_MAX_ERROR_RATE", 0.25))
+"""a model with a p95 latency above this many seconds is routed around - 0 routes on errors only"""
+P8_ROUTING_MAX_P95 = float(os.environ.get("P8_ROUTING_MAX_P95", 0))
+"""send a second request to the next model if the first has not answered by its p95 latency"""
+P8_ROUTING_HEDGE = os.environ.get("P8_ROUTING_HEDGE", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+
+"""validate streamed deltas with the pydantic stream models when translating between dialects (slower - for debugging)"""
+P8_STREAM_DELTA_VALIDATION = os.environ.get("P8_STREAM_DELTA_VALIDATION", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+
+"""audit records (sessions and AI responses) are written in batches by one background writer per process"""
+P8_AUDIT_QUEUE_SIZE = int(os.environ.get("P8_AUDIT_QUEUE_SIZE", 10000))
+P8_AUDIT_BATCH_SIZE = int(os.environ.get("P8_AUDIT_BATCH_SIZE", 200))
+P8_AUDIT_FLUSH_INTERVAL = float(os.environ.get("P8_AUDIT_FLUSH_INTERVAL", 1.0))
+"""seconds a caller waits for space when the audit queue is full before the record is dropped - a short wait rides out a slow flush, 0 never blocks"""
+P8_AUDIT_ENQUEUE_TIMEOUT = float(os.environ.get("P8_AUDIT_ENQUEUE_TIMEOUT", 0.5))
+
+"""durable background jobs (percolate.services.tasks.JobQueue) - when enabled API routes queue work for `p8 worker` processes"""
+P8_JOBS_ENABLED = os.environ.get("P8_JOBS_ENABLED", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+    "y",
+)
+P8_JOB_POLL_INTERVAL = float(os.environ.get("P8_JOB_POLL_INTERVAL", 1.0))
+P8_JOB_MAX_ATTEMPTS = int(os.environ.get("P8_JOB_MAX_ATTEMPTS", 3))
+"""seconds before the first retry of a failed job - doubled for each further attempt"""
+P8_JOB_RETRY_BACKOFF = float(os.environ.get("P8_JOB_RETRY_BACKOFF", 10))
+"""running jobs locked for longer than this are assumed lost with their worker and queued again"""
+P8_JOB_LEASE_SECONDS = int(os.environ.get("P8_JOB_LEASE_SECONDS", 1800))
+
+"""warm pool of initialized agent runners (templates) keyed by agent and role level - requests get cheap clones"""
+P8_RUNNER_POOL_SIZE = int(os.environ.get("P8_RUNNER_POOL_SIZE", 20))
+P8_RUNNER_POOL_TTL = int(os.environ.get("P8_RUNNER_POOL_TTL", 3600))
+
+"""compiled agent models (Agent.load) are cached by name and row version - dropped on p8."Agent" changes via LISTEN/NOTIFY"""
+P8_AGENT_CACHE_TTL = int(os.environ.get("P8_AGENT_CACHE_TTL", 300))
+P8_AGENT_NEGATIVE_CACHE_TTL = int(os.environ.get("P8_AGENT_NEGATIVE_CACHE_TTL", 30))
+"""names that are not agents come from user input so at most this many misses are remembered (least recently used first out)"""
+P8_AGENT_NEGATIVE_CACHE_SIZE = int(os.environ.get("P8_AGENT_NEGATIVE_CACHE_SIZE", 1000))
+
+"""the most questions a batch run requested through the API may run at once"""
+P8_BATCH_MAX_CONCURRENCY = int(os.environ.get("P8_BATCH_MAX_CONCURRENCY", 16))
+
 """later we will add these to the project"""
 MINIO_SECRET = os.environ.get("MINIO_SECRET", "percolate")
 MINIO_SERVER = os.environ.get("MINIO_SERVER", "localhost:9000")
@@ -0,0 +1,309 @@
+"""
+Shared HTTP clients for outbound LLM and embedding calls.
+
+Every call to a provider used to go through a bare `requests.post` which opens a new TCP/TLS connection each time.
+Here we keep one `requests.Session` per provider host (scheme + host + port) so connections are kept alive between
+turns of an agent loop. Each session has
+
+- a connection pool bounded per provider (P8_HTTP_POOL_MAXSIZE or the host in P8_HTTP_PROVIDER_LIMITS) - callers block for a free connection rather than opening more
+- retries with exponential backoff on connection errors and 429/5xx responses, honouring Retry-After
+- scheduling by the provider's `rate_limiter` (P8_RATE_LIMIT_ENABLED) - rate limits, adaptive concurrency and cooldowns after 429s
+- default (connect, read) timeouts
+
+The async client is an `httpx.AsyncClient` per host and event loop and uses HTTP/2 if P8_HTTP2_ENABLED and `h2` is installed.
+
+```python
+from percolate.utils.http_client import post
+response = post("https://api.openai.com/v1/embeddings", headers=headers, json=data)
+```
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import typing
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from percolate.utils import logger, rate_limiter
+from percolate.utils.env import (
+    P8_HTTP_POOL_MAXSIZE,
+    P8_HTTP_CONNECT_TIMEOUT,
+    P8_HTTP_READ_TIMEOUT,
+    P8_HTTP_MAX_RETRIES,
+    P8_HTTP_BACKOFF_FACTOR,
+    P8_HTTP2_ENABLED,
+    P8_HTTP_PROVIDER_LIMITS,
+    P8_RATE_LIMIT_ENABLED,
+)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_sessions: typing.Dict[str, requests.Session] = {}
+_async_clients: typing.Dict[typing.Tuple[str, int], typing.Any] = {}
+_pid = os.getpid()
+
+
+def _provider_limits() -> typing.Dict[str, int]:
+    if not P8_HTTP_PROVIDER_LIMITS:
+        return {}
+    try:
+        return {k: int(v) for k, v in json.loads(P8_HTTP_PROVIDER_LIMITS).items()}
+    except Exception as ex:
+        logger.warning(f"Ignoring invalid P8_HTTP_PROVIDER_LIMITS - {ex}")
+        return {}
+
+
+def provider_key(url: str) -> str:
+    """the pool key for a url - scheme://host[:port]"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def connection_limit(url: str) -> int:
+    """the max connections to the provider host of the url"""
+    host = urlsplit(url).hostname or ""
+    return _provider_limits().get(host, P8_HTTP_POOL_MAXSIZE)
+
+
+def default_timeout() -> typing.Tuple[float, float]:
+    return (P8_HTTP_CONNECT_TIMEOUT, P8_HTTP_READ_TIMEOUT)
+
+
+def retry_policy(total: int = None, backoff_factor: float = None, status: int = None) -> Retry:
+    """
+    retry connection errors and 429/5xx for all methods (provider calls are POSTs).
+    Streaming responses are only retried before the body is read.
+    Status retries are made by `request` instead when the rate limiter is enabled so it sees every throttled response.
+    """
+    total = P8_HTTP_MAX_RETRIES if total is None else total
+    return Retry(
+        total=total,
+        connect=total,
+        read=0,
+        status=total if status is None else status,
+        backoff_factor=P8_HTTP_BACKOFF_FACTOR if backoff_factor is None else backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def _check_fork():
+    """pools must not be shared with a forked child"""
+    global _pid
+    if _pid != os.getpid():
+        _sessions.clear()
+        _async_clients.clear()
+        _pid = os.getpid()
+
+
+def get_session(url: str) -> requests.Session:
+    """the keep-alive session for the provider host of the url"""
+    key = provider_key(url)
+    with _lock:
+        _check_fork()
+        session = _sessions.get(key)
+        if session is None:
+            limit = connection_limit(url)
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=limit,
+                pool_block=True,
+                max_retries=retry_policy(status=0 if P8_RATE_LIMIT_ENABLED else None),
+            )
+            session = requests.Session()
+            session.mount(f"{key}/", adapter)
+            _sessions[key] = session
+            logger.debug(f"Created http session for {key} with {limit} connections")
+        return session
+
+
+def _limiter_for(url: str, kwargs: dict) -> typing.Tuple[rate_limiter.ProviderLimiter, int]:
+    body = kwargs.get("json", kwargs.get("data", kwargs.get("content")))
+    limiter = rate_limiter.get_limiter(
+        url, model=rate_limiter.model_of(body), default_concurrency=connection_limit(url)
+    )
+    return limiter, rate_limiter.estimate_tokens(body)
+
+
+def request(method: str, url: str, max_retries: int = None, **kwargs) -> requests.Response:
+    """make a request on the pooled session - the signature is that of `requests.request`"""
+    kwargs.setdefault("timeout", default_timeout())
+    session = get_session(url)
+    if not P8_RATE_LIMIT_ENABLED:
+        return session.request(method, url, **kwargs)
+
+    max_retries = P8_HTTP_MAX_RETRIES if max_retries is None else max_retries
+    limiter, tokens = _limiter_for(url, kwargs)
+    attempt = 0
+    while True:
+        limiter.acquire(tokens)
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            limiter.release(error=True)
+            raise
+        delay = None
+        if response.status_code in RETRY_STATUS_CODES:
+            delay = retry_after_seconds(response.headers, attempt)
+        limiter.release(response.status_code, time.monotonic() - started, retry_after=delay)
+        if delay is None or attempt >= max_retries:
+            return response
+        response.close()
+        logger.warning(f"{url} returned {response.status_code} - retrying in {delay:.1f}s")
+        time.sleep(delay)
+        attempt += 1
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """pooled `requests.post`"""
+    return request("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """pooled `requests.get`"""
+    return request("GET", url, **kwargs)
+
+
+def _http2_available() -> bool:
+    if not P8_HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        logger.warning("P8_HTTP2_ENABLED is set but h2 is not installed - using HTTP/1.1")
+        return False
+
+
+def get_async_client(url: str):
+    """
+    the pooled `httpx.AsyncClient` for the provider host of the url on the running event loop.
+    httpx only retries connection errors - status retries are left to the caller.
+    """
+    import httpx
+
+    key = provider_key(url)
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = 0
+    with _lock:
+        _check_fork()
+        client = _async_clients.get((key, loop_id))
+        if client is None or client.is_closed:
+            limit = connection_limit(url)
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(P8_HTTP_READ_TIMEOUT, connect=P8_HTTP_CONNECT_TIMEOUT),
+                transport=httpx.AsyncHTTPTransport(
+                    http2=_http2_available(),
+                    retries=P8_HTTP_MAX_RETRIES,
+                    limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                ),
+            )
+            _async_clients[(key, loop_id)] = client
+        return client
+
+
+def retry_after_seconds(headers, attempt: int, backoff_factor: float = None) -> float:
+    """the Retry-After header (in seconds) if the provider sent one, otherwise exponential backoff with jitter"""
+    value = (headers or {}).get("retry-after")
+    if value:
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+    backoff_factor = P8_HTTP_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+    return backoff_factor * (2**attempt) * (0.5 + random.random() / 2)
+
+
+@contextlib.asynccontextmanager
+async def astream(method: str, url: str, max_retries: int = None, **kwargs):
+    """
+    stream a response from the pooled async client e.g. a provider SSE stream.
+    429/5xx responses are retried with backoff before the body is read - the last response is returned otherwise
+
+    ```python
+    async with http_client.astream("POST", url, headers=headers, content=payload) as response:
+        async for line in response.aiter_lines():
+            ...
+    ```
+    """
+    max_retries = P8_HTTP_MAX_RETRIES if max_retries is None else max_retries
+    client = get_async_client(url)
+    limiter, tokens = _limiter_for(url, kwargs) if P8_RATE_LIMIT_ENABLED else (None, 0)
+    attempt = 0
+    while True:
+        if limiter:
+            await limiter.aacquire(tokens)
+        started = time.monotonic()
+        try:
+            request = client.build_request(method, url, **kwargs)
+            response = await client.send(request, stream=True)
+        except BaseException as ex:
+            """the slot is always freed - a cancelled request (e.g. the client disconnected) is not a provider error"""
+            if limiter:
+                limiter.release(error=isinstance(ex, Exception))
+            raise
+        if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+            delay = retry_after_seconds(response.headers, attempt)
+            if limiter:
+                limiter.release(response.status_code, time.monotonic() - started, retry_after=delay)
+            await response.aclose()
+            logger.warning(f"{url} returned {response.status_code} - retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        """the slot is held until the stream is read - latency is the time to the first byte"""
+        latency = time.monotonic() - started
+        try:
+            yield response
+        finally:
+            try:
+                await response.aclose()
+            finally:
+                if limiter:
+                    limiter.release(response.status_code, latency)
+        return
+
+
+def close():
+    """close the sync sessions (async clients are closed with `aclose`)"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+async def aclose():
+    """close the async clients for the running loop"""
+    loop_id = id(asyncio.get_running_loop())
+    with _lock:
+        clients = [(k, c) for k, c in _async_clients.items() if k[1] == loop_id]
+        for k, _ in clients:
+            _async_clients.pop(k, None)
+    for _, client in clients:
+        await client.aclose()
+
+
+def get_stats() -> dict:
+    """the providers we hold pools for and their rate limiter queues"""
+    with _lock:
+        stats = {
+            "sessions": sorted(_sessions),
+            "async_clients": sorted({k for k, _ in _async_clients}),
+        }
+    stats["rate_limits"] = rate_limiter.get_stats()
+    return stats
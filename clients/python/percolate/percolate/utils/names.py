@@ -1,2 +1,11 @@
 class EmbeddingProviders:
-    embedding_text_embedding_ada_002 = "text-embedding-ada-002"
\ No newline at end of file
+    embedding_text_embedding_ada_002 = "text-embedding-ada-002"
+
+
+"""the dimensions of the embedding models we index - the embedding column is dimensionless so indexes cast to these"""
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "bge-m3": 1024,
+}
@@ -0,0 +1,293 @@
+"""
+Process-wide scheduling of outbound provider requests (LLM, embedding, vision and transcription).
+
+`http_client` asks the limiter of the provider (host, or host/model if configured) for a slot before each request and
+reports the outcome afterwards. Each limiter has
+
+- optional token buckets for requests and (estimated) tokens per minute from P8_RATE_LIMITS
+- an adaptive concurrency limit - it is halved on 429/503 and connection errors, reduced when latency spikes
+  (P8_RATE_LIMIT_LATENCY_FACTOR times the recent average) and grows back by one per window of successful requests
+- a cooldown for the whole provider when it sends Retry-After on a 429, so queued requests do not trip the quota again
+
+```bash
+export P8_RATE_LIMITS='{"api.openai.com": {"rpm": 5000, "tpm": 800000}, "api.openai.com/gpt-4o": {"rpm": 500, "max_concurrency": 20}}'
+```
+
+`get_stats()` reports the queue depth, in flight requests and current limit of each provider.
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+import typing
+from urllib.parse import urlsplit
+
+from percolate.utils import logger
+from percolate.utils.env import (
+    P8_RATE_LIMITS,
+    P8_RATE_LIMIT_MIN_CONCURRENCY,
+    P8_RATE_LIMIT_LATENCY_FACTOR,
+)
+
+THROTTLE_STATUS_CODES = (429, 503)
+_MODEL_PATTERN = re.compile(r'"model"\s*:\s*"([^"]+)"')
+
+
+class TokenBucket:
+    """a bucket refilled at `per_minute` - reservations may go negative so callers are served in order"""
+
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float = 1) -> float:
+        """take the amount and return the seconds to wait before using it - call under the limiter lock"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ProviderLimiter:
+    """rate and adaptive concurrency limits of one provider or model - see the module docs"""
+
+    def __init__(
+        self,
+        key: str,
+        max_concurrency: int,
+        rpm: float = None,
+        tpm: float = None,
+        min_concurrency: int = P8_RATE_LIMIT_MIN_CONCURRENCY,
+        latency_factor: float = P8_RATE_LIMIT_LATENCY_FACTOR,
+    ):
+        self.key = key
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.latency_factor = latency_factor
+        self.limit = float(self.max_concurrency)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._cond = threading.Condition()
+        self._async_waiters: typing.List[typing.Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.in_flight = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.throttled = 0
+        self.errors = 0
+        self.completed = 0
+
+    def _try_enter(self) -> typing.Optional[float]:
+        """0 if a slot was taken, otherwise the seconds to wait (None to wait for a release) - call under the lock"""
+        now = time.monotonic()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        self.in_flight += 1
+        return 0
+
+    def _reserve(self, tokens: int) -> float:
+        with self._cond:
+            delay = self.requests.reserve(1) if self.requests else 0.0
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(tokens))
+            return delay
+
+    def acquire(self, tokens: int = 1) -> float:
+        """block until the request may be sent and return the time waited"""
+        started = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    delay = self._try_enter()
+                    if delay == 0:
+                        break
+                    self._cond.wait(timeout=delay or 1.0)
+            finally:
+                self.waiting -= 1
+        delay = self._reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return time.monotonic() - started
+
+    async def aacquire(self, tokens: int = 1) -> float:
+        """`acquire` without blocking the event loop - waiters are woken by `release`"""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_enter()
+                    if delay == 0:
+                        break
+                    woken = loop.create_future()
+                    self._async_waiters.append((loop, woken))
+                try:
+                    await asyncio.wait([woken], timeout=delay or 1.0)
+                finally:
+                    with self._cond:
+                        if (loop, woken) in self._async_waiters:
+                            self._async_waiters.remove((loop, woken))
+        finally:
+            with self._cond:
+                self.waiting -= 1
+        delay = self._reserve(tokens)
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                """cancelled while holding the slot - free it without counting an error"""
+                self.release()
+                raise
+        return time.monotonic() - started
+
+    def _wake_async_waiters(self):
+        """wake the coroutines waiting in `aacquire` on their own loops - call under the lock"""
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, woken in waiters:
+            try:
+                loop.call_soon_threadsafe(_set_done, woken)
+            except RuntimeError:
+                """the loop is closed"""
+                pass
+
+    def release(
+        self,
+        status_code: int = None,
+        latency: float = None,
+        retry_after: float = None,
+        error: bool = False,
+    ):
+        """free the slot and adapt the limit to the outcome"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if error or status_code in THROTTLE_STATUS_CODES:
+                if error:
+                    self.errors += 1
+                else:
+                    self.throttled += 1
+                previous = int(self.limit)
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                if retry_after and status_code == 429:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                if int(self.limit) < previous:
+                    logger.warning(
+                        f"{self.key} is throttling ({status_code or 'error'}) - concurrency {previous} -> {int(self.limit)}"
+                    )
+            elif status_code is not None and status_code < 500:
+                self.completed += 1
+                if (
+                    latency is not None
+                    and self.latency is not None
+                    and self.latency_factor
+                    and latency > self.latency_factor * self.latency
+                ):
+                    self.limit = max(self.min_concurrency, self.limit * 0.9)
+                else:
+                    """additive increase - about one slot per window of successful requests"""
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                if latency is not None:
+                    self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self._cond.notify_all()
+            self._wake_async_waiters()
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.limit),
+                "max_concurrency": self.max_concurrency,
+                "cooldown_seconds": max(0.0, self.blocked_until - time.monotonic()),
+                "latency_seconds": self.latency,
+                "completed": self.completed,
+                "throttled": self.throttled,
+                "errors": self.errors,
+            }
+
+
+def _set_done(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _parse_limits(limits: typing.Optional[str]) -> typing.Dict[str, dict]:
+    if not limits:
+        return {}
+    try:
+        return {k.lower(): dict(v) for k, v in json.loads(limits).items()}
+    except Exception as ex:
+        logger.warning(f"Ignoring invalid P8_RATE_LIMITS - {ex}")
+        return {}
+
+
+_lock = threading.Lock()
+_limiters: typing.Dict[str, ProviderLimiter] = {}
+_limits = _parse_limits(P8_RATE_LIMITS)
+
+
+def model_of(body: typing.Any) -> typing.Optional[str]:
+    """the model named in a request body (a dict or json text) if any"""
+    if isinstance(body, dict):
+        return body.get("model")
+    if isinstance(body, bytes):
+        body = body[:2048].decode("utf-8", errors="ignore")
+    if isinstance(body, str):
+        match = _MODEL_PATTERN.search(body[:2048])
+        return match.group(1) if match else None
+    return None
+
+
+def estimate_tokens(body: typing.Any) -> int:
+    """a rough token count of a request body (about 4 characters per token) for the tokens per minute bucket"""
+    if body is None:
+        return 1
+    if isinstance(body, dict):
+        body = json.dumps(body, default=str)
+    try:
+        return max(1, len(body) // 4)
+    except TypeError:
+        return 1
+
+
+def get_limiter(url: str, model: str = None, default_concurrency: int = 10) -> ProviderLimiter:
+    """the limiter of the provider host, or of the host and model if P8_RATE_LIMITS has an entry for it"""
+    host = (urlsplit(url).hostname or "").lower()
+    limits = _limits
+    key = f"{host}/{model}".lower() if model and f"{host}/{model}".lower() in limits else host
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            config = limits.get(key, {})
+            limiter = ProviderLimiter(
+                key,
+                max_concurrency=config.get("max_concurrency", default_concurrency),
+                rpm=config.get("rpm"),
+                tpm=config.get("tpm"),
+            )
+            _limiters[key] = limiter
+        return limiter
+
+
+def get_stats() -> typing.Dict[str, dict]:
+    """queue depth, in flight requests and limits by provider"""
+    with _lock:
+        limiters = list(_limiters.values())
+    return {l.key: l.get_stats() for l in limiters}
+
+
+def reset(limits: str = None):
+    """forget all limiters and parse the limits again - P8_RATE_LIMITS or the given json"""
+    global _limits
+    with _lock:
+        _limiters.clear()
+        _limits = _parse_limits(P8_RATE_LIMITS if limits is None else limits)
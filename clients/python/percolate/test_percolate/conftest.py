@@ -12,4 +12,13 @@ import os
 # Add the project root to the Python path to ensure imports work correctly
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Define project-wide fixtures here if needed
\ No newline at end of file
+# Define project-wide fixtures here if needed
+
+def pytest_collection_modifyitems(config, items):
+    """benchmarks time the code and would flake on loaded machines - they run only with P8_RUN_BENCHMARKS=1"""
+    if os.environ.get("P8_RUN_BENCHMARKS", "").lower() in ("true", "1", "yes", "y"):
+        return
+    skip = pytest.mark.skip(reason="benchmark - set P8_RUN_BENCHMARKS=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -36,4 +36,30 @@ def test_typing_mapping():
     for k,v in expected.items():
         assert v == mapping[k], f"Expected the mapping for field {k} to by {v} but got {mapping[k]}"
         
-    
\ No newline at end of file
+    
+
+def test_embedding_index_scripts():
+    from percolate.models.p8 import Resources
+
+    helper = SqlModelHelper(Resources)
+    source, ann = helper.create_embedding_index_scripts(method="hnsw", concurrently=True)
+    assert source.startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS p8_resources_embeddings_source_idx")
+    assert "(source_record_id)" in source
+    assert "USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops)" in ann
+    assert "WHERE embedding_name = 'text-embedding-ada-002'" in ann
+
+    _, ivf, large = helper.create_embedding_index_scripts(
+        method="ivfflat",
+        ops="vector_cosine_ops",
+        embedding_models=["text-embedding-ada-002", "text-embedding-3-large", "unknown-model"],
+    )
+    assert "USING ivfflat" in ivf and "WITH (lists =" in ivf
+    """large models are indexed as halfvec and unknown dimensions are skipped"""
+    assert "(embedding_vector::halfvec(3072)) halfvec_cosine_ops" in large
+
+    assert len(helper.create_embedding_index_scripts(method="none")) == 1
+    with pytest.raises(ValueError):
+        helper.create_embedding_index_scripts(method="btree")
+
+    long_name = helper.embedding_index_name("hnsw_" + "x" * 80)
+    assert len(long_name) <= 63
@@ -0,0 +1,96 @@
+"""
+Unit tests for the async streaming path (the provider is faked or a local server)
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from percolate.services.llm.proxy.stream_generators import stream_with_buffered_functions
+from percolate.services.llm.LanguageModel import AsyncProviderStream
+from percolate.api.routes.chat.router import astream_generator
+from percolate.utils import http_client
+
+LINES = [
+    b'data: {"choices":[{"delta":{"content":"Hello"}}]}',
+    b'data: {"choices":[{"delta":{"tool_calls":[{"index":0,"id":"t1","function":{"name":"f","arguments":"{\\"a\\""}}]}}]}',
+    b'data: {"choices":[{"delta":{"tool_calls":[{"index":0,"function":{"arguments":": 1}"}}]}}]}',
+    b'data: {"choices":[{"delta":{},"finish_reason":"tool_calls"}]}',
+    b'data: {"usage":{"prompt_tokens":3,"completion_tokens":2}}',
+    b"data: [DONE]",
+]
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            yield line.decode() if decode_unicode else line
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+def test_buffered_stream_collapses_tool_calls():
+    events = list(stream_with_buffered_functions(FakeResponse(LINES)))
+    tool_calls = [c for _, c in events if c.get("choices") and c["choices"][0].get("finish_reason") == "tool_calls"]
+    assert tool_calls[0]["choices"][0]["delta"]["tool_calls"][0]["function"]["arguments"] == '{"a": 1}'
+
+
+def test_astream_generator_frames_and_audits():
+    audited = []
+
+    class BytesResponse:
+        async def aiter_lines(self):
+            yield b'data: {"choices":[{"delta":{"content":"Hi"}}]}'
+            yield b"data: [DONE]"
+
+    chunks = asyncio.run(collect(astream_generator(BytesResponse(), "sse", audit_callback=audited.append)))
+    assert chunks[1] == b'data: {"choices":[{"delta":{"content":"Hi"}}]}\n\n'
+    assert chunks[2] == b"data: [DONE]\n\n"
+    assert b'"finish_reason": "stop"' in chunks[-1]
+    assert len(audited) == 1 and "Hi" in audited[0]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if Handler.failures:
+            Handler.failures -= 1
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b"\n\n".join(LINES[:1] + LINES[-1:]) + b"\n\n"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_provider_stream_retries_rate_limits():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/v1/chat/completions"
+
+    async def run():
+        stream = AsyncProviderStream(url, {"Content-Type": "application/json"}, {"stream": True})
+        lines = [line async for line in stream.aiter_lines() if line]
+        await http_client.aclose()
+        return stream, lines
+
+    try:
+        stream, lines = asyncio.run(run())
+    finally:
+        httpd.shutdown()
+    assert stream.status_code == 200
+    assert lines == [LINES[0], LINES[-1]]
@@ -0,0 +1,92 @@
+"""
+Parity of the dict delta translators with the pydantic stream models and a per chunk benchmark
+"""
+import time
+import pytest
+from percolate.api.routes.chat.models import StreamingCompletionsResponseChunk
+from percolate.services.llm.proxy import translators
+from percolate.services.llm.proxy.models import AnthropicStreamDelta, GoogleStreamDelta, OpenAIStreamDelta
+
+ANTHROPIC = [
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": " Hello"}},
+    {"type": "content_block_start", "index": 1, "content_block": {"type": "tool_use", "id": "toolu_1", "name": "get_weather", "input": {}}},
+    {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": '{"loc'}},
+    {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}},
+    {"type": "message_start", "message": {"id": "msg_1"}},
+]
+GOOGLE = [
+    {"candidates": [{"content": {"parts": [{"text": "Hello"}], "role": "model"}, "finishReason": None}]},
+    {"candidates": [{"content": {"parts": [{"functionCall": {"name": "get_weather", "args": {"location": "Paris"}}}], "role": "model"}, "finishReason": "STOP"}],
+     "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 4, "totalTokenCount": 7}},
+]
+OPENAI = [
+    {"id": "c", "object": "chat.completion.chunk", "created": 1, "model": "gpt-4o", "choices": [{"index": 0, "delta": {"content": " Hi"}, "finish_reason": None}]},
+    {"id": "c", "object": "chat.completion.chunk", "created": 1, "model": "gpt-4o",
+     "choices": [{"index": 0, "delta": {"tool_calls": [{"index": 0, "id": "call_1", "type": "function", "function": {"name": "f", "arguments": ""}}]}, "finish_reason": None}]},
+    {"id": "c", "object": "chat.completion.chunk", "created": 1, "model": "gpt-4o",
+     "choices": [{"index": 0, "delta": {"tool_calls": [{"index": 0, "function": {"arguments": '{"a": 1}'}}]}, "finish_reason": None}]},
+    {"id": "c", "object": "chat.completion.chunk", "created": 1, "model": "gpt-4o", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+     "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3}},
+]
+
+
+def stable(d):
+    """drop the generated ids and timestamps"""
+    if isinstance(d, dict):
+        return {k: stable(v) for k, v in d.items() if k not in ("id", "created")}
+    if isinstance(d, list):
+        return [stable(v) for v in d]
+    return d
+
+
+@pytest.mark.parametrize("chunk", ANTHROPIC)
+def test_anthropic_parity(chunk):
+    model = AnthropicStreamDelta(**chunk)
+    assert stable(translators.anthropic_to_openai(chunk)) == stable(model.to_openai_format())
+    assert stable(translators.get_delta_translator("anthropic", "google")(chunk)) == stable(model.to_google_format())
+    assert stable(translators.to_completions_chunk(chunk, "anthropic", "claude")) == stable(
+        StreamingCompletionsResponseChunk.map_to_canonical_format(chunk, "anthropic", "claude")
+    )
+
+
+@pytest.mark.parametrize("chunk", GOOGLE)
+def test_google_parity(chunk):
+    model = GoogleStreamDelta(**chunk)
+    assert stable(translators.google_to_openai(chunk)) == stable(model.to_openai_format())
+    assert stable(translators.get_delta_translator("google", "anthropic")(chunk)) == stable(model.to_anthropic_format())
+    assert stable(translators.to_completions_chunk(chunk, "google", "gemini")) == stable(
+        StreamingCompletionsResponseChunk.map_to_canonical_format(chunk, "google", "gemini")
+    )
+
+
+@pytest.mark.parametrize("chunk", OPENAI)
+def test_openai_parity(chunk):
+    model = OpenAIStreamDelta(**chunk)
+    assert stable(translators.openai_to_anthropic(chunk)) == stable(model.to_anthropic_format())
+    assert stable(translators.openai_to_google(chunk)) == stable(model.to_google_format())
+    assert translators.to_completions_chunk(chunk, "openai", "gpt-4o") is chunk
+
+
+def test_validation_mode_uses_the_models():
+    with pytest.raises(Exception):
+        translators.get_delta_translator("google", "openai", validate=True)({"no": "candidates"})
+    assert translators.get_delta_translator("google", "openai")({"no": "candidates"})["choices"][0]["delta"] == {}
+
+
+@pytest.mark.benchmark
+def test_benchmark_per_chunk_cost():
+    chunks = ANTHROPIC[:1] * 5000
+    started = time.perf_counter()
+    for c in chunks:
+        AnthropicStreamDelta(**c).to_openai_format()
+        StreamingCompletionsResponseChunk.map_to_canonical_format(c, "anthropic", "claude")
+    pydantic_cost = (time.perf_counter() - started) / len(chunks)
+
+    to_openai = translators.get_delta_translator("anthropic", "openai")
+    started = time.perf_counter()
+    for c in chunks:
+        to_openai(c)
+        translators.to_completions_chunk(c, "anthropic", "claude")
+    dict_cost = (time.perf_counter() - started) / len(chunks)
+
+    assert dict_cost < pydantic_cost
@@ -0,0 +1,83 @@
+"""
+Unit tests for routing between equivalent models (the models are faked)
+"""
+import time
+import pytest
+from percolate.services.llm import ModelRouter as module
+from percolate.services.llm.ModelRouter import ModelRouter
+
+
+@pytest.fixture(autouse=True)
+def few_samples(monkeypatch):
+    monkeypatch.setattr(module, "P8_ROUTING_MIN_SAMPLES", 3)
+
+
+def test_failing_and_slow_models_are_routed_around():
+    router = ModelRouter(routes={"a": ["b", "c"]}, enabled=True, max_p95=1.0)
+    assert router.candidates("a") == ["a", "b", "c"]
+    for _ in range(3):
+        router.record("a", 0.1, False)
+        router.record("b", 2.0, True)
+        router.record("c", 0.5, True)
+    """a is failing and b is slow - they are tried last"""
+    assert router.candidates("a") == ["c", "a", "b"]
+    assert router.get_stats()["models"]["a"]["error_rate"] == 1.0
+    assert ModelRouter(routes={"a": ["b"]}, enabled=False).routes_for("a") == []
+
+
+def test_calls_fall_back_on_errors():
+    router = ModelRouter(routes={}, enabled=True, hedge=False)
+
+    def attempt(model):
+        if model == "a":
+            raise ConnectionError("down")
+        return {"model": model, "ok": model == "c"}
+
+    assert router.call(["a", "b", "c"], attempt, lambda r: r["ok"]) == {"model": "c", "ok": True}
+    assert router.fallbacks == 2
+    """the last result is returned if no model succeeds"""
+    assert router.call(["b"], attempt, lambda r: r["ok"])["model"] == "b"
+    with pytest.raises(ConnectionError):
+        router.call(["a"], attempt, lambda r: r["ok"])
+
+
+def test_hedged_requests_take_the_first_answer():
+    router = ModelRouter(routes={}, enabled=True, hedge=True)
+    for _ in range(3):
+        router.record("slow", 0.05, True)
+
+    def attempt(model):
+        time.sleep(1.0 if model == "slow" else 0.01)
+        return model
+
+    started = time.monotonic()
+    assert router.call(["slow", "fast"], attempt, lambda r: True) == "fast"
+    assert time.monotonic() - started < 0.5
+    assert router.hedges == 1
+
+    """without a p95 there is no deadline and the primary answers"""
+    router = ModelRouter(routes={}, enabled=True, hedge=True)
+    assert router.call(["fast", "slow"], attempt, lambda r: True) == "fast"
+    assert router.hedges == 0
+
+
+def test_streams_only_fall_back_before_the_first_chunk():
+    router = ModelRouter(routes={}, enabled=True, hedge=False)
+    sent = []
+
+    def attempt(model):
+        if model == "a":
+            if fail_after_chunk:
+                sent.append("partial")
+            raise ConnectionError("dropped")
+        sent.append(model)
+        return model
+
+    fail_after_chunk = False
+    assert router.call(["a", "b"], attempt, lambda r: True, committed=lambda: bool(sent)) == "b"
+
+    sent.clear()
+    fail_after_chunk = True
+    with pytest.raises(ConnectionError):
+        router.call(["a", "b"], attempt, lambda r: True, committed=lambda: bool(sent))
+    assert sent == ["partial"] and router.fallbacks == 1
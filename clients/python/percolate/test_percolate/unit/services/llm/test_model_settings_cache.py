@@ -0,0 +1,101 @@
+"""
+Unit tests for the LanguageModelApi settings cache and the notification listener (no database)
+"""
+import json
+from types import SimpleNamespace
+from percolate.services.llm.LanguageModel import LanguageModelSettingsCache
+from percolate.services.PostgresNotificationListener import PostgresNotificationListener
+
+
+def make_cache(ttl=300):
+    cache = LanguageModelSettingsCache(ttl=ttl)
+    cache._subscribed = True
+    calls = []
+
+    def loader(name):
+        calls.append(name)
+        return {"name": name, "token": "t"}
+
+    return cache, loader, calls
+
+
+def test_settings_are_loaded_once():
+    cache, loader, calls = make_cache()
+    a = cache.get("gpt-4o", loader)
+    a["token"] = "changed"
+    b = cache.get("gpt-4o", loader)
+    assert calls == ["gpt-4o"]
+    assert b["token"] == "t"
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_invalidate_by_name_or_everything():
+    cache, loader, calls = make_cache()
+    cache.get("a", loader)
+    cache.get("b", loader)
+    cache.invalidate({"name": "a", "op": "UPDATE"})
+    cache.get("a", loader)
+    cache.get("b", loader)
+    assert calls == ["a", "b", "a"]
+    cache.invalidate(None)
+    assert cache.get_stats()["size"] == 0
+
+
+def test_change_during_load_is_not_cached():
+    cache, _, _ = make_cache()
+
+    def loader(name):
+        cache.invalidate({"name": name})
+        return {"name": name}
+
+    cache.get("a", loader)
+    assert cache.get_stats()["size"] == 0
+
+
+def test_zero_ttl_bypasses_cache():
+    cache, loader, calls = make_cache(ttl=0)
+    cache.get("a", loader)
+    cache.get("a", loader)
+    assert calls == ["a", "a"]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.notifies = []
+        self.executed = []
+
+    def set_isolation_level(self, level):
+        pass
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, q):
+                conn.executed.append(q)
+
+        return Cursor()
+
+    def close(self):
+        pass
+
+
+def test_listener_listens_and_dispatches():
+    conn = FakeConnection()
+    listener = PostgresNotificationListener("postgresql://x", connect=lambda *a, **k: conn)
+    received = []
+    listener._subscribers["p8_language_model_api"] = [received.append]
+    listener._ensure_listening()
+    assert conn.executed == ['LISTEN "p8_language_model_api"']
+
+    conn.notifies.append(SimpleNamespace(channel="p8_language_model_api", payload=json.dumps({"name": "a"})))
+    n = conn.notifies.pop(0)
+    listener._dispatch(n.channel, json.loads(n.payload))
+    listener._dispatch_all()
+    assert received == [{"name": "a"}, None]
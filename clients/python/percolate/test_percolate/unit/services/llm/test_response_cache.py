@@ -0,0 +1,103 @@
+"""
+Unit tests for the LanguageModel response cache (embeddings are faked)
+"""
+import time
+from percolate.models import MessageStack
+from percolate.models.p8 import AIResponse
+from percolate.services.llm.CallingContext import CallingContext
+from percolate.services.llm import ResponseCache as module
+from percolate.services.llm.ResponseCache import ResponseCache
+
+
+def response(content="Dublin", tool_calls=None):
+    return AIResponse(id="r1", model_name="gpt-4o", role="assistant", content=content,
+                      status="RESPONSE", tokens_in=10, tokens_out=5, tool_calls=tool_calls,
+                      verbatim={"role": "assistant", "content": content})
+
+
+def test_exact_hits_are_new_responses():
+    cache = ResponseCache(ttl=60, max_entries=10)
+    messages = MessageStack("capital of ireland?", system_prompt="be brief")
+    ctx = CallingContext(session_id="s2")
+    assert cache.get("gpt-4o", messages, [], ctx) is None
+    cache.put("gpt-4o", messages, [], response(), ctx)
+
+    hit = cache.get("gpt-4o", MessageStack("capital of ireland?", system_prompt="be brief"), [], ctx)
+    assert hit.content == "Dublin" and hit.id != "r1" and hit.session_id == "s2"
+    assert hit.tokens == 0 and hit.verbatim["content"] == "Dublin"
+    """the key includes the system prompt, functions and model"""
+    assert cache.get("gpt-4o", MessageStack("capital of ireland?"), [], ctx) is None
+    assert cache.get("gpt-4o", messages, [{"name": "f"}], ctx) is None
+    assert cache.get("gpt-4o-mini", messages, [], ctx) is None
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 4
+
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    for q in ["a", "b", "c"]:
+        cache.put("m", MessageStack(q), [], response(q))
+    assert cache.get("m", MessageStack("a"), []) is None
+    assert cache.get("m", MessageStack("c"), []).content == "c"
+    assert cache.get_stats()["evictions"] == 1
+
+    cache = ResponseCache(ttl=0.01)
+    cache.put("m", MessageStack("a"), [], response())
+    time.sleep(0.02)
+    assert cache.get("m", MessageStack("a"), []) is None
+
+
+def test_semantic_tier_for_single_turn_content():
+    vectors = {"capital of ireland?": [1, 0], "what is the capital of ireland": [0.99, 0.05], "weather?": [0, 1]}
+    cache = ResponseCache(semantic_threshold=0.95, embed=lambda q: vectors[q])
+    cache.put("m", MessageStack("capital of ireland?"), [], response())
+    assert cache.get("m", MessageStack("what is the capital of ireland"), []).content == "Dublin"
+    assert cache.get("m", MessageStack("weather?"), []) is None
+    assert cache.get_stats()["semantic_hits"] == 1
+
+    """tool calls are not reused for near duplicates"""
+    cache = ResponseCache(semantic_threshold=0.95, embed=lambda q: vectors[q])
+    cache.put("m", MessageStack("capital of ireland?"), [], response(tool_calls=[{"id": "t"}]))
+    assert cache.get("m", MessageStack("what is the capital of ireland"), []) is None
+
+
+def test_enablement(monkeypatch):
+    assert not ResponseCache.is_enabled_for(CallingContext())
+    assert ResponseCache.is_enabled_for(CallingContext(response_cache=True))
+    monkeypatch.setattr(module, "P8_LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(module, "P8_LLM_CACHE_AGENTS", "p8.PercolateAgent")
+    assert ResponseCache.is_enabled_for(CallingContext(agent="p8.PercolateAgent"))
+    assert not ResponseCache.is_enabled_for(CallingContext(agent="p8.Other"))
+    assert not ResponseCache.is_enabled_for(CallingContext(agent="p8.PercolateAgent", response_cache=False))
+
+
+def test_call_api_simple_uses_the_raw_tier(monkeypatch):
+    import importlib
+    import requests
+    from percolate.services.llm.LanguageModel import LanguageModel
+
+    lm_module = importlib.import_module("percolate.services.llm.LanguageModel")
+
+    cache = ResponseCache(ttl=60, max_entries=10)
+    monkeypatch.setattr(lm_module, "response_cache", cache)
+    posts = []
+
+    def post(url, **kwargs):
+        posts.append(kwargs)
+        r = requests.Response()
+        r.status_code = 200
+        r._content = b'{"choices": [{"message": {"content": "Dublin"}}]}'
+        return r
+
+    monkeypatch.setattr(lm_module.http_client, "post", post)
+    llm = LanguageModel.__new__(LanguageModel)
+    llm.model_name = "gpt-4o"
+    llm.params = {"completions_uri": "https://api.openai.com/v1/chat/completions", "token": "t", "scheme": "openai", "model": "gpt-4o"}
+
+    ctx = CallingContext(response_cache=True)
+    assert llm.call_api_simple("capital of ireland?", context=ctx).json() == llm.call_api_simple("capital of ireland?", context=ctx).json()
+    assert len(posts) == 1 and cache.get_stats()["hits"] == 1
+    """streams, other questions and callers that opt out go to the provider"""
+    llm.call_api_simple("capital of france?", context=ctx)
+    llm.call_api_simple("capital of ireland?", context=ctx, use_cache=False)
+    llm.call_api_simple("capital of ireland?", context=CallingContext())
+    assert len(posts) == 4
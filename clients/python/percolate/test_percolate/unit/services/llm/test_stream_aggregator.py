@@ -0,0 +1,84 @@
+"""
+Unit tests and a micro-benchmark for the single pass SSE aggregation in LLMStreamIterator
+"""
+import json
+import time
+import pytest
+from percolate.models.p8 import AIResponse
+from percolate.services.llm.utils.stream_utils import LLMStreamIterator, SSEStreamAggregator
+
+
+def chunk(content=None, tool_calls=None, finish_reason=None, usage=None):
+    data = {"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+    if content is not None:
+        data["choices"][0]["delta"]["content"] = content
+    if tool_calls is not None:
+        data["choices"][0]["delta"]["tool_calls"] = tool_calls
+    if usage:
+        data = {"choices": [], "usage": usage}
+    return f"data: {json.dumps(data)}"
+
+
+def test_aggregator_accepts_str_bytes_and_dicts():
+    agg = SSEStreamAggregator()
+    agg.feed(chunk("Hello"))
+    agg.feed((chunk(" wor") + "\n\n").encode())
+    agg.feed(json.loads(chunk("ld")[6:]))
+    agg.feed(": keep-alive")
+    agg.feed(chunk(usage={"total_tokens": 3}))
+    assert agg.content == "Hello world" and agg.usage == {"total_tokens": 3}
+    assert not agg.done
+    agg.feed(b"data: [DONE]\n\n")
+    assert agg.done
+
+
+def test_tool_call_deltas_are_collapsed():
+    agg = SSEStreamAggregator()
+    agg.feed(chunk(tool_calls=[{"index": 0, "id": "c1", "function": {"name": "search", "arguments": '{"q"'}}]))
+    agg.feed(chunk(tool_calls=[{"index": 0, "function": {"arguments": ': "x"}'}}]))
+    agg.feed(chunk(tool_calls=[{"index": 1, "id": "c2", "function": {"name": "get", "arguments": "{}"}}]))
+    """a collapsed repeat of a call does not duplicate the arguments"""
+    agg.feed(chunk(tool_calls=[{"index": 0, "id": "c1", "function": {"name": "search", "arguments": '{"q": "x"}'}}], finish_reason="tool_calls"))
+    assert [(t["id"], t["function"]["arguments"]) for t in agg.tool_calls] == [("c1", '{"q": "x"}'), ("c2", "{}")]
+    assert agg.finish_reason == "tool_calls"
+
+
+def test_stream_iterator_collects_content_once():
+    def g():
+        yield chunk("a").encode()
+        yield f"{chunk('b')}\n\n"
+        yield AIResponse(id="1", model_name="m", role="assistant", content="", status="RESPONSE")
+        yield chunk(usage={"total_tokens": 2})
+        yield "data: [DONE]"
+
+    it = LLMStreamIterator(g)
+    lines = list(it.iter_lines())
+    assert it.content == "ab" and it.usage == {"total_tokens": 2} and len(it.ai_responses) == 1
+    """a stop is added and [DONE] is sent once"""
+    assert sum(1 for l in lines if l.strip() == b"data: [DONE]") == 1
+    assert any(b'"finish_reason": "stop"' in l.replace(b'":"', b'": "') for l in lines)
+
+
+def stream_of(tokens):
+    lines = [chunk(f" token{i}").encode() for i in range(tokens)]
+
+    def g():
+        yield from lines
+
+    return LLMStreamIterator(g)
+
+
+def test_long_streams_aggregate_every_token():
+    it = stream_of(10_000)
+    for _ in it.iter_lines():
+        pass
+    assert it.content.count("token") == 10_000
+
+
+@pytest.mark.benchmark
+def test_benchmark_10k_token_stream():
+    it = stream_of(10_000)
+    started = time.perf_counter()
+    for _ in it.iter_lines():
+        pass
+    assert time.perf_counter() - started < 2.0
@@ -0,0 +1,64 @@
+"""
+Unit tests for the async repository query building (no database required)
+"""
+import pytest
+from percolate.models.p8 import Agent
+from percolate.services.AsyncPostgresService import AsyncPostgresService
+from percolate.models.utils import SqlModelHelper
+
+
+def test_expand_values_for_upsert_batches():
+    query = SqlModelHelper(Agent).upsert_query(batch_size=2)
+    assert "VALUES %s" in query
+
+    rows = [(1, "a"), (2, "b")]
+    expanded, params = AsyncPostgresService._expand_values(query, rows)
+    assert "VALUES (%s, %s), (%s, %s)" in expanded
+    assert params == (1, "a", 2, "b")
+
+
+def test_select_with_predicates_query_matches_sync_service():
+    helper = SqlModelHelper(Agent)
+    query, data = helper.select_with_predicates_query(
+        filter={"name": "p8.PercolateAgent", "id": ["a", "b"]},
+        fields=["id", "name"],
+        limit=5,
+        order_by="name ASC",
+    )
+    assert (
+        query
+        == 'SELECT id, name FROM p8."Agent" WHERE name = %s AND id = ANY(%s) ORDER BY name ASC LIMIT 5'
+    )
+    assert data == ("p8.PercolateAgent", ["a", "b"])
+
+    _, data = helper.select_with_predicates_query()
+    assert data is None
+
+
+def test_async_repository_inherits_user_context():
+    import percolate as p8
+
+    repo = p8.async_repository(Agent, user_id="u1", role_level=5)
+    other = repo.repository(Agent)
+    assert other.user_id == "u1" and other.role_level == 5
+    assert other.model.get_model_full_name() == "p8.Agent"
+
+
+def test_async_search_fans_out_questions():
+    import asyncio
+    from percolate.models.p8 import Resources
+    from percolate.models import AbstractModel
+
+    repo = AsyncPostgresService.__new__(AsyncPostgresService)
+    repo.model = AbstractModel.Abstracted(Resources)
+    asked = []
+
+    async def execute(query, data=None, **kwargs):
+        asked.append(data[0])
+        return [{"query_text": None, "confidence": 0, "relational_result": None,
+                 "vector_result": [{"id": data[0], "vdistance": 0.5}], "error_message": None}]
+
+    repo.execute = execute
+    result = asyncio.run(repo.search(["q1", "q2"]))
+    assert sorted(asked) == ["q1", "q2"]
+    assert {v["id"] for v in result[0]["vector_result"]} == {"q1", "q2"}
@@ -0,0 +1,105 @@
+"""
+Unit tests for the process-wide batched audit writer using a fake repository write
+"""
+import threading
+import time
+from percolate.models import Session
+from percolate.models.p8 import AIResponse
+from percolate.services.AuditWriter import AuditWriter
+
+
+def make_writer(**kwargs):
+    writes = []
+
+    def write(model, records):
+        writes.append((model, list(records)))
+
+    kwargs.setdefault("flush_interval", 0.05)
+    return AuditWriter(write=write, **kwargs), writes
+
+
+def response(i, session_id="s1"):
+    return AIResponse(id=f"r{i}", model_name="m", role="assistant", content="hi", status="RESPONSE", session_id=session_id)
+
+
+def test_records_are_batched_by_size_and_model():
+    writer, writes = make_writer(batch_size=10, flush_interval=5)
+    writer.submit([response(i) for i in range(10)])
+    writer.submit(Session(id="s1", query="q"))
+    assert writer.flush(timeout=2)
+    assert [(m, len(r)) for m, r in writes] == [(AIResponse, 10), (Session, 1)]
+    stats = writer.get_stats()
+    assert stats["written"] == 11 and stats["dropped"] == 0 and stats["queue_depth"] == 0
+
+
+def test_records_are_flushed_after_the_interval():
+    writer, writes = make_writer(batch_size=100)
+    writer.submit(Session(id="s1", query="q"))
+    deadline = time.monotonic() + 2
+    while not writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writes and writes[0][1][0].id == "s1"
+
+
+def test_the_last_write_of_a_record_wins_within_a_batch():
+    writer, writes = make_writer(batch_size=100, flush_interval=5)
+    writer.submit(Session(id="s1", query="first"))
+    writer.submit(Session(id="s1", query="second"))
+    writer.flush(timeout=2)
+    assert [s.query for s in writes[0][1]] == ["second"]
+
+
+def test_a_full_queue_drops_without_blocking_the_caller():
+    release = threading.Event()
+    writer = AuditWriter(max_queue=2, batch_size=1, flush_interval=0.01, enqueue_timeout=0, write=lambda m, r: release.wait(2))
+    started = time.monotonic()
+    results = [writer.submit(Session(id=f"s{i}", query="q")) for i in range(10)]
+    assert time.monotonic() - started < 0.5
+    assert not all(results)
+    assert writer.get_stats()["dropped"] >= 1
+    release.set()
+
+
+def test_a_full_queue_waits_briefly_by_default():
+    release = threading.Event()
+    writer = AuditWriter(max_queue=1, batch_size=1, flush_interval=0.01, write=lambda m, r: release.wait(2))
+    assert writer.enqueue_timeout > 0
+    """the writer holds one record and the queue another - the next caller waits for the slow flush"""
+    writer.submit(Session(id="s0", query="q"))
+    time.sleep(0.05)
+    writer.submit(Session(id="s1", query="q"))
+    threading.Timer(0.05, release.set).start()
+    assert writer.submit(Session(id="s2", query="q"))
+    assert writer.flush(timeout=2) and writer.get_stats()["dropped"] == 0
+
+
+def test_tasks_run_after_earlier_records_and_failures_are_counted():
+    writer, writes = make_writer(batch_size=100, flush_interval=5)
+    seen = []
+    writer.submit(Session(id="s1", query="q"))
+    writer.submit_task(lambda: seen.append(len(writes)))
+    writer.submit_task(lambda: 1 / 0)
+    writer.flush(timeout=2)
+    assert seen == [1]
+    assert writer.get_stats()["failed"] == 1 and writer.get_stats()["tasks"] == 1
+
+
+def test_records_returned_by_tasks_join_the_batch_without_requeueing():
+    """a full queue must not stall the writer on records produced by its own tasks"""
+    writer, writes = make_writer(max_queue=1, batch_size=100, flush_interval=0.05, enqueue_timeout=1)
+    writer.submit_task(lambda: [(Session, Session(id="s1", query="q")), (Session, [Session(id="s2", query="q")])])
+    started = time.monotonic()
+    assert writer.flush(timeout=2)
+    assert time.monotonic() - started < 0.5
+    assert [r.id for _, records in writes for r in records] == ["s1", "s2"]
+    stats = writer.get_stats()
+    assert stats["written"] == 2 and stats["enqueued"] == 3 and stats["dropped"] == 0
+
+
+def test_close_drains_the_queue():
+    writer, writes = make_writer(batch_size=1000, flush_interval=60)
+    writer.submit([response(i) for i in range(50)])
+    writer.close(timeout=2)
+    assert sum(len(r) for _, r in writes) == 50
+    assert writer.submit(response(99)) is False
+    assert writer.get_stats()["dropped"] == 1
@@ -0,0 +1,86 @@
+"""
+Unit tests for batch agent runs using fake runners
+"""
+import json
+import threading
+import time
+from percolate.services.BatchRunner import BatchRunner
+
+
+class FakeRunner:
+    created = []
+
+    def __init__(self, fail_on=(), delay=0.01):
+        self.fail_on = fail_on
+        self.delay = delay
+        self.thread = threading.current_thread().name
+        FakeRunner.created.append(self)
+
+    def run(self, question, context=None, limit=None, audit=True):
+        time.sleep(self.delay)
+        if question in self.fail_on:
+            raise ValueError(f"cannot answer {question}")
+        return question.upper()
+
+
+def make_batch(checkpoint=None, concurrency=3, **kwargs):
+    FakeRunner.created = []
+    return BatchRunner(
+        "test.Agent", concurrency=concurrency, checkpoint=checkpoint, runner_factory=lambda: FakeRunner(**kwargs)
+    )
+
+
+def test_batch_answers_all_questions_with_one_runner_per_worker():
+    questions = [f"q{i}" for i in range(20)]
+    summary = make_batch().run(questions)
+    assert summary.total == 20 and summary.completed == 20 and summary.failed == 0
+    assert [r.answer for r in summary.results] == [q.upper() for q in questions]
+    assert len(FakeRunner.created) <= 3
+    assert summary.throughput > 0 and summary.latency_p95 >= summary.latency_p50 > 0
+
+
+def test_concurrency_is_bounded():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    class Counting(FakeRunner):
+        def run(self, *args, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                return super().run(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+    BatchRunner("test.Agent", concurrency=2, runner_factory=Counting).run([f"q{i}" for i in range(10)])
+    assert peak[0] == 2
+
+
+def test_results_stream_as_they_complete_and_failures_are_reported():
+    batch = make_batch(fail_on=("q1",))
+    seen = []
+    summary = batch.run(["q0", "q1", "q2"], on_result=seen.append)
+    assert len(seen) == 3
+    assert summary.failed == 1 and "cannot answer" in summary.results[1].error
+
+
+def test_an_interrupted_batch_resumes_from_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "batch.jsonl")
+    questions = [f"q{i}" for i in range(10)]
+    stream = make_batch(checkpoint=checkpoint, concurrency=1).stream(questions)
+    for _ in range(4):
+        next(stream)
+    stream.close()
+    with open(checkpoint) as f:
+        assert len([json.loads(l) for l in f]) >= 4
+
+    summary = make_batch(checkpoint=checkpoint, fail_on=("q9",)).run(questions)
+    assert summary.resumed >= 4
+    assert summary.resumed + summary.completed + summary.failed == 10
+    assert all(r.answer == r.question.upper() for r in summary.results[:9])
+
+    """failed questions are retried on the next run"""
+    summary = make_batch(checkpoint=checkpoint).run(questions)
+    assert summary.resumed == 9 and summary.completed == 1
@@ -0,0 +1,242 @@
+"""
+Unit tests for the job queue and worker pools using an in-memory queue and a fake repository
+"""
+import threading
+import time
+import pytest
+from percolate.models.p8 import Job, JobStatus
+from percolate.services.tasks.JobQueue import (
+    JobQueue,
+    WorkerPool,
+    execute_job,
+    job_handler,
+    retry_delay,
+)
+
+
+@job_handler("test.add")
+def add(a, b):
+    return a + b
+
+
+@job_handler("test.flaky")
+def flaky(fail):
+    if fail:
+        raise ValueError("boom")
+    return {"ok": True}
+
+
+class MemoryQueue:
+    """the JobQueue interface over a list"""
+
+    def __init__(self, jobs):
+        self.jobs = {j.id: j for j in jobs}
+        self.results = {}
+        self.renewed = []
+        self.lock = threading.Lock()
+
+    def claim(self, queue, worker_id, limit=1):
+        with self.lock:
+            due = [j for j in self.jobs.values() if j.queue == queue and j.status == JobStatus.Queued.value][:limit]
+            for j in due:
+                j.status, j.attempts, j.locked_by = JobStatus.Running.value, j.attempts + 1, worker_id
+            return [j.model_copy() for j in due]
+
+    def renew(self, job_ids, worker_id):
+        self.renewed.append(sorted(job_ids))
+        return len(job_ids)
+
+    def complete(self, job, result=None):
+        self.jobs[job.id].status = JobStatus.Completed.value
+        self.results[job.id] = result
+        return True
+
+    def fail(self, job, error):
+        stored = self.jobs[job.id]
+        stored.error = error
+        stored.status = JobStatus.Queued.value if job.attempts < job.max_attempts else JobStatus.Failed.value
+        return stored.status == JobStatus.Queued.value
+
+    def requeue_stale(self, queue, lease_seconds=None):
+        return 0
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_execute_job_runs_the_named_handler():
+    assert execute_job("test.add", {"a": 1, "b": 2}) == 3
+    with pytest.raises(KeyError):
+        execute_job("test.missing", {})
+
+
+def test_retry_delay_doubles_per_attempt():
+    assert [retry_delay(n, backoff=10) for n in (1, 2, 3)] == [10, 20, 40]
+
+
+def test_pool_runs_jobs_and_stores_results():
+    jobs = [Job(name="test.add", payload={"a": i, "b": 1}) for i in range(5)]
+    memory = MemoryQueue(jobs)
+    pool = WorkerPool(concurrency=2, job_queue=memory, poll_interval=0.01)
+    thread = threading.Thread(target=pool.run, daemon=True)
+    thread.start()
+    assert wait_for(lambda: len(memory.results) == 5)
+    pool.stop()
+    assert sorted(memory.results.values()) == [1, 2, 3, 4, 5]
+    assert pool.get_stats()["completed"] == 5 and pool.get_stats()["in_flight"] == 0
+
+
+def test_failed_jobs_are_retried_until_max_attempts():
+    job = Job(name="test.flaky", payload={"fail": True}, max_attempts=2)
+    memory = MemoryQueue([job])
+    pool = WorkerPool(job_queue=memory, poll_interval=0.01)
+    pool.run_once()
+    assert wait_for(lambda: pool.retried == 1)
+    assert memory.jobs[job.id].status == JobStatus.Queued.value
+    pool.run_once()
+    assert wait_for(lambda: pool.failed == 1)
+    pool.stop()
+    assert memory.jobs[job.id].status == JobStatus.Failed.value
+    assert "boom" in memory.jobs[job.id].error
+
+
+def test_pool_only_claims_free_slots():
+    release = threading.Event()
+
+    @job_handler("test.block")
+    def block():
+        release.wait(5)
+
+    memory = MemoryQueue([Job(name="test.block") for _ in range(3)])
+    pool = WorkerPool(concurrency=2, job_queue=memory)
+    assert pool.run_once() == 2
+    assert pool.run_once() == 0
+    release.set()
+    assert wait_for(lambda: pool.completed == 2)
+    assert pool.run_once() == 1
+    pool.stop()
+
+
+def test_process_pool_runs_registered_handlers():
+    memory = MemoryQueue([Job(name="test.add", payload={"a": 20, "b": 22})])
+    pool = WorkerPool(job_queue=memory, mode="process", concurrency=1)
+    pool.run_once()
+    assert wait_for(lambda: pool.completed == 1, timeout=30)
+    pool.stop()
+    assert list(memory.results.values()) == [42]
+
+
+class FakeRepository:
+    def __init__(self, rows=None):
+        self.statements = []
+        self.rows = rows or []
+
+    def execute(self, query, data=None):
+        self.statements.append((query, data))
+        return self.rows
+
+    def update_records(self, records):
+        self.saved = records
+
+
+def test_claim_skips_rows_locked_by_other_workers():
+    repo = FakeRepository(rows=[{"id": "j1", "name": "test.add", "queue": "default", "status": "RUNNING", "attempts": 1, "max_attempts": 3}])
+    jobs = JobQueue(service=repo).claim("default", "w1", limit=5)
+    query, data = repo.statements[0]
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert data[-1] == 5 and jobs[0].id == "j1"
+
+
+def test_fail_requeues_with_backoff_then_fails():
+    repo = FakeRepository(rows=[{"id": "j1"}])
+    queue = JobQueue(service=repo)
+    assert queue.fail(Job(id="j1", name="x", attempts=1, max_attempts=2, locked_by="w1"), "err") is True
+    assert repo.statements[-1][1][0] == JobStatus.Queued.value
+    assert queue.fail(Job(id="j1", name="x", attempts=2, max_attempts=2, locked_by="w1"), "err") is False
+    assert repo.statements[-1][1][0] == JobStatus.Failed.value
+
+
+def test_only_the_worker_holding_the_lease_settles_the_job():
+    repo = FakeRepository()
+    queue = JobQueue(service=repo)
+    job = Job(id="j1", name="x", attempts=1, max_attempts=2, locked_by="w1")
+    """no row matched - the lease expired and the job was requeued for another worker"""
+    assert queue.complete(job, {"ok": True}) is False
+    assert queue.fail(job, "err") is None
+    for query, data in repo.statements:
+        assert "locked_by = %s AND status = %s" in query
+        assert data[-2:] == ("w1", JobStatus.Running.value)
+
+
+def test_delayed_jobs_are_due_on_the_database_clock():
+    repo = FakeRepository(rows=[{"run_at": "2026-01-01T00:01:00"}])
+    job = JobQueue(service=repo).enqueue("test.add", {"a": 1, "b": 2}, delay_seconds=60)
+    query, data = repo.statements[0]
+    assert "CURRENT_TIMESTAMP + make_interval" in query and data == (60,)
+    assert job.run_at.minute == 1
+
+
+def test_running_jobs_renew_their_lease():
+    release = threading.Event()
+
+    @job_handler("test.long")
+    def long_job():
+        release.wait(5)
+
+    memory = MemoryQueue([Job(name="test.long")])
+    pool = WorkerPool(job_queue=memory, poll_interval=0.01)
+    pool.renew_interval = 0.02
+    thread = threading.Thread(target=pool.run, daemon=True)
+    thread.start()
+    assert wait_for(lambda: len(memory.renewed) >= 2)
+    release.set()
+    pool.stop()
+    assert memory.renewed[-1] == [next(iter(memory.jobs))]
+
+    repo = FakeRepository(rows=[{"id": "j1"}])
+    assert JobQueue(service=repo).renew(["j1", "j2"], "w1") == 1
+    query, data = repo.statements[0]
+    assert "SET locked_at = CURRENT_TIMESTAMP" in query and data == (["j1", "j2"], "w1", JobStatus.Running.value)
+
+
+def test_batch_jobs_resume_from_the_answers_saved_on_the_job(monkeypatch):
+    import sys
+
+    job_queue_module = sys.modules["percolate.services.tasks.JobQueue"]
+    from percolate.services.BatchRunner import BatchRunner
+    from percolate.services.tasks.JobQueue import run_agent_batch
+
+    row = Job(id="2f1c4f7e-0000-4000-8000-000000000001", name="agent.batch")
+    asked = []
+
+    class RowQueue:
+        def get(self, job_id):
+            return row
+
+        def save_progress(self, job_id, result):
+            row.result = result
+
+    class Runner:
+        def run(self, question, **kwargs):
+            asked.append(question)
+            if question in fail_on:
+                raise ValueError("no answer")
+            return question.upper()
+
+    monkeypatch.setattr(job_queue_module, "JobQueue", RowQueue)
+    monkeypatch.setattr(BatchRunner, "_default_factory", staticmethod(lambda agent, **kwargs: Runner))
+    questions = [f"q{i}" for i in range(5)]
+
+    fail_on = {"q3"}
+    first = run_agent_batch("test.Agent", questions, concurrency=2, job_id=row.id)
+    assert first.failed == 1 and len(row.result["checkpoint"]) == 4
+
+    """a retry on another worker has no local file - it resumes from the job row"""
+    fail_on, asked[:] = set(), []
+    second = run_agent_batch("test.Agent", questions, concurrency=2, job_id=row.id)
+    assert asked == ["q3"] and second.resumed == 4 and second.completed == 1
+    assert [r.answer for r in second.results] == [q.upper() for q in questions]
@@ -0,0 +1,123 @@
+"""
+Unit tests for the versioned agent model cache (rows come from a fake fetch, no database)
+"""
+import time
+import pytest
+from percolate.services.ModelCache import ModelCache
+
+
+@pytest.fixture
+def cache():
+    cache = ModelCache()
+    cache._initialize()
+    cache._subscribed = True
+    yield cache
+    cache._initialize()
+
+
+class Table:
+    """p8.Agent rows by name and the models built from them"""
+
+    def __init__(self, **rows):
+        self.rows = rows
+        self.fetches = []
+        self.builds = []
+
+    def fetch(self, name):
+        self.fetches.append(name)
+        return self.rows.get(name)
+
+    def build(self, row):
+        self.builds.append(row["name"])
+        return type(row["name"].replace(".", "_"), (), {"version": row["updated_at"]})
+
+    def load(self, cache, name):
+        return cache.load_agent(name, self.fetch, self.build)
+
+
+def test_agents_are_built_once_and_served_without_a_query(cache):
+    table = Table(**{"public.Bot": {"name": "public.Bot", "updated_at": "v1"}})
+    first = table.load(cache, "public.Bot")
+    assert table.load(cache, "public.Bot") is first
+    assert table.fetches == ["public.Bot"] and table.builds == ["public.Bot"]
+    assert cache.get_stats()["agents"]["hits"] == 1
+
+
+def test_expired_agents_are_only_rebuilt_when_the_row_version_changes(cache):
+    table = Table(**{"public.Bot": {"name": "public.Bot", "updated_at": "v1"}})
+    cache._agent_ttl = 0.01
+    first = table.load(cache, "public.Bot")
+    time.sleep(0.02)
+    assert table.load(cache, "public.Bot") is first
+    table.rows["public.Bot"] = {"name": "public.Bot", "updated_at": "v2"}
+    time.sleep(0.02)
+    assert table.load(cache, "public.Bot").version == "v2"
+    stats = cache.get_stats()["agents"]
+    assert (stats["builds"], stats["revalidations"], len(table.fetches)) == (2, 1, 3)
+
+
+def test_missing_agents_are_cached_briefly(cache):
+    table = Table()
+    assert table.load(cache, "public.Missing") is None
+    assert table.load(cache, "public.Missing") is None
+    assert table.fetches == ["public.Missing"]
+    assert cache.get_stats()["agents"]["negative_hits"] == 1
+    cache._negative_ttl = 0
+    cache.clear()
+    table.load(cache, "public.Missing")
+    table.load(cache, "public.Missing")
+    assert len(table.fetches) == 3
+
+
+def test_missing_agents_are_bounded(cache):
+    """names come from requests so only the most recently used misses are kept"""
+    table = Table()
+    cache._negative_max_size = 3
+    for i in range(10):
+        table.load(cache, f"public.Missing{i}")
+    table.load(cache, "public.Missing7")
+    table.load(cache, "public.Missing10")
+    stats = cache.get_stats()["agents"]
+    assert stats["missing"] == 3 and stats["size"] == 0 and stats["negative_hits"] == 1
+    assert list(cache._missing) == ["public.Missing9", "public.Missing7", "public.Missing10"]
+
+
+def test_notifications_drop_the_changed_agent(cache):
+    table = Table(
+        **{
+            "public.Bot": {"name": "public.Bot", "updated_at": "v1"},
+            "public.Other": {"name": "public.Other", "updated_at": "v1"},
+        }
+    )
+    table.load(cache, "public.Bot")
+    table.load(cache, "public.Other")
+    table.load(cache, "public.New")
+    table.rows["public.New"] = {"name": "public.New", "updated_at": "v1"}
+    cache.invalidate_agent({"table": "p8.Agent", "op": "INSERT", "name": "public.New"})
+    cache.invalidate_agent({"table": "p8.Agent", "op": "UPDATE", "name": "public.Bot"})
+    assert table.load(cache, "public.New") is not None
+    table.load(cache, "public.Bot")
+    table.load(cache, "public.Other")
+    assert table.fetches == ["public.Bot", "public.Other", "public.New", "public.New", "public.Bot"]
+    cache.invalidate_agent(None)
+    assert cache.get_stats()["agents"]["size"] == 0
+
+
+def test_a_change_during_the_load_is_not_cached(cache):
+    table = Table(**{"public.Bot": {"name": "public.Bot", "updated_at": "v1"}})
+
+    def fetch(name):
+        cache.invalidate_agent({"name": name})
+        return table.fetch(name)
+
+    cache.load_agent("public.Bot", fetch, table.build)
+    assert cache.get_stats()["agents"]["size"] == 0
+
+
+def test_fetch_errors_are_raised_and_not_cached(cache):
+    def fetch(name):
+        raise ConnectionError("database is down")
+
+    with pytest.raises(ConnectionError):
+        cache.load_agent("public.Bot", fetch, lambda row: None)
+    assert cache.get_stats()["agents"]["size"] == 0
@@ -0,0 +1,114 @@
+"""
+Unit tests for the ModelRunner warm pool and runner clones (runners are built without a database)
+"""
+import importlib
+import threading
+import time
+import pytest
+import percolate.interface as interface
+from percolate.models import MessageStack
+from percolate.services.FunctionManager import FunctionManager
+from percolate.services.ModelRunner import ModelRunner
+from percolate.services.ModelRunnerCache import ModelRunnerCache, get_runner, runner_key
+
+cache_module = importlib.import_module("percolate.services.ModelRunnerCache")
+
+
+class _Agent:
+    @staticmethod
+    def get_model_full_name():
+        return "test.Agent"
+
+
+def lookup(name: str):
+    """looks up things"""
+    return name
+
+
+def stamp(note: str):
+    """records a note"""
+    return note
+
+
+def make_runner(*args, **kwargs):
+    fm = FunctionManager.__new__(FunctionManager)
+    fm._functions, fm._function_access_levels, fm._serial_functions = {}, {}, set()
+    runner = ModelRunner.__new__(ModelRunner)
+    runner._function_manager = fm
+    runner._context = None
+    runner.agent_model = _Agent
+    runner.messages = MessageStack(None)
+    runner.user_id = runner.user_groups = None
+    runner.role_level = kwargs.get("role_level")
+    fm.add_function(runner.get_entities)
+    fm.add_function(lookup)
+    return runner
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    cache = ModelRunnerCache()
+    cache._initialize()
+    builds = []
+
+    def build(model, **kwargs):
+        time.sleep(0.05)
+        builds.append((model, kwargs.get("role_level")))
+        return make_runner(**kwargs)
+
+    monkeypatch.setattr(cache_module, "ModelRunner", build)
+    monkeypatch.setattr(interface, "try_load_model", lambda name: _Agent if name == "test.Agent" else None)
+    yield cache, builds
+    cache._initialize()
+
+
+def test_clones_have_their_own_state():
+    template = make_runner()
+    a, b = template.clone(user_id="a"), template.clone(user_id="b", role_level=10)
+    a.messages.add({"role": "user", "content": "hi"})
+    a._function_manager.add_function(stamp)
+    assert len(b.messages.data) == 0 and len(template.messages.data) == 0
+    assert "stamp" in a.functions and "stamp" not in b.functions and "stamp" not in template.functions
+    assert a.functions["get_entities"].fn.__self__ is a
+    assert template.functions["get_entities"].fn.__self__ is template
+    assert a.functions["lookup"] is template.functions["lookup"]
+    assert (a.user_id, b.user_id, b.role_level) == ("a", "b", 10)
+
+
+def test_templates_are_keyed_by_agent_and_role_level(pool):
+    cache, builds = pool
+    first = get_runner("test-Agent", user_id="u1")
+    second = get_runner("test.Agent", user_id="u2")
+    admin = get_runner("test.Agent", user_id="u3", role_level=1)
+    assert first is not second and first.user_id == "u1" and second.user_id == "u2"
+    assert builds == [(_Agent, None), (_Agent, 1)]
+    stats = cache.get_stats()
+    assert stats["builds"] == 2 and stats["clones"] == 3 and stats["hit_count"] == 1
+    assert set(stats["cached_runners"]) == {runner_key("test.Agent"), runner_key("test.Agent", 1)}
+
+
+def test_concurrent_requests_build_the_template_once(pool):
+    cache, builds = pool
+    runners = []
+    threads = [threading.Thread(target=lambda: runners.append(get_runner("test.Agent"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1 and len(runners) == 8 and len({id(r) for r in runners}) == 8
+
+
+def test_unknown_agents_fall_back_to_a_pooled_resources_runner(pool):
+    cache, builds = pool
+    assert get_runner("missing.Agent", fallback_to_resources=False) is None
+    get_runner("missing.Agent")
+    get_runner("missing.Agent")
+    assert [m.get_model_full_name() for m, _ in builds] == ["p8.Resources"]
+
+
+def test_least_recently_used_templates_are_evicted(pool):
+    cache, builds = pool
+    cache._max_size = 1
+    get_runner("test.Agent")
+    get_runner("test.Agent", role_level=1)
+    assert cache.get_stats()["evictions"] == 1
@@ -0,0 +1,145 @@
+"""
+Unit tests for concurrent tool calls in the ModelRunner (functions are local callables, no database)
+"""
+import importlib
+import threading
+import time
+import pytest
+from percolate.services import ModelRunner as model_runner_module
+from percolate.services.ModelRunner import ModelRunner
+from percolate.services.FunctionManager import FunctionManager
+from percolate.services.llm import FunctionCall
+from percolate.utils.decorators import tool
+
+
+class _Agent:
+    @staticmethod
+    def get_model_full_name():
+        return "test.Agent"
+
+
+def make_runner(*functions):
+    fm = FunctionManager.__new__(FunctionManager)
+    fm._functions, fm._function_access_levels, fm._serial_functions = {}, {}, set()
+    for f in functions:
+        fm.add_function(f)
+    runner = ModelRunner.__new__(ModelRunner)
+    runner._function_manager = fm
+    runner._context = None
+    runner.agent_model = _Agent
+    return runner
+
+
+def as_dict(message):
+    return message if isinstance(message, dict) else message.model_dump()
+
+
+def call(name, i):
+    return FunctionCall(id=f"call_{i}", name=name, arguments={"i": i})
+
+
+def slow_search(i: int):
+    """search slowly"""
+    time.sleep(0.2)
+    return {"i": i, "thread": threading.current_thread().name}
+
+
+def test_tool_calls_run_concurrently_in_call_order():
+    runner = make_runner(slow_search)
+    start = time.monotonic()
+    results = [as_dict(r) for r in runner._call_functions([call("slow_search", i) for i in range(3)])]
+    assert time.monotonic() - start < 0.5
+    assert [r["tool_call_id"] for r in results] == ["call_0", "call_1", "call_2"]
+    assert all('"p8-tool' in r["content"] for r in results)
+
+
+order = []
+
+
+@tool(thread_safe=False)
+def activate(i: int):
+    """changes state"""
+    order.append(("activate", i, threading.current_thread().name))
+    return {}
+
+
+def record(i: int):
+    """reads state"""
+    time.sleep(0.05)
+    order.append(("record", i))
+    return {}
+
+
+def test_serial_functions_are_barriers():
+    order.clear()
+    runner = make_runner(activate, record)
+    assert not runner._function_manager.is_thread_safe("activate")
+    runner._call_functions([call("record", 0), call("record", 1), call("activate", 2), call("record", 3)])
+    assert {o[:2] for o in order[:2]} == {("record", 0), ("record", 1)}
+    assert order[2] == ("activate", 2, threading.current_thread().name)
+    assert order[3] == ("record", 3)
+
+
+def test_tool_call_timeout(monkeypatch):
+    monkeypatch.setattr(model_runner_module, "P8_TOOL_CALL_TIMEOUT", 0.05)
+    runner = make_runner(slow_search)
+    results = [as_dict(r) for r in runner._call_functions([call("slow_search", 0), call("slow_search", 1)])]
+    assert all("did not complete" in r["content"] for r in results)
+
+
+def test_queued_calls_get_the_full_timeout(monkeypatch):
+    monkeypatch.setattr(model_runner_module, "P8_TOOL_CALL_TIMEOUT", 0.3)
+    monkeypatch.setattr(model_runner_module, "P8_TOOL_CALL_CONCURRENCY", 1)
+    runner = make_runner(slow_search)
+    """three 0.2s calls one at a time take 0.6s but none runs for longer than its own timeout"""
+    results = [as_dict(r) for r in runner._call_functions([call("slow_search", i) for i in range(3)])]
+    assert all("did not complete" not in r["content"] for r in results)
+
+
+def test_timed_out_calls_free_their_slot(monkeypatch):
+    monkeypatch.setattr(model_runner_module, "P8_TOOL_CALL_TIMEOUT", 0.1)
+    monkeypatch.setattr(model_runner_module, "P8_TOOL_CALL_CONCURRENCY", 2)
+    release = threading.Event()
+
+    def hang(i: int):
+        """never returns in time"""
+        release.wait(5)
+        return {}
+
+    def quick(i: int):
+        """returns straight away"""
+        return {"i": i}
+
+    runner = make_runner(hang, quick)
+    start = time.monotonic()
+    results = [as_dict(r) for r in runner._call_functions([call("hang", 0), call("hang", 1), call("quick", 2)])]
+    release.set()
+    assert time.monotonic() - start < 1
+    assert ["did not complete" in r["content"] for r in results] == [True, True, False]
+
+
+def test_tool_calls_share_the_fan_out_slots_with_search(monkeypatch):
+    pool_module = importlib.import_module("percolate.services.PostgresConnectionPool")
+    monkeypatch.setattr(pool_module, "_fan_out_slots", threading.BoundedSemaphore(1))
+    runner = make_runner(slow_search)
+    assert pool_module.acquire_fan_out(1) == 1
+    try:
+        start = time.monotonic()
+        runner._call_functions([call("slow_search", i) for i in range(2)])
+        """no free slot so the calls ran one after the other"""
+        assert time.monotonic() - start >= 0.4
+    finally:
+        pool_module.release_fan_out(1)
+    start = time.monotonic()
+    runner._call_functions([call("slow_search", i) for i in range(2)])
+    assert time.monotonic() - start < 0.4
+    time.sleep(0.05)
+    assert pool_module.acquire_fan_out(1) == 1
+    pool_module.release_fan_out(1)
+
+
+def test_errors_are_formatted_for_the_model():
+    runner = make_runner(slow_search)
+    results = [as_dict(r) for r in runner._call_functions([call("missing_function", 0), call("slow_search", 1)])]
+    assert "Error" in results[0]["content"] or "error" in results[0]["content"]
+    assert '"i": 1' in results[1]["content"]
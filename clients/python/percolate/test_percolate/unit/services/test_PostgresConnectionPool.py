@@ -0,0 +1,161 @@
+"""
+Unit tests for the process-wide postgres connection pool using fake connections
+"""
+import threading
+import time
+import pytest
+import psycopg2
+import importlib
+from percolate.services.PostgresConnectionPool import (
+    PostgresConnectionPool,
+    PoolTimeoutError,
+    acquire_fan_out,
+    release_fan_out,
+    fan_out,
+)
+
+pool_module = importlib.import_module("percolate.services.PostgresConnectionPool")
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, data=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.conn.statements.append(query)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect(conn_string, **kw):
+        c = FakeConnection()
+        opened.append(c)
+        return c
+
+    pool = PostgresConnectionPool("postgresql://test", connect=connect, **kwargs)
+    return pool, opened
+
+
+def test_connections_are_reused_and_reset():
+    pool, opened = make_pool(max_size=2)
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+    assert len(opened) == 1
+    assert "RESET ALL" in first.statements
+    stats = pool.get_stats()
+    assert stats["checkouts"] == 2 and stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_expired_connections_are_recycled():
+    pool, opened = make_pool(max_lifetime=1)
+    with pool.connection() as conn:
+        first = conn
+    pool._idle[0].created_at -= 5
+    with pool.connection() as conn:
+        assert conn is not first
+    assert first.closed
+    assert pool.get_stats()["recycled"] == 1
+
+
+def test_unhealthy_connections_are_replaced():
+    pool, opened = make_pool(health_check_seconds=0)
+    with pool.connection() as conn:
+        first = conn
+    first.broken = True
+    with pool.connection() as conn:
+        assert conn is not first
+    assert pool.get_stats()["failed_health_checks"] == 1
+
+
+def test_broken_connections_are_discarded_on_error():
+    pool, opened = make_pool()
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise psycopg2.OperationalError("lost")
+    assert conn.closed
+    assert pool.get_stats()["open"] == 0
+
+
+def test_exhausted_pool_blocks_then_times_out():
+    pool, opened = make_pool(max_size=1, timeout=0.2)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+
+    """a waiting caller gets the connection as soon as it is returned"""
+    pool.timeout = 2
+    threading.Timer(0.1, lambda: pool.putconn(conn)).start()
+    started = time.monotonic()
+    assert pool.getconn() is conn
+    assert time.monotonic() - started < 1.5
+
+
+def test_maintain_fills_to_min_size():
+    pool, opened = make_pool(min_size=3, max_size=5)
+    assert pool.maintain() == 3
+    assert pool.get_stats()["idle"] == 3
+    assert pool.maintain() == 0
+
+
+def test_nested_fan_out_shares_the_process_wide_slots(monkeypatch):
+    monkeypatch.setattr(pool_module, "_fan_out_slots", threading.BoundedSemaphore(2))
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return 1
+
+    def question():
+        return sum(fan_out([work, work]))
+
+    assert fan_out([question] * 4) == [2] * 4
+    """the caller's thread and two slots - nested calls found no free slot and ran in sequence"""
+    assert peak[0] == 3
+    assert acquire_fan_out(3) == 2
+    release_fan_out(2)
+
+
+def test_fan_out_runs_in_sequence_without_slots(monkeypatch):
+    monkeypatch.setattr(pool_module, "_fan_out_slots", threading.BoundedSemaphore(1))
+    assert acquire_fan_out(1) == 1
+    try:
+        names = fan_out([lambda: threading.current_thread().name] * 2)
+    finally:
+        release_fan_out(1)
+    assert names == [threading.current_thread().name] * 2
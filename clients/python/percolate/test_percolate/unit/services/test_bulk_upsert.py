@@ -0,0 +1,77 @@
+"""
+Unit tests for the COPY based bulk loader query building and encoding (no database required)
+"""
+import datetime
+import uuid
+from percolate.models.p8 import Agent
+from percolate.models.utils import SqlModelHelper
+from percolate.services.PostgresService import _IterableTextIO
+
+
+def test_copy_text_encoding():
+    row = SqlModelHelper.copy_text_row(
+        [
+            None,
+            True,
+            3,
+            "tab\there\nnew line \\ slash",
+            ["a", 'say "hi"', None],
+            datetime.datetime(2025, 1, 2, 3, 4, 5),
+        ]
+    )
+    assert row == (
+        "\\N\tt\t3\ttab\\there\\nnew line \\\\ slash\t"
+        '{"a","say \\\\"hi\\\\"",NULL}\t2025-01-02T03:04:05\n'
+    )
+
+
+def test_bulk_merge_query_dedupes_and_counts():
+    helper = SqlModelHelper(Agent)
+    query = helper.bulk_merge_query("_stage", ["id", "name", "description"])
+    assert 'INSERT INTO p8."Agent" (id, name, description)' in query
+    assert "SELECT DISTINCT ON (id) id, name, description FROM _stage" in query
+    assert "ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, description = EXCLUDED.description" in query
+    assert "count(*) FILTER (WHERE inserted) AS inserted" in query
+
+    assert helper.copy_query("_stage", ["id", "name"]) == "COPY _stage (id, name) FROM STDIN"
+    assert "LIKE p8.\"Agent\" INCLUDING DEFAULTS" in helper.create_staging_table_query("_stage")
+
+
+def test_rows_are_streamed_in_chunks():
+    lines = (SqlModelHelper.copy_text_row([str(uuid.uuid4()), i]) for i in range(100))
+    reader = _IterableTextIO(lines)
+    chunks = []
+    while chunk := reader.read(512):
+        assert len(chunk) <= 512
+        chunks.append(chunk)
+    assert "".join(chunks).count("\n") == 100
+
+
+def test_update_records_returns_rows_for_large_collections_unless_bulk_is_requested():
+    from percolate.services.PostgresService import PostgresService
+
+    pg = PostgresService.__new__(PostgresService)
+    pg.model = Agent
+    pg.helper = SqlModelHelper(Agent)
+    pg.execute_upsert = lambda query, data: [{"id": row[pg.helper.field_names.index("id")]} for row in data]
+    pg.bulk_upsert = lambda records, index_entities=False: {"inserted": len(records), "updated": 0}
+    records = [Agent(id=str(uuid.uuid4()), name=f"a{i}", description="d", spec={}) for i in range(1500)]
+
+    result = pg.update_records(records, batch_size=2000)
+    assert isinstance(result, list) and len(result) == 1500
+    assert pg.update_records(records, bulk=True) == {"inserted": 1500, "updated": 0}
+
+
+def test_writers_that_ignore_the_rows_opt_in_from_the_threshold(monkeypatch):
+    import importlib
+
+    pg_module = importlib.import_module("percolate.services.PostgresService")
+    from percolate.utils.env import P8_AUDIT_BATCH_SIZE, P8_BULK_UPSERT_THRESHOLD
+
+    """a full audit batch is bulk loaded with the defaults"""
+    assert 0 < P8_BULK_UPSERT_THRESHOLD <= P8_AUDIT_BATCH_SIZE
+    monkeypatch.setattr(pg_module, "P8_BULK_UPSERT_THRESHOLD", 3)
+    assert pg_module.should_bulk_upsert([1, 2, 3]) and not pg_module.should_bulk_upsert([1, 2])
+    assert not pg_module.should_bulk_upsert(Agent(id=str(uuid.uuid4()), name="a", description="d", spec={}))
+    monkeypatch.setattr(pg_module, "P8_BULK_UPSERT_THRESHOLD", 0)
+    assert not pg_module.should_bulk_upsert([1, 2, 3])
@@ -0,0 +1,141 @@
+"""
+Unit tests for how search dispatches to query_entity (the database is faked)
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from percolate.models.p8 import Agent, Resources
+from percolate.models.utils import SqlModelHelper
+from percolate.services import PostgresService
+from percolate.services.AsyncPostgresService import AsyncPostgresService
+
+
+def fake_rows(query):
+    if "relational_search_entity" in query:
+        return [{"query_text": "select 1", "confidence": 0.9, "relational_result": [{"a": 1}], "error_message": None}]
+    return [{"query_text": None, "confidence": 0, "relational_result": [], "vector_result": [{"b": 2}], "error_message": None}]
+
+
+def make_service(model, pooled=True):
+    pg = PostgresService.__new__(PostgresService)
+    pg.model = model
+    pg.helper = SqlModelHelper(model)
+    pg._pool = object() if pooled else None
+    calls = []
+
+    def execute(query, data=None, **kwargs):
+        calls.append((query, data, threading.current_thread().name))
+        return fake_rows(query)
+
+    pg.execute = execute
+    return pg, calls
+
+
+def test_semantic_only_entities_skip_nl2sql():
+    pg, calls = make_service(Resources)
+    pg.search("what is percolate")
+    assert len(calls) == 1
+    query, data, _ = calls[0]
+    assert "query_entity" in query and data == ("what is percolate", "p8.Resources", True)
+
+
+def test_relational_and_vector_search_run_concurrently():
+    pg, calls = make_service(Agent)
+    result = pg.search("agents created this week")
+    assert {q.split("(")[0] for q, _, _ in calls} == {
+        "select * from p8.relational_search_entity",
+        "select * from p8.query_entity",
+    }
+    """both ran on worker threads"""
+    assert all(t != threading.current_thread().name for _, _, t in calls)
+    row = result[0]
+    assert row["relational_result"] == [{"a": 1}] and row["vector_result"] == [{"b": 2}]
+    assert row["query_text"] == "select 1" and row["confidence"] == 0.9
+
+
+def test_unpooled_service_uses_query_entity():
+    pg, calls = make_service(Agent, pooled=False)
+    pg.search("agents created this week")
+    assert len(calls) == 1 and calls[0][1] == ("agents created this week", "p8.Agent", False)
+
+
+def test_async_relational_and_vector_search_run_concurrently():
+    service = AsyncPostgresService.__new__(AsyncPostgresService)
+    service.model = Agent
+    running, peak = [0], [0]
+
+    async def execute(query, data=None, **kwargs):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return fake_rows(query)
+
+    service.execute = execute
+    row = asyncio.run(service.search("agents created this week"))[0]
+    assert peak[0] == 2
+    assert row["relational_result"] == [{"a": 1}] and row["vector_result"] == [{"b": 2}]
+    assert row["query_text"] == "select 1" and row["confidence"] == 0.9
+
+
+def test_questions_fan_out_and_merge():
+    from percolate.services.PostgresService import search_questions
+
+    pg, calls = make_service(Resources)
+    distances = {"q1": [{"id": "a", "vdistance": 0.4}, {"id": "b", "vdistance": 0.2}], "q2": [{"id": "a", "vdistance": 0.1}]}
+
+    def execute(query, data=None, **kwargs):
+        calls.append((query, data, threading.current_thread().name))
+        return [{"query_text": None, "confidence": 0, "relational_result": None, "vector_result": distances[data[0]], "error_message": None}]
+
+    pg.execute = execute
+    assert search_questions(["q1", " q1 ", "", "q2"]) == ["q1", "q2"]
+    result = pg.search(["q1", "q2", "q1"])
+    assert sorted(data[0] for _, data, _ in calls) == ["q1", "q2"]
+    assert all(t != threading.current_thread().name for _, _, t in calls)
+    assert result[0]["vector_result"] == [{"id": "a", "vdistance": 0.1}, {"id": "b", "vdistance": 0.2}]
+    assert result[0]["relational_result"] is None
+
+
+def test_pooled_checkouts_do_not_change_the_service_user_context():
+    class Cursor:
+        def execute(self, query):
+            pass
+
+        def fetchall(self):
+            return [("user", 1, ["admins"])]
+
+        def close(self):
+            pass
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            pass
+
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield Connection()
+
+    pg = PostgresService.__new__(PostgresService)
+    pg.user_id, pg.role_level, pg.user_groups, pg._pool = "10e0b1a4-1c5a-4b46-9a3b-9c8d7a7a4f11", 100, [], Pool()
+    with pg._pooled_connection():
+        pass
+    assert (pg.role_level, pg.user_groups) == (100, [])
+    pg._apply_user_context(Connection())
+    assert (pg.role_level, pg.user_groups) == (1, ["admins"])
+
+
+def test_merge_keeps_relational_rows_and_errors():
+    from percolate.services.PostgresService import merge_search_results
+
+    merged = merge_search_results([
+        [{"query_text": "select 1", "confidence": 0.8, "relational_result": [{"id": 1}], "vector_result": [], "error_message": "x"}],
+        [{"query_text": "select 2", "confidence": 0.9, "relational_result": [{"id": 1}, {"n": 2}], "vector_result": [], "error_message": "x"}],
+    ])[0]
+    assert merged["relational_result"] == [{"id": 1}, {"n": 2}]
+    assert merged["query_text"] == "select 1;\nselect 2" and merged["confidence"] == 0.9
+    assert merged["error_message"] == "x"
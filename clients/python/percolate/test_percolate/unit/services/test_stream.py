@@ -0,0 +1,125 @@
+"""
+Unit tests for streaming and columnar reads from a named server-side cursor using a fake connection
+"""
+from contextlib import contextmanager
+from pydantic import BaseModel
+from percolate.models.AbstractModel import AbstractModel
+from percolate.services import PostgresService
+
+
+class Named(BaseModel):
+    name: str
+    description: str
+
+
+class FakeNamedCursor:
+    def __init__(self, name, rows, columns):
+        self.name = name
+        self.rows = rows
+        self.itersize = None
+        self.description = [(c,) for c in columns]
+        self.fetched = 0
+        self.closed = False
+
+    def execute(self, query, data=None):
+        self.query = query
+        self.data = data
+
+    def fetchmany(self, size):
+        chunk = self.rows[self.fetched : self.fetched + size]
+        self.fetched += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        for r in self.rows:
+            self.fetched += 1
+            yield r
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.cursors = []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self, name=None):
+        c = FakeNamedCursor(name, self.rows, self.columns)
+        self.cursors.append(c)
+        return c
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def make_service(rows, columns=("name", "description")):
+    conn = FakeConnection(rows, columns)
+    pg = PostgresService.__new__(PostgresService)
+    pg.model = None
+
+    @contextmanager
+    def _connection():
+        yield conn
+
+    pg._connection = _connection
+    return pg, conn
+
+
+def test_stream_yields_dicts_lazily_from_named_cursor():
+    rows = [(f"agent{i}", "d") for i in range(10)]
+    pg, conn = make_service(rows)
+
+    it = pg.stream("select name, description from p8.\"Agent\"", fetch_size=3)
+    assert next(it) == {"name": "agent0", "description": "d"}
+    cursor = conn.cursors[0]
+    assert cursor.name.startswith("p8_stream_") and cursor.itersize == 3
+    assert cursor.fetched == 1
+
+    assert len(list(it)) == 9
+    assert cursor.closed and conn.commits == 1
+
+
+def test_stream_closed_early_releases_cursor():
+    pg, conn = make_service([("a", "d"), ("b", "d")])
+    pg.model = Named
+    it = pg.stream("select name, description from p8.\"Agent\"", as_model=True)
+    agent = next(it)
+    assert isinstance(agent, Named) and agent.name == "a"
+    it.close()
+    assert conn.cursors[0].closed and conn.rollbacks == 1
+
+
+def test_execute_arrow_builds_typed_batches():
+    import uuid
+    import pyarrow as pa
+
+    class Scored(BaseModel):
+        id: str
+        score: float
+        count: int | None = None
+
+    ids = [uuid.uuid4() for _ in range(5)]
+    rows = [(ids[i], i, None if i < 3 else i, {"k": i}) for i in range(5)]
+    pg, conn = make_service(rows, columns=("id", "score", "count", "meta"))
+    pg.model = AbstractModel.Abstracted(Scored)
+
+    table = pg.execute_arrow("select * from scored", fetch_size=2)
+    assert isinstance(table, pa.Table) and table.num_rows == 5
+    """uuids are coerced to the model's string type and ints to floats"""
+    assert table.schema.field("id").type == pa.string()
+    assert table.column("id").to_pylist() == [str(i) for i in ids]
+    assert table.schema.field("score").type == pa.float64()
+    assert table.column("count").to_pylist() == [None, None, None, 3, 4]
+    """columns that are not on the model are inferred"""
+    assert table.column("meta").to_pylist()[0] == {"k": 0}
+    assert conn.commits == 1 and conn.cursors[0].closed
+
+    empty, _ = make_service([], columns=("id", "score"))
+    empty.model = AbstractModel.Abstracted(Scored)
+    assert empty.execute_arrow("select id, score from scored").num_rows == 0
@@ -0,0 +1,133 @@
+"""
+Unit tests for the embedding cache lookup in get_embeddings (the database and provider are faked)
+"""
+import hashlib
+import threading
+import time
+import uuid
+import pytest
+from percolate.utils import embedding
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    store = {}
+    requested = []
+
+    def get_cached(hashes, model):
+        return {h: store[(model, h)] for h in hashes if (model, h) in store}
+
+    def cache(embeddings, model):
+        for h, v in embeddings.items():
+            store[(model, h)] = v
+
+    def request(texts, model, *args):
+        requested.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    embedding.memory_cache.clear()
+    monkeypatch.setattr(embedding, "_cache_retry_at", 0.0)
+    monkeypatch.setattr(embedding, "_get_cached_embeddings", get_cached)
+    monkeypatch.setattr(embedding, "_cache_embeddings", cache)
+    monkeypatch.setattr(embedding, "_request_embeddings", request)
+    return store, requested
+
+
+def test_only_missing_texts_are_requested(fake_cache):
+    store, requested = fake_cache
+
+    result = embedding.get_embeddings(["alpha", "beta", " alpha  "], use_cache=True)
+    """normalized duplicates are requested once"""
+    assert requested == [["alpha", "beta"]]
+    assert result == [[5.0], [4.0], [5.0]]
+
+    result = embedding.get_embeddings(["beta", "gamma"], use_cache=True)
+    assert requested[-1] == ["gamma"]
+    assert result == [[4.0], [5.0]]
+    assert len(store) == 3
+
+
+def test_cache_can_be_bypassed(fake_cache):
+    store, requested = fake_cache
+    embedding.get_embeddings(["alpha"], use_cache=False)
+    embedding.get_embeddings(["alpha"], use_cache=False)
+    assert len(requested) == 2 and not store
+
+
+def test_text_hash_normalizes_whitespace():
+    assert embedding.embedding_text_hash("what is\n  percolate ") == embedding.embedding_text_hash("what is percolate")
+    assert embedding.embedding_text_hash("What is percolate") != embedding.embedding_text_hash("what is percolate")
+
+
+def test_database_errors_back_off_and_retry(fake_cache, monkeypatch):
+    store, requested = fake_cache
+    reads = []
+
+    def failing_read(hashes, model):
+        reads.append(hashes)
+        if len(reads) == 1:
+            embedding._back_off_cache("connection refused")
+        return {}
+
+    monkeypatch.setattr(embedding, "_get_cached_embeddings", failing_read)
+    monkeypatch.setattr(embedding, "P8_EMBEDDING_CACHE_RETRY_SECONDS", 0.05)
+    embedding.get_embeddings(["alpha"], use_cache=True)
+    """the write and the next read are skipped while backing off"""
+    embedding.get_embeddings(["beta"], use_cache=True)
+    assert len(reads) == 1 and not store
+    time.sleep(0.06)
+    embedding.get_embeddings(["gamma"], use_cache=True)
+    assert len(reads) == 2 and list(store) == [("text-embedding-ada-002", embedding.embedding_text_hash("gamma"))]
+
+
+def test_cache_ids_match_the_database():
+    """md5(model || ':' || text_hash)::uuid in p8.embedding_cache_id"""
+    h = embedding.embedding_text_hash("what is percolate")
+    assert embedding.embedding_cache_id("m", h) == str(uuid.UUID(hashlib.md5(f"m:{h}".encode()).hexdigest()))
+
+
+def test_memory_cache_is_checked_before_the_database(fake_cache, monkeypatch):
+    store, requested = fake_cache
+    embedding.get_embeddings(["alpha"], use_cache=True)
+    monkeypatch.setattr(embedding, "_get_cached_embeddings", lambda *a: pytest.fail("the database was read"))
+    assert embedding.get_embeddings(["alpha"]) == [[5.0]]
+    assert embedding.get_embedding("alpha") == [5.0]
+    assert len(requested) == 1
+
+
+def test_requests_are_split_into_batches(monkeypatch):
+    assert embedding.split_batches(["a"] * 5, max_size=2) == [["a", "a"], ["a", "a"], ["a"]]
+    assert embedding.split_batches(["x" * 40, "x" * 40, "y"], max_tokens=15) == [["x" * 40], ["x" * 40, "y"]]
+
+    batches = []
+    monkeypatch.setattr(
+        embedding, "split_batches", lambda texts: [texts[i : i + 2] for i in range(0, len(texts), 2)]
+    )
+    monkeypatch.setattr(
+        embedding, "_request_embedding_batch", lambda texts, *a: batches.append(texts) or [[float(t)] for t in texts]
+    )
+    assert embedding._request_embeddings(["1", "2", "3", "4", "5"], "m") == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert sorted(batches) == [["1", "2"], ["3", "4"], ["5"]]
+
+
+def test_concurrent_single_texts_are_coalesced(fake_cache):
+    store, requested = fake_cache
+    coalescer = embedding._Coalescer(window_ms=200, max_batch=100)
+    results = {}
+
+    def embed(text):
+        results[text] = coalescer.submit(
+            "m", text, lambda texts: embedding.get_embeddings(texts, use_cache=False)
+        )
+
+    threads = [threading.Thread(target=embed, args=(t,)) for t in ["a", "bb", "ccc"]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(requested) == 1 and sorted(requested[0]) == ["a", "bb", "ccc"]
+    assert results == {"a": [1.0], "bb": [2.0], "ccc": [3.0]}
+
+    """errors reach every caller"""
+    with pytest.raises(ValueError):
+        coalescer.submit("m", "x", lambda texts: (_ for _ in ()).throw(ValueError("down")))
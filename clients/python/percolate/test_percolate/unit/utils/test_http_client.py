@@ -0,0 +1,74 @@
+"""
+Unit tests for the shared http client against a local server
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from percolate.utils import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    connections = set()
+
+    def do_POST(self):
+        Handler.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if Handler.failures:
+            Handler.failures -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            body = b"busy"
+        else:
+            self.send_response(200)
+            body = b'{"ok": true}'
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.failures = 0
+    Handler.connections = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    http_client.close()
+
+
+def test_connections_are_reused(server):
+    for _ in range(5):
+        assert http_client.post(f"{server}/v1/embeddings", json={"input": "x"}).json() == {"ok": True}
+    assert len(Handler.connections) == 1
+    assert http_client.get_session(server) is http_client.get_session(f"{server}/other")
+    assert server in http_client.get_stats()["sessions"]
+
+
+def test_retries_with_backoff(server):
+    Handler.failures = 2
+    response = http_client.post(f"{server}/v1/chat/completions", data="{}")
+    assert response.status_code == 200
+
+
+def test_provider_limits(monkeypatch):
+    monkeypatch.setattr(http_client, "P8_HTTP_PROVIDER_LIMITS", '{"api.openai.com": 50}')
+    assert http_client.connection_limit("https://api.openai.com/v1/embeddings") == 50
+    assert http_client.connection_limit("https://api.anthropic.com/v1/messages") == http_client.P8_HTTP_POOL_MAXSIZE
+    assert http_client.provider_key("https://API.openai.com/v1/x") == "https://api.openai.com"
+
+
+def test_throttled_responses_reach_the_rate_limiter(server):
+    from percolate.utils import rate_limiter
+
+    rate_limiter.reset()
+    Handler.failures = 1
+    assert http_client.post(f"{server}/v1/chat/completions", data='{"model": "m"}').status_code == 200
+    stats = http_client.get_stats()["rate_limits"]["127.0.0.1"]
+    assert stats["throttled"] == 1 and stats["completed"] == 1 and stats["in_flight"] == 0
+    rate_limiter.reset()
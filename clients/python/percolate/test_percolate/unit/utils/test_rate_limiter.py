@@ -0,0 +1,155 @@
+"""
+Unit tests for the provider rate limiter
+"""
+import asyncio
+import threading
+import time
+from percolate.utils import http_client, rate_limiter
+from percolate.utils.rate_limiter import ProviderLimiter, TokenBucket
+
+
+def test_token_bucket_delays_over_the_rate():
+    bucket = TokenBucket(per_minute=60, burst=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    """the third request waits about a second and the fourth two"""
+    assert 0.9 < bucket.reserve() <= 1.0
+    assert 1.9 < bucket.reserve() <= 2.0
+
+
+def test_concurrency_is_limited_and_queued():
+    limiter = ProviderLimiter("test", max_concurrency=1)
+    limiter.acquire()
+    entered = threading.Event()
+
+    def second():
+        limiter.acquire()
+        entered.set()
+
+    threading.Thread(target=second, daemon=True).start()
+    time.sleep(0.1)
+    assert not entered.is_set() and limiter.get_stats()["queue_depth"] == 1
+    limiter.release(200, 0.1)
+    assert entered.wait(2)
+    assert limiter.get_stats()["queue_depth"] == 0 and limiter.get_stats()["in_flight"] == 1
+
+
+def test_limit_adapts_to_throttling_and_latency():
+    limiter = ProviderLimiter("test", max_concurrency=8, latency_factor=3)
+    limiter.acquire()
+    limiter.release(429, 0.1, retry_after=0.2)
+    stats = limiter.get_stats()
+    assert stats["concurrency_limit"] == 4 and stats["throttled"] == 1 and stats["cooldown_seconds"] > 0
+
+    """requests wait for the cooldown"""
+    assert limiter.acquire() >= 0.1
+    limiter.release(200, 0.1)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(200, 0.1)
+    assert limiter.get_stats()["concurrency_limit"] > 4
+
+    before = limiter.limit
+    limiter.acquire()
+    limiter.release(200, 5.0)
+    assert limiter.limit < before
+
+    limiter.acquire()
+    limiter.release(error=True)
+    assert limiter.get_stats()["errors"] == 1
+
+
+def test_async_acquire():
+    limiter = ProviderLimiter("test", max_concurrency=2)
+
+    async def call(i):
+        await limiter.aacquire()
+        await asyncio.sleep(0.05)
+        limiter.release(200, 0.05)
+
+    async def main():
+        await asyncio.gather(*[call(i) for i in range(6)])
+
+    started = time.monotonic()
+    asyncio.run(main())
+    """six calls two at a time"""
+    assert time.monotonic() - started >= 0.14
+    assert limiter.get_stats()["completed"] == 6
+
+
+def test_limiters_by_provider_and_model():
+    rate_limiter.reset('{"api.openai.com": {"rpm": 100}, "api.openai.com/gpt-4o": {"max_concurrency": 3}}')
+    url = "https://api.openai.com/v1/chat/completions"
+    limiter = rate_limiter.get_limiter(url, rate_limiter.model_of('{"model": "gpt-4o", "messages": []}'))
+    assert limiter.key == "api.openai.com/gpt-4o" and limiter.max_concurrency == 3
+    limiter = rate_limiter.get_limiter(url, rate_limiter.model_of({"model": "gpt-4o-mini"}))
+    assert limiter.key == "api.openai.com" and limiter.requests is not None
+    assert set(rate_limiter.get_stats()) == {"api.openai.com", "api.openai.com/gpt-4o"}
+    rate_limiter.reset()
+
+
+def test_async_waiters_are_woken_by_release():
+    limiter = ProviderLimiter("test", max_concurrency=1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and len(limiter._async_waiters) == 1
+        released = time.monotonic()
+        limiter.release(200, 0.01)
+        await waiter
+        return time.monotonic() - released
+
+    """woken straight away rather than on the next poll or timeout"""
+    assert asyncio.run(main()) < 0.5
+    assert limiter.get_stats()["in_flight"] == 1 and limiter._async_waiters == []
+
+
+def test_cancelled_acquire_frees_the_slot():
+    limiter = ProviderLimiter("test", max_concurrency=2, rpm=60)
+    limiter.requests.tokens = 0
+
+    async def main():
+        task = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    stats = limiter.get_stats()
+    assert stats["in_flight"] == 0 and stats["errors"] == 0 and stats["concurrency_limit"] == 2
+
+
+class _PendingClient:
+    """an async client whose responses never arrive"""
+
+    def build_request(self, method, url, **kwargs):
+        return (method, url)
+
+    async def send(self, request, stream=False):
+        await asyncio.sleep(60)
+
+
+def test_cancelled_streams_free_their_slots(monkeypatch):
+    rate_limiter.reset()
+    monkeypatch.setattr(http_client, "P8_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(http_client, "get_async_client", lambda url: _PendingClient())
+    url = "https://pending.test/v1/chat/completions"
+
+    async def stream():
+        async with http_client.astream("POST", url, json={"model": "m"}):
+            pass
+
+    async def main():
+        tasks = [asyncio.ensure_future(stream()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert rate_limiter.get_stats()["pending.test"]["in_flight"] == 3
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    stats = rate_limiter.get_stats()["pending.test"]
+    assert stats["in_flight"] == 0 and stats["errors"] == 0
+    rate_limiter.reset()
@@ -28,13 +28,13 @@ DECLARE
     sql_query_result JSONB;
     sql_error TEXT;
     vector_search_result JSONB;
-    embedding_for_text VECTOR;
     ack_http_timeout BOOLEAN;
 BEGIN
 
     /*
     first crude look at merging multiple together
     we will spend time on this later with a proper fast parallel index
+    semantic_only skips the nl2sql round trip - clients can instead run p8.relational_search_entity concurrently with a semantic_only query
 
     select * from p8.nl2sql('current place of residence', 'p8.UserFact' )
     select * from p8.query_entity('what is my favourite color', 'p8.UserFact', 'e9c56a28-1d09-5253-af36-4b9d812f6bfa')
@@ -57,25 +57,10 @@ BEGIN
     vector_search_result := NULL;
 
     IF NOT semantic_only THEN
-        -- Call the nl2sql function to get the SQL query and confidence
-        SELECT "query", nq.confidence INTO query_to_execute, query_confidence  
-        FROM p8.nl2sql(question, table_name) nq;
-
-        -- Replace 'YOUR_TABLE' in the query with the actual table name
-        query_to_execute := REPLACE(query_to_execute, 'YOUR_TABLE', full_table_name);
-
-        -- Execute the SQL query if confidence is high enough
-        IF query_confidence >= min_confidence THEN
-            BEGIN
-                query_to_execute := rtrim(query_to_execute, ';');
-                EXECUTE FORMAT('SELECT jsonb_agg(row_to_json(t)) FROM (%s) t', query_to_execute)
-                INTO sql_query_result;
-            EXCEPTION
-                WHEN OTHERS THEN
-                    sql_error := SQLERRM; -- Capture the error message
-                    sql_query_result := NULL;
-            END;
-        END IF;
+        -- Generate (or reuse cached) SQL for the question and run it - see p8.relational_search_entity
+        SELECT r.query_text, r.confidence, r.relational_result, r.error_message
+        INTO query_to_execute, query_confidence, sql_query_result, sql_error
+        FROM p8.relational_search_entity(question, table_name, min_confidence) r;
     ELSE
         -- Skip SQL query generation and execution
         query_to_execute := NULL;
@@ -83,8 +68,7 @@ BEGIN
         sql_query_result := '[]'::jsonb;
     END IF;
 
-    -- Get the embedding for the question
-    SELECT p8.get_embedding_for_text(question) INTO embedding_for_text;
+    -- The vector search function computes (or reads the cached) embedding for the question
 
     -- Use the selected vector search function to perform the vector search
     -- update this to filter by user id if its provided
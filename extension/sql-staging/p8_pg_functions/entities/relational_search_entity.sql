@@ -0,0 +1,53 @@
+DROP FUNCTION IF EXISTS p8.relational_search_entity;
+CREATE OR REPLACE FUNCTION p8.relational_search_entity(
+    question TEXT,
+    table_name TEXT,
+    min_confidence NUMERIC DEFAULT 0.7
+)
+RETURNS TABLE(
+    query_text TEXT,
+    confidence NUMERIC,
+    relational_result JSONB,
+    error_message TEXT
+)
+LANGUAGE 'plpgsql'
+COST 100
+VOLATILE PARALLEL UNSAFE
+AS $BODY$
+DECLARE
+    query_to_execute TEXT;
+    query_confidence NUMERIC;
+    full_table_name TEXT;
+    sql_query_result JSONB;
+    sql_error TEXT;
+BEGIN
+    /*
+    the relational half of p8.query_entity - generate (or reuse cached) SQL for the question and run it
+    this is separate so that clients can run it concurrently with the vector search
+
+    select * from p8.relational_search_entity('agents created this week', 'p8.Agent')
+    */
+    full_table_name := FORMAT('%I."%I"', split_part(table_name, '.', 1), split_part(table_name, '.', 2));
+
+    SELECT nq.query, nq.confidence INTO query_to_execute, query_confidence
+    FROM p8.nl2sql_cached(question, table_name) nq;
+
+    -- Replace 'YOUR_TABLE' in the query with the actual table name
+    query_to_execute := REPLACE(query_to_execute, 'YOUR_TABLE', full_table_name);
+
+    -- Execute the SQL query if confidence is high enough
+    IF query_confidence >= min_confidence THEN
+        BEGIN
+            query_to_execute := rtrim(query_to_execute, ';');
+            EXECUTE FORMAT('SELECT jsonb_agg(row_to_json(t)) FROM (%s) t', query_to_execute)
+            INTO sql_query_result;
+        EXCEPTION
+            WHEN OTHERS THEN
+                sql_error := SQLERRM; -- Capture the error message
+                sql_query_result := NULL;
+        END;
+    END IF;
+
+    RETURN QUERY SELECT query_to_execute, query_confidence, sql_query_result, sql_error;
+END;
+$BODY$;
@@ -1,26 +1,38 @@
- 
 DROP FUNCTION IF EXISTS p8.vector_search_entity;
 
 CREATE OR REPLACE FUNCTION p8.vector_search_entity(
     question TEXT,
     entity_name TEXT,
     distance_threshold NUMERIC DEFAULT 0.75,
-    limit_results INTEGER DEFAULT 3 --TODO think about this, this is very low
+    limit_results INTEGER DEFAULT 3, --TODO think about this, this is very low
+    embedding_model TEXT DEFAULT 'text-embedding-ada-002',
+    ef_search INTEGER DEFAULT NULL,
+    ivfflat_probes INTEGER DEFAULT NULL,
+    candidate_factor INTEGER DEFAULT 10
 )
 RETURNS TABLE(id uuid, vdistance double precision) 
 LANGUAGE 'plpgsql'
 AS $BODY$
 DECLARE
-    embedding_for_text TEXT;
+    embedding_for_text VECTOR;
+    vector_type TEXT;
     schema_name TEXT;
     table_name TEXT;
+    candidate_limit INTEGER;
     vector_search_query TEXT;
 BEGIN
     /*
 	This is a generic model search that resturns ids which can be joined with the original table
 	we dont do it ine one because we want to dedup and take min distance on multiple embeddings 
 	
+	The nearest candidates are read first with ORDER BY distance LIMIT k * candidate_factor so that the
+	approximate nearest neighbour index on the embeddings table can be used (see SqlModelHelper.create_embedding_index_scripts).
+	The index is a partial expression index per embedding model so we cast to the same typed vector and filter on the model.
+	Only then do we dedup per source record, apply the threshold and join the entity table.
+	ef_search (hnsw) and ivfflat_probes trade recall for speed for this call only.
+	
 	select  * from p8.vector_search_entity('what sql queries do we have for generating uuids from json', 'p8.PercolateAgent')
+	select  * from p8.vector_search_entity('what sql queries do we have for generating uuids from json', 'p8.PercolateAgent', 0.75, 10, ef_search=>100)
 	*/
     -- Format the entity name to include the schema if not already present
     SELECT CASE 
@@ -29,29 +41,50 @@ BEGIN
     END INTO entity_name;
 
     -- Compute the embedding for the question
-    embedding_for_text := p8.get_embedding_for_text(question);
+    SELECT embedding INTO embedding_for_text FROM p8.get_embedding_for_text(question, embedding_model);
+
+    -- pgvector can only index up to 2000 dimensions as vector so larger models are indexed as halfvec
+    vector_type := CASE
+        WHEN vector_dims(embedding_for_text) <= 2000 THEN FORMAT('vector(%s)', vector_dims(embedding_for_text))
+        ELSE FORMAT('halfvec(%s)', vector_dims(embedding_for_text))
+    END;
 
     -- Extract schema and table name from the entity name (assuming format schema.table)
     schema_name := split_part(entity_name, '.', 1);
     table_name := split_part(entity_name, '.', 2);
 
-    -- Construct the dynamic query using a CTE to order by vdistance and limit results
+    -- Several embeddings can belong to one record so we read more candidates than we return
+    candidate_limit := limit_results * GREATEST(candidate_factor, 1);
+
+    -- The index scan returns at most ef_search rows so it must cover the candidates - settings are local to the transaction
+    PERFORM set_config('hnsw.ef_search', GREATEST(COALESCE(ef_search, 40), LEAST(candidate_limit, 1000))::TEXT, true);
+    IF ivfflat_probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', ivfflat_probes::TEXT, true);
+    END IF;
+
     vector_search_query := FORMAT(
-        'WITH vector_search_results AS (
-            SELECT b.id, MIN(a.embedding_vector <-> %L) AS vdistance
-            FROM p8_embeddings."%s_%s_embeddings" a
-            JOIN %s.%I b ON b.id = a.source_record_id
-            WHERE a.embedding_vector <-> %L <= %L
-            GROUP BY b.id
+        'WITH candidates AS (
+            SELECT a.source_record_id, a.embedding_vector::%1$s <-> $1::%1$s AS vdistance
+            FROM p8_embeddings."%2$s_%3$s_embeddings" a
+            WHERE a.embedding_name = $2
+            ORDER BY a.embedding_vector::%1$s <-> $1::%1$s
+            LIMIT $3
+        ), vector_search_results AS (
+            SELECT source_record_id AS id, MIN(vdistance) AS vdistance
+            FROM candidates
+            WHERE vdistance <= $4
+            GROUP BY source_record_id
         )
-        SELECT id, vdistance
-        FROM vector_search_results
-        ORDER BY vdistance
-        LIMIT %s',
-        embedding_for_text, schema_name, table_name, schema_name, table_name, embedding_for_text, distance_threshold, limit_results
+        SELECT r.id, r.vdistance::double precision
+        FROM vector_search_results r
+        JOIN %2$s.%4$I b ON b.id = r.id
+        ORDER BY r.vdistance
+        LIMIT $5',
+        vector_type, schema_name, table_name, table_name
     );
 
     -- Execute the query and return the results
-    RETURN QUERY EXECUTE vector_search_query;
+    RETURN QUERY EXECUTE vector_search_query
+        USING embedding_for_text, embedding_model, candidate_limit, distance_threshold, limit_results;
 END;
 $BODY$;
@@ -0,0 +1,103 @@
+-- Query embeddings are cached in p8."EmbeddingCache" (a registered model) by model and a hash of the normalized text
+-- so repeated searches do not call the provider. Lookups only read - entries expire by created_at (see p8.evict_embedding_cache)
+
+CREATE OR REPLACE FUNCTION p8.embedding_text_hash(
+    description_text TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    texts that differ only by surrounding or repeated whitespace share a cache entry
+    this must match percolate.utils.embedding.embedding_text_hash
+    select p8.embedding_text_hash('  what is   percolate ')
+    */
+    SELECT md5(regexp_replace(btrim(description_text, E' \t\r\n'), '\s+', ' ', 'g'));
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.embedding_cache_id(
+    embedding_model TEXT,
+    text_hash TEXT
+)
+RETURNS UUID
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    the primary key of a cache entry - this must match percolate.utils.embedding.embedding_cache_id
+    select p8.embedding_cache_id('text-embedding-ada-002', p8.embedding_text_hash('what is percolate'))
+    */
+    SELECT md5(embedding_model || ':' || text_hash)::uuid;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.get_cached_embedding;
+CREATE OR REPLACE FUNCTION p8.get_cached_embedding(
+    description_text TEXT,
+    embedding_model TEXT DEFAULT 'text-embedding-ada-002',
+    cache_ttl INTERVAL DEFAULT INTERVAL '30 days'
+)
+RETURNS VECTOR
+LANGUAGE plpgsql
+STABLE
+AS $BODY$
+BEGIN
+    /*
+    returns the cached embedding or null - entries older than the ttl are treated as missing
+    select p8.get_cached_embedding('what is percolate')
+    */
+    RETURN (
+        SELECT c.embedding
+        FROM p8."EmbeddingCache" c
+        WHERE c.id = p8.embedding_cache_id(get_cached_embedding.embedding_model, p8.embedding_text_hash(description_text))
+          AND c.created_at > CURRENT_TIMESTAMP - cache_ttl
+    );
+END;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.cache_embedding;
+CREATE OR REPLACE FUNCTION p8.cache_embedding(
+    description_text TEXT,
+    embedding_model TEXT,
+    embedding VECTOR
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    hashed TEXT := p8.embedding_text_hash(description_text);
+BEGIN
+    INSERT INTO p8."EmbeddingCache" (id, embedding_model, text_hash, embedding)
+    VALUES (p8.embedding_cache_id(cache_embedding.embedding_model, hashed), cache_embedding.embedding_model, hashed, cache_embedding.embedding)
+    ON CONFLICT (id) DO UPDATE
+    SET embedding = EXCLUDED.embedding, created_at = CURRENT_TIMESTAMP;
+END;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.evict_embedding_cache;
+CREATE OR REPLACE FUNCTION p8.evict_embedding_cache(
+    cache_ttl INTERVAL DEFAULT INTERVAL '30 days',
+    batch_size INTEGER DEFAULT 1000
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    evicted INTEGER;
+BEGIN
+    /*
+    drop up to batch_size expired entries - the oldest first on the created_at index (embedding_cache_created_at_idx)
+    so a call is cheap and can run from a scheduler or a worker until it returns 0
+    select p8.evict_embedding_cache()
+    */
+    DELETE FROM p8."EmbeddingCache" c
+    WHERE c.id IN (
+        SELECT id FROM p8."EmbeddingCache"
+        WHERE created_at <= CURRENT_TIMESTAMP - cache_ttl
+        ORDER BY created_at
+        LIMIT batch_size
+    );
+    GET DIAGNOSTICS evicted = ROW_COUNT;
+    RETURN evicted;
+END;
+$BODY$;
@@ -2,7 +2,8 @@ DROP FUNCTION IF EXISTS p8.get_embedding_for_text;
 
 CREATE OR REPLACE FUNCTION p8.get_embedding_for_text(
 	description_text text,
-	embedding_model text DEFAULT 'text-embedding-ada-002'::text)
+	embedding_model text DEFAULT 'text-embedding-ada-002'::text,
+	use_cache boolean DEFAULT true)
 RETURNS TABLE(embedding vector) 
 LANGUAGE 'plpgsql'
 COST 100
@@ -15,6 +16,7 @@ DECLARE
     embedding_response JSONB;
     request_url TEXT;
     use_ollama BOOLEAN;
+    cached_embedding VECTOR;
 BEGIN
     /*
         for now we have a crude way of assuming ollama for open source models
@@ -25,6 +27,15 @@ BEGIN
             }'
     */
 
+    -- Step 0: Repeated questions are served from the embedding cache (see p8.get_cached_embedding)
+    IF use_cache THEN
+        cached_embedding := p8.get_cached_embedding(description_text, embedding_model);
+        IF cached_embedding IS NOT NULL THEN
+            RETURN QUERY SELECT cached_embedding;
+            RETURN;
+        END IF;
+    END IF;
+
     -- Step 1: Check if the model is in the list of hardcoded Ollama models
     use_ollama := embedding_model IN ('bge-m3');
 
@@ -65,9 +76,15 @@ BEGIN
     );
 
     -- Step 3: Extract the embedding and convert it to a PG vector
+    cached_embedding := VECTOR((embedding_response->'data'->0->'embedding')::text);
+
+    -- only misses write - expired entries are removed by p8.evict_embedding_cache
+    IF use_cache THEN
+        PERFORM p8.cache_embedding(description_text, embedding_model, cached_embedding);
+    END IF;
+
     RETURN QUERY
-    SELECT
-        VECTOR((embedding_response->'data'->0->'embedding')::text) AS embedding;
+    SELECT cached_embedding AS embedding;
 
 END;
 $BODY$;
\ No newline at end of file
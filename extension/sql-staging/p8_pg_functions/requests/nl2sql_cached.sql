@@ -0,0 +1,89 @@
+-- Generated SQL is cached in p8."Nl2SqlCache" (a registered model) per entity, normalized question and entity schema
+-- so repeated questions skip the LLM. Failed generations are not cached
+
+CREATE OR REPLACE FUNCTION p8.entity_schema_hash(
+    entity_name TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $BODY$
+    /*
+    a fingerprint of the entity table columns
+    select p8.entity_schema_hash('p8.Agent')
+    */
+    SELECT md5(COALESCE(string_agg(c.column_name || ' ' || c.data_type, ',' ORDER BY c.ordinal_position), ''))
+    FROM information_schema.columns c
+    WHERE c.table_schema = split_part($1, '.', 1)
+      AND c.table_name = split_part($1, '.', 2);
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.nl2sql_cache_id(
+    entity_name TEXT,
+    question_hash TEXT,
+    schema_hash TEXT
+)
+RETURNS UUID
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    the primary key of a cache entry
+    select p8.nl2sql_cache_id('p8.Agent', p8.embedding_text_hash('agents created this week'), p8.entity_schema_hash('p8.Agent'))
+    */
+    SELECT md5(entity_name || ':' || question_hash || ':' || schema_hash)::uuid;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.nl2sql_cached;
+CREATE OR REPLACE FUNCTION p8.nl2sql_cached(
+    question TEXT,
+    agent_name TEXT,
+    model_in TEXT DEFAULT 'gpt-4.1-mini',
+    cache_ttl INTERVAL DEFAULT INTERVAL '7 days'
+)
+RETURNS TABLE(query TEXT, confidence NUMERIC, cached BOOLEAN)
+LANGUAGE plpgsql
+AS $BODY$
+#variable_conflict use_column
+DECLARE
+    q_hash TEXT;
+    s_hash TEXT;
+BEGIN
+    /*
+    p8.nl2sql with a cache keyed by (entity, normalized question, entity schema)
+    select * from p8.nl2sql_cached('agents created this week', 'p8.Agent')
+    */
+    IF agent_name NOT LIKE '%.%' THEN
+        agent_name := 'public.' || agent_name;
+    END IF;
+
+    q_hash := p8.embedding_text_hash(question);
+    s_hash := p8.entity_schema_hash(agent_name);
+
+    RETURN QUERY
+    SELECT c.query, c.confidence::NUMERIC, true
+    FROM p8."Nl2SqlCache" c
+    WHERE c.id = p8.nl2sql_cache_id(agent_name, q_hash, s_hash)
+      AND c.created_at > CURRENT_TIMESTAMP - cache_ttl;
+    IF FOUND THEN
+        RETURN;
+    END IF;
+
+    -- entries for old schemas can never be hit again
+    DELETE FROM p8."Nl2SqlCache" c WHERE c.entity_name = agent_name AND c.schema_hash <> s_hash;
+
+    RETURN QUERY
+    WITH generated AS (
+        SELECT n.query, n.confidence FROM p8.nl2sql(question, agent_name, model_in) n
+    ), saved AS (
+        -- a failed generation returns a null query and must not be served from the cache
+        INSERT INTO p8."Nl2SqlCache" (id, entity_name, question_hash, schema_hash, query, confidence)
+        SELECT p8.nl2sql_cache_id(agent_name, q_hash, s_hash), agent_name, q_hash, s_hash, g.query, g.confidence
+        FROM generated g
+        WHERE g.query IS NOT NULL
+        ON CONFLICT (id) DO UPDATE
+        SET query = EXCLUDED.query, confidence = EXCLUDED.confidence, created_at = CURRENT_TIMESTAMP
+    )
+    SELECT g.query, g.confidence, false FROM generated g;
+END;
+$BODY$;
@@ -0,0 +1,53 @@
+CREATE OR REPLACE FUNCTION p8.notify_table_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    row_data JSONB;
+BEGIN
+    /*
+    sends a json payload {table, op, id, name} on the channel given as the trigger argument
+    clients use this to invalidate in-process caches - see PostgresNotificationListener
+    */
+    row_data := CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD) ELSE to_jsonb(NEW) END;
+    PERFORM pg_notify(
+        TG_ARGV[0],
+        jsonb_build_object(
+            'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', row_data->>'id',
+            'name', row_data->>'name'
+        )::TEXT
+    );
+    RETURN NULL;
+END;
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.attach_change_notify(
+    table_name TEXT,
+    channel TEXT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $BODY$
+BEGIN
+    /*
+    notify the channel when rows of the table change - does nothing if the table does not exist yet
+    select p8.attach_change_notify('p8.LanguageModelApi', 'p8_language_model_api')
+    */
+    IF to_regclass(FORMAT('%I.%I', split_part(table_name, '.', 1), split_part(table_name, '.', 2))) IS NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE FORMAT('DROP TRIGGER IF EXISTS %I ON %I.%I',
+        'notify_change_' || channel, split_part(table_name, '.', 1), split_part(table_name, '.', 2));
+    EXECUTE FORMAT(
+        'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I.%I FOR EACH ROW EXECUTE FUNCTION p8.notify_table_change(%L)',
+        'notify_change_' || channel, split_part(table_name, '.', 1), split_part(table_name, '.', 2), channel
+    );
+END;
+$BODY$;
+
+-- tables that are cached by clients - on a fresh install the tables are created later and attached in 10_finalize.sql
+SELECT p8.attach_change_notify('p8.LanguageModelApi', 'p8_language_model_api');
+SELECT p8.attach_change_notify('p8.Agent', 'p8_agent');
@@ -1110,10 +1110,13 @@ $BODY$;
 
 -- Function from: entities/get_entity_ids_by_description.sql
 ------------------------------------------------------------
+DROP FUNCTION IF EXISTS p8.get_entity_ids_by_description;
+
 CREATE OR REPLACE FUNCTION p8.get_entity_ids_by_description(
     description_text text,
     entity_name text,  -- The entity/table name to search
-    limit_results integer DEFAULT 5
+    limit_results integer DEFAULT 5,
+    ef_search integer DEFAULT NULL
 )
 RETURNS TABLE(id uuid) 
 LANGUAGE 'plpgsql'
@@ -1121,11 +1124,6 @@ COST 100
 VOLATILE PARALLEL UNSAFE
 ROWS 1000
 AS $BODY$
-DECLARE
-    embedded_question VECTOR; -- Variable to store the computed embedding
-    sql_query text;  -- Variable to store dynamic SQL query
-	schema_name text;
-	table_name_only text;
 BEGIN
 	/*
 	you can use this function to get the ids of the entity and then join those in
@@ -1133,36 +1131,14 @@ BEGIN
     
 	select a.* from p8.get_entity_ids_by_description('something about langauge models', 'p8.Agent', 1) idx
 	 join p8."Agent" a on a.id = idx.id
-	*/
-
-    -- Compute the embedding once and store it in the variable
-    SELECT embedding 
-    INTO embedded_question
-    FROM p8.get_embedding_for_text(description_text);
 
-	schema_name := split_part(entity_name, '.', 1);
-    table_name_only := split_part(entity_name, '.', 2);
-	
-    -- Construct the dynamic SQL query
-    sql_query := format('
-        WITH records AS (
-            SELECT b.id, 
-                   min(a.embedding_vector <-> $1) AS vdistance
-            FROM p8_embeddings.%I a
-            JOIN %s."%s" b ON b.id = a.source_record_id
-            WHERE a.embedding_vector <-> $1 <= 0.75
-            GROUP BY b.id
-        )
-        SELECT a.id
-        FROM records a
-        ORDER BY vdistance ASC
-        LIMIT $2;
-    ', REPLACE(entity_name, '.', '_') || '_embeddings', 
-	   schema_name, table_name_only,
-	   schema_name, table_name_only );
+	this uses the index friendly candidate scan in p8.vector_search_entity
+	*/
 
-    -- Execute the dynamic SQL and return the result
-    RETURN QUERY EXECUTE sql_query USING embedded_question, limit_results;
+    RETURN QUERY
+    SELECT v.id
+    FROM p8.vector_search_entity(description_text, entity_name, 0.75, limit_results, 'text-embedding-ada-002', ef_search) v
+    ORDER BY v.vdistance ASC;
 END;
 $BODY$;
 
@@ -1474,13 +1450,13 @@ DECLARE
     sql_query_result JSONB;
     sql_error TEXT;
     vector_search_result JSONB;
-    embedding_for_text VECTOR;
     ack_http_timeout BOOLEAN;
 BEGIN
 
     /*
     first crude look at merging multiple together
     we will spend time on this later with a proper fast parallel index
+    semantic_only skips the nl2sql round trip - clients can instead run p8.relational_search_entity concurrently with a semantic_only query
 
     select * from p8.nl2sql('current place of residence', 'p8.UserFact' )
     select * from p8.query_entity('what is my favourite color', 'p8.UserFact', 'e9c56a28-1d09-5253-af36-4b9d812f6bfa')
@@ -1503,25 +1479,10 @@ BEGIN
     vector_search_result := NULL;
 
     IF NOT semantic_only THEN
-        -- Call the nl2sql function to get the SQL query and confidence
-        SELECT "query", nq.confidence INTO query_to_execute, query_confidence  
-        FROM p8.nl2sql(question, table_name) nq;
-
-        -- Replace 'YOUR_TABLE' in the query with the actual table name
-        query_to_execute := REPLACE(query_to_execute, 'YOUR_TABLE', full_table_name);
-
-        -- Execute the SQL query if confidence is high enough
-        IF query_confidence >= min_confidence THEN
-            BEGIN
-                query_to_execute := rtrim(query_to_execute, ';');
-                EXECUTE FORMAT('SELECT jsonb_agg(row_to_json(t)) FROM (%s) t', query_to_execute)
-                INTO sql_query_result;
-            EXCEPTION
-                WHEN OTHERS THEN
-                    sql_error := SQLERRM; -- Capture the error message
-                    sql_query_result := NULL;
-            END;
-        END IF;
+        -- Generate (or reuse cached) SQL for the question and run it - see p8.relational_search_entity
+        SELECT r.query_text, r.confidence, r.relational_result, r.error_message
+        INTO query_to_execute, query_confidence, sql_query_result, sql_error
+        FROM p8.relational_search_entity(question, table_name, min_confidence) r;
     ELSE
         -- Skip SQL query generation and execution
         query_to_execute := NULL;
@@ -1529,8 +1490,7 @@ BEGIN
         sql_query_result := '[]'::jsonb;
     END IF;
 
-    -- Get the embedding for the question
-    SELECT p8.get_embedding_for_text(question) INTO embedding_for_text;
+    -- The vector search function computes (or reads the cached) embedding for the question
 
     -- Use the selected vector search function to perform the vector search
     -- update this to filter by user id if its provided
@@ -1676,6 +1636,63 @@ ALTER FUNCTION p8.register_entities(text, boolean, text)
     OWNER TO postgres;
 
 
+-- Function from: entities/relational_search_entity.sql
+------------------------------------------------------------
+DROP FUNCTION IF EXISTS p8.relational_search_entity;
+CREATE OR REPLACE FUNCTION p8.relational_search_entity(
+    question TEXT,
+    table_name TEXT,
+    min_confidence NUMERIC DEFAULT 0.7
+)
+RETURNS TABLE(
+    query_text TEXT,
+    confidence NUMERIC,
+    relational_result JSONB,
+    error_message TEXT
+)
+LANGUAGE 'plpgsql'
+COST 100
+VOLATILE PARALLEL UNSAFE
+AS $BODY$
+DECLARE
+    query_to_execute TEXT;
+    query_confidence NUMERIC;
+    full_table_name TEXT;
+    sql_query_result JSONB;
+    sql_error TEXT;
+BEGIN
+    /*
+    the relational half of p8.query_entity - generate (or reuse cached) SQL for the question and run it
+    this is separate so that clients can run it concurrently with the vector search
+
+    select * from p8.relational_search_entity('agents created this week', 'p8.Agent')
+    */
+    full_table_name := FORMAT('%I."%I"', split_part(table_name, '.', 1), split_part(table_name, '.', 2));
+
+    SELECT nq.query, nq.confidence INTO query_to_execute, query_confidence
+    FROM p8.nl2sql_cached(question, table_name) nq;
+
+    -- Replace 'YOUR_TABLE' in the query with the actual table name
+    query_to_execute := REPLACE(query_to_execute, 'YOUR_TABLE', full_table_name);
+
+    -- Execute the SQL query if confidence is high enough
+    IF query_confidence >= min_confidence THEN
+        BEGIN
+            query_to_execute := rtrim(query_to_execute, ';');
+            EXECUTE FORMAT('SELECT jsonb_agg(row_to_json(t)) FROM (%s) t', query_to_execute)
+            INTO sql_query_result;
+        EXCEPTION
+            WHEN OTHERS THEN
+                sql_error := SQLERRM; -- Capture the error message
+                sql_query_result := NULL;
+        END;
+    END IF;
+
+    RETURN QUERY SELECT query_to_execute, query_confidence, sql_query_result, sql_error;
+END;
+$BODY$;
+
+
 -- Function from: entities/vector_search_entity.sql
 ------------------------------------------------------------
 DROP FUNCTION IF EXISTS p8.vector_search_entity;
@@ -1684,22 +1701,35 @@ CREATE OR REPLACE FUNCTION p8.vector_search_entity(
     question TEXT,
     entity_name TEXT,
     distance_threshold NUMERIC DEFAULT 0.75,
-    limit_results INTEGER DEFAULT 3 --TODO think about this, this is very low
+    limit_results INTEGER DEFAULT 3, --TODO think about this, this is very low
+    embedding_model TEXT DEFAULT 'text-embedding-ada-002',
+    ef_search INTEGER DEFAULT NULL,
+    ivfflat_probes INTEGER DEFAULT NULL,
+    candidate_factor INTEGER DEFAULT 10
 )
 RETURNS TABLE(id uuid, vdistance double precision) 
 LANGUAGE 'plpgsql'
 AS $BODY$
 DECLARE
-    embedding_for_text TEXT;
+    embedding_for_text VECTOR;
+    vector_type TEXT;
     schema_name TEXT;
     table_name TEXT;
+    candidate_limit INTEGER;
     vector_search_query TEXT;
 BEGIN
     /*
 	This is a generic model search that resturns ids which can be joined with the original table
 	we dont do it ine one because we want to dedup and take min distance on multiple embeddings 
 	
+	The nearest candidates are read first with ORDER BY distance LIMIT k * candidate_factor so that the
+	approximate nearest neighbour index on the embeddings table can be used (see SqlModelHelper.create_embedding_index_scripts).
+	The index is a partial expression index per embedding model so we cast to the same typed vector and filter on the model.
+	Only then do we dedup per source record, apply the threshold and join the entity table.
+	ef_search (hnsw) and ivfflat_probes trade recall for speed for this call only.
+	
 	select  * from p8.vector_search_entity('what sql queries do we have for generating uuids from json', 'p8.PercolateAgent')
+	select  * from p8.vector_search_entity('what sql queries do we have for generating uuids from json', 'p8.PercolateAgent', 0.75, 10, ef_search=>100)
 	*/
     -- Format the entity name to include the schema if not already present
     SELECT CASE 
@@ -1708,30 +1738,51 @@ BEGIN
     END INTO entity_name;
 
     -- Compute the embedding for the question
-    embedding_for_text := p8.get_embedding_for_text(question);
+    SELECT embedding INTO embedding_for_text FROM p8.get_embedding_for_text(question, embedding_model);
+
+    -- pgvector can only index up to 2000 dimensions as vector so larger models are indexed as halfvec
+    vector_type := CASE
+        WHEN vector_dims(embedding_for_text) <= 2000 THEN FORMAT('vector(%s)', vector_dims(embedding_for_text))
+        ELSE FORMAT('halfvec(%s)', vector_dims(embedding_for_text))
+    END;
 
     -- Extract schema and table name from the entity name (assuming format schema.table)
     schema_name := split_part(entity_name, '.', 1);
     table_name := split_part(entity_name, '.', 2);
 
-    -- Construct the dynamic query using a CTE to order by vdistance and limit results
+    -- Several embeddings can belong to one record so we read more candidates than we return
+    candidate_limit := limit_results * GREATEST(candidate_factor, 1);
+
+    -- The index scan returns at most ef_search rows so it must cover the candidates - settings are local to the transaction
+    PERFORM set_config('hnsw.ef_search', GREATEST(COALESCE(ef_search, 40), LEAST(candidate_limit, 1000))::TEXT, true);
+    IF ivfflat_probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', ivfflat_probes::TEXT, true);
+    END IF;
+
     vector_search_query := FORMAT(
-        'WITH vector_search_results AS (
-            SELECT b.id, MIN(a.embedding_vector <-> %L) AS vdistance
-            FROM p8_embeddings."%s_%s_embeddings" a
-            JOIN %s.%I b ON b.id = a.source_record_id
-            WHERE a.embedding_vector <-> %L <= %L
-            GROUP BY b.id
+        'WITH candidates AS (
+            SELECT a.source_record_id, a.embedding_vector::%1$s <-> $1::%1$s AS vdistance
+            FROM p8_embeddings."%2$s_%3$s_embeddings" a
+            WHERE a.embedding_name = $2
+            ORDER BY a.embedding_vector::%1$s <-> $1::%1$s
+            LIMIT $3
+        ), vector_search_results AS (
+            SELECT source_record_id AS id, MIN(vdistance) AS vdistance
+            FROM candidates
+            WHERE vdistance <= $4
+            GROUP BY source_record_id
         )
-        SELECT id, vdistance
-        FROM vector_search_results
-        ORDER BY vdistance
-        LIMIT %s',
-        embedding_for_text, schema_name, table_name, schema_name, table_name, embedding_for_text, distance_threshold, limit_results
+        SELECT r.id, r.vdistance::double precision
+        FROM vector_search_results r
+        JOIN %2$s.%4$I b ON b.id = r.id
+        ORDER BY r.vdistance
+        LIMIT $5',
+        vector_type, schema_name, table_name, table_name
     );
 
     -- Execute the query and return the results
-    RETURN QUERY EXECUTE vector_search_query;
+    RETURN QUERY EXECUTE vector_search_query
+        USING embedding_for_text, embedding_model, candidate_limit, distance_threshold, limit_results;
 END;
 $BODY$;
 
@@ -2150,6 +2201,113 @@ END;
 $BODY$;
 
 
+-- Function from: index/embedding_cache.sql
+------------------------------------------------------------
+-- Query embeddings are cached in p8."EmbeddingCache" (a registered model) by model and a hash of the normalized text
+-- so repeated searches do not call the provider. Lookups only read - entries expire by created_at (see p8.evict_embedding_cache)
+
+CREATE OR REPLACE FUNCTION p8.embedding_text_hash(
+    description_text TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    texts that differ only by surrounding or repeated whitespace share a cache entry
+    this must match percolate.utils.embedding.embedding_text_hash
+    select p8.embedding_text_hash('  what is   percolate ')
+    */
+    SELECT md5(regexp_replace(btrim(description_text, E' \t\r\n'), '\s+', ' ', 'g'));
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.embedding_cache_id(
+    embedding_model TEXT,
+    text_hash TEXT
+)
+RETURNS UUID
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    the primary key of a cache entry - this must match percolate.utils.embedding.embedding_cache_id
+    select p8.embedding_cache_id('text-embedding-ada-002', p8.embedding_text_hash('what is percolate'))
+    */
+    SELECT md5(embedding_model || ':' || text_hash)::uuid;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.get_cached_embedding;
+CREATE OR REPLACE FUNCTION p8.get_cached_embedding(
+    description_text TEXT,
+    embedding_model TEXT DEFAULT 'text-embedding-ada-002',
+    cache_ttl INTERVAL DEFAULT INTERVAL '30 days'
+)
+RETURNS VECTOR
+LANGUAGE plpgsql
+STABLE
+AS $BODY$
+BEGIN
+    /*
+    returns the cached embedding or null - entries older than the ttl are treated as missing
+    select p8.get_cached_embedding('what is percolate')
+    */
+    RETURN (
+        SELECT c.embedding
+        FROM p8."EmbeddingCache" c
+        WHERE c.id = p8.embedding_cache_id(get_cached_embedding.embedding_model, p8.embedding_text_hash(description_text))
+          AND c.created_at > CURRENT_TIMESTAMP - cache_ttl
+    );
+END;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.cache_embedding;
+CREATE OR REPLACE FUNCTION p8.cache_embedding(
+    description_text TEXT,
+    embedding_model TEXT,
+    embedding VECTOR
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    hashed TEXT := p8.embedding_text_hash(description_text);
+BEGIN
+    INSERT INTO p8."EmbeddingCache" (id, embedding_model, text_hash, embedding)
+    VALUES (p8.embedding_cache_id(cache_embedding.embedding_model, hashed), cache_embedding.embedding_model, hashed, cache_embedding.embedding)
+    ON CONFLICT (id) DO UPDATE
+    SET embedding = EXCLUDED.embedding, created_at = CURRENT_TIMESTAMP;
+END;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.evict_embedding_cache;
+CREATE OR REPLACE FUNCTION p8.evict_embedding_cache(
+    cache_ttl INTERVAL DEFAULT INTERVAL '30 days',
+    batch_size INTEGER DEFAULT 1000
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    evicted INTEGER;
+BEGIN
+    /*
+    drop up to batch_size expired entries - the oldest first on the created_at index (embedding_cache_created_at_idx)
+    so a call is cheap and can run from a scheduler or a worker until it returns 0
+    select p8.evict_embedding_cache()
+    */
+    DELETE FROM p8."EmbeddingCache" c
+    WHERE c.id IN (
+        SELECT id FROM p8."EmbeddingCache"
+        WHERE created_at <= CURRENT_TIMESTAMP - cache_ttl
+        ORDER BY created_at
+        LIMIT batch_size
+    );
+    GET DIAGNOSTICS evicted = ROW_COUNT;
+    RETURN evicted;
+END;
+$BODY$;
+
+
 -- Function from: index/fetch_embeddings.sql
 ------------------------------------------------------------
 DROP FUNCTION IF EXISTS p8.fetch_embeddings;
@@ -2557,7 +2715,8 @@ DROP FUNCTION IF EXISTS p8.get_embedding_for_text;
 
 CREATE OR REPLACE FUNCTION p8.get_embedding_for_text(
 	description_text text,
-	embedding_model text DEFAULT 'text-embedding-ada-002'::text)
+	embedding_model text DEFAULT 'text-embedding-ada-002'::text,
+	use_cache boolean DEFAULT true)
 RETURNS TABLE(embedding vector) 
 LANGUAGE 'plpgsql'
 COST 100
@@ -2570,6 +2729,7 @@ DECLARE
     embedding_response JSONB;
     request_url TEXT;
     use_ollama BOOLEAN;
+    cached_embedding VECTOR;
 BEGIN
     /*
         for now we have a crude way of assuming ollama for open source models
@@ -2580,6 +2740,15 @@ BEGIN
             }'
     */
 
+    -- Step 0: Repeated questions are served from the embedding cache (see p8.get_cached_embedding)
+    IF use_cache THEN
+        cached_embedding := p8.get_cached_embedding(description_text, embedding_model);
+        IF cached_embedding IS NOT NULL THEN
+            RETURN QUERY SELECT cached_embedding;
+            RETURN;
+        END IF;
+    END IF;
+
     -- Step 1: Check if the model is in the list of hardcoded Ollama models
     use_ollama := embedding_model IN ('bge-m3');
 
@@ -2620,9 +2789,15 @@ BEGIN
     );
 
     -- Step 3: Extract the embedding and convert it to a PG vector
+    cached_embedding := VECTOR((embedding_response->'data'->0->'embedding')::text);
+
+    -- only misses write - expired entries are removed by p8.evict_embedding_cache
+    IF use_cache THEN
+        PERFORM p8.cache_embedding(description_text, embedding_model, cached_embedding);
+    END IF;
+
     RETURN QUERY
-    SELECT
-        VECTOR((embedding_response->'data'->0->'embedding')::text) AS embedding;
+    SELECT cached_embedding AS embedding;
 
 END;
 $BODY$;
@@ -3785,6 +3960,99 @@ ALTER FUNCTION p8.nl2sql(text, character varying, character varying, character v
     OWNER TO postgres;
 
 
+-- Function from: requests/nl2sql_cached.sql
+------------------------------------------------------------
+-- Generated SQL is cached in p8."Nl2SqlCache" (a registered model) per entity, normalized question and entity schema
+-- so repeated questions skip the LLM. Failed generations are not cached
+
+CREATE OR REPLACE FUNCTION p8.entity_schema_hash(
+    entity_name TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+AS $BODY$
+    /*
+    a fingerprint of the entity table columns
+    select p8.entity_schema_hash('p8.Agent')
+    */
+    SELECT md5(COALESCE(string_agg(c.column_name || ' ' || c.data_type, ',' ORDER BY c.ordinal_position), ''))
+    FROM information_schema.columns c
+    WHERE c.table_schema = split_part($1, '.', 1)
+      AND c.table_name = split_part($1, '.', 2);
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.nl2sql_cache_id(
+    entity_name TEXT,
+    question_hash TEXT,
+    schema_hash TEXT
+)
+RETURNS UUID
+LANGUAGE sql
+IMMUTABLE
+AS $BODY$
+    /*
+    the primary key of a cache entry
+    select p8.nl2sql_cache_id('p8.Agent', p8.embedding_text_hash('agents created this week'), p8.entity_schema_hash('p8.Agent'))
+    */
+    SELECT md5(entity_name || ':' || question_hash || ':' || schema_hash)::uuid;
+$BODY$;
+
+DROP FUNCTION IF EXISTS p8.nl2sql_cached;
+CREATE OR REPLACE FUNCTION p8.nl2sql_cached(
+    question TEXT,
+    agent_name TEXT,
+    model_in TEXT DEFAULT 'gpt-4.1-mini',
+    cache_ttl INTERVAL DEFAULT INTERVAL '7 days'
+)
+RETURNS TABLE(query TEXT, confidence NUMERIC, cached BOOLEAN)
+LANGUAGE plpgsql
+AS $BODY$
+#variable_conflict use_column
+DECLARE
+    q_hash TEXT;
+    s_hash TEXT;
+BEGIN
+    /*
+    p8.nl2sql with a cache keyed by (entity, normalized question, entity schema)
+    select * from p8.nl2sql_cached('agents created this week', 'p8.Agent')
+    */
+    IF agent_name NOT LIKE '%.%' THEN
+        agent_name := 'public.' || agent_name;
+    END IF;
+
+    q_hash := p8.embedding_text_hash(question);
+    s_hash := p8.entity_schema_hash(agent_name);
+
+    RETURN QUERY
+    SELECT c.query, c.confidence::NUMERIC, true
+    FROM p8."Nl2SqlCache" c
+    WHERE c.id = p8.nl2sql_cache_id(agent_name, q_hash, s_hash)
+      AND c.created_at > CURRENT_TIMESTAMP - cache_ttl;
+    IF FOUND THEN
+        RETURN;
+    END IF;
+
+    -- entries for old schemas can never be hit again
+    DELETE FROM p8."Nl2SqlCache" c WHERE c.entity_name = agent_name AND c.schema_hash <> s_hash;
+
+    RETURN QUERY
+    WITH generated AS (
+        SELECT n.query, n.confidence FROM p8.nl2sql(question, agent_name, model_in) n
+    ), saved AS (
+        -- a failed generation returns a null query and must not be served from the cache
+        INSERT INTO p8."Nl2SqlCache" (id, entity_name, question_hash, schema_hash, query, confidence)
+        SELECT p8.nl2sql_cache_id(agent_name, q_hash, s_hash), agent_name, q_hash, s_hash, g.query, g.confidence
+        FROM generated g
+        WHERE g.query IS NOT NULL
+        ON CONFLICT (id) DO UPDATE
+        SET query = EXCLUDED.query, confidence = EXCLUDED.confidence, created_at = CURRENT_TIMESTAMP
+    )
+    SELECT g.query, g.confidence, false FROM generated g;
+END;
+$BODY$;
+
+
 -- Function from: requests/request_by_scheme.sql
 ------------------------------------------------------------
 --select * from p8."LanguageModelApi"
@@ -6928,6 +7196,63 @@ END;
 $$ LANGUAGE plpgsql;
 
 
+-- Function from: utils/notify_table_changes.sql
+------------------------------------------------------------
+CREATE OR REPLACE FUNCTION p8.notify_table_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $BODY$
+DECLARE
+    row_data JSONB;
+BEGIN
+    /*
+    sends a json payload {table, op, id, name} on the channel given as the trigger argument
+    clients use this to invalidate in-process caches - see PostgresNotificationListener
+    */
+    row_data := CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD) ELSE to_jsonb(NEW) END;
+    PERFORM pg_notify(
+        TG_ARGV[0],
+        jsonb_build_object(
+            'table', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', row_data->>'id',
+            'name', row_data->>'name'
+        )::TEXT
+    );
+    RETURN NULL;
+END;
+$BODY$;
+
+CREATE OR REPLACE FUNCTION p8.attach_change_notify(
+    table_name TEXT,
+    channel TEXT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $BODY$
+BEGIN
+    /*
+    notify the channel when rows of the table change - does nothing if the table does not exist yet
+    select p8.attach_change_notify('p8.LanguageModelApi', 'p8_language_model_api')
+    */
+    IF to_regclass(FORMAT('%I.%I', split_part(table_name, '.', 1), split_part(table_name, '.', 2))) IS NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE FORMAT('DROP TRIGGER IF EXISTS %I ON %I.%I',
+        'notify_change_' || channel, split_part(table_name, '.', 1), split_part(table_name, '.', 2));
+    EXECUTE FORMAT(
+        'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I.%I FOR EACH ROW EXECUTE FUNCTION p8.notify_table_change(%L)',
+        'notify_change_' || channel, split_part(table_name, '.', 1), split_part(table_name, '.', 2), channel
+    );
+END;
+$BODY$;
+
+-- tables that are cached by clients - on a fresh install the tables are created later and attached in 10_finalize.sql
+SELECT p8.attach_change_notify('p8.LanguageModelApi', 'p8_language_model_api');
+SELECT p8.attach_change_notify('p8.Agent', 'p8_agent');
+
+
 -- Function from: utils/ping_api.sql
 ------------------------------------------------------------
 DROP FUNCTION IF EXISTS p8.ping_api();
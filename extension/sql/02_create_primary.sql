@@ -657,3 +657,92 @@ EXECUTE FUNCTION update_updated_at_column();
 SELECT p8.attach_rls_policy('p8', 'Audit');
             
 -- ------------------
+
+-- register entity (p8.Job)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS  p8."Job" (
+finished_at TIMESTAMP,
+    queue TEXT NOT NULL,
+    userid UUID,
+    payload JSON,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    required_access_level INTEGER DEFAULT 100,
+    id UUID PRIMARY KEY ,
+    run_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    result JSON,
+    groupid TEXT,
+    name TEXT,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    locked_by TEXT,
+    max_attempts INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+DROP TRIGGER IF EXISTS update_updated_at_trigger ON p8."Job";
+CREATE   TRIGGER update_updated_at_trigger
+BEFORE UPDATE ON p8."Job"
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at_column();
+
+        
+-- Apply row-level security policy
+SELECT p8.attach_rls_policy('p8', 'Job');
+            
+-- ------------------
+
+-- register entity (p8.EmbeddingCache)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS  p8."EmbeddingCache" (
+text_hash TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    groupid TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    id UUID PRIMARY KEY ,
+    embedding VECTOR NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    embedding_model TEXT NOT NULL,
+    required_access_level INTEGER DEFAULT 100,
+    userid UUID
+);
+DROP TRIGGER IF EXISTS update_updated_at_trigger ON p8."EmbeddingCache";
+CREATE   TRIGGER update_updated_at_trigger
+BEFORE UPDATE ON p8."EmbeddingCache"
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at_column();
+
+        
+-- Apply row-level security policy
+SELECT p8.attach_rls_policy('p8', 'EmbeddingCache');
+            
+-- ------------------
+
+-- register entity (p8.Nl2SqlCache)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS  p8."Nl2SqlCache" (
+question_hash TEXT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    userid UUID,
+    id UUID PRIMARY KEY ,
+    required_access_level INTEGER DEFAULT 100,
+    query TEXT NOT NULL,
+    entity_name TEXT NOT NULL,
+    schema_hash TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    confidence REAL,
+    groupid TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+DROP TRIGGER IF EXISTS update_updated_at_trigger ON p8."Nl2SqlCache";
+CREATE   TRIGGER update_updated_at_trigger
+BEFORE UPDATE ON p8."Nl2SqlCache"
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at_column();
+
+        
+-- Apply row-level security policy
+SELECT p8.attach_rls_policy('p8', 'Nl2SqlCache');
+            
+-- ------------------
@@ -17,6 +17,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_User_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.User)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_user_embeddings_source_idx ON p8_embeddings."p8_User_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_user_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_User_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.User)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -83,6 +89,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Project_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Project)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_project_embeddings_source_idx ON p8_embeddings."p8_Project_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_project_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Project_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Project)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -135,6 +147,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Agent_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Agent)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_agent_embeddings_source_idx ON p8_embeddings."p8_Agent_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_agent_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Agent_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Agent)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -187,6 +205,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_ModelField_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.ModelField)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_modelfield_embeddings_source_idx ON p8_embeddings."p8_ModelField_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.ModelField)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -241,6 +264,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_LanguageModelApi_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.LanguageModelApi)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_languagemodelapi_embeddings_source_idx ON p8_embeddings."p8_LanguageModelApi_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.LanguageModelApi)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -294,6 +322,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Function_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Function)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_function_embeddings_source_idx ON p8_embeddings."p8_Function_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_function_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Function_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Function)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -350,6 +384,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Session_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Session)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_session_embeddings_source_idx ON p8_embeddings."p8_Session_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_session_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Session_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Session)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -417,6 +457,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_SessionEvaluation_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.SessionEvaluation)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_sessionevaluation_embeddings_source_idx ON p8_embeddings."p8_SessionEvaluation_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.SessionEvaluation)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -461,6 +506,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_AIResponse_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.AIResponse)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_airesponse_embeddings_source_idx ON p8_embeddings."p8_AIResponse_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_airesponse_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_AIResponse_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.AIResponse)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -518,6 +569,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_ApiProxy_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.ApiProxy)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_apiproxy_embeddings_source_idx ON p8_embeddings."p8_ApiProxy_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.ApiProxy)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -567,6 +623,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_PlanModel_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.PlanModel)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_planmodel_embeddings_source_idx ON p8_embeddings."p8_PlanModel_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.PlanModel)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -625,6 +686,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Settings_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Settings)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_settings_embeddings_source_idx ON p8_embeddings."p8_Settings_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.Settings)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -668,6 +734,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_PercolateAgent_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.PercolateAgent)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_percolateagent_embeddings_source_idx ON p8_embeddings."p8_PercolateAgent_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_percolateagent_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_PercolateAgent_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.PercolateAgent)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -731,6 +803,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_IndexAudit_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.IndexAudit)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_indexaudit_embeddings_source_idx ON p8_embeddings."p8_IndexAudit_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.IndexAudit)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -782,6 +859,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Task_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Task)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_task_embeddings_source_idx ON p8_embeddings."p8_Task_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_task_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Task_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Task)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -841,6 +924,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_TaskResources_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.TaskResources)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_taskresources_embeddings_source_idx ON p8_embeddings."p8_TaskResources_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.TaskResources)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -886,6 +974,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_ResearchIteration_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.ResearchIteration)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_researchiteration_embeddings_source_idx ON p8_embeddings."p8_ResearchIteration_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_researchiteration_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_ResearchIteration_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.ResearchIteration)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -942,6 +1036,12 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Resources_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Resources)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_resources_embeddings_source_idx ON p8_embeddings."p8_Resources_embeddings" (source_record_id);
+CREATE INDEX IF NOT EXISTS p8_resources_embeddings_hnsw_text_embedding_ada_002 ON p8_embeddings."p8_Resources_embeddings" USING hnsw ((embedding_vector::vector(1536)) vector_l2_ops) WITH (m = 16, ef_construction = 64) WHERE embedding_name = 'text-embedding-ada-002';
+-- ------------------
+
 -- insert_field_data (p8.Resources)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -1012,6 +1112,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_SessionResources_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.SessionResources)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_sessionresources_embeddings_source_idx ON p8_embeddings."p8_SessionResources_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.SessionResources)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -1056,6 +1161,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Schedule_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Schedule)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_schedule_embeddings_source_idx ON p8_embeddings."p8_Schedule_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.Schedule)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -1109,6 +1219,11 @@ CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Audit_embeddings" (
 
 -- ------------------
 
+-- register_embedding_indexes (p8.Audit)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_audit_embeddings_source_idx ON p8_embeddings."p8_Audit_embeddings" (source_record_id);
+-- ------------------
+
 -- insert_field_data (p8.Audit)------
 -- ------------------
 INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
@@ -1137,6 +1252,174 @@ None```
     ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category = EXCLUDED.category, description = EXCLUDED.description, spec = EXCLUDED.spec, functions = EXCLUDED.functions, metadata = EXCLUDED.metadata;
 -- ------------------
 
+-- register_embeddings (p8.Job)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Job_embeddings" (
+    id UUID PRIMARY KEY,  -- Hash-based unique ID - we typically hash the column key and provider and column being indexed
+    source_record_id UUID NOT NULL,  -- Foreign key to primary table
+    column_name TEXT NOT NULL,  -- Column name for embedded content
+    embedding_vector VECTOR NULL,  -- Embedding vector as an array of floats
+    embedding_name VARCHAR(50),  -- ID for embedding provider
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp for tracking
+    
+    -- Foreign key constraint
+    CONSTRAINT fk_source_table_p8_job
+        FOREIGN KEY (source_record_id) REFERENCES p8."Job"
+        ON DELETE CASCADE
+);
+
+-- ------------------
+
+-- register_embedding_indexes (p8.Job)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_job_embeddings_source_idx ON p8_embeddings."p8_Job_embeddings" (source_record_id);
+-- ------------------
+
+-- insert_field_data (p8.Job)------
+-- ------------------
+INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
+    ('id', 'b9129f0a-786d-e306-5431-7227511776d7', 'p8.Job', 'str', NULL, 'Unique job id', False),
+ ('userid', '0c0ba57e-67e3-ddc9-2b1e-573240f637dc', 'p8.Job', 'str', NULL, 'The user that queued the job', False),
+ ('name', '5205550a-9f58-e895-67cc-b93fe0d3c28d', 'p8.Job', 'str', NULL, 'The registered job handler e.g. agent.run', False),
+ ('queue', '404c8797-d6fd-d7d9-8af7-9397ca65a992', 'p8.Job', 'str', NULL, 'The queue (worker pool) that runs the job', False),
+ ('payload', 'fb298d2c-7e0f-f7df-bbb9-ef336860cd36', 'p8.Job', 'dict', NULL, 'Keyword arguments for the handler', False),
+ ('status', 'c7ec89d3-e773-68be-7e04-3a315e68478e', 'p8.Job', 'str', NULL, 'QUEUED|RUNNING|COMPLETED|FAILED', False),
+ ('attempts', '91e1b211-c691-6289-e6f6-2f85344f6d9c', 'p8.Job', 'int', NULL, 'The number of times the job has been started', False),
+ ('max_attempts', 'a1366291-d84d-c53f-9561-cb86045c6825', 'p8.Job', 'int', NULL, 'Failed jobs are retried with backoff until this many attempts', False),
+ ('run_at', '60576aa0-3eb0-83b2-9974-c4454cfb5ba3', 'p8.Job', 'datetime', NULL, 'The job is not claimed before this time - used for delays and retry backoff', False),
+ ('locked_by', 'f39d5213-eaf6-0d2b-5893-a0d0c0cef5e4', 'p8.Job', 'str', NULL, 'The worker running the job', False),
+ ('locked_at', 'b6f63c09-ab5b-2237-88ab-e666a6fa9372', 'p8.Job', 'datetime', NULL, 'When the worker claimed the job', False),
+ ('finished_at', '1c4f0c24-9104-f9b3-4616-f23dc3f40bde', 'p8.Job', 'datetime', NULL, 'When the job completed or finally failed', False),
+ ('result', 'c20fb3cf-27a0-7ee7-1ffc-92e50a78b223', 'p8.Job', 'dict', NULL, 'The handler result', False),
+ ('error', '7c90502f-5583-b5f9-803f-f331283c02af', 'p8.Job', 'str', NULL, 'The last error', False)
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, entity_name = EXCLUDED.entity_name, field_type = EXCLUDED.field_type, embedding_provider = EXCLUDED.embedding_provider, description = EXCLUDED.description, is_key = EXCLUDED.is_key;
+-- ------------------
+
+-- insert_agent_data (p8.Job)------
+-- ------------------
+INSERT INTO p8."Agent" (name, id, category, description, spec, functions, metadata) VALUES
+    ('p8.Job', '10d28880-164b-54a1-bba6-efe93590c12f', NULL, '# Agent - p8.Job
+A durable unit of background work e.g. an agent run. Jobs are claimed by `p8 worker` processes - see `percolate.services.tasks.JobQueue`
+# Schema
+
+```{''''description'''': ''''A durable unit of background work e.g. an agent run. Jobs are claimed by `p8 worker` processes - see `percolate.services.tasks.JobQueue`'''', ''''properties'''': {''''id'''': {''''anyOf'''': [{''''type'''': ''''string''''}, {''''format'''': ''''uuid'''', ''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''Unique job id'''', ''''title'''': ''''Id''''}, ''''userid'''': {''''anyOf'''': [{''''type'''': ''''string''''}, {''''format'''': ''''uuid'''', ''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The user that queued the job'''', ''''title'''': ''''Userid''''}, ''''name'''': {''''description'''': ''''The registered job handler e.g. agent.run'''', ''''title'''': ''''Name'''', ''''type'''': ''''string''''}, ''''queue'''': {''''default'''': ''''default'''', ''''description'''': ''''The queue (worker pool) that runs the job'''', ''''title'''': ''''Queue'''', ''''type'''': ''''string''''}, ''''payload'''': {''''anyOf'''': [{''''additionalProperties'''': True, ''''type'''': ''''object''''}, {''''type'''': ''''null''''}], ''''description'''': ''''Keyword arguments for the handler'''', ''''title'''': ''''Payload''''}, ''''status'''': {''''default'''': ''''QUEUED'''', ''''description'''': ''''QUEUED|RUNNING|COMPLETED|FAILED'''', ''''title'''': ''''Status'''', ''''type'''': ''''string''''}, ''''attempts'''': {''''default'''': 0, ''''description'''': ''''The number of times the job has been started'''', ''''title'''': ''''Attempts'''', ''''type'''': ''''integer''''}, ''''max_attempts'''': {''''default'''': 3, ''''description'''': ''''Failed jobs are retried with backoff until this many attempts'''', ''''title'''': ''''Max Attempts'''', ''''type'''': ''''integer''''}, ''''run_at'''': {''''anyOf'''': [{''''format'''': ''''date-time'''', ''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The job is not claimed before this time - used for delays and retry backoff'''', ''''title'''': ''''Run At''''}, ''''locked_by'''': {''''anyOf'''': [{''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The worker running the job'''', ''''title'''': ''''Locked By''''}, ''''locked_at'''': {''''anyOf'''': [{''''format'''': ''''date-time'''', ''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''When the worker claimed the job'''', ''''title'''': ''''Locked At''''}, ''''finished_at'''': {''''anyOf'''': [{''''format'''': ''''date-time'''', ''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''When the job completed or finally failed'''', ''''title'''': ''''Finished At''''}, ''''result'''': {''''anyOf'''': [{''''additionalProperties'''': True, ''''type'''': ''''object''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The handler result'''', ''''title'''': ''''Result''''}, ''''error'''': {''''anyOf'''': [{''''type'''': ''''string''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The last error'''', ''''title'''': ''''Error''''}}, ''''required'''': [''''name''''], ''''title'''': ''''Job'''', ''''type'''': ''''object''''}``` 
+
+# Functions
+ ```
+None```
+            ', '{"description": "A durable unit of background work e.g. an agent run. Jobs are claimed by `p8 worker` processes - see `percolate.services.tasks.JobQueue`", "properties": {"id": {"anyOf": [{"type": "string"}, {"format": "uuid", "type": "string"}, {"type": "null"}], "default": null, "description": "Unique job id", "title": "Id"}, "userid": {"anyOf": [{"type": "string"}, {"format": "uuid", "type": "string"}, {"type": "null"}], "default": null, "description": "The user that queued the job", "title": "Userid"}, "name": {"description": "The registered job handler e.g. agent.run", "title": "Name", "type": "string"}, "queue": {"default": "default", "description": "The queue (worker pool) that runs the job", "title": "Queue", "type": "string"}, "payload": {"anyOf": [{"additionalProperties": true, "type": "object"}, {"type": "null"}], "description": "Keyword arguments for the handler", "title": "Payload"}, "status": {"default": "QUEUED", "description": "QUEUED|RUNNING|COMPLETED|FAILED", "title": "Status", "type": "string"}, "attempts": {"default": 0, "description": "The number of times the job has been started", "title": "Attempts", "type": "integer"}, "max_attempts": {"default": 3, "description": "Failed jobs are retried with backoff until this many attempts", "title": "Max Attempts", "type": "integer"}, "run_at": {"anyOf": [{"format": "date-time", "type": "string"}, {"type": "null"}], "default": null, "description": "The job is not claimed before this time - used for delays and retry backoff", "title": "Run At"}, "locked_by": {"anyOf": [{"type": "string"}, {"type": "null"}], "default": null, "description": "The worker running the job", "title": "Locked By"}, "locked_at": {"anyOf": [{"format": "date-time", "type": "string"}, {"type": "null"}], "default": null, "description": "When the worker claimed the job", "title": "Locked At"}, "finished_at": {"anyOf": [{"format": "date-time", "type": "string"}, {"type": "null"}], "default": null, "description": "When the job completed or finally failed", "title": "Finished At"}, "result": {"anyOf": [{"additionalProperties": true, "type": "object"}, {"type": "null"}], "default": null, "description": "The handler result", "title": "Result"}, "error": {"anyOf": [{"type": "string"}, {"type": "null"}], "default": null, "description": "The last error", "title": "Error"}}, "required": ["name"], "title": "Job", "type": "object"}', NULL, '{}')
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category = EXCLUDED.category, description = EXCLUDED.description, spec = EXCLUDED.spec, functions = EXCLUDED.functions, metadata = EXCLUDED.metadata;
+-- ------------------
+
+-- register_entities (p8.Job)------
+-- ------------------
+select * from p8.register_entities('p8.Job');
+-- ------------------
+
+-- register_embeddings (p8.EmbeddingCache)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_EmbeddingCache_embeddings" (
+    id UUID PRIMARY KEY,  -- Hash-based unique ID - we typically hash the column key and provider and column being indexed
+    source_record_id UUID NOT NULL,  -- Foreign key to primary table
+    column_name TEXT NOT NULL,  -- Column name for embedded content
+    embedding_vector VECTOR NULL,  -- Embedding vector as an array of floats
+    embedding_name VARCHAR(50),  -- ID for embedding provider
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp for tracking
+    
+    -- Foreign key constraint
+    CONSTRAINT fk_source_table_p8_embeddingcache
+        FOREIGN KEY (source_record_id) REFERENCES p8."EmbeddingCache"
+        ON DELETE CASCADE
+);
+
+-- ------------------
+
+-- register_embedding_indexes (p8.EmbeddingCache)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_embeddingcache_embeddings_source_idx ON p8_embeddings."p8_EmbeddingCache_embeddings" (source_record_id);
+-- ------------------
+
+-- insert_field_data (p8.EmbeddingCache)------
+-- ------------------
+INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
+    ('id', 'dd5d2473-ea8a-8323-4c5b-3e62c995dde0', 'p8.EmbeddingCache', 'uuid.UUID | str', NULL, 'md5 of the embedding model and text hash as a uuid - see p8.embedding_cache_id', False),
+ ('embedding_model', 'd420d026-23cd-aa0e-3378-9ce3f8e53086', 'p8.EmbeddingCache', 'str', NULL, 'The embedding model e.g. text-embedding-ada-002', False),
+ ('text_hash', '4acd643e-ddd1-9e1a-f1e3-e135222583a9', 'p8.EmbeddingCache', 'str', NULL, 'md5 of the normalized text - see p8.embedding_text_hash', False),
+ ('embedding', '0e262085-2d01-db7e-57f6-39dd8b42eed2', 'p8.EmbeddingCache', 'float', NULL, 'The embedding vector', False)
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, entity_name = EXCLUDED.entity_name, field_type = EXCLUDED.field_type, embedding_provider = EXCLUDED.embedding_provider, description = EXCLUDED.description, is_key = EXCLUDED.is_key;
+-- ------------------
+
+-- insert_agent_data (p8.EmbeddingCache)------
+-- ------------------
+INSERT INTO p8."Agent" (name, id, category, description, spec, functions, metadata) VALUES
+    ('p8.EmbeddingCache', '729fca07-43a4-5f33-aafa-be670a49560a', NULL, '# Agent - p8.EmbeddingCache
+Query embeddings cached by embedding model and a hash of the whitespace-normalized text.
+    Rows are written by p8.get_embedding_for_text and (when enabled) percolate.utils.embedding and expire by created_at
+    
+# Schema
+
+```{''''description'''': ''''Query embeddings cached by embedding model and a hash of the whitespace-normalized text.\nRows are written by p8.get_embedding_for_text and (when enabled) percolate.utils.embedding and expire by created_at'''', ''''properties'''': {''''id'''': {''''anyOf'''': [{''''format'''': ''''uuid'''', ''''type'''': ''''string''''}, {''''type'''': ''''string''''}], ''''description'''': ''''md5 of the embedding model and text hash as a uuid - see p8.embedding_cache_id'''', ''''title'''': ''''Id''''}, ''''embedding_model'''': {''''description'''': ''''The embedding model e.g. text-embedding-ada-002'''', ''''title'''': ''''Embedding Model'''', ''''type'''': ''''string''''}, ''''text_hash'''': {''''description'''': ''''md5 of the normalized text - see p8.embedding_text_hash'''', ''''title'''': ''''Text Hash'''', ''''type'''': ''''string''''}, ''''embedding'''': {''''description'''': ''''The embedding vector'''', ''''items'''': {''''type'''': ''''number''''}, ''''sql_type'''': ''''VECTOR'''', ''''title'''': ''''Embedding'''', ''''type'''': ''''array''''}}, ''''required'''': [''''id'''', ''''embedding_model'''', ''''text_hash'''', ''''embedding''''], ''''title'''': ''''EmbeddingCache'''', ''''type'''': ''''object''''}``` 
+
+# Functions
+ ```
+None```
+            ', '{"description": "Query embeddings cached by embedding model and a hash of the whitespace-normalized text.\nRows are written by p8.get_embedding_for_text and (when enabled) percolate.utils.embedding and expire by created_at", "properties": {"id": {"anyOf": [{"format": "uuid", "type": "string"}, {"type": "string"}], "description": "md5 of the embedding model and text hash as a uuid - see p8.embedding_cache_id", "title": "Id"}, "embedding_model": {"description": "The embedding model e.g. text-embedding-ada-002", "title": "Embedding Model", "type": "string"}, "text_hash": {"description": "md5 of the normalized text - see p8.embedding_text_hash", "title": "Text Hash", "type": "string"}, "embedding": {"description": "The embedding vector", "items": {"type": "number"}, "sql_type": "VECTOR", "title": "Embedding", "type": "array"}}, "required": ["id", "embedding_model", "text_hash", "embedding"], "title": "EmbeddingCache", "type": "object"}', NULL, '{}')
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category = EXCLUDED.category, description = EXCLUDED.description, spec = EXCLUDED.spec, functions = EXCLUDED.functions, metadata = EXCLUDED.metadata;
+-- ------------------
+
+-- register_embeddings (p8.Nl2SqlCache)------
+-- ------------------
+CREATE TABLE  IF NOT EXISTS p8_embeddings."p8_Nl2SqlCache_embeddings" (
+    id UUID PRIMARY KEY,  -- Hash-based unique ID - we typically hash the column key and provider and column being indexed
+    source_record_id UUID NOT NULL,  -- Foreign key to primary table
+    column_name TEXT NOT NULL,  -- Column name for embedded content
+    embedding_vector VECTOR NULL,  -- Embedding vector as an array of floats
+    embedding_name VARCHAR(50),  -- ID for embedding provider
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp for tracking
+    
+    -- Foreign key constraint
+    CONSTRAINT fk_source_table_p8_nl2sqlcache
+        FOREIGN KEY (source_record_id) REFERENCES p8."Nl2SqlCache"
+        ON DELETE CASCADE
+);
+
+-- ------------------
+
+-- register_embedding_indexes (p8.Nl2SqlCache)------
+-- ------------------
+CREATE INDEX IF NOT EXISTS p8_nl2sqlcache_embeddings_source_idx ON p8_embeddings."p8_Nl2SqlCache_embeddings" (source_record_id);
+-- ------------------
+
+-- insert_field_data (p8.Nl2SqlCache)------
+-- ------------------
+INSERT INTO p8."ModelField" (name, id, entity_name, field_type, embedding_provider, description, is_key) VALUES
+    ('id', 'aef97e88-665f-2c05-4ddb-03ebf1f5a171', 'p8.Nl2SqlCache', 'uuid.UUID | str', NULL, 'md5 of the entity, question hash and schema hash as a uuid - see p8.nl2sql_cache_id', False),
+ ('entity_name', '7aef2cf0-788e-423d-2ddf-a9acf5c1ff17', 'p8.Nl2SqlCache', 'str', NULL, 'The fully qualified entity the question was asked about', False),
+ ('question_hash', 'f074e9c9-ec2f-cacc-f67f-8867ecfb33f7', 'p8.Nl2SqlCache', 'str', NULL, 'md5 of the normalized question - see p8.embedding_text_hash', False),
+ ('schema_hash', '8179e077-a8fe-c8b5-6201-08a7171b3a50', 'p8.Nl2SqlCache', 'str', NULL, 'A fingerprint of the entity table columns - see p8.entity_schema_hash', False),
+ ('query', '8966b716-f327-c0ba-5776-6881bab31303', 'p8.Nl2SqlCache', 'str', NULL, 'The generated SQL query', False),
+ ('confidence', 'b5a54a53-ac12-5b16-e153-56a04f9d926f', 'p8.Nl2SqlCache', 'float', NULL, 'The confidence returned with the query', False)
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, entity_name = EXCLUDED.entity_name, field_type = EXCLUDED.field_type, embedding_provider = EXCLUDED.embedding_provider, description = EXCLUDED.description, is_key = EXCLUDED.is_key;
+-- ------------------
+
+-- insert_agent_data (p8.Nl2SqlCache)------
+-- ------------------
+INSERT INTO p8."Agent" (name, id, category, description, spec, functions, metadata) VALUES
+    ('p8.Nl2SqlCache', '85d11da7-4849-5e9e-834a-92c4d2f8c134', NULL, '# Agent - p8.Nl2SqlCache
+SQL generated by p8.nl2sql cached per entity, normalized question and entity schema so repeated questions skip the LLM.
+    Rows are written by p8.nl2sql_cached - only successful generations are stored and a schema change is a cache miss
+    
+# Schema
+
+```{''''description'''': ''''SQL generated by p8.nl2sql cached per entity, normalized question and entity schema so repeated questions skip the LLM.\nRows are written by p8.nl2sql_cached - only successful generations are stored and a schema change is a cache miss'''', ''''properties'''': {''''id'''': {''''anyOf'''': [{''''format'''': ''''uuid'''', ''''type'''': ''''string''''}, {''''type'''': ''''string''''}], ''''description'''': ''''md5 of the entity, question hash and schema hash as a uuid - see p8.nl2sql_cache_id'''', ''''title'''': ''''Id''''}, ''''entity_name'''': {''''description'''': ''''The fully qualified entity the question was asked about'''', ''''title'''': ''''Entity Name'''', ''''type'''': ''''string''''}, ''''question_hash'''': {''''description'''': ''''md5 of the normalized question - see p8.embedding_text_hash'''', ''''title'''': ''''Question Hash'''', ''''type'''': ''''string''''}, ''''schema_hash'''': {''''description'''': ''''A fingerprint of the entity table columns - see p8.entity_schema_hash'''', ''''title'''': ''''Schema Hash'''', ''''type'''': ''''string''''}, ''''query'''': {''''description'''': ''''The generated SQL query'''', ''''title'''': ''''Query'''', ''''type'''': ''''string''''}, ''''confidence'''': {''''anyOf'''': [{''''type'''': ''''number''''}, {''''type'''': ''''null''''}], ''''default'''': None, ''''description'''': ''''The confidence returned with the query'''', ''''title'''': ''''Confidence''''}}, ''''required'''': [''''id'''', ''''entity_name'''', ''''question_hash'''', ''''schema_hash'''', ''''query''''], ''''title'''': ''''Nl2SqlCache'''', ''''type'''': ''''object''''}``` 
+
+# Functions
+ ```
+None```
+            ', '{"description": "SQL generated by p8.nl2sql cached per entity, normalized question and entity schema so repeated questions skip the LLM.\nRows are written by p8.nl2sql_cached - only successful generations are stored and a schema change is a cache miss", "properties": {"id": {"anyOf": [{"format": "uuid", "type": "string"}, {"type": "string"}], "description": "md5 of the entity, question hash and schema hash as a uuid - see p8.nl2sql_cache_id", "title": "Id"}, "entity_name": {"description": "The fully qualified entity the question was asked about", "title": "Entity Name", "type": "string"}, "question_hash": {"description": "md5 of the normalized question - see p8.embedding_text_hash", "title": "Question Hash", "type": "string"}, "schema_hash": {"description": "A fingerprint of the entity table columns - see p8.entity_schema_hash", "title": "Schema Hash", "type": "string"}, "query": {"description": "The generated SQL query", "title": "Query", "type": "string"}, "confidence": {"anyOf": [{"type": "number"}, {"type": "null"}], "default": null, "description": "The confidence returned with the query", "title": "Confidence"}}, "required": ["id", "entity_name", "question_hash", "schema_hash", "query"], "title": "Nl2SqlCache", "type": "object"}', NULL, '{}')
+    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category = EXCLUDED.category, description = EXCLUDED.description, spec = EXCLUDED.spec, functions = EXCLUDED.functions, metadata = EXCLUDED.metadata;
+-- ------------------
+
 
 -- -----------
 -- sample models--
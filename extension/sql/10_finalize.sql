@@ -109,3 +109,17 @@ $$ LANGUAGE plpgsql;
 
 
 --SELECT grant_full_access_all_schemas('app');
+
+-- clients cache these tables in memory and listen for changes - see p8.attach_change_notify
+SELECT p8.attach_change_notify('p8.LanguageModelApi', 'p8_language_model_api');
+SELECT p8.attach_change_notify('p8.Agent', 'p8_agent');
+
+-- expired query embeddings are evicted oldest first - see p8.evict_embedding_cache
+CREATE INDEX IF NOT EXISTS embedding_cache_created_at_idx ON p8."EmbeddingCache" (created_at);
+
+-- cached nl2sql entries for an old entity schema are dropped by entity - see p8.nl2sql_cached
+CREATE INDEX IF NOT EXISTS nl2sql_cache_entity_idx ON p8."Nl2SqlCache" (entity_name);
+
+-- workers claim due jobs per queue with FOR UPDATE SKIP LOCKED - ordered by COALESCE(run_at, created_at) - see percolate.services.tasks.JobQueue
+DROP INDEX IF EXISTS p8.job_claim_idx;
+CREATE INDEX IF NOT EXISTS job_claim_due_idx ON p8."Job" (queue, (COALESCE(run_at, created_at))) WHERE status = 'QUEUED';